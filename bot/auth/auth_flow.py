@@ -21,13 +21,15 @@ from aiogram import exceptions, types
 from aiogram.fsm.context import FSMContext
 
 from bot.config                         import MENU_TIMEOUT
-from bot.database                       import queries as q
+from bot.database                       import queries as q, user_cache
 from bot.database.connection            import get_pool
 from bot.handlers.role_choice_handlers  import ask_role
 from bot.menus                          import show_menu
 from bot.menus.ui_helpers               import delete_messages, close_menu_with_alert
 from bot.states.auth_states             import AuthStates
-from bot.utils.phone                    import cleanse
+from bot.utils                          import chat_lock
+from bot.utils.phone                    import canonical
+from bot.utils.render                   import PARSE_MODE, Template, static
 
 log = logging.getLogger(__name__)
 
@@ -44,6 +46,18 @@ class OnboardingData(TypedDict, total=False):
     warned_plain_text: bool
     active_role: str
 
+# ───────────────── textos (HTML) ─────────────────
+_CONTACT_PROMPT = static(
+    "<b>Precisamos confirmar o seu número.</b>\n"
+    "Clique no botão abaixo 👇"
+)
+_PLAIN_TEXT_WARN = static(
+    "❗ Por favor, <b>não</b> escreva o número manualmente.\n"
+    "Toque no botão <b>ENVIAR CONTACTO</b> para continuar."
+)
+_FOUND = Template("Encontrámos um perfil para <b>{first} {last}</b>.\nÉ você?")
+_LINKED = Template("✅ O utilizador <b>{first} {last}</b> foi associado ao seu Telegram 💬")
+
 # ───────────────── keyboards ─────────────────
 def _contact_kbd() -> types.ReplyKeyboardMarkup:
     """Teclado com botão `request_contact`."""
@@ -85,9 +99,8 @@ async def _ensure_contact_prompt(
 
     prompt = await bot.send_message(
         chat_id,
-        "*Precisamos confirmar o seu número.*\n"
-        "Clique no botão abaixo 👇",
-        parse_mode="Markdown",
+        _CONTACT_PROMPT,
+        parse_mode=PARSE_MODE,
         reply_markup=_contact_kbd(),
     )
     await state.update_data(contact_marker=prompt.message_id)
@@ -105,20 +118,21 @@ async def _expire_contact_request(
 ) -> None:
     try:
         await asyncio.sleep(MENU_TIMEOUT)
-        data: OnboardingData = await state.get_data()
-        waiting = await state.get_state() == AuthStates.WAITING_CONTACT.state
-        if data.get("contact_marker") != msg_id or not waiting:
-            return
-
-        await _purge_warning(bot, chat_id, data)
-        await delete_messages(bot, chat_id, msg_id, soft=False)
-        await state.clear()
-
-        warn = await bot.send_message(
-            chat_id,
-            "⌛ Não obtivemos resposta em 60 s.\n"
-            "Envie /start (ou Menu > Iniciar) para tentar novamente.",
-        )
+        async with chat_lock.hold(chat_id):   # o contacto pode estar a chegar agora
+            data: OnboardingData = await state.get_data()
+            waiting = await state.get_state() == AuthStates.WAITING_CONTACT.state
+            if data.get("contact_marker") != msg_id or not waiting:
+                return
+
+            await _purge_warning(bot, chat_id, data)
+            await delete_messages(bot, chat_id, msg_id, soft=False)
+            await state.clear()
+
+            warn = await bot.send_message(
+                chat_id,
+                "⌛ Não obtivemos resposta em 60 s.\n"
+                "Envie /start (ou Menu > Iniciar) para tentar novamente.",
+            )
         await asyncio.sleep(MENU_TIMEOUT)
         with suppress(exceptions.TelegramBadRequest):
             await warn.delete()
@@ -134,17 +148,18 @@ async def _expire_confirm(
 ) -> None:
     try:
         await asyncio.sleep(MENU_TIMEOUT)
-        if (await state.get_data()).get("confirm_marker") != msg_id:
-            return
+        async with chat_lock.hold(chat_id):   # idem para «Sim/Não»
+            if (await state.get_data()).get("confirm_marker") != msg_id:
+                return
 
-        await state.clear()
-        await delete_messages(bot, chat_id, msg_id, soft=False)
+            await state.clear()
+            await delete_messages(bot, chat_id, msg_id, soft=False)
 
-        warn = await bot.send_message(
-            chat_id,
-            "⌛ Não obtivemos resposta em 60 s.\n"
-            "Envie /start (ou Menu > Iniciar) para tentar novamente.",
-        )
+            warn = await bot.send_message(
+                chat_id,
+                "⌛ Não obtivemos resposta em 60 s.\n"
+                "Envie /start (ou Menu > Iniciar) para tentar novamente.",
+            )
         await asyncio.sleep(MENU_TIMEOUT)
         with suppress(exceptions.TelegramBadRequest):
             await warn.delete()
@@ -166,15 +181,18 @@ async def reject_plain_text(msg: types.Message, state: FSMContext) -> None:
     data: OnboardingData = await state.get_data()
     if not data.get("warned_plain_text"):
         warn = await msg.answer(
-            "❗ Por favor, *não* escreva o número manualmente.\n"
-            "Toque no botão *ENVIAR CONTACTO* para continuar.",
-            parse_mode="Markdown",
+            _PLAIN_TEXT_WARN,
+            parse_mode=PARSE_MODE,
         )
         await state.update_data(warned_plain_text=True, warn_marker=warn.message_id)
 
 
 async def handle_contact(msg: types.Message, state: FSMContext) -> None:
-    phone_digits = cleanse(msg.contact.phone_number)
+    try:
+        phone_digits = canonical(msg.contact.phone_number)    # = user_phones.phone_number
+    except ValueError:
+        log.warning("Contacto com número inválido: %r", msg.contact.phone_number)
+        phone_digits = None
 
     await msg.answer("👍 Obrigado!", reply_markup=types.ReplyKeyboardRemove())
 
@@ -185,7 +203,7 @@ async def handle_contact(msg: types.Message, state: FSMContext) -> None:
         await delete_messages(msg.bot, msg.chat.id, prompt, soft=False)
 
     pool = await get_pool()
-    user = await q.get_user_by_phone(pool, phone_digits)
+    user = await q.get_user_by_phone(pool, phone_digits) if phone_digits else None
     if not user:
         await state.clear()
         await msg.answer("Número não encontrado. Assim que o seu perfil for criado avisaremos 🙏")
@@ -200,9 +218,8 @@ async def handle_contact(msg: types.Message, state: FSMContext) -> None:
     await state.set_state(AuthStates.CONFIRMING_LINK)
 
     confirm = await msg.answer(
-        f"Encontrámos um perfil para *{user['first_name']} {user['last_name']}*.\n"
-        "É você?",
-        parse_mode="Markdown",
+        _FOUND.render(first=user["first_name"], last=user["last_name"]),
+        parse_mode=PARSE_MODE,
         reply_markup=_confirm_kbd(),
     )
     await state.update_data(confirm_marker=confirm.message_id)
@@ -223,15 +240,22 @@ async def confirm_link(cb: types.CallbackQuery, state: FSMContext) -> None:
         return
 
     pool = await get_pool()
-    await q.link_telegram_id(pool, user_id, phone_digits, cb.from_user.id)
-    roles = await q.get_user_roles(pool, user_id)
+    linked = await q.link_telegram_and_get_user(pool, user_id, phone_digits, cb.from_user.id)
+    # a cache ainda tem este TG-ID como «sem utilizador»; o NOTIFY chegaria
+    # depois do próximo clique
+    user_cache.evict_telegram_id(cb.from_user.id)
+    if linked is None:
+        await cb.answer("Sessão expirada. Envie /start novamente.", show_alert=True)
+        await state.clear()
+        return
+    roles = linked["roles"]
 
-    first, last = data.get("first_name", ""), data.get("last_name", "")
+    first, last = linked["first_name"], linked["last_name"]
     await state.clear()
 
     await cb.message.edit_text(
-        f"✅ O utilizador *{first} {last}* foi associado ao seu Telegram 💬",
-        parse_mode="Markdown",
+        _LINKED.render(first=first, last=last),
+        parse_mode=PARSE_MODE,
     )
     await cb.answer()
 
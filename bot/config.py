@@ -45,6 +45,17 @@ SECRET_TOKEN: str = _need("TELEGRAM_SECRET_TOKEN")        # cabeçalho X-Telegra
 WEBHOOK_PATH: str = f"/webhook/{BOT_TOKEN}"
 WEBHOOK_URL:  str = f"https://{DOMAIN}{WEBHOOK_PATH}"
 
+# ───────────── Bot API (sessão HTTP – bot.utils.bot_session) ─────────────
+# BOT_API_BASE vazio → api.telegram.org · ex.: http://telegram-bot-api:8081
+BOT_API_BASE: str              = os.getenv("BOT_API_BASE", "")
+BOT_API_LOCAL: bool            = os.getenv("BOT_API_LOCAL", "0") == "1"         # servidor com --local
+BOT_API_POOL: int              = int(os.getenv("BOT_API_POOL", "100"))          # ligações simultâneas
+BOT_API_KEEPALIVE: float       = float(os.getenv("BOT_API_KEEPALIVE", "30"))    # s; 0 → sem keep-alive
+BOT_API_TIMEOUT: float         = float(os.getenv("BOT_API_TIMEOUT", "15"))      # s por chamada
+BOT_API_UPLOAD_TIMEOUT: float  = float(os.getenv("BOT_API_UPLOAD_TIMEOUT", "300"))  # sendDocument…
+BOT_API_TIMEOUTS: str          = os.getenv("BOT_API_TIMEOUTS", "")              # «método=s,…»
+BOT_API_JSON: str              = os.getenv("BOT_API_JSON", "orjson")            # orjson | json
+
 # ───────────── Base de Dados ─────────────
 DATABASE_URL: str | None = os.getenv("DATABASE_URL")
 if not DATABASE_URL:
@@ -66,10 +77,89 @@ REDIS_PORT:   int = int(os.getenv("REDIS_PORT", "6379"))
 REDIS_DB:     int = int(os.getenv("REDIS_DB",   "0"))
 REDIS_PREFIX: str = os.getenv("REDIS_PREFIX", "fsm")       # chave-prefixo no Redis
 
+# ───────────── Lock por chat (bot.utils.chat_lock) ─────────────
+CHAT_LOCK_REDIS: bool  = os.getenv("CHAT_LOCK_REDIS", "1") == "1"      # 0 → só lock no processo
+CHAT_LOCK_LEASE: float = float(os.getenv("CHAT_LOCK_LEASE", "15"))     # s (renovado a cada lease/3)
+CHAT_LOCK_WAIT: float  = float(os.getenv("CHAT_LOCK_WAIT", "10"))      # s à espera antes de seguir sem ele
+
 # ───────────── Diversos ─────────────
 LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
 TIMEZONE: str  = os.getenv("LOCAL_TIMEZONE", "Europe/Zurich")
 
+# ───────────── Cache de utilizadores (invalidada por NOTIFY) ─────────────
+USER_CACHE_TTL: float = float(os.getenv("USER_CACHE_TTL", "3600"))   # s
+
+# ───────────── Tracing (OTLP/JSON) ─────────────
+# vazio → desligado · caminho → ficheiro JSONL · http(s)://… → collector
+TRACE_EXPORT: str        = os.getenv("TRACE_EXPORT", "")
+TRACE_SAMPLE_RATE: float = float(os.getenv("TRACE_SAMPLE_RATE", "0.05"))   # head sampling
+TRACE_SLOW_MS: float     = float(os.getenv("TRACE_SLOW_MS", "1000"))       # tail sampling
+
+# ───────────── Queries lentas (bot.database.instrumentation) ─────────────
+SLOW_QUERY_MS: float               = float(os.getenv("SLOW_QUERY_MS", "200"))
+SLOW_QUERY_EXPLAIN_INTERVAL: float = float(os.getenv("SLOW_QUERY_EXPLAIN_INTERVAL", "600"))  # s por statement
+
+# ───────────── Logs em PostgreSQL (partições mensais) ─────────────
+LOG_RETENTION_MONTHS: int       = int(os.getenv("LOG_RETENTION_MONTHS", "12"))
+LOG_PARTITIONS_AHEAD: int       = int(os.getenv("LOG_PARTITIONS_AHEAD", "3"))
+LOG_MAINTENANCE_INTERVAL: float = float(os.getenv("LOG_MAINTENANCE_INTERVAL", "86400"))  # s
+
+# ───────────── Estatísticas (vistas materializadas, migração 006) ─────────────
+STATS_REFRESH_INTERVAL: float = float(os.getenv("STATS_REFRESH_INTERVAL", "900"))  # s
+STATS_REFRESH_DEBOUNCE: float = float(os.getenv("STATS_REFRESH_DEBOUNCE", "30"))   # s após escritas
+
+# ───────────── Moloni (faturação – cache local, migração 007) ─────────────
+# MOLONI_CLIENT_ID vazio → sincronização desligada (os ecrãs mostram a cache)
+MOLONI_API_URL: str          = os.getenv("MOLONI_API_URL", "https://api.moloni.pt/v1")
+MOLONI_CLIENT_ID: str        = os.getenv("MOLONI_CLIENT_ID", "")
+MOLONI_CLIENT_SECRET: str    = os.getenv("MOLONI_CLIENT_SECRET", "")
+MOLONI_USERNAME: str         = os.getenv("MOLONI_USERNAME", "")
+MOLONI_PASSWORD: str         = os.getenv("MOLONI_PASSWORD", "")
+MOLONI_COMPANY_ID: int       = int(os.getenv("MOLONI_COMPANY_ID") or "0")
+MOLONI_SYNC_CRON: str        = os.getenv("MOLONI_SYNC_CRON", "*/5 * * * *")      # job no worker
+MOLONI_MAX_CONNECTIONS: int  = int(os.getenv("MOLONI_MAX_CONNECTIONS", "4"))     # pedidos em paralelo
+
+# ───────────── Jobs em segundo plano (bot.jobs · worker.py) ─────────────
+JOBS_PREFIX: str              = os.getenv("JOBS_PREFIX", "jobs")                 # chave-prefixo no Redis
+JOBS_CONCURRENCY: int         = int(os.getenv("JOBS_CONCURRENCY", "4"))          # jobs em paralelo por worker
+JOBS_MAX_TRIES: int           = int(os.getenv("JOBS_MAX_TRIES", "5"))
+JOBS_RETRY_BASE: float        = float(os.getenv("JOBS_RETRY_BASE", "10"))        # s – back-off exponencial
+JOBS_RETRY_MAX: float         = float(os.getenv("JOBS_RETRY_MAX", "900"))        # s
+JOBS_LEASE: float             = float(os.getenv("JOBS_LEASE", "60"))             # s sem heartbeat → volta à fila
+JOBS_KEEP_RESULT: int         = int(os.getenv("JOBS_KEEP_RESULT", "86400"))      # s que o resultado fica legível
+JOBS_SHUTDOWN_TIMEOUT: float  = float(os.getenv("JOBS_SHUTDOWN_TIMEOUT", "25"))  # < stop_grace_period
+
+# ───────────── Lembretes de marcações (migração 008 · job «reminders_dispatch») ─────────────
+REMINDER_LEADS: str         = os.getenv("REMINDER_LEADS", "24,2")           # horas de antecedência
+REMINDERS_CRON: str         = os.getenv("REMINDERS_CRON", "* * * * *")
+REMINDERS_BATCH: int        = int(os.getenv("REMINDERS_BATCH", "100"))       # lembretes por claim
+REMINDERS_RATE: float       = float(os.getenv("REMINDERS_RATE", "25"))       # mensagens/s (Bot API ~30)
+REMINDERS_CONCURRENCY: int  = int(os.getenv("REMINDERS_CONCURRENCY", "8"))   # envios em curso
+REMINDERS_MAX_TRIES: int    = int(os.getenv("REMINDERS_MAX_TRIES", "3"))
+REMINDERS_STALE: float      = float(os.getenv("REMINDERS_STALE", "600"))     # s em «sending» → failed
+
+# ───────────── Relatórios CSV/XLSX (bot.database.reports · job «report_export») ─────────────
+REPORTS_PROCESSES: int   = int(os.getenv("REPORTS_PROCESSES", "2"))     # formatação; 0 → thread
+REPORTS_BATCH: int       = int(os.getenv("REPORTS_BATCH", "2000"))      # linhas por fetch do cursor
+REPORTS_SPOOL_MB: float  = float(os.getenv("REPORTS_SPOOL_MB", "8"))    # acima disto o ficheiro vai para disco
+
+# ───────────── Endpoints /debug/* ─────────────
+# vazio → endpoints desligados; pedido tem de trazer «Authorization: Bearer <token>»
+DEBUG_TOKEN: str = os.getenv("DEBUG_TOKEN", "")
+
+# ───────────── Captura de updates (bot.utils.capture) ─────────────
+# vazio → desligado · caminho → JSONL rotativo com updates pseudonimizados
+CAPTURE_FILE: str      = os.getenv("CAPTURE_FILE", "")
+CAPTURE_MAX_MB: float  = float(os.getenv("CAPTURE_MAX_MB", "50"))
+CAPTURE_BACKUPS: int   = int(os.getenv("CAPTURE_BACKUPS", "5"))
+CAPTURE_SALT: str      = os.getenv("CAPTURE_SALT", "")      # vazio → aleatório por processo
+
+# ───────────── Shutdown (drain) ─────────────
+# prazo total do drain (updates / chamadas Bot API em curso + buffers);
+# fica bem abaixo do stop_grace_period do docker-compose (30 s) para
+# sobrar tempo para fechar HTTP, PostgreSQL e Redis antes do SIGKILL
+DRAIN_TIMEOUT: float = float(os.getenv("DRAIN_TIMEOUT", "20"))
+
 # ───────────── Timeouts (Menus) ─────────────
 MENU_TIMEOUT: int = int(os.getenv("MENU_TIMEOUT", "60"))
 MESSAGE_TIMEOUT: int = int(os.getenv("MESSAGE_TIMEOUT", "60"))
@@ -0,0 +1,174 @@
+# bot/database/appointments.py
+"""
+Lembretes de marcações (migração 008) – lado da BD do dispatcher
+(bot.jobs.reminders).
+
+Cada ronda:
+1. plan()    – cria os lembretes em falta para as sessões das próximas
+               horas: paciente + cuidadores (caregiver_patients) com
+               Telegram ligado, uma linha por (marcação, chat, antecedência);
+               INSERT … ON CONFLICT DO NOTHING, idempotente;
+2. expire()  – pendentes de sessões que já começaram → skipped;
+               «sending» há mais de REMINDERS_STALE s (worker morto) → failed;
+3. claim()   – reclama até N lembretes vencidos com FOR UPDATE SKIP LOCKED
+               e marca-os «sending» na mesma instrução – vários workers
+               podem correr em paralelo sem nunca reclamar a mesma linha;
+4. record()  – grava o resultado de um lote inteiro numa instrução
+               (unnest) – sent / failed / pending com nova hora.
+
+Remarcar / desmarcar / reactivar uma sessão é tratado pelo trigger da
+migração 008 (trg_appointment_reminders_sync): os lembretes existentes
+voltam a pending para a nova hora, mesmo os já enviados.
+
+O scan de vencidos usa o índice parcial ix_appointment_reminders_due
+(só linhas pendentes), por isso não cresce com o histórico.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, List, Optional, Sequence
+
+from bot.database.connection import get_pool
+
+__all__ = ["Outcome", "Reminder", "claim", "expire", "plan", "record"]
+
+
+@dataclass
+class Reminder:
+    reminder_id: int
+    chat_id: int
+    attempts: int                      # já inclui esta tentativa
+    lead: timedelta
+    starts_at: datetime
+    location: Optional[str]
+    patient_name: str
+    physio_name: Optional[str]
+    for_caregiver: bool
+
+
+@dataclass
+class Outcome:
+    reminder_id: int
+    status: str                        # sent | failed | pending (nova tentativa)
+    message_id: Optional[int] = None
+    error: Optional[str] = None
+    retry_at: Optional[datetime] = None
+
+
+_PLAN_SQL = """
+INSERT INTO appointment_reminders (appointment_id, recipient_id, chat_id, lead, due_at)
+SELECT a.appointment_id, r.user_id, p.telegram_user_id, l.lead, a.starts_at - l.lead
+FROM   appointments a
+CROSS  JOIN unnest($1::interval[]) AS l(lead)
+CROSS  JOIN LATERAL (
+           SELECT a.patient_id AS user_id
+           UNION
+           SELECT cp.caregiver_id FROM caregiver_patients cp WHERE cp.patient_id = a.patient_id
+       ) r
+JOIN   user_phones p ON p.user_id = r.user_id AND p.telegram_user_id IS NOT NULL
+WHERE  a.status = 'scheduled'
+  AND  a.starts_at > now()
+  AND  a.starts_at <= now() + $2::interval
+  AND  a.starts_at - l.lead >= a.created_at      -- marcada já dentro da antecedência → não
+ON CONFLICT DO NOTHING
+"""
+
+_SKIP_SQL = """
+UPDATE appointment_reminders r
+SET    status = 'skipped'
+FROM   appointments a
+WHERE  r.status = 'pending' AND r.due_at <= now()
+  AND  a.appointment_id = r.appointment_id AND a.starts_at <= now()
+"""
+
+_STALE_SQL = """
+UPDATE appointment_reminders
+SET    status = 'failed', error = 'envio interrompido – entrega desconhecida'
+WHERE  status = 'sending' AND claimed_at < now() - $1::interval
+"""
+
+_CLAIM_SQL = """
+WITH due AS (
+    SELECT r.reminder_id
+    FROM   appointment_reminders r
+    JOIN   appointments a USING (appointment_id)
+    WHERE  r.status = 'pending' AND r.due_at <= now() AND a.starts_at > now()
+    ORDER  BY r.due_at
+    LIMIT  $1
+    FOR UPDATE OF r SKIP LOCKED
+)
+UPDATE appointment_reminders r
+SET    status = 'sending', attempts = r.attempts + 1, claimed_by = $2, claimed_at = now()
+FROM   due, appointments a
+JOIN   users pu ON pu.user_id = a.patient_id
+LEFT   JOIN users ph ON ph.user_id = a.physiotherapist_id
+WHERE  r.reminder_id = due.reminder_id AND a.appointment_id = r.appointment_id
+RETURNING r.reminder_id, r.chat_id, r.attempts, r.lead, a.starts_at, a.location,
+          pu.first_name || ' ' || pu.last_name        AS patient_name,
+          ph.first_name || ' ' || ph.last_name        AS physio_name,
+          r.recipient_id <> a.patient_id              AS for_caregiver
+"""
+
+_RECORD_SQL = """
+UPDATE appointment_reminders r
+SET    status     = v.status,
+       sent_at    = CASE WHEN v.status = 'sent' THEN now() END,
+       message_id = v.message_id,
+       error      = v.error,
+       due_at     = coalesce(v.retry_at, r.due_at)
+FROM   unnest($1::bigint[], $2::text[], $3::bigint[], $4::text[], $5::timestamptz[])
+           AS v(reminder_id, status, message_id, error, retry_at)
+WHERE  r.reminder_id = v.reminder_id AND r.status = 'sending' AND r.claimed_by = $6
+"""
+
+
+def _reminder(r: Any) -> Reminder:
+    return Reminder(
+        reminder_id=r["reminder_id"],
+        chat_id=r["chat_id"],
+        attempts=r["attempts"],
+        lead=r["lead"],
+        starts_at=r["starts_at"],
+        location=r["location"],
+        patient_name=r["patient_name"],
+        physio_name=r["physio_name"],
+        for_caregiver=r["for_caregiver"],
+    )
+
+
+async def plan(leads: Sequence[timedelta], horizon: timedelta) -> int:
+    """Cria os lembretes em falta para sessões até now() + *horizon*; devolve quantos."""
+    pool = await get_pool()
+    status = await pool.execute(_PLAN_SQL, list(leads), horizon)
+    return int(status.split()[-1])
+
+
+async def expire(stale: timedelta) -> int:
+    """Sessões já começadas → skipped; envios órfãos → failed. Devolve o total."""
+    pool = await get_pool()
+    skipped = await pool.execute(_SKIP_SQL)
+    failed = await pool.execute(_STALE_SQL, stale)
+    return int(skipped.split()[-1]) + int(failed.split()[-1])
+
+
+async def claim(limit: int, worker_id: str) -> List[Reminder]:
+    pool = await get_pool()
+    rows = await pool.fetch(_CLAIM_SQL, limit, worker_id)
+    return sorted((_reminder(r) for r in rows), key=lambda r: r.starts_at)
+
+
+async def record(worker_id: str, outcomes: Sequence[Outcome]) -> None:
+    if not outcomes:
+        return
+    pool = await get_pool()
+    await pool.execute(
+        _RECORD_SQL,
+        [o.reminder_id for o in outcomes],
+        [o.status for o in outcomes],
+        [o.message_id for o in outcomes],
+        [o.error for o in outcomes],
+        [o.retry_at for o in outcomes],
+        worker_id,
+    )
@@ -0,0 +1,356 @@
+# bot/database/billing.py
+"""
+Faturação Moloni em cache local (migração 007).
+
+Os ecrãs «Pagamentos» (paciente) e «Faturas» / «Pagamentos» (contabilista)
+lêem só de moloni_documents – nunca chamam a API Moloni durante um update –
+e só mostram documentos fechados (status 1): rascunhos (0) e anulados (2)
+ficam de fora.
+
+A cache é mantida pelo job «moloni_sync» do worker (bot.jobs.tasks,
+cron MOLONI_SYNC_CRON) – nunca pelo processo do webhook:
+• incremental – documents/getModifiedSince a partir do cursor guardado
+  (o maior «lastmodified» visto), todas as páginas, upsert em lote;
+  o cursor só avança depois de todas as páginas estarem gravadas;
+• backfill – clientes ligados a um user (users.moloni_customer_id) que
+  ainda não estão em moloni_customers recebem o histórico completo,
+  um documents/getAll paginado por cliente, MOLONI_MAX_CONNECTIONS
+  clientes em paralelo.
+Os upserts só substituem uma linha por outra com lastmodified ≥, por
+isso a ordem entre as duas fases (ou rondas repetidas) é indiferente.
+Um advisory lock garante que só uma instância sincroniza de cada vez.
+
+Sem MOLONI_CLIENT_ID o cron não é registado; os ecrãs continuam a
+mostrar o que estiver na cache.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from bot.config import (
+    MOLONI_API_URL,
+    MOLONI_CLIENT_ID,
+    MOLONI_CLIENT_SECRET,
+    MOLONI_COMPANY_ID,
+    MOLONI_MAX_CONNECTIONS,
+    MOLONI_PASSWORD,
+    MOLONI_USERNAME,
+)
+from bot.database.connection import get_pool
+from bot.utils import metrics
+from bot.utils.moloni import MoloniClient, MoloniError
+
+log = logging.getLogger(__name__)
+
+_LOCK_KEY = 0x0B07_B111              # pg_advisory_lock partilhado entre instâncias
+_CURSOR = "documents"
+_BACKFILL_BATCH = 50                 # clientes por ronda
+_MOLONI_TZ = ZoneInfo("Europe/Lisbon")   # a API fala em hora local, sem fuso
+
+# SAF-T → tipo na cache (FR = fatura-recibo: já paga, conta como pagamento)
+_KINDS = {
+    "FT": "invoice", "FS": "invoice", "NC": "invoice", "ND": "invoice",
+    "FR": "payment", "RC": "payment",
+}
+_DEBIT_TYPES = ("FT", "FS", "ND")        # documentos que podem ficar por pagar
+
+_SYNC_SECONDS = metrics.histogram(
+    "moloni_sync_seconds",
+    "Duração de uma ronda de sincronização Moloni",
+    buckets=(0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0),
+)
+_SYNCED = metrics.counter("moloni_documents_synced_total", "Documentos Moloni gravados na cache")
+
+_client: Optional[MoloniClient] = None
+
+
+def enabled() -> bool:
+    return bool(MOLONI_CLIENT_ID)
+
+
+# ───────────────────────────── modelos ─────────────────────────────
+@dataclass
+class Document:
+    number: str
+    doc_type: str
+    doc_date: date
+    due_date: Optional[date]
+    gross_value: Decimal
+    paid_value: Decimal
+    status: int
+    customer_name: Optional[str] = None
+
+    @property
+    def open_value(self) -> Decimal:
+        """Valor em dívida (só faturas fechadas; recibos e notas de crédito não contam)."""
+        if self.status != 1 or self.doc_type not in _DEBIT_TYPES:
+            return Decimal(0)
+        return max(Decimal(0), self.gross_value - self.paid_value)
+
+
+@dataclass
+class CustomerBilling:
+    invoices: List[Document]
+    payments: List[Document]
+    open_total: Decimal
+
+
+def _doc(r: Any) -> Document:
+    return Document(
+        number=r["number"],
+        doc_type=r["doc_type"],
+        doc_date=r["doc_date"],
+        due_date=r["due_date"],
+        gross_value=r["gross_value"],
+        paid_value=r["paid_value"],
+        status=r["status"],
+        customer_name=r.get("customer_name"),
+    )
+
+
+# ───────────────────────────── leitura (handlers) ─────────────────────────────
+_CUSTOMER_SQL = """
+SELECT *
+FROM  (SELECT d.*,
+              row_number() OVER (PARTITION BY kind ORDER BY doc_date DESC, document_id DESC) AS rn,
+              sum(CASE WHEN status = 1 AND doc_type IN ('FT', 'FS', 'ND')
+                       THEN greatest(gross_value - paid_value, 0) ELSE 0 END) OVER () AS open_total
+       FROM   moloni_documents d
+       WHERE  customer_id = $1 AND status = 1) x
+WHERE  rn <= $2
+ORDER  BY kind, rn
+"""
+
+_RECENT_SQL = """
+SELECT d.*, u.first_name || ' ' || u.last_name AS customer_name
+FROM   moloni_documents d
+LEFT   JOIN users u ON u.moloni_customer_id = d.customer_id
+WHERE  d.kind = $1 AND d.status = 1
+ORDER  BY d.doc_date DESC, d.document_id DESC
+LIMIT  $2
+"""
+
+
+async def customer_billing(customer_id: int, limit: int = 5) -> CustomerBilling:
+    """Últimas *limit* faturas e pagamentos de um cliente + total em dívida (1 query)."""
+    pool = await get_pool()
+    rows = await pool.fetch(_CUSTOMER_SQL, customer_id, limit)
+    out = CustomerBilling(invoices=[], payments=[], open_total=Decimal(0))
+    for r in rows:
+        out.open_total = r["open_total"]
+        (out.invoices if r["kind"] == "invoice" else out.payments).append(_doc(r))
+    return out
+
+
+async def recent(kind: str, limit: int = 15) -> List[Document]:
+    """Últimos documentos de um tipo ('invoice' | 'payment'), com o nome do cliente."""
+    pool = await get_pool()
+    return [_doc(r) for r in await pool.fetch(_RECENT_SQL, kind, limit)]
+
+
+async def last_sync() -> Optional[datetime]:
+    pool = await get_pool()
+    return await pool.fetchval("SELECT synced_at FROM moloni_sync_cursor WHERE name = $1", _CURSOR)
+
+
+# ───────────────────────────── conversão ─────────────────────────────
+def _parse_ts(value: str) -> datetime:
+    """«2026-10-01 10:00:00» (hora de Lisboa) ou ISO com fuso → datetime com fuso."""
+    value = value.strip().replace(" ", "T", 1)
+    if value[-5] in "+-" and value[-3] != ":":           # +0000 → +00:00
+        value = f"{value[:-2]}:{value[-2:]}"
+    ts = datetime.fromisoformat(value)
+    return ts if ts.tzinfo else ts.replace(tzinfo=_MOLONI_TZ)
+
+
+def _fmt_ts(ts: datetime) -> str:
+    return ts.astimezone(_MOLONI_TZ).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _row(doc: Dict[str, Any]) -> Optional[Tuple[Any, ...]]:
+    """Documento Moloni → tuplo para o upsert (None se o tipo não interessa)."""
+    saft = (doc.get("document_type") or {}).get("saft_code", "")
+    kind = _KINDS.get(saft)
+    if kind is None or not doc.get("customer_id"):
+        return None
+    number = f"{saft} {doc.get('document_set_name', '')}/{doc.get('number', '')}"
+    gross = Decimal(str(doc.get("gross_value") or 0))
+    paid = gross if saft == "FR" else Decimal(str(doc.get("reconciled_value") or 0))
+    due = doc.get("expiration_date")
+    return (
+        int(doc["document_id"]),
+        int(doc["customer_id"]),
+        kind,
+        saft,
+        number,
+        _parse_ts(doc["date"]).date(),
+        _parse_ts(due).date() if due else None,
+        gross,
+        paid,
+        int(doc.get("status", 1)),
+        _parse_ts(doc["lastmodified"]),
+    )
+
+
+# ───────────────────────────── escrita ─────────────────────────────
+_UPSERT_SQL = """
+INSERT INTO moloni_documents (document_id, customer_id, kind, doc_type, number, doc_date,
+                              due_date, gross_value, paid_value, status, lastmodified)
+SELECT *
+FROM   unnest($1::bigint[], $2::int[], $3::text[], $4::varchar[], $5::text[], $6::date[],
+              $7::date[], $8::numeric[], $9::numeric[], $10::smallint[], $11::timestamptz[])
+ON CONFLICT (document_id) DO UPDATE
+SET    customer_id  = EXCLUDED.customer_id,
+       kind         = EXCLUDED.kind,
+       doc_type     = EXCLUDED.doc_type,
+       number       = EXCLUDED.number,
+       doc_date     = EXCLUDED.doc_date,
+       due_date     = EXCLUDED.due_date,
+       gross_value  = EXCLUDED.gross_value,
+       paid_value   = EXCLUDED.paid_value,
+       status       = EXCLUDED.status,
+       lastmodified = EXCLUDED.lastmodified,
+       synced_at    = now()
+WHERE  EXCLUDED.lastmodified >= moloni_documents.lastmodified
+"""
+
+
+async def _upsert(conn: Any, docs: List[Dict[str, Any]]) -> Optional[datetime]:
+    """Grava um lote numa instrução; devolve o maior lastmodified do lote."""
+    rows = [r for r in map(_row, docs) if r is not None]
+    if rows:
+        await conn.execute(_UPSERT_SQL, *(list(col) for col in zip(*rows)))
+        _SYNCED.inc(len(rows))
+    stamps = [_parse_ts(d["lastmodified"]) for d in docs if d.get("lastmodified")]
+    return max(stamps, default=None)
+
+
+# ───────────────────────────── sincronização ─────────────────────────────
+async def _incremental(conn: Any, client: MoloniClient) -> int:
+    cursor = await conn.fetchval("SELECT lastmodified FROM moloni_sync_cursor WHERE name = $1", _CURSOR)
+    if cursor is None:
+        # primeira ronda: o histórico chega pelo backfill de cada cliente
+        cursor = await conn.fetchval("SELECT now()")
+    newest, n = cursor, 0
+    async for page in client.documents_modified_since(_fmt_ts(cursor)):
+        stamp = await _upsert(conn, page)
+        if stamp is not None and stamp > newest:
+            newest = stamp
+        n += len(page)
+    await conn.execute(
+        """
+        INSERT INTO moloni_sync_cursor (name, lastmodified) VALUES ($1, $2)
+        ON CONFLICT (name) DO UPDATE SET lastmodified = EXCLUDED.lastmodified, synced_at = now()
+        """,
+        _CURSOR, newest,
+    )
+    return n
+
+
+async def _backfill(conn: Any, client: MoloniClient) -> int:
+    pending = [
+        r["moloni_customer_id"]
+        for r in await conn.fetch(
+            """
+            SELECT u.moloni_customer_id
+            FROM   users u
+            LEFT   JOIN moloni_customers mc ON mc.customer_id = u.moloni_customer_id
+            WHERE  u.moloni_customer_id IS NOT NULL AND mc.customer_id IS NULL
+            LIMIT  $1
+            """,
+            _BACKFILL_BATCH,
+        )
+    ]
+    if not pending:
+        return 0
+
+    sem = asyncio.Semaphore(MOLONI_MAX_CONNECTIONS)
+
+    async def fetch(customer_id: int) -> Tuple[int, List[Dict[str, Any]]]:
+        async with sem:
+            return customer_id, await client.customer_documents(customer_id)
+
+    n = 0
+    tasks = [asyncio.ensure_future(fetch(c)) for c in pending]
+    try:
+        for fut in asyncio.as_completed(tasks):
+            try:
+                customer_id, docs = await fut
+            except MoloniError as exc:
+                log.warning("Moloni: backfill de um cliente falhou (%s) – fica para a próxima ronda", exc)
+                continue
+            async with conn.transaction():
+                await _upsert(conn, docs)
+                await conn.execute(
+                    "INSERT INTO moloni_customers (customer_id) VALUES ($1) ON CONFLICT DO NOTHING",
+                    customer_id,
+                )
+            n += len(docs)
+    finally:
+        # qualquer outro erro (BD, cancelamento): nenhum pedido fica órfão
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    log.info("Moloni: backfill de %d cliente(s), %d documento(s)", len(pending), n)
+    return n
+
+
+Progress = Callable[[int, int, str], Awaitable[None]]
+
+
+async def sync_once(
+    client: Optional[MoloniClient] = None,
+    progress: Optional[Progress] = None,
+) -> Optional[Tuple[int, int]]:
+    """Uma ronda; devolve (incrementais, backfill) ou None se outra instância a tem."""
+    client = client or get_client()
+    pool = await get_pool()
+    started = time.perf_counter()
+    async with pool.acquire() as conn:
+        if not await conn.fetchval("SELECT pg_try_advisory_lock($1)", _LOCK_KEY):
+            return None
+        try:
+            if progress:
+                await progress(0, 2, "alterações")
+            changed = await _incremental(conn, client)
+            if progress:
+                await progress(1, 2, "clientes novos")
+            backfilled = await _backfill(conn, client)
+        finally:
+            await conn.execute("SELECT pg_advisory_unlock($1)", _LOCK_KEY)
+    _SYNC_SECONDS.observe(time.perf_counter() - started)
+    log.debug("Moloni: %d alterado(s), %d de backfill", changed, backfilled)
+    return changed, backfilled
+
+
+# ───────────────────────────── cliente partilhado ─────────────────────────────
+def get_client() -> MoloniClient:
+    """Cliente do processo (criado no primeiro uso; uma pool de ligações por processo)."""
+    global _client
+    if _client is None:
+        _client = MoloniClient(
+            MOLONI_API_URL,
+            client_id=MOLONI_CLIENT_ID,
+            client_secret=MOLONI_CLIENT_SECRET,
+            username=MOLONI_USERNAME,
+            password=MOLONI_PASSWORD,
+            company_id=MOLONI_COMPANY_ID,
+            max_connections=MOLONI_MAX_CONNECTIONS,
+        )
+    return _client
+
+
+async def close() -> None:
+    """Fecha as ligações HTTP (shutdown do worker)."""
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
@@ -0,0 +1,183 @@
+# bot/database/care_index.py
+"""
+Índice em memória das relações de cuidado (migração 003).
+
+    caregiver  → {pacientes}      paciente → {cuidadores}
+    fisio      → {pacientes}      paciente → {fisioterapeutas}
+
+Carregado por inteiro no arranque (e após cada re-ligação do listener)
+e actualizado incrementalmente pelos NOTIFY do canal «care_index»,
+emitidos por triggers em caregiver_patients / therapist_patients.
+
+As verificações de autorização dos ecrãs de cuidador e fisioterapeuta
+(«cg:dependents», «ph:patients»…) ficam O(1) e sem SQL:
+
+    care_index.caregiver_may_see(cg_id, patient_id)
+    care_index.therapist_may_see(ph_id, patient_id)
+
+Payload do NOTIFY (JSON compacto):
+    {"t": "cg"|"th", "op": "I"|"D"|"U"|"T", "new": [a, p], "old": [a, p]}
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+from typing import Awaitable, Dict, FrozenSet, List, Optional, Set, Tuple
+
+from bot.database.connection import get_pool
+from bot.database.notify import listener
+from bot.utils import metrics
+
+log = logging.getLogger(__name__)
+
+CHANNEL = "care_index"
+
+_Adj = Dict[str, Set[str]]
+
+_EDGES = metrics.gauge("care_index_edges", "Relações no índice de cuidado")
+_EVENTS = metrics.counter("care_index_events_total", "NOTIFY aplicados ao índice de cuidado")
+_RELOADS = metrics.counter("care_index_reloads_total", "Recargas completas do índice de cuidado")
+
+
+class _Index:
+    """Par de mapas de adjacência (directo + inverso) de uma tabela."""
+
+    __slots__ = ("fwd", "rev")
+
+    def __init__(self) -> None:
+        self.fwd: _Adj = {}
+        self.rev: _Adj = {}
+
+    def add(self, a: str, p: str) -> None:
+        self.fwd.setdefault(a, set()).add(p)
+        self.rev.setdefault(p, set()).add(a)
+
+    def remove(self, a: str, p: str) -> None:
+        for adj, k, v in ((self.fwd, a, p), (self.rev, p, a)):
+            s = adj.get(k)
+            if s is not None:
+                s.discard(v)
+                if not s:
+                    del adj[k]
+
+    def has(self, a: str, p: str) -> bool:
+        return p in self.fwd.get(a, ())
+
+    def __len__(self) -> int:
+        return sum(len(s) for s in self.fwd.values())
+
+
+_caregivers = _Index()
+_therapists = _Index()
+
+_reloading = False
+_buffer: List[str] = []
+
+
+def _by_kind(kind: str) -> _Index:
+    return _caregivers if kind == "cg" else _therapists
+
+
+# ───────────────────────────── consultas ─────────────────────────────
+def caregiver_may_see(caregiver_id: str, patient_id: str) -> bool:
+    return _caregivers.has(str(caregiver_id), str(patient_id))
+
+
+def therapist_may_see(therapist_id: str, patient_id: str) -> bool:
+    return _therapists.has(str(therapist_id), str(patient_id))
+
+
+def patients_of_caregiver(caregiver_id: str) -> FrozenSet[str]:
+    return frozenset(_caregivers.fwd.get(str(caregiver_id), ()))
+
+
+def caregivers_of(patient_id: str) -> FrozenSet[str]:
+    return frozenset(_caregivers.rev.get(str(patient_id), ()))
+
+
+def patients_of_therapist(therapist_id: str) -> FrozenSet[str]:
+    return frozenset(_therapists.fwd.get(str(therapist_id), ()))
+
+
+def therapists_of(patient_id: str) -> FrozenSet[str]:
+    return frozenset(_therapists.rev.get(str(patient_id), ()))
+
+
+def size() -> Dict[str, int]:
+    return {"caregiver": len(_caregivers), "physiotherapist": len(_therapists)}
+
+
+# ───────────────────────────── manutenção ─────────────────────────────
+async def reload() -> None:
+    """Recarga completa (arranque / re-ligação / TRUNCATE)."""
+    global _caregivers, _therapists, _reloading
+    _reloading = True
+    try:
+        pool = await get_pool()
+        cg_rows = await pool.fetch("SELECT caregiver_id, patient_id FROM caregiver_patients")
+        th_rows = await pool.fetch("SELECT physiotherapist_id, patient_id FROM therapist_patients")
+
+        cg, th = _Index(), _Index()
+        for a, p in cg_rows:
+            cg.add(str(a), str(p))
+        for a, p in th_rows:
+            th.add(str(a), str(p))
+        _caregivers, _therapists = cg, th
+    finally:
+        _reloading = False
+
+    # eventos recebidos durante a carga podem ser posteriores ao snapshot;
+    # add/discard são idempotentes, por isso reaplicá-los é seguro
+    pending, _buffer[:] = list(_buffer), []
+    for payload in pending:
+        again = on_notify(payload)
+        if again is not None:           # TRUNCATE durante a carga → nova carga
+            await again
+            return
+
+    _RELOADS.inc()
+    _EDGES.set(len(_caregivers), labels={"kind": "caregiver"})
+    _EDGES.set(len(_therapists), labels={"kind": "physiotherapist"})
+    log.info("Índice de cuidado: %d cuidador↔paciente, %d fisio↔paciente",
+             len(_caregivers), len(_therapists))
+
+
+def _pair(raw: List[str] | None) -> Tuple[str, str] | None:
+    return (raw[0], raw[1]) if raw else None
+
+
+def _apply(payload: str) -> Optional[Awaitable[None]]:
+    """Aplica um evento; devolve uma recarga a agendar se for TRUNCATE."""
+    evt = json.loads(payload)
+    op = evt["op"]
+    if op == "T":
+        return reload()
+
+    idx = _by_kind(evt["t"])
+    old, new = _pair(evt.get("old")), _pair(evt.get("new"))
+    if old and op in ("D", "U"):
+        idx.remove(*old)
+    if new and op in ("I", "U"):
+        idx.add(*new)
+    _EVENTS.inc(labels={"op": op})
+    _EDGES.set(len(idx), labels={"kind": "caregiver" if idx is _caregivers else "physiotherapist"})
+    return None
+
+
+def on_notify(payload: str) -> Optional[Awaitable[None]]:
+    """Callback do listener (uma recarga devolvida é agendada por ele)."""
+    if _reloading:
+        _buffer.append(payload)
+        return None
+    try:
+        return _apply(payload)
+    except (ValueError, KeyError, TypeError):
+        log.warning("Índice de cuidado: payload inválido %r", payload)
+        return None
+
+
+def register() -> None:
+    """Liga o índice ao listener (chamar antes de listener.start())."""
+    listener.subscribe(CHANNEL, on_notify)
+    listener.on_resync(reload)
@@ -6,7 +6,8 @@ Singleton para o pool asyncpg usado em toda a aplicação.
 • Funções expostas:
       init()      → cria/devolve pool (primeira chamada inicializa)
       get_pool()  → alias de conveniência para init()
-      close()     → fecha pool de forma limpa (invocar no shutdown)
+      peek()      → pool actual ou None (nunca cria)
+      close()     → fecha pool (e ligação lateral de EXPLAIN) no shutdown
 """
 
 from __future__ import annotations
@@ -15,6 +16,8 @@ import asyncpg
 from typing import Optional
 
 from bot.config import DATABASE_URL   # ← mantém o nome existente na tua config
+from bot.database import instrumentation
+from bot.database.instrumentation import InstrumentedConnection
 
 _pool: Optional[asyncpg.Pool] = None
 
@@ -32,6 +35,7 @@ async def init() -> asyncpg.Pool:
             dsn=DATABASE_URL,
             min_size=1,
             max_size=10,
+            connection_class=InstrumentedConnection,   # spans / métricas por query
         )
     return _pool
 
@@ -41,12 +45,18 @@ async def get_pool() -> asyncpg.Pool:
     return await init()
 
 
+def peek() -> Optional[asyncpg.Pool]:
+    """Pool actual, sem o criar (None antes de init() / depois de close())."""
+    return _pool
+
+
 async def close() -> None:
     """Fecha graciosamente o pool (deve ser chamado no shutdown)."""
     global _pool
     if _pool is not None:
         await _pool.close()
         _pool = None
+    await instrumentation.close()          # ligação lateral dos EXPLAIN
 
 
 # ---------- teste rápido ----------
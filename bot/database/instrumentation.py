@@ -0,0 +1,307 @@
+# bot/database/instrumentation.py
+"""
+Instrumentação das ligações asyncpg.
+
+`InstrumentedConnection` é passada como `connection_class` ao pool em
+bot.database.connection; como `pool.fetch*()` delega na ligação, todas
+as queries (incluindo as de bot.database.queries) passam por aqui.
+
+Por cada statement:
+• abre um span `db.<função>` com o SQL (ver bot.utils.tracing);
+• acumula estatísticas por (SQL normalizado, função chamadora):
+  nº de execuções, tempo total/máximo e linhas devolvidas/afectadas;
+• acima de SLOW_QUERY_MS agenda um `EXPLAIN (ANALYZE, BUFFERS)` numa
+  ligação lateral, dentro de uma transacção revertida (ANALYZE executa
+  o statement!), com limite de frequência por statement e global.
+  Só SELECT/INSERT/UPDATE/DELETE/WITH sem chamadas a funções levam
+  ANALYZE: uma função pode ter efeitos que o rollback não desfaz
+  (pg_try_advisory_lock fica com a ligação lateral até ao fim do
+  processo; refresh_user_stats() refazia as matviews).  Com funções
+  fica o EXPLAIN simples; advisory locks, REFRESH e DDL não levam nada.
+
+Os resultados ficam em memória e são consultáveis com /slowq (admins)
+ou em GET /debug/queries.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import re
+import sys
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+import asyncpg
+
+from bot.config import (
+    DATABASE_URL,
+    SLOW_QUERY_MS,
+    SLOW_QUERY_EXPLAIN_INTERVAL,
+)
+from bot.utils import tracing
+
+log = logging.getLogger(__name__)
+
+__all__ = [
+    "InstrumentedConnection",
+    "caller_name",
+    "normalize_sql",
+    "query_stats",
+    "slow_queries",
+    "report",
+]
+
+_SKIP_MODULES = (__name__, "asyncpg", "contextlib", "bot.utils.tracing")
+
+_STR_LIT_RE = re.compile(r"'(?:[^']|'')*'")
+_NUM_LIT_RE = re.compile(r"(?<![\w$])\d+(?:\.\d+)?\b")
+_SPACE_RE   = re.compile(r"\s+")
+
+# limites do EXPLAIN automático
+_EXPLAIN_GLOBAL_GAP = 10.0          # no máximo 1 EXPLAIN a cada 10 s (global)
+_EXPLAIN_TIMEOUT    = "5s"          # statement_timeout na ligação lateral
+_MAX_SLOW_KEPT      = 50
+
+# EXPLAIN só para estes statements; ANALYZE só se não chamarem funções
+_EXPLAINABLE   = {"select", "insert", "update", "delete", "with", "values"}
+_NO_EXPLAIN_RE = re.compile(r"pg_\w*advisory|\brefresh\b", re.I)
+_CALL_RE       = re.compile(r"([a-z_][\w.]*)\s*\(", re.I)
+_INTO_COLS_RE  = re.compile(r"\binto\s+[\w.\"]+\s*\(", re.I)   # INSERT INTO t (cols)
+# palavras-chave seguidas de «(» e funções built-in sem efeitos
+_NOT_CALLS = frozenset('''
+    select from into where and or not in any all some exists values as on using
+    over filter within partition by conflict set row array cast interval
+    join lateral case when then else
+    count sum min max avg coalesce nullif greatest least lower upper trim
+    length substr substring date_trunc extract now array_agg string_agg
+    jsonb_agg jsonb_build_object json_agg json_build_object to_char
+    row_number rank dense_rank unnest generate_series
+'''.split())
+
+
+def caller_name(depth: int = 2) -> str:
+    """Primeira função fora do asyncpg/instrumentação na stack (ex.: add_user)."""
+    frame: Optional[Any] = sys._getframe(depth)
+    while frame is not None:
+        module = frame.f_globals.get("__name__", "")
+        if not module.startswith(_SKIP_MODULES):
+            return frame.f_code.co_name
+        frame = frame.f_back
+    return "unknown"
+
+
+def normalize_sql(query: str) -> str:
+    """SQL numa só linha, com literais substituídos por `?`."""
+    q = _STR_LIT_RE.sub("?", query)
+    q = _NUM_LIT_RE.sub("?", q)
+    return _SPACE_RE.sub(" ", q).strip()
+
+
+def _row_count(op: str, result: Any) -> int:
+    if op == "fetch":
+        return len(result)
+    if op in ("fetchrow", "fetchval"):
+        return 0 if result is None else 1
+    if op == "execute" and isinstance(result, str):
+        tail = result.rsplit(" ", 1)[-1]           # "UPDATE 3", "INSERT 0 1"
+        return int(tail) if tail.isdigit() else 0
+    return 0
+
+
+# ───────────────────────────── estatísticas ─────────────────────────────
+@dataclass
+class QueryStat:
+    sql: str
+    caller: str
+    calls: int = 0
+    total_ms: float = 0.0
+    max_ms: float = 0.0
+    rows: int = 0
+
+    @property
+    def mean_ms(self) -> float:
+        return self.total_ms / self.calls if self.calls else 0.0
+
+
+@dataclass
+class SlowQuery:
+    at: float
+    sql: str
+    caller: str
+    duration_ms: float
+    rows: int
+    plan: Optional[str] = None
+    error: Optional[str] = None
+
+
+@dataclass
+class _Registry:
+    stats: Dict[Tuple[str, str], QueryStat] = field(default_factory=dict)
+    slow: Deque[SlowQuery] = field(default_factory=lambda: deque(maxlen=_MAX_SLOW_KEPT))
+    last_explain: Dict[str, float] = field(default_factory=dict)
+    last_explain_any: float = 0.0
+    side_conn: Optional[asyncpg.Connection] = None
+    side_lock: Optional[asyncio.Lock] = None
+    tasks: Set[asyncio.Task] = field(default_factory=set)
+
+
+_REG = _Registry()
+
+
+def query_stats() -> List[QueryStat]:
+    """Estatísticas agregadas, ordenadas por tempo total (desc)."""
+    return sorted(_REG.stats.values(), key=lambda s: s.total_ms, reverse=True)
+
+
+def slow_queries() -> List[SlowQuery]:
+    """Statements lentos mais recentes primeiro."""
+    return list(reversed(_REG.slow))
+
+
+def report(limit: int = 20) -> Dict[str, Any]:
+    """Resumo serializável (endpoint HTTP / comando de admin)."""
+    return {
+        "threshold_ms": SLOW_QUERY_MS,
+        "top": [
+            {
+                "caller": s.caller, "sql": s.sql, "calls": s.calls,
+                "total_ms": round(s.total_ms, 2), "mean_ms": round(s.mean_ms, 2),
+                "max_ms": round(s.max_ms, 2), "rows": s.rows,
+            }
+            for s in query_stats()[:limit]
+        ],
+        "slow": [
+            {
+                "at": q.at, "caller": q.caller, "sql": q.sql,
+                "duration_ms": round(q.duration_ms, 2), "rows": q.rows,
+                "plan": q.plan, "error": q.error,
+            }
+            for q in slow_queries()[:limit]
+        ],
+    }
+
+
+def _record(op: str, query: str, caller: str, elapsed_ms: float, rows: int, args: tuple) -> None:
+    sql = normalize_sql(query)
+    stat = _REG.stats.get((sql, caller))
+    if stat is None:
+        stat = _REG.stats[(sql, caller)] = QueryStat(sql=sql, caller=caller)
+    stat.calls += 1
+    stat.total_ms += elapsed_ms
+    stat.max_ms = max(stat.max_ms, elapsed_ms)
+    stat.rows += rows
+
+    if elapsed_ms < SLOW_QUERY_MS:
+        return
+
+    entry = SlowQuery(at=time.time(), sql=sql, caller=caller, duration_ms=elapsed_ms, rows=rows)
+    _REG.slow.append(entry)
+    log.warning("Query lenta (%.0f ms) em %s: %s", elapsed_ms, caller, sql[:200])
+
+    options = _explain_options(sql)
+    if op != "executemany" and options is not None and _explain_allowed(sql):
+        task = asyncio.get_running_loop().create_task(_explain(entry, query, args, options))
+        _REG.tasks.add(task)
+        task.add_done_callback(_REG.tasks.discard)
+
+
+def _explain_options(sql: str) -> Optional[str]:
+    """Opções do EXPLAIN para *sql*, ou None se não se deve correr nenhum."""
+    first = sql.lstrip("( ").split(" ", 1)[0].lower()
+    if first not in _EXPLAINABLE or _NO_EXPLAIN_RE.search(sql):
+        return None
+    body = _INTO_COLS_RE.sub("into (", sql)
+    if any(name.lower() not in _NOT_CALLS for name in _CALL_RE.findall(body)):
+        return ""                                  # plano estimado: nada é executado
+    return "(ANALYZE, BUFFERS) "
+
+
+def _explain_allowed(sql: str) -> bool:
+    """Rate-limit: 1 por statement a cada INTERVAL s e 1 global a cada 10 s."""
+    now = time.monotonic()
+    if now - _REG.last_explain_any < _EXPLAIN_GLOBAL_GAP:
+        return False
+    if now - _REG.last_explain.get(sql, float("-inf")) < SLOW_QUERY_EXPLAIN_INTERVAL:
+        return False
+    if ";" in sql.rstrip(";"):
+        return False                               # multi-statement: não dá EXPLAIN
+    _REG.last_explain_any = now
+    _REG.last_explain[sql] = now
+    return True
+
+
+async def _side_connection() -> asyncpg.Connection:
+    """Ligação lateral (fora do pool e sem instrumentação)."""
+    if _REG.side_conn is None or _REG.side_conn.is_closed():
+        _REG.side_conn = await asyncpg.connect(dsn=DATABASE_URL)
+    return _REG.side_conn
+
+
+async def _explain(entry: SlowQuery, query: str, args: tuple, options: str) -> None:
+    if _REG.side_lock is None:
+        _REG.side_lock = asyncio.Lock()
+    async with _REG.side_lock:
+        try:
+            conn = await _side_connection()
+            tr = conn.transaction()
+            await tr.start()
+            try:
+                await conn.execute(f"SET LOCAL statement_timeout = '{_EXPLAIN_TIMEOUT}'")
+                rows = await conn.fetch(f"EXPLAIN {options}{query}", *args)
+                entry.plan = "\n".join(r[0] for r in rows)
+            finally:
+                await tr.rollback()                # ANALYZE executou o statement
+                # advisory locks de sessão sobrevivem ao rollback
+                await conn.execute("SELECT pg_advisory_unlock_all()")
+        except Exception as exc:
+            entry.error = f"{type(exc).__name__}: {exc}"
+
+
+async def close() -> None:
+    """Fecha a ligação lateral (chamar no shutdown)."""
+    for task in list(_REG.tasks):
+        task.cancel()
+    if _REG.side_conn is not None and not _REG.side_conn.is_closed():
+        await _REG.side_conn.close()
+    _REG.side_conn = None
+
+
+# ───────────────────────────── ligação ─────────────────────────────
+class InstrumentedConnection(asyncpg.Connection):
+    """asyncpg.Connection com spans e estatísticas à volta de cada statement."""
+
+    async def _run(self, op: str, query: str, call, *args: Any, **kwargs: Any) -> Any:
+        func = caller_name(3)
+        started = time.perf_counter()
+        with tracing.span(
+            f"db.{func}",
+            kind=tracing.KIND_CLIENT,
+            **{
+                "db.system": "postgresql",
+                "db.operation": op,
+                "db.statement": " ".join(query.split())[:500],
+                "code.function": func,
+            },
+        ):
+            result = await call(query, *args, **kwargs)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        _record(op, query, func, elapsed_ms, _row_count(op, result), args)
+        return result
+
+    async def execute(self, query: str, *args: Any, **kwargs: Any) -> str:
+        return await self._run("execute", query, super().execute, *args, **kwargs)
+
+    async def executemany(self, command: str, args: Any, **kwargs: Any) -> None:
+        return await self._run("executemany", command, super().executemany, args, **kwargs)
+
+    async def fetch(self, query: str, *args: Any, **kwargs: Any) -> list:
+        return await self._run("fetch", query, super().fetch, *args, **kwargs)
+
+    async def fetchrow(self, query: str, *args: Any, **kwargs: Any) -> Any:
+        return await self._run("fetchrow", query, super().fetchrow, *args, **kwargs)
+
+    async def fetchval(self, query: str, *args: Any, **kwargs: Any) -> Any:
+        return await self._run("fetchval", query, super().fetchval, *args, **kwargs)
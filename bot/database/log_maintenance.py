@@ -0,0 +1,73 @@
+# bot/database/log_maintenance.py
+"""
+Manutenção periódica da tabela de logs particionada (migração 002).
+
+• bot_log_ensure_partitions(LOG_PARTITIONS_AHEAD) – cria partições futuras
+  com antecedência (os inserts nunca caem na partição DEFAULT);
+• bot_log_drop_expired(LOG_RETENTION_MONTHS)      – desanexa e apaga as
+  partições mais antigas que o período de retenção.
+
+Corre no arranque e depois de LOG_MAINTENANCE_INTERVAL em
+LOG_MAINTENANCE_INTERVAL segundos.  Um advisory lock garante que só uma
+instância do bot faz o trabalho de cada vez.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from typing import Optional, Tuple
+
+from bot.config import (
+    LOG_MAINTENANCE_INTERVAL,
+    LOG_PARTITIONS_AHEAD,
+    LOG_RETENTION_MONTHS,
+)
+from bot.database.connection import get_pool
+
+log = logging.getLogger(__name__)
+
+_LOCK_KEY = 0x0B07_1065              # pg_advisory_lock partilhado entre instâncias
+
+_task: Optional[asyncio.Task] = None
+
+
+async def run_once() -> Optional[Tuple[int, int]]:
+    """Executa uma ronda; devolve (criadas, apagadas) ou None se outra instância a tem."""
+    pool = await get_pool()
+    async with pool.acquire() as conn:
+        if not await conn.fetchval("SELECT pg_try_advisory_lock($1)", _LOCK_KEY):
+            return None
+        try:
+            created = await conn.fetchval("SELECT bot_log_ensure_partitions($1)", LOG_PARTITIONS_AHEAD)
+            dropped = await conn.fetchval("SELECT bot_log_drop_expired($1)", LOG_RETENTION_MONTHS)
+        finally:
+            await conn.execute("SELECT pg_advisory_unlock($1)", _LOCK_KEY)
+
+    if created or dropped:
+        log.info("Logs: %d partição(ões) criada(s), %d expirada(s) apagada(s)", created, dropped)
+    return created, dropped
+
+
+async def _loop() -> None:
+    while True:
+        try:
+            await run_once()
+        except Exception:
+            log.exception("Manutenção das partições de logs falhou")
+        await asyncio.sleep(LOG_MAINTENANCE_INTERVAL)
+
+
+def start() -> None:
+    """Lança a tarefa periódica (idempotente)."""
+    global _task
+    if _task is None or _task.done():
+        _task = asyncio.get_running_loop().create_task(_loop())
+
+
+async def stop(_timeout: float = 0) -> None:
+    """Drain hook: cancela a tarefa periódica."""
+    global _task
+    if _task is not None:
+        _task.cancel()
+        _task = None
@@ -8,6 +8,10 @@ Gravação assíncrona de registos (logs) em PostgreSQL.
   na escrita, o registo é enviado para stderr (fallback seguro).
 • Nenhuma alteração de estrutura é necessária depois da migração
   do telegram_user_id para user_phones — o campo continua BIGINT.
+• A tabela é particionada por mês (migrations/002); created_at vem do
+  DEFAULT now() e a retenção é feita por bot.database.log_maintenance.
+• As escritas pendentes ficam registadas; drain() espera por elas no
+  shutdown (antes de o pool ser fechado).
 """
 
 from __future__ import annotations
@@ -15,9 +19,9 @@ from __future__ import annotations
 import asyncio
 import logging
 import sys
-from typing import Any
+from typing import Any, Set
 
-from infra.db_async import DBPools
+from bot.database import connection
 
 # ------------------------------------------------------------------ #
 #  SQL de inserção — 1 linha por log
@@ -38,12 +42,22 @@ class PGHandler(logging.Handler):
       (nunca volta a chamar logging para evitar loops).
     """
 
+    def __init__(self, level: int = logging.NOTSET) -> None:
+        super().__init__(level)
+        self._pending: Set[asyncio.Task] = set()
+
+    async def drain(self, timeout: float) -> None:
+        """Espera (até `timeout` s) pelas escritas ainda em curso."""
+        if self._pending:
+            await asyncio.wait(set(self._pending), timeout=timeout)
+
     def emit(self, record: logging.LogRecord) -> None:
         # -------- formatação imediata (thread-safe) -------- #
         formatted: str = self.format(record)
 
         # -------- fallback se ainda não há pool -------- #
-        if DBPools.pool_logs is None:
+        pool = connection.peek()
+        if pool is None:
             print(formatted, file=sys.stderr)
             return
 
@@ -55,7 +69,7 @@ class PGHandler(logging.Handler):
 
         async def _write() -> None:
             try:
-                async with DBPools.pool_logs.acquire() as conn:
+                async with pool.acquire() as conn:
                     await conn.execute(
                         _INSERT_SQL,
                         level_name,
@@ -70,10 +84,13 @@ class PGHandler(logging.Handler):
 
         # -------- agenda a escrita no event-loop -------- #
         try:
-            asyncio.get_running_loop().create_task(_write())
+            task = asyncio.get_running_loop().create_task(_write())
         except RuntimeError:
             # Fora de um event-loop (ex.: preload do gunicorn)
             print(formatted, file=sys.stderr)
+            return
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
 
 
 # ------------------------------------------------------------------ #
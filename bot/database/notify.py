@@ -0,0 +1,147 @@
+# bot/database/notify.py
+"""
+Ligação dedicada a LISTEN/NOTIFY do PostgreSQL.
+
+Uma única ligação (fora do pool, que recicla ligações e perderia os
+LISTEN) serve todos os canais.  Cada módulo interessado:
+
+    listener.subscribe("canal", callback)   # callback(payload: str)
+    listener.on_resync(async_reload)        # estado completo
+
+`on_resync` é chamado depois de cada (re)ligação – já com os LISTEN
+activos, para não perder eventos entre o reload e a subscrição.
+Notificações enviadas enquanto a ligação esteve em baixo perdem-se;
+é por isso que o resync completo é obrigatório.
+
+A ligação é vigiada por um ping periódico (a termination-listener do
+asyncpg não dispara em todas as falhas de rede); ao cair, volta a ligar
+com back-off exponencial.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+from typing import Awaitable, Callable, Dict, List, Optional, Union
+
+import asyncpg
+
+from bot.config import DATABASE_URL
+
+log = logging.getLogger(__name__)
+
+__all__ = ["PgListener", "listener"]
+
+Callback = Callable[[str], Union[None, Awaitable[None]]]
+Resync   = Callable[[], Awaitable[None]]
+
+
+class PgListener:
+    PING_INTERVAL = 30.0
+    BACKOFF_MAX   = 30.0
+
+    def __init__(self, dsn: str) -> None:
+        self.dsn = dsn
+        self._subs: Dict[str, List[Callback]] = {}
+        self._resync: List[Resync] = []
+        self._conn: Optional[asyncpg.Connection] = None
+        self._task: Optional[asyncio.Task] = None
+        self._ready: Optional[asyncio.Event] = None
+        self._lost: Optional[asyncio.Event] = None
+        self._pending: set[asyncio.Task] = set()
+        self.reconnects = 0
+
+    # ───────────────────────── registo ─────────────────────────
+    def subscribe(self, channel: str, callback: Callback) -> None:
+        self._subs.setdefault(channel, []).append(callback)
+
+    def on_resync(self, callback: Resync) -> None:
+        self._resync.append(callback)
+
+    @property
+    def connected(self) -> bool:
+        return self._conn is not None and not self._conn.is_closed()
+
+    # ───────────────────────── ciclo de vida ─────────────────────────
+    async def start(self, timeout: float = 30.0) -> bool:
+        """
+        Liga, subscreve e faz o primeiro resync (espera até `timeout`).
+
+        Devolve False se não ficou pronto a tempo – o supervisor continua
+        a tentar em fundo, o arranque do bot não bloqueia.
+        """
+        if self._task is None or self._task.done():
+            self._ready = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._supervise())
+        assert self._ready is not None
+        try:
+            await asyncio.wait_for(asyncio.shield(self._ready.wait()), timeout)
+        except asyncio.TimeoutError:
+            log.warning("PgListener: sem ligação ao fim de %.0f s (continua a tentar)", timeout)
+            return False
+        return True
+
+    async def stop(self, _timeout: float = 0) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self.connected:
+            assert self._conn is not None
+            await self._conn.close()
+        self._conn = None
+
+    # ───────────────────────── internos ─────────────────────────
+    async def _supervise(self) -> None:
+        delay = 1.0
+        while True:
+            try:
+                await self._connect()
+                delay = 1.0
+                assert self._ready is not None
+                self._ready.set()
+                await self._watch()
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                log.warning("PgListener: ligação falhou (%s); nova tentativa em %.0f s", exc, delay)
+            if self._conn is not None and not self._conn.is_closed():
+                self._conn.terminate()
+            self._conn = None
+            self.reconnects += 1
+            await asyncio.sleep(delay + random.random())
+            delay = min(delay * 2, self.BACKOFF_MAX)
+
+    async def _connect(self) -> None:
+        self._lost = asyncio.Event()
+        conn = await asyncpg.connect(dsn=self.dsn)
+        conn.add_termination_listener(lambda _c: self._lost and self._lost.set())
+        for channel in self._subs:
+            await conn.add_listener(channel, self._dispatch)
+        self._conn = conn
+        # LISTEN já activo → agora o estado completo
+        await asyncio.gather(*(cb() for cb in self._resync))
+        log.info("PgListener: a escutar %s", ", ".join(self._subs) or "—")
+
+    async def _watch(self) -> None:
+        assert self._conn is not None and self._lost is not None
+        while not self._lost.is_set():
+            try:
+                await asyncio.wait_for(self._lost.wait(), self.PING_INTERVAL)
+            except asyncio.TimeoutError:
+                await asyncio.wait_for(self._conn.fetchval("SELECT 1"), 10)
+        raise ConnectionError("ligação LISTEN terminada")
+
+    def _dispatch(self, _conn: object, _pid: int, channel: str, payload: str) -> None:
+        for cb in self._subs.get(channel, ()):
+            try:
+                result = cb(payload)
+                if asyncio.iscoroutine(result):
+                    task = asyncio.get_running_loop().create_task(result)
+                    self._pending.add(task)
+                    task.add_done_callback(self._pending.discard)
+            except Exception:
+                log.exception("PgListener: callback de %s falhou", channel)
+
+
+listener = PgListener(DATABASE_URL)
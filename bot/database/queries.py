@@ -7,15 +7,20 @@ Alterações (mai-2025)
 • `telegram_user_id` mudou de *users* → *user_phones*.
   - get_user_by_telegram_id() faz JOIN a user_phones
   - link_telegram_id(user_id, phone_number, tg_id) actualiza user_phones
+  - link_telegram_and_get_user() faz o mesmo + roles numa só ida à BD
 """
 
 from __future__ import annotations
 
-from datetime import date
-from typing import Any, Dict, List, Optional
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple, TypedDict
+from uuid import uuid4
 
 from asyncpg import Pool, Record
 
+from bot.database import role_cache
+from bot.utils.phone import canonical
+
 
 # ─────────────────────── helpers internos ────────────────────────
 def _to_dict(rec: Record | None) -> Optional[Dict[str, Any]]:
@@ -49,7 +54,8 @@ async def get_user_by_phone(
     phone_digits: str,
 ) -> Optional[Dict[str, Any]]:
     """
-    Procura utilizador através do número de telefone normalizado.
+    Procura utilizador através do número de telefone canónico
+    (bot.utils.phone.canonical – índice ix_user_phones_number, migração 009).
     """
     rec = await pool.fetchrow(
         """
@@ -128,6 +134,31 @@ async def link_telegram_id(
             )
 
 
+
+async def link_telegram_and_get_user(
+    pool: Pool,
+    user_id: str,
+    phone_digits: str,
+    tg_id: int,
+) -> Optional[Dict[str, Any]]:
+    """
+    Igual a link_telegram_id() + get_user_roles(), numa só ida à BD.
+
+    Usa a função SQL link_telegram_and_get_user() (migração 005), que
+    corre tudo na mesma transacção.  Devolve
+    {user_id, first_name, last_name, roles: [...]} ou None se o
+    utilizador não existir.
+    """
+    rec = await pool.fetchrow(
+        "SELECT * FROM link_telegram_and_get_user($1, $2, $3)",
+        user_id, phone_digits, tg_id,
+    )
+    if rec is None:
+        return None
+    user = dict(rec)
+    user["roles"] = list(user["roles"] or [])
+    return user
+
 async def get_user_roles(pool: Pool, user_id: str) -> List[str]:
     """
     Lista de roles (lower-case) atribuídas ao utilizador.
@@ -169,10 +200,7 @@ async def create_user(
 
 
 async def add_user_role(pool: Pool, user_id: str, role_name: str) -> None:
-    role_id = await pool.fetchval(
-        "SELECT role_id FROM roles WHERE role_name = $1",
-        role_name,
-    )
+    role_id = await role_cache.role_id(pool, role_name)
     if role_id:
         await pool.execute(
             """
@@ -219,7 +247,7 @@ async def add_phone(
         ON CONFLICT (phone_number) DO NOTHING
         """,
         user_id,
-        phone_number,
+        canonical(phone_number),
         is_primary,
         telegram_user_id,
     )
@@ -255,6 +283,63 @@ async def add_address(
 
 
 # ───────────── inserção “tudo-em-um” (utilitário) ────────────────
+class NewUser(TypedDict, total=False):
+    """Argumentos de add_user(), um por utilizador em add_users()."""
+    role: str
+    first_name: str
+    last_name: str
+    date_of_birth: Optional[date]
+    phone_cc: str              # indicativo (dígitos) de `phone` se este for nacional
+    phone: str                 # nacional, ou internacional com «+»/«00»
+    email: str
+    created_by: Optional[str]
+
+
+_ADD_USER_SQL = """
+WITH u AS (
+    INSERT INTO users (first_name, last_name, date_of_birth, created_by)
+    VALUES ($1, $2, $3, $4)
+    RETURNING user_id
+), r AS (
+    INSERT INTO user_roles (user_id, role_id)
+    SELECT user_id, $5 FROM u
+    WHERE  $5::uuid IS NOT NULL
+), e AS (
+    INSERT INTO user_emails (user_id, email, is_primary)
+    SELECT user_id, $6, TRUE FROM u
+), p AS (
+    INSERT INTO user_phones (user_id, phone_number, is_primary)
+    SELECT user_id, $7, TRUE FROM u
+)
+SELECT user_id FROM u
+"""
+
+# user_id gerado no cliente → cada linha de `d` já sabe a que user pertence
+_ADD_USERS_SQL = """
+WITH d AS (
+    SELECT *
+    FROM   unnest($1::uuid[], $2::varchar[], $3::varchar[], $4::date[],
+                  $5::uuid[], $6::uuid[],    $7::citext[],  $8::varchar[])
+           AS t(user_id, first_name, last_name, date_of_birth,
+                created_by, role_id, email, phone)
+), u AS (
+    INSERT INTO users (user_id, first_name, last_name, date_of_birth, created_by)
+    SELECT user_id, first_name, last_name, date_of_birth, created_by FROM d
+    RETURNING user_id
+), r AS (
+    INSERT INTO user_roles (user_id, role_id)
+    SELECT user_id, role_id FROM d WHERE role_id IS NOT NULL
+), e AS (
+    INSERT INTO user_emails (user_id, email, is_primary)
+    SELECT user_id, email, TRUE FROM d
+), p AS (
+    INSERT INTO user_phones (user_id, phone_number, is_primary)
+    SELECT user_id, phone, TRUE FROM d
+)
+SELECT count(*) FROM u
+"""
+
+
 async def add_user(
     pool: Pool,
     *,
@@ -270,47 +355,96 @@ async def add_user(
     """
     Cria utilizador + role + email + telefone (todos primários).
     Devolve o user_id (UUID).
+
+    Uma só instrução (CTE com INSERTs encadeados) – atómica por natureza,
+    1 ida à BD; o role_id vem do mapa em memória (bot.database.role_cache).
+    O telefone é gravado canónico (bot.utils.phone) – ValueError se inválido.
     """
-    async with pool.acquire() as conn, conn.transaction():
-        user_id = await conn.fetchval(
-            """
-            INSERT INTO users (first_name, last_name, date_of_birth, created_by)
-            VALUES ($1,$2,$3,$4)
-            RETURNING user_id
-            """,
-            first_name,
-            last_name,
-            date_of_birth,
-            created_by,
-        )
+    role_id = await role_cache.role_id(pool, role)
+    user_id = await pool.fetchval(
+        _ADD_USER_SQL,
+        first_name,
+        last_name,
+        date_of_birth,
+        created_by,
+        role_id,
+        email,
+        canonical(phone, cc=phone_cc),
+    )
+    return str(user_id)
 
-        role_id = await conn.fetchval(
-            "SELECT role_id FROM roles WHERE role_name = $1",
-            role,
-        )
-        if role_id:
-            await conn.execute(
-                "INSERT INTO user_roles (user_id, role_id) VALUES ($1,$2)",
-                user_id,
-                role_id,
-            )
 
-        await conn.execute(
+async def add_users(pool: Pool, users: Sequence[NewUser]) -> List[str]:
+    """
+    Variante em lote de add_user(): todos os utilizadores numa instrução
+    (arrays + unnest), tudo-ou-nada.  Devolve os user_id pela mesma ordem.
+    Um telefone inválido levanta ValueError antes de ir à BD – valide a
+    importação antes com bot.utils.validators.check_phones.
+    """
+    if not users:
+        return []
+
+    phones = [canonical(u["phone"], cc=u["phone_cc"]) for u in users]
+
+    ids = [uuid4() for _ in users]
+    by_name = await role_cache.role_ids(pool, {u["role"] for u in users})
+    role_ids = [by_name[u["role"]] for u in users]
+    await pool.fetchval(
+        _ADD_USERS_SQL,
+        ids,
+        [u["first_name"] for u in users],
+        [u["last_name"] for u in users],
+        [u.get("date_of_birth") for u in users],
+        [u.get("created_by") for u in users],
+        role_ids,
+        [u["email"] for u in users],
+        phones,
+    )
+    return [str(i) for i in ids]
+
+
+# ─────────────────────── logs do bot (suporte) ───────────────────────
+LogCursor = Tuple[datetime, int]            # (created_at, log_id) da última linha
+
+
+async def get_user_logs(
+    pool: Pool,
+    tg_id: int,
+    limit: int = 50,
+    before: Optional[LogCursor] = None,
+) -> Tuple[List[Dict[str, Any]], Optional[LogCursor]]:
+    """
+    Últimas `limit` linhas de log do utilizador *tg_id*, mais recentes primeiro.
+
+    Paginação keyset: passe o cursor devolvido em `before` para obter a
+    página seguinte (None quando não há mais).  Usa o índice
+    (telegram_user_id, created_at DESC, log_id DESC) – custo constante
+    seja qual for a página, ao contrário de OFFSET.
+    """
+    if before is None:
+        rows = await pool.fetch(
             """
-            INSERT INTO user_emails (user_id, email, is_primary)
-            VALUES ($1,$2,TRUE)
+            SELECT log_id, created_at, level, chat_id, is_system, message
+            FROM   clinicafisina_telegram_bot
+            WHERE  telegram_user_id = $1
+            ORDER  BY created_at DESC, log_id DESC
+            LIMIT  $2
             """,
-            user_id,
-            email,
+            tg_id, limit,
         )
-
-        await conn.execute(
+    else:
+        rows = await pool.fetch(
             """
-            INSERT INTO user_phones (user_id, phone_number, is_primary)
-            VALUES ($1,$2,TRUE)
+            SELECT log_id, created_at, level, chat_id, is_system, message
+            FROM   clinicafisina_telegram_bot
+            WHERE  telegram_user_id = $1
+              AND  (created_at, log_id) < ($2, $3)
+            ORDER  BY created_at DESC, log_id DESC
+            LIMIT  $4
             """,
-            user_id,
-            f"{phone_cc}{phone}",
+            tg_id, before[0], before[1], limit,
         )
 
-    return str(user_id)
+    logs = [dict(r) for r in rows]
+    cursor = (logs[-1]["created_at"], logs[-1]["log_id"]) if len(logs) == limit else None
+    return logs, cursor
@@ -0,0 +1,222 @@
+# bot/database/reports.py
+"""
+Relatórios exportáveis (CSV / XLSX) – gerados pelo job «report_export»
+do worker (bot.jobs.tasks) e enviados ao utilizador com send_document.
+
+Memória constante, seja um mês ou um ano inteiro:
+• as linhas vêm de um cursor do servidor (asyncpg conn.cursor, numa
+  transacção só de leitura) em lotes de REPORTS_BATCH;
+• cada lote é formatado num processo à parte (bot.utils.spreadsheet)
+  enquanto o lote seguinte é pedido ao PostgreSQL – no máximo dois lotes
+  em memória;
+• o ficheiro é escrito para um SpooledTemporaryFile (RAM até
+  REPORTS_SPOOL_MB, depois disco) e enviado aos pedaços.
+
+    async with reports.export("invoices", "xlsx", start, end) as out:
+        await bot.send_document(chat_id, out.input_file())
+
+Relatórios:
+• invoices / payments – documentos Moloni (cache da migração 007) do
+  período, todos os clientes (contabilista);
+• physio_billing – documentos dos pacientes de um fisioterapeuta
+  (therapist_patients), *owner* = user_id do fisioterapeuta.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import tempfile
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import IO, Any, AsyncIterator, Awaitable, Callable, Dict, Optional, Sequence, Tuple
+
+from bot.config import REPORTS_BATCH, REPORTS_SPOOL_MB
+from bot.database.connection import get_pool
+from bot.utils import metrics
+from bot.utils.spreadsheet import Column, SpooledInputFile, format_rows, open_sink
+
+log = logging.getLogger(__name__)
+
+__all__ = ["Export", "PERIODS", "REPORTS", "Report", "export", "period_bounds"]
+
+Progress = Callable[[int, int, str], Awaitable[None]]
+
+_EXPORT_SECONDS = metrics.histogram(
+    "report_export_seconds",
+    "Duração da geração de um relatório (sem o envio)",
+    buckets=(0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0),
+)
+_EXPORT_ROWS = metrics.counter("report_rows_total", "Linhas exportadas em relatórios")
+
+_MONTHS = (
+    "", "janeiro", "fevereiro", "março", "abril", "maio", "junho",
+    "julho", "agosto", "setembro", "outubro", "novembro", "dezembro",
+)
+
+
+@dataclass(frozen=True)
+class Report:
+    slug: str                          # prefixo do nome do ficheiro
+    title: str                         # nome da folha / legenda
+    sql: str                           # $1 início (incl.) · $2 fim (excl.) · $3 owner
+    columns: Sequence[Column]
+    needs_owner: bool = False
+
+
+# ───────────────────────────── catálogo ─────────────────────────────
+_DOC_COLUMNS: Tuple[Column, ...] = (
+    ("Data", "date"),
+    ("Tipo", "text"),
+    ("Número", "text"),
+    ("Cliente", "text"),
+    ("NIF", "text"),
+    ("Nº cliente Moloni", "int"),
+    ("Total", "money"),
+    ("Pago", "money"),
+    ("Em dívida", "money"),
+    ("Vencimento", "date"),
+    ("Estado", "text"),
+    ("Alterado em", "datetime"),
+)
+
+_DOC_SELECT = """
+SELECT d.doc_date, d.doc_type, d.number,
+       u.first_name || ' ' || u.last_name, u.tax_id_number, d.customer_id,
+       d.gross_value, d.paid_value,
+       CASE WHEN d.status = 1 AND d.doc_type IN ('FT', 'FS', 'ND')
+            THEN greatest(d.gross_value - d.paid_value, 0) ELSE 0 END,
+       d.due_date,
+       CASE d.status WHEN 1 THEN 'fechado' WHEN 2 THEN 'anulado' ELSE d.status::text END,
+       d.lastmodified
+FROM   moloni_documents d
+"""
+
+REPORTS: Dict[str, Report] = {
+    "invoices": Report(
+        "faturas", "Faturas",
+        _DOC_SELECT + """
+LEFT   JOIN users u ON u.moloni_customer_id = d.customer_id
+WHERE  d.kind = 'invoice' AND d.status <> 0 AND d.doc_date >= $1 AND d.doc_date < $2
+ORDER  BY d.doc_date, d.document_id
+""",
+        _DOC_COLUMNS,
+    ),
+    "payments": Report(
+        "pagamentos", "Pagamentos",
+        _DOC_SELECT + """
+LEFT   JOIN users u ON u.moloni_customer_id = d.customer_id
+WHERE  d.kind = 'payment' AND d.status <> 0 AND d.doc_date >= $1 AND d.doc_date < $2
+ORDER  BY d.doc_date, d.document_id
+""",
+        _DOC_COLUMNS,
+    ),
+    "physio_billing": Report(
+        "faturacao_pacientes", "Faturação pacientes",
+        _DOC_SELECT + """
+JOIN   users u ON u.moloni_customer_id = d.customer_id
+JOIN   therapist_patients tp ON tp.patient_id = u.user_id
+WHERE  tp.physiotherapist_id = $3
+  AND  d.status <> 0 AND d.doc_date >= $1 AND d.doc_date < $2
+ORDER  BY d.doc_date, d.document_id
+""",
+        _DOC_COLUMNS,
+        needs_owner=True,
+    ),
+}
+
+PERIODS = ("m", "y")                   # mês anterior · ano corrente até hoje
+
+
+def period_bounds(code: str, today: Optional[date] = None) -> Tuple[date, date, str]:
+    """Código do botão → (primeiro dia, último dia, legenda)."""
+    today = today or date.today()
+    if code == "m":
+        end = today.replace(day=1) - timedelta(days=1)
+        start = end.replace(day=1)
+        return start, end, f"{_MONTHS[start.month]} {start.year}"
+    if code == "y":
+        return date(today.year, 1, 1), today, f"{today.year} (até {today:%d/%m})"
+    raise ValueError(f"período desconhecido: {code}")
+
+
+def _stamp(start: date, end: date) -> str:
+    if start.day == 1 and (end + timedelta(days=1)).day == 1 and (start.year, start.month) == (end.year, end.month):
+        return f"{start:%Y-%m}"
+    if (start.month, start.day) == (1, 1) and start.year == end.year:
+        return f"{start:%Y}"
+    return f"{start:%Y%m%d}-{end:%Y%m%d}"
+
+
+# ───────────────────────────── exportação ─────────────────────────────
+@dataclass
+class Export:
+    report: Report
+    file: IO[bytes]
+    filename: str
+    rows: int
+    size: int                          # bytes
+
+    def input_file(self) -> SpooledInputFile:
+        return SpooledInputFile(self.file, self.filename)
+
+
+@asynccontextmanager
+async def export(
+    name: str,
+    fmt: str,
+    start: date,
+    end: date,
+    *,
+    owner: Any = None,
+    progress: Optional[Progress] = None,
+) -> AsyncIterator[Export]:
+    """
+    Gera o relatório *name* de *start* a *end* (inclusive) no formato
+    *fmt* ('csv' | 'xlsx'); o ficheiro temporário é fechado à saída do bloco.
+    """
+    report = REPORTS[name]
+    if report.needs_owner and owner is None:
+        raise ValueError(f"relatório {name} precisa de owner")
+    args: Tuple[Any, ...] = (start, end + timedelta(days=1))
+    if report.needs_owner:
+        args += (owner,)
+
+    spool = tempfile.SpooledTemporaryFile(max_size=int(REPORTS_SPOOL_MB * 1024 * 1024), prefix="report-")
+    try:
+        t0 = time.perf_counter()
+        sink = open_sink(fmt, spool, report.columns, sheet=report.title)
+        try:
+            pool = await get_pool()
+            async with pool.acquire() as conn:
+                async with conn.transaction(readonly=True, isolation="repeatable_read"):
+                    cur = await conn.cursor(report.sql, *args)
+                    # formatação do lote n (processo) em paralelo com o fetch do lote n+1
+                    pending: Optional[Tuple[Awaitable[bytes], int]] = None
+                    while True:
+                        batch = await cur.fetch(REPORTS_BATCH)
+                        nxt = (format_rows(sink, [tuple(r) for r in batch]), len(batch)) if batch else None
+                        if pending is not None:
+                            chunk, n = await pending[0], pending[1]
+                            await asyncio.to_thread(sink.write, chunk, n)
+                            if progress is not None:
+                                await progress(sink.rows, 0, "linhas")
+                        if nxt is None:
+                            break
+                        pending = nxt
+        except BaseException:
+            sink.abort()
+            raise
+        await asyncio.to_thread(sink.close)
+
+        spool.seek(0, 2)
+        size = spool.tell()
+        elapsed = time.perf_counter() - t0
+        _EXPORT_SECONDS.observe(elapsed, labels={"report": name, "format": fmt})
+        _EXPORT_ROWS.inc(sink.rows, labels={"report": name})
+        log.info("Relatório %s.%s: %d linhas, %.0f KiB em %.2fs", name, fmt, sink.rows, size / 1024, elapsed)
+        yield Export(report, spool, f"{report.slug}_{_stamp(start, end)}.{fmt}", sink.rows, size)
+    finally:
+        spool.close()
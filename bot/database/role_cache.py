@@ -0,0 +1,90 @@
+# bot/database/role_cache.py
+"""
+Mapa em memória «role_name → role_id».
+
+A tabela *roles* quase nunca muda; em vez do
+`SELECT role_id FROM roles WHERE role_name = $1` em cada inserção, o
+mapa é carregado uma vez e recarregado quando:
+• chega um NOTIFY de *roles* no canal «cache_inval» (migração 004);
+• o listener volta a ligar (eventos podem ter-se perdido);
+• se pede um nome desconhecido (role criada entretanto noutro sítio).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+from typing import Dict, Iterable, Optional
+from uuid import UUID
+
+from asyncpg import Pool
+
+from bot.database.notify import listener
+
+log = logging.getLogger(__name__)
+
+CHANNEL = "cache_inval"                     # o mesmo bus de bot.database.user_cache
+
+_ids: Optional[Dict[str, UUID]] = None
+_lock: Optional[asyncio.Lock] = None
+
+
+async def load(pool: Pool) -> Dict[str, UUID]:
+    """(Re)carrega o mapa inteiro."""
+    global _ids, _lock
+    if _lock is None:
+        _lock = asyncio.Lock()
+    async with _lock:
+        rows = await pool.fetch("SELECT role_name, role_id FROM roles")
+        _ids = {r["role_name"]: r["role_id"] for r in rows}
+    log.debug("Mapa de roles carregado: %s", ", ".join(sorted(_ids)))
+    return _ids
+
+
+async def role_id(pool: Pool, role_name: str) -> Optional[UUID]:
+    """role_id de *role_name* (None se não existir)."""
+    ids = _ids if _ids is not None else await load(pool)
+    rid = ids.get(role_name)
+    if rid is None:
+        rid = (await load(pool)).get(role_name)       # pode ser uma role nova
+    return rid
+
+
+async def role_ids(pool: Pool, role_names: Iterable[str]) -> Dict[str, Optional[UUID]]:
+    """{role_name: role_id} de várias roles – no máximo um reload para as que faltem."""
+    names = set(role_names)
+    ids = _ids if _ids is not None else await load(pool)
+    if not names <= ids.keys():
+        ids = await load(pool)                        # pode haver roles novas
+    return {name: ids.get(name) for name in names}
+
+
+def size() -> int:
+    return len(_ids or ())
+
+
+def invalidate() -> None:
+    """Esquece o mapa; a próxima consulta recarrega-o."""
+    global _ids
+    _ids = None
+
+
+# ───────────────────────────── NOTIFY ─────────────────────────────
+def _on_notify(payload: str) -> None:
+    try:
+        table = json.loads(payload).get("t")
+    except ValueError:
+        table = None
+    if table in ("roles", None):
+        invalidate()
+
+
+async def _on_resync() -> None:
+    invalidate()
+
+
+def register() -> None:
+    """Liga o mapa ao listener (chamar antes de listener.start())."""
+    listener.subscribe(CHANNEL, _on_notify)
+    listener.on_resync(_on_resync)
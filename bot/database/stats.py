@@ -0,0 +1,162 @@
+# bot/database/stats.py
+"""
+Estatísticas de utilizadores para o ecrã do administrador.
+
+Lê da vista materializada da migração 006 (mv_user_stats) em vez de
+agregar users / user_roles / user_phones a cada abertura do menu.
+
+Refresh (`refresh_user_stats()` – CONCURRENTLY, não bloqueia leituras):
+• no arranque e de STATS_REFRESH_INTERVAL em STATS_REFRESH_INTERVAL s;
+• depois de escritas: os NOTIFY do canal «cache_inval» (migração 004)
+  marcam as vistas como desactualizadas e um único refresh corre
+  STATS_REFRESH_DEBOUNCE s depois – um lote de inserts custa um refresh.
+Um advisory lock garante que só uma instância faz o refresh de cada vez.
+
+`generation` sobe a cada refresh local; quem guarda texto renderizado
+(ex.: administrator_handlers) usa-a para saber quando o refazer.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+
+from bot.config import STATS_REFRESH_DEBOUNCE, STATS_REFRESH_INTERVAL
+from bot.database.connection import get_pool
+from bot.database.notify import listener
+from bot.utils import metrics
+
+log = logging.getLogger(__name__)
+
+CHANNEL = "cache_inval"                     # o mesmo bus de bot.database.user_cache
+
+_LOCK_KEY = 0x0B07_57A7                     # pg_advisory_lock partilhado entre instâncias
+
+_REFRESH_SECONDS = metrics.histogram(
+    "user_stats_refresh_seconds",
+    "Duração de refresh_user_stats()",
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+
+generation = 0
+_task: Optional[asyncio.Task] = None
+_debounce: Optional[asyncio.TimerHandle] = None
+_pending: Set[asyncio.Task] = set()
+_last_refresh = 0.0
+
+
+@dataclass
+class UserStats:
+    total: int = 0
+    by_role: Dict[str, int] = field(default_factory=dict)
+    linked_by_role: Dict[str, int] = field(default_factory=dict)
+    weekly: List[Tuple[str, int, int]] = field(default_factory=list)   # (segunda, novos, por staff)
+    refreshed_at: Optional[datetime] = None
+
+
+# ───────────────────────────── leitura ─────────────────────────────
+async def fetch() -> UserStats:
+    """Lê mv_user_stats (uma query sobre ~30 linhas)."""
+    pool = await get_pool()
+    rows = await pool.fetch("SELECT kind, key, n, n_by_staff, refreshed_at FROM mv_user_stats")
+    out = UserStats()
+    for r in rows:
+        out.refreshed_at = r["refreshed_at"]
+        kind = r["kind"]
+        if kind == "total":
+            out.total = r["n"]
+        elif kind == "role":
+            out.by_role[r["key"]] = r["n"]
+        elif kind == "linked":
+            out.linked_by_role[r["key"]] = r["n"]
+        elif kind == "week":
+            out.weekly.append((r["key"], r["n"], r["n_by_staff"]))
+    out.weekly.sort()
+    return out
+
+
+# ───────────────────────────── refresh ─────────────────────────────
+async def refresh() -> bool:
+    """REFRESH CONCURRENTLY das vistas; False se outra instância o está a fazer."""
+    global generation, _last_refresh
+    pool = await get_pool()
+    started = time.perf_counter()
+    async with pool.acquire() as conn:
+        if not await conn.fetchval("SELECT pg_try_advisory_lock($1)", _LOCK_KEY):
+            return False
+        try:
+            await conn.execute("SELECT refresh_user_stats()")
+        finally:
+            await conn.execute("SELECT pg_advisory_unlock($1)", _LOCK_KEY)
+    elapsed = time.perf_counter() - started
+    _REFRESH_SECONDS.observe(elapsed)
+    generation += 1
+    _last_refresh = time.monotonic()
+    log.debug("Estatísticas actualizadas em %.3fs", elapsed)
+    return True
+
+
+async def _refresh_logged() -> None:
+    try:
+        await refresh()
+    except Exception:
+        log.exception("Refresh das estatísticas falhou")
+
+
+def _debounced() -> None:
+    global _debounce
+    _debounce = None
+    task = asyncio.get_running_loop().create_task(_refresh_logged())
+    _pending.add(task)
+    task.add_done_callback(_pending.discard)
+
+
+def mark_dirty() -> None:
+    """Agenda um refresh para daqui a STATS_REFRESH_DEBOUNCE s (eventos seguintes juntam-se a este)."""
+    global _debounce
+    if _debounce is None:
+        _debounce = asyncio.get_running_loop().call_later(STATS_REFRESH_DEBOUNCE, _debounced)
+
+
+def stale_after() -> float:
+    """Segundos até a próxima actualização periódica (para TTL de caches)."""
+    return max(0.0, _last_refresh + STATS_REFRESH_INTERVAL - time.monotonic())
+
+
+# ───────────────────────────── NOTIFY ─────────────────────────────
+def _on_notify(_payload: str) -> None:
+    mark_dirty()
+
+
+def register() -> None:
+    """Liga o refresh adiado ao bus de invalidação (chamar antes de listener.start())."""
+    listener.subscribe(CHANNEL, _on_notify)
+
+
+# ───────────────────────────── tarefa periódica ─────────────────────────────
+async def _loop() -> None:
+    while True:
+        await _refresh_logged()
+        await asyncio.sleep(STATS_REFRESH_INTERVAL)
+
+
+def start() -> None:
+    """Lança a tarefa periódica (idempotente)."""
+    global _task
+    if _task is None or _task.done():
+        _task = asyncio.get_running_loop().create_task(_loop())
+
+
+async def stop(_timeout: float = 0) -> None:
+    """Drain hook: cancela a tarefa periódica e o refresh pendente."""
+    global _task, _debounce
+    if _debounce is not None:
+        _debounce.cancel()
+        _debounce = None
+    if _task is not None:
+        _task.cancel()
+        _task = None
@@ -0,0 +1,165 @@
+# bot/database/user_cache.py
+"""
+Cache em memória «telegram_user_id → (utilizador, roles)».
+
+Substitui a cache de 60 s do RoleCheckMiddleware.  Como as alterações
+em users / user_roles / user_phones / roles chegam por NOTIFY (canal
+«cache_inval», migração 004), as entradas podem viver muito mais tempo
+(USER_CACHE_TTL): cada evento despeja exactamente os utilizadores e
+telegram IDs afectados.
+
+Salvaguardas:
+• enquanto o listener estiver desligado o TTL volta aos 60 s de sempre;
+• a cada (re)ligação a cache é esvaziada – os eventos perdidos no
+  intervalo não são recuperáveis;
+• o atraso entre o trigger e o despejo é medido em
+  `user_cache_invalidation_lag_seconds`.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import time
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from bot.config import USER_CACHE_TTL
+from bot.database import queries as q
+from bot.database.connection import get_pool
+from bot.database.notify import listener
+from bot.utils import metrics
+
+log = logging.getLogger(__name__)
+
+CHANNEL = "cache_inval"
+
+_FALLBACK_TTL = 60.0                       # sem listener: comportamento antigo
+
+_Entry = Tuple[Optional[Dict[str, Any]], List[str], float]
+
+_by_tg: Dict[int, _Entry] = {}
+_tg_by_user: Dict[str, Set[int]] = {}
+_generation = 0                            # sobe a cada invalidação
+
+_ENTRIES = metrics.gauge("user_cache_entries", "Entradas na cache de utilizadores")
+_LOOKUPS = metrics.counter("user_cache_lookups_total", "Consultas à cache de utilizadores")
+_EVICTIONS = metrics.counter("user_cache_evictions_total", "Entradas despejadas da cache de utilizadores")
+_LAG = metrics.histogram(
+    "user_cache_invalidation_lag_seconds",
+    "Atraso entre o trigger na BD e o despejo na cache",
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+
+
+def _ttl() -> float:
+    return USER_CACHE_TTL if listener.connected else _FALLBACK_TTL
+
+
+# ───────────────────────────── leitura ─────────────────────────────
+async def get_user_and_roles(tg_id: int) -> Tuple[Optional[Dict[str, Any]], List[str]]:
+    """Utilizador ligado a *tg_id* (ou None) e as suas roles em minúsculas."""
+    now = time.monotonic()
+    cached = _by_tg.get(tg_id)
+    if cached and now - cached[2] < _ttl():
+        _LOOKUPS.inc(labels={"result": "hit"})
+        return cached[0], cached[1]
+
+    _LOOKUPS.inc(labels={"result": "miss"})
+    gen   = _generation
+    pool  = await get_pool()
+    user  = await q.get_user_by_telegram_id(pool, tg_id)
+    roles = [r.lower() for r in await q.get_user_roles(pool, user["user_id"])] if user else []
+
+    # uma invalidação durante a leitura pode tornar o resultado obsoleto
+    if gen == _generation:
+        _store(tg_id, user, roles, now)
+    return user, roles
+
+
+def _store(tg_id: int, user: Optional[Dict[str, Any]], roles: List[str], now: float) -> None:
+    _evict_tg(tg_id)
+    _by_tg[tg_id] = (user, roles, now)
+    if user:
+        _tg_by_user.setdefault(str(user["user_id"]), set()).add(tg_id)
+    _ENTRIES.set(len(_by_tg))
+
+
+# ───────────────────────────── despejo ─────────────────────────────
+def _evict_tg(tg_id: int) -> int:
+    entry = _by_tg.pop(tg_id, None)
+    if entry is None:
+        return 0
+    user = entry[0]
+    if user:
+        ids = _tg_by_user.get(str(user["user_id"]))
+        if ids is not None:
+            ids.discard(tg_id)
+            if not ids:
+                del _tg_by_user[str(user["user_id"])]
+    return 1
+
+
+def evict_user(user_id: str) -> int:
+    """Despeja todas as entradas do utilizador (todos os seus telefones)."""
+    global _generation
+    _generation += 1                         # leituras em curso não repõem a entrada
+    return sum(_evict_tg(tg) for tg in list(_tg_by_user.get(str(user_id), ())))
+
+
+def evict_telegram_id(tg_id: int) -> int:
+    global _generation
+    _generation += 1
+    return _evict_tg(tg_id)
+
+
+def flush(reason: str = "manual") -> None:
+    global _generation
+    _generation += 1
+    n = len(_by_tg)
+    _by_tg.clear()
+    _tg_by_user.clear()
+    _EVICTIONS.inc(n, labels={"reason": reason})
+    _ENTRIES.set(0)
+    if n:
+        log.info("Cache de utilizadores esvaziada (%s): %d entradas", reason, n)
+
+
+def size() -> int:
+    return len(_by_tg)
+
+
+# ───────────────────────────── NOTIFY ─────────────────────────────
+def on_notify(payload: str) -> None:
+    global _generation
+    _generation += 1
+    try:
+        evt = json.loads(payload)
+        table = evt["t"]
+    except (ValueError, KeyError, TypeError):
+        log.warning("Cache de utilizadores: payload inválido %r – a esvaziar", payload)
+        flush("invalid")
+        return
+
+    if "ts" in evt:
+        _LAG.observe(max(0.0, time.time() - float(evt["ts"])))
+
+    if table == "roles":
+        flush("roles")
+        return
+
+    # um telegram ID recém-ligado pode estar em cache como «sem utilizador»
+    n = sum(evict_user(u) for u in evt.get("u", ()))
+    n += sum(_evict_tg(int(tg)) for tg in evt.get("tg", ()))
+    if n:
+        _EVICTIONS.inc(n, labels={"reason": table})
+        _ENTRIES.set(len(_by_tg))
+
+
+async def _on_resync() -> None:
+    flush("resync")
+
+
+def register() -> None:
+    """Liga a cache ao listener (chamar antes de listener.start())."""
+    listener.subscribe(CHANNEL, on_notify)
+    listener.on_resync(_on_resync)
@@ -0,0 +1,225 @@
+# bot/debug_http.py
+"""
+Endpoints HTTP de diagnóstico (/debug/*).
+
+Só são registados quando DEBUG_TOKEN está definido e exigem o cabeçalho
+«Authorization: Bearer <DEBUG_TOKEN>»; sem ele respondem 404 para não
+revelar a sua existência.
+
+• GET /debug/queries – estatísticas por query + queries lentas com EXPLAIN
+• GET /debug/runtime – tarefas asyncio por corrotina, GC, caches, pool
+                       PostgreSQL e ligações Redis;
+      ?tracemalloc=start[:N]  liga o tracemalloc (N frames, 1–50, default 1)
+      ?tracemalloc=stop       desliga-o e esquece o snapshot
+  Com o tracemalloc ligado cada chamada devolve os maiores alocadores e
+  a diferença face ao snapshot da chamada anterior – duas chamadas com
+  uns minutos de intervalo mostram o que está a crescer.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import gc
+import hmac
+import os
+import resource
+import tracemalloc
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from aiohttp import web
+from redis.asyncio import Redis
+
+from bot.config import DEBUG_TOKEN
+from bot.database import (
+    care_index,
+    connection,
+    instrumentation,
+    role_cache,
+    user_cache,
+)
+from bot.database.logger import pg_handler
+from bot.database.notify import listener
+from bot.utils import tracing
+
+_TOP = 25
+_MAX_LIMIT = 500                        # ?limit= de /debug/queries
+_MAX_FRAMES = 50                        # ?tracemalloc=start:N
+_IGNORED_FILES = (tracemalloc.__file__, "<frozen importlib._bootstrap>", "<unknown>")
+
+_last_snapshot: Optional[tracemalloc.Snapshot] = None
+
+
+def _authorized(request: web.Request) -> bool:
+    header = request.headers.get("Authorization", "")
+    scheme, _, token = header.partition(" ")
+    return scheme.lower() == "bearer" and hmac.compare_digest(token, DEBUG_TOKEN)
+
+
+def _int_param(name: str, value: str, lo: int, hi: int) -> int:
+    """Inteiro em [lo, hi] vindo da query string; 400 se não for."""
+    try:
+        n = int(value)
+    except ValueError:
+        raise web.HTTPBadRequest(text=f"{name}: esperado um inteiro") from None
+    if not lo <= n <= hi:
+        raise web.HTTPBadRequest(text=f"{name}: tem de estar entre {lo} e {hi}")
+    return n
+
+
+# ───────────────────────────── /debug/queries ─────────────────────────────
+async def queries(request: web.Request) -> web.Response:
+    if not _authorized(request):
+        raise web.HTTPNotFound()
+    limit = _int_param("limit", request.query.get("limit", "20"), 1, _MAX_LIMIT)
+    return web.json_response(instrumentation.report(limit=limit))
+
+
+# ───────────────────────────── /debug/runtime ─────────────────────────────
+def _task_name(task: asyncio.Task) -> str:
+    coro = task.get_coro()
+    return getattr(coro, "__qualname__", None) or type(coro).__name__
+
+
+def _tasks() -> Dict[str, Any]:
+    tasks = asyncio.all_tasks()
+    by_coro = Counter(_task_name(t) for t in tasks)
+    return {
+        "total": len(tasks),
+        "by_coroutine": dict(by_coro.most_common()),
+    }
+
+
+def _gc() -> Dict[str, Any]:
+    return {
+        "counts": gc.get_count(),
+        "thresholds": gc.get_threshold(),
+        "generations": gc.get_stats(),
+        "garbage": len(gc.garbage),
+    }
+
+
+def _process() -> Dict[str, Any]:
+    page = os.sysconf("SC_PAGE_SIZE")
+    try:
+        with open("/proc/self/statm") as fh:
+            rss = int(fh.read().split()[1]) * page
+    except OSError:
+        rss = None
+    return {
+        "rss_bytes": rss,
+        "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "open_fds": len(os.listdir("/proc/self/fd")) if os.path.isdir("/proc/self/fd") else None,
+    }
+
+
+def _caches() -> Dict[str, Any]:
+    return {
+        "user_cache": user_cache.size(),
+        "role_cache": role_cache.size(),
+        "care_index": care_index.size(),
+        "query_stats": len(instrumentation.query_stats()),
+        "trace_queue": len(tracing.exporter._queue),
+        "trace_dropped": tracing.exporter.dropped,
+        "pg_log_pending": len(pg_handler._pending),
+    }
+
+
+def _postgres() -> Dict[str, Any]:
+    pool = connection.peek()
+    out: Dict[str, Any] = {
+        "listener_connected": listener.connected,
+        "listener_reconnects": listener.reconnects,
+    }
+    if pool is not None:
+        out.update(
+            size=pool.get_size(),
+            idle=pool.get_idle_size(),
+            min=pool.get_min_size(),
+            max=pool.get_max_size(),
+        )
+    return out
+
+
+def _redis(redis: Optional[Redis]) -> Dict[str, Any]:
+    if redis is None:
+        return {}
+    cp = redis.connection_pool
+    return {
+        "available": len(getattr(cp, "_available_connections", ())),
+        "in_use": len(getattr(cp, "_in_use_connections", ())),
+        "max": cp.max_connections,
+    }
+
+
+def _stat_line(stat: Any) -> Dict[str, Any]:
+    frame = stat.traceback[0]
+    out = {
+        "where": f"{frame.filename}:{frame.lineno}",
+        "size_kb": round(stat.size / 1024, 1),
+        "count": stat.count,
+    }
+    if hasattr(stat, "size_diff"):
+        out["size_diff_kb"] = round(stat.size_diff / 1024, 1)
+        out["count_diff"] = stat.count_diff
+    return out
+
+
+def _take_snapshot() -> tracemalloc.Snapshot:
+    snap = tracemalloc.take_snapshot()
+    return snap.filter_traces([tracemalloc.Filter(False, f) for f in _IGNORED_FILES])
+
+
+async def _tracemalloc(action: Optional[str]) -> Dict[str, Any]:
+    global _last_snapshot
+    if action and action.startswith("start"):
+        _, _, frames = action.partition(":")
+        n = _int_param("tracemalloc=start:N", frames or "1", 1, _MAX_FRAMES)
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(n)
+        _last_snapshot = None
+    elif action == "stop":
+        tracemalloc.stop()
+        _last_snapshot = None
+
+    if not tracemalloc.is_tracing():
+        return {"tracing": False}
+
+    # take_snapshot percorre todas as alocações – fora do event-loop
+    snap = await asyncio.get_running_loop().run_in_executor(None, _take_snapshot)
+    current, peak = tracemalloc.get_traced_memory()
+    out: Dict[str, Any] = {
+        "tracing": True,
+        "traced_kb": round(current / 1024, 1),
+        "peak_kb": round(peak / 1024, 1),
+        "top": [_stat_line(s) for s in snap.statistics("lineno")[:_TOP]],
+    }
+    if _last_snapshot is not None:
+        diff: List[Any] = snap.compare_to(_last_snapshot, "lineno")
+        out["growth_since_last_call"] = [_stat_line(s) for s in diff[:_TOP] if s.size_diff > 0]
+    _last_snapshot = snap
+    return out
+
+
+def _runtime_handler(redis: Optional[Redis]):
+    async def runtime(request: web.Request) -> web.Response:
+        if not _authorized(request):
+            raise web.HTTPNotFound()
+        return web.json_response({
+            "process": _process(),
+            "tasks": _tasks(),
+            "gc": _gc(),
+            "caches": _caches(),
+            "postgres": _postgres(),
+            "redis": _redis(redis),
+            "tracemalloc": await _tracemalloc(request.query.get("tracemalloc")),
+        })
+    return runtime
+
+
+def register(app: web.Application, *, redis: Optional[Redis] = None) -> None:
+    """Adiciona as rotas /debug/* (no-op se DEBUG_TOKEN estiver vazio)."""
+    if not DEBUG_TOKEN:
+        return
+    app.router.add_get("/debug/queries", queries)
+    app.router.add_get("/debug/runtime", _runtime_handler(redis))
@@ -1,11 +1,154 @@
 # bot/handlers/accountant_handlers.py
-from aiogram import Router
-from aiogram.filters import Command
+"""
+Accountant menu handlers (Aiogram 3.x)
+
+• «Faturas» / «Pagamentos» – últimos documentos de todos os clientes,
+  lidos da cache Moloni (bot.database.billing).
+• «📥 XLSX/CSV» – enfileira o job «report_export» (worker); o ficheiro
+  chega ao chat com send_document quando estiver pronto.
+• «Sincronizar» – enfileira o job «moloni_sync» (worker) e acompanha o
+  progresso na própria mensagem-menu durante até _FOLLOW_TIMEOUT s.
+  O acompanhamento corre numa tarefa à parte (o handler termina logo e
+  liberta o lock do chat); cada edição volta a pegar no lock e pára se
+  o utilizador entretanto saiu deste ecrã.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+
+from aiogram import Bot, F, Router, types
+from aiogram.filters import Command, StateFilter
+from aiogram.fsm.context import FSMContext
 from aiogram.types import Message
 
+from bot import jobs
+from bot.database import billing, reports
+from bot.menus import show_menu
+from bot.menus.billing_menu import build_back_kbd, render_job, render_recent
+from bot.menus.reports_menu import export_callbacks, parse_export
+from bot.menus.ui_helpers import edit_menu, refresh_menu
+from bot.states.billing_states import BillingStates
+from bot.utils import chat_lock
+
+log = logging.getLogger(__name__)
+
 router = Router(name="accountant")
 
+_KIND = {"ac:invoices": "invoice", "ac:payments": "payment"}
+_REPORT = {"invoice": "invoices", "payment": "payments"}
+_FOLLOW_TIMEOUT = 20.0                 # s a actualizar o menu com o progresso
+
 @router.message(Command("accountant_dummy"))
 async def accountant_dummy(message: Message) -> None:
     """Stub handler só para confirmar que o router está registado."""
     await message.answer("Accountant handler stub está OK.")
+
+# ─────────────────────────── Faturas / Pagamentos ───────────────────────────
+async def _screen(kind: str) -> str:
+    docs, synced_at = await asyncio.gather(billing.recent(kind), billing.last_sync())
+    return render_recent(kind, docs, synced_at)
+
+@router.callback_query(StateFilter(None), F.data.in_(list(_KIND)))
+async def open_billing(cb: types.CallbackQuery, state: FSMContext) -> None:
+    await cb.answer()
+    kind = _KIND[cb.data]
+    text = await _screen(kind)
+
+    await state.set_state(BillingStates.ACCOUNTANT)
+    await state.update_data(billing_kind=kind)
+    await refresh_menu(
+        bot       = cb.bot,
+        state     = state,
+        chat_id   = cb.message.chat.id,
+        message_id= (await state.get_data()).get("menu_msg_id"),
+        text      = text,
+        keyboard  = build_back_kbd(sync=billing.enabled(), export=True),
+    )
+
+@router.callback_query(BillingStates.ACCOUNTANT, F.data == "ac:sync")
+async def sync_now(cb: types.CallbackQuery, state: FSMContext) -> None:
+    await cb.answer("🔄 Sincronização pedida")
+    data = await state.get_data()
+    kind = data.get("billing_kind", "invoice")
+    # mesma chave do cron: um clique durante a ronda periódica segue essa ronda
+    job_id = await jobs.enqueue("moloni_sync", dedup_key="moloni_sync")
+
+    asyncio.create_task(
+        _follow_sync(cb.bot, cb.message.chat.id, state, kind, job_id, data.get("menu_msg_id"))
+    )
+
+async def _still_here(state: FSMContext, msg_id: int | None) -> bool:
+    """O menu de faturação que estamos a actualizar continua a ser o activo?"""
+    cur, data = await asyncio.gather(state.get_state(), state.get_data())
+    return cur == BillingStates.ACCOUNTANT.state and data.get("menu_msg_id") == msg_id
+
+async def _follow_sync(
+    bot: Bot,
+    chat_id: int,
+    state: FSMContext,
+    kind: str,
+    job_id: str,
+    msg_id: int | None,
+) -> None:
+    try:
+        text = await _screen(kind)
+        info = None
+        async for info in jobs.follow(job_id, interval=1.0, timeout=_FOLLOW_TIMEOUT):
+            if info.finished:
+                break
+            async with chat_lock.hold(chat_id):
+                if not await _still_here(state, msg_id):
+                    return
+                msg = await edit_menu(
+                    bot=bot,
+                    chat_id=chat_id,
+                    message_id=msg_id,
+                    text=f"{text}\n\n{render_job(info)}",
+                    keyboard=build_back_kbd(sync=True, export=True),
+                    state=state,             # progresso igual → nenhuma chamada
+                )
+                if msg.message_id != msg_id:  # menu reenviado: cliques no novo contam
+                    msg_id = msg.message_id
+                    await state.update_data(menu_msg_id=msg_id, menu_ids=[msg_id])
+
+        # ecrã final com os dados novos (e o temporizador do menu reiniciado)
+        final = f"{await _screen(kind)}\n\n{render_job(info)}"
+        async with chat_lock.hold(chat_id):
+            if not await _still_here(state, msg_id):
+                return
+            await refresh_menu(
+                bot       = bot,
+                state     = state,
+                chat_id   = chat_id,
+                message_id= msg_id,
+                text      = final,
+                keyboard  = build_back_kbd(sync=True, export=True),
+            )
+    except Exception:
+        log.exception("Erro a acompanhar a sincronização %s", job_id)
+
+@router.callback_query(BillingStates.ACCOUNTANT, F.data.in_(export_callbacks("ac")))
+async def export_billing(cb: types.CallbackQuery, state: FSMContext) -> None:
+    fmt, period = parse_export(cb.data)
+    kind = (await state.get_data()).get("billing_kind", "invoice")
+    start, end, label = reports.period_bounds(period)
+    chat_id = cb.message.chat.id
+    # dedup: cliques repetidos enquanto o ficheiro é gerado não criam outro job
+    await jobs.enqueue(
+        "report_export",
+        dedup_key=f"report:{chat_id}:{kind}:{fmt}:{period}",
+        chat_id=chat_id,
+        report=_REPORT[kind],
+        fmt=fmt,
+        start=start.isoformat(),
+        end=end.isoformat(),
+        label=label,
+    )
+    await cb.answer(f"📥 A preparar o ficheiro ({label}) – chega a este chat dentro de momentos.")
+
+@router.callback_query(BillingStates.ACCOUNTANT, F.data == "back")
+async def billing_back(cb: types.CallbackQuery, state: FSMContext) -> None:
+    await cb.answer()
+    await show_menu(cb.bot, cb.message.chat.id, state, ["accountant"], requested="accountant")
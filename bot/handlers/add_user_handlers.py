@@ -18,7 +18,12 @@ from bot.utils.validators import (
     valid_pt_phone,
 )
 from bot.database import queries as Q
-from bot.utils.fsm_helpers import clear_keep_role          # ← mantém active_role
+from bot.utils.phone import canonical, display, is_country_code, split
+from bot.utils.render import PARSE_MODE, Template, static
+from bot.utils.fsm_helpers import (
+    append_data,
+    clear_keep_role,                                       # ← mantém active_role
+)
 
 router = Router(name="add_user")
 
@@ -29,15 +34,24 @@ PROMPTS = {
         "Data de nascimento (dd-MM-aaaa ou dd/MM/aaaa) — escreva «saltar» se desconhece:"
     ),
     AddUserFlow.PHONE_COUNTRY: "Indicativo do país (ex.: +351, 351 ou 00351):",
-    AddUserFlow.PHONE_NUMBER: "Número de telemóvel *sem* indicativo:",
+    AddUserFlow.PHONE_NUMBER: "Número de telemóvel <b>sem</b> indicativo:",
     AddUserFlow.EMAIL: "Endereço de e-mail:",
 }
+PROMPTS = {k: static(v) for k, v in PROMPTS.items()}      # HTML, validado no import
+
+_CHOOSE_ROLE = static("👤 <b>Adicionar utilizador</b> — escolha o tipo:")
+_SUMMARY = Template(
+    "<b>Confirme os dados:</b>\n"
+    "• Tipo: {role}\n"
+    "• Nome: {first_name} {last_name}\n"
+    "• Data Nasc.: {date_of_birth}\n"
+    "• Tel.: {phone}\n"
+    "• Email: {email}"
+)
 
 # ───────────────── helpers ─────────────────
 async def _cache(state: FSMContext, mid: int):
-    d = await state.get_data()
-    d.setdefault("flow_msgs", []).append(mid)
-    await state.update_data(flow_msgs=d["flow_msgs"])
+    await append_data(state, "flow_msgs", mid)
 
 
 async def _purge(bot: types.Bot, state: FSMContext, fallback_chat: int):
@@ -52,6 +66,7 @@ async def _purge(bot: types.Bot, state: FSMContext, fallback_chat: int):
 async def _ask(msg: types.Message, prompt: str, state: FSMContext, *, kbd=True):
     m = await msg.answer(
         prompt,
+        parse_mode=PARSE_MODE,
         reply_markup=cancel_back_kbd() if kbd else types.ReplyKeyboardRemove(),
     )
     await _cache(state, m.message_id)
@@ -80,8 +95,8 @@ async def _handle_back_cancel(
             await state.set_state(AddUserFlow.CHOOSING_ROLE)
             await msg.answer("⁠", reply_markup=types.ReplyKeyboardRemove())  # zero-width
             menu = await msg.answer(
-                "👤 *Adicionar utilizador* — escolha o tipo:",
-                parse_mode="Markdown",
+                _CHOOSE_ROLE,
+                parse_mode=PARSE_MODE,
                 reply_markup=build_user_type_kbd(),
             )
             await state.update_data(menu_msg_id=menu.message_id, menu_chat_id=menu.chat.id)
@@ -135,10 +150,12 @@ async def phone_cc(msg: types.Message, state: FSMContext):
     if await _handle_back_cancel(msg, state, AddUserFlow.DATE_OF_BIRTH):
         return
     try:
-        disp, cc = normalize_phone_cc(msg.text)
+        _disp, cc = normalize_phone_cc(msg.text)
+        if not is_country_code(cc):
+            raise ValueError("Indicativo de país desconhecido.")
     except ValueError as e:
         return await msg.reply(f"⚠️ {e}")
-    await state.update_data(phone_cc_display=disp, phone_cc=cc)
+    await state.update_data(phone_cc=cc)
     await _ask(msg, PROMPTS[AddUserFlow.PHONE_NUMBER], state)
     await state.set_state(AddUserFlow.PHONE_NUMBER)
 
@@ -149,13 +166,12 @@ async def phone(msg: types.Message, state: FSMContext):
         return
     d = await state.get_data()
     try:
-        if d["phone_cc"] == "351":
-            valid_pt_phone(msg.text.strip())
-        elif not msg.text.isdigit():
-            raise ValueError("Apenas dígitos.")
+        e164 = canonical(msg.text, cc=d["phone_cc"])           # nacional ou «+…»
+        if e164.startswith("351"):
+            valid_pt_phone(e164[3:])                           # PT: só telemóveis
     except ValueError as e:
         return await msg.reply(f"⚠️ {e}")
-    await state.update_data(phone=msg.text.strip())
+    await state.update_data(phone=e164)
     await _ask(msg, PROMPTS[AddUserFlow.EMAIL], state)
     await state.set_state(AddUserFlow.EMAIL)
 
@@ -175,13 +191,13 @@ async def email(msg: types.Message, state: FSMContext):
 # ───────── summary & callbacks ─────────
 async def _summary(msg: types.Message, state: FSMContext):
     d = await state.get_data()
-    txt = (
-        "*Confirme os dados:*\n"
-        f"• Tipo: {d['role']}\n"
-        f"• Nome: {d['first_name']} {d['last_name']}\n"
-        f"• Data Nasc.: {d['date_of_birth'] or '—'}\n"
-        f"• Tel.: {d['phone_cc_display']}{d['phone']}\n"
-        f"• Email: {d['email']}"
+    txt = _SUMMARY.render(
+        role=d["role"],
+        first_name=d["first_name"],
+        last_name=d["last_name"],
+        date_of_birth=d["date_of_birth"],                 # None → «—»
+        phone=display(d["phone"]),
+        email=d["email"],
     )
     kb = types.InlineKeyboardMarkup(
         inline_keyboard=[
@@ -192,7 +208,7 @@ async def _summary(msg: types.Message, state: FSMContext):
             ]
         ]
     )
-    m = await msg.answer(txt, reply_markup=kb, parse_mode="Markdown")
+    m = await msg.answer(txt, reply_markup=kb, parse_mode=PARSE_MODE)
     await state.update_data(menu_msg_id=m.message_id, menu_chat_id=m.chat.id)
     await _cache(state, m.message_id)
     await state.set_state(AddUserFlow.CONFIRM_DATA)
@@ -205,13 +221,13 @@ async def cb_cancel(cb: types.CallbackQuery, state: FSMContext):
 
 
 @router.callback_query(AddUserFlow.CONFIRM_DATA, F.data == "add_ok")
-async def cb_ok(cb: types.CallbackQuery, state: FSMContext):
+async def cb_ok(cb: types.CallbackQuery, state: FSMContext, user: dict | None = None):
     d = await state.get_data()
     pool = cb.bot.pg_pool
 
-    # obter UUID do staff que cria (pode não existir)
-    admin = await Q.get_user_by_telegram_id(pool, cb.from_user.id)
-    created_by = admin["user_id"] if admin else None
+    # UUID do staff que cria (injectado pelo RoleCheckMiddleware; pode não existir)
+    created_by = user["user_id"] if user else None
+    cc, national = split(d["phone"])             # E.164 (pode ser de outro país que o pedido)
 
     await Q.add_user(
         pool,
@@ -221,8 +237,8 @@ async def cb_ok(cb: types.CallbackQuery, state: FSMContext):
         date_of_birth=(
             date.fromisoformat(d["date_of_birth"]) if d["date_of_birth"] else None
         ),
-        phone_cc=d["phone_cc"],
-        phone=d["phone"],
+        phone_cc=cc,
+        phone=national,
         email=d["email"],
         created_by=created_by,
     )
@@ -239,5 +255,5 @@ async def cb_edit(cb: types.CallbackQuery, state: FSMContext):
 async def _finish(cb: types.CallbackQuery, state: FSMContext, text: str):
     await _purge(cb.bot, state, cb.message.chat.id)
     with suppress(exceptions.TelegramBadRequest):
-        await cb.message.edit_text(text, parse_mode="Markdown")
+        await cb.message.edit_text(text)
     await clear_keep_role(state)                       # ← (era state.clear())
@@ -5,13 +5,21 @@ Administrator menu handlers (Aiogram 3.x)
 • Navegação do menu de administrador
 • Fluxo “Adicionar Utilizador” (FSM AddUserFlow)
 • Menu rendering através de ui_helpers.refresh_menu
+• Ecrã «Estatísticas» (bot.database.stats – texto em cache entre refreshes)
 """
 
 from __future__ import annotations
 
+import time
+from typing import Optional, Tuple
+from zoneinfo import ZoneInfo
+
 from aiogram import F, Router, types
 from aiogram.fsm.context import FSMContext
 
+from bot.config import TIMEZONE
+from bot.database import stats
+
 from bot.states.admin_menu_states import AdminMenuStates
 from bot.states.add_user_flow     import AddUserFlow
 from bot.menus.ui_helpers         import (
@@ -24,6 +32,7 @@ from bot.menus.administrator_menu import (
     build_menu as _main_menu_kbd,
     build_user_type_kbd,
 )
+from bot.utils.render import Template, static
 
 router = Router(name="administrator")
 
@@ -46,7 +55,63 @@ def _users_kbd() -> types.InlineKeyboardMarkup:
         ]
     )
 
+def _stats_kbd() -> types.InlineKeyboardMarkup:
+    return types.InlineKeyboardMarkup(inline_keyboard=[[back_button()]])
+
+# ─────────────────────────── estatísticas ───────────────────────────
+_ROLE_PT = {
+    "patient":         "🩹 Pacientes",
+    "caregiver":       "🫱🏼‍🫲🏽 Cuidadores",
+    "physiotherapist": "👩🏼‍⚕️ Fisioterapeutas",
+    "accountant":      "📊 Contabilistas",
+    "administrator":   "👨🏼‍💻 Administradores",
+}
+
+# (geração do refresh, expira em, texto) – o texto só muda quando as
+# vistas materializadas mudam
+_stats_text: Optional[Tuple[int, float, str]] = None
+
+
+_STATS_TITLE = static("📊 <b>Estatísticas</b>")
+_STATS_TOTAL = Template("👥 Utilizadores: <b>{total}</b>")
+_STATS_BY_ROLE = static("<b>Por perfil</b> (com Telegram):")
+_STATS_ROLE = Template("{label}: {count} ({linked})")
+_STATS_WEEKLY = static("<b>Novos por semana</b> (criados via bot):")
+_STATS_WEEK = Template("<code>{day}/{month}</code>  {new} ({by_staff})")
+_STATS_AT = Template("Actualizado às {at:%H:%M}")
+
+
+def _render_stats(s: stats.UserStats) -> str:
+    lines = [_STATS_TITLE, "", _STATS_TOTAL.render(total=s.total), "", _STATS_BY_ROLE]
+    for role, label in _ROLE_PT.items():
+        if role in s.by_role:
+            lines.append(_STATS_ROLE.render(
+                label=label, count=s.by_role[role], linked=s.linked_by_role.get(role, 0),
+            ))
+    lines += ["", _STATS_WEEKLY]
+    for monday, new, by_staff in s.weekly:
+        lines.append(_STATS_WEEK.render(day=monday[8:10], month=monday[5:7], new=new, by_staff=by_staff))
+    if s.refreshed_at is not None:
+        lines += ["", _STATS_AT.render(at=s.refreshed_at.astimezone(ZoneInfo(TIMEZONE)))]
+    return "\n".join(lines)
+
+
+async def _stats_screen_text() -> str:
+    global _stats_text
+    now = time.monotonic()
+    if _stats_text is not None and _stats_text[0] == stats.generation and now < _stats_text[1]:
+        return _stats_text[2]
+    text = _render_stats(await stats.fetch())
+    # outra instância pode ter feito o refresh → expira no máximo no próximo periódico
+    _stats_text = (stats.generation, now + max(stats.stale_after(), 30.0), text)
+    return text
+
 # ─────────────────────────── helper UI ───────────────────────────
+_MAIN_TEXT     = static("👨🏼‍💻 <b>Menu:</b>")
+_AGENDA_TEXT   = static("📅 <b>Agenda</b> — seleccione:")
+_USERS_TEXT    = static("👥 <b>Utilizadores</b> — seleccione:")
+_ADD_USER_TEXT = static("👤 <b>Adicionar utilizador</b> — escolha o tipo:")
+
 async def _swap_menu(
     cb: types.CallbackQuery,
     state: FSMContext,
@@ -67,24 +132,23 @@ async def _swap_menu(
 # ─────────────────── wrappers de navegação ───────────────────
 async def _main(cb: types.CallbackQuery, state: FSMContext):
     await state.set_state(AdminMenuStates.MAIN)
-    await _swap_menu(cb, state, "👨🏼‍💻 *Menu:*", _main_menu_kbd())
+    await _swap_menu(cb, state, _MAIN_TEXT, _main_menu_kbd())
 
 async def _agenda(cb: types.CallbackQuery, state: FSMContext):
     await state.set_state(AdminMenuStates.AGENDA)
-    await _swap_menu(cb, state, "📅 *Agenda* — seleccione:", _agenda_kbd())
+    await _swap_menu(cb, state, _AGENDA_TEXT, _agenda_kbd())
 
 async def _users(cb: types.CallbackQuery, state: FSMContext):
     await state.set_state(AdminMenuStates.USERS)
-    await _swap_menu(cb, state, "👥 *Utilizadores* — seleccione:", _users_kbd())
+    await _swap_menu(cb, state, _USERS_TEXT, _users_kbd())
+
+async def _stats(cb: types.CallbackQuery, state: FSMContext):
+    await state.set_state(AdminMenuStates.STATS)
+    await _swap_menu(cb, state, await _stats_screen_text(), _stats_kbd())
 
 async def _add_user(cb: types.CallbackQuery, state: FSMContext):
     await state.set_state(AddUserFlow.CHOOSING_ROLE)
-    await _swap_menu(
-        cb,
-        state,
-        "👤 *Adicionar utilizador* — escolha o tipo:",
-        build_user_type_kbd(),
-    )
+    await _swap_menu(cb, state, _ADD_USER_TEXT, build_user_type_kbd())
 
 # ─────────────────────────── MENU PRINCIPAL ───────────────────────────
 @router.callback_query(AdminMenuStates.MAIN, F.data == "admin:agenda")
@@ -102,11 +166,22 @@ async def open_messages(cb: types.CallbackQuery, state: FSMContext):
     await close_menu_with_alert(cb, "🚧 Mensagens – em desenvolvimento", state)
     await state.set_state(AdminMenuStates.MAIN)
 
+@router.callback_query(AdminMenuStates.MAIN, F.data == "admin:stats")
+async def open_stats(cb: types.CallbackQuery, state: FSMContext):
+    await cb.answer()
+    await _stats(cb, state)
+
+# ─────────────────────────────── Estatísticas ───────────────────────────────
+@router.callback_query(AdminMenuStates.STATS, F.data == "back")
+async def stats_back(cb: types.CallbackQuery, state: FSMContext):
+    await cb.answer()
+    await _main(cb, state)
+
 # ─────────────────────────────── Agenda ───────────────────────────────
 @router.callback_query(AdminMenuStates.AGENDA, F.data.in_(["agenda:geral", "agenda:fisios"]))
 async def agenda_placeholder(cb: types.CallbackQuery, state: FSMContext):
     destino = "Geral" if cb.data.endswith("geral") else "Fisioterapeuta"
-    await close_menu_with_alert(cb, f"📅 *Agenda {destino}* – em desenvolvimento", state)
+    await close_menu_with_alert(cb, f"📅 Agenda {destino} – em desenvolvimento", state)
     await state.set_state(AdminMenuStates.MAIN)
 
 @router.callback_query(AdminMenuStates.AGENDA, F.data == "back")
@@ -117,7 +192,7 @@ async def agenda_back(cb: types.CallbackQuery, state: FSMContext):
 # ─────────────────────────── Utilizadores ───────────────────────────
 @router.callback_query(AdminMenuStates.USERS, F.data == "users:search")
 async def users_search(cb: types.CallbackQuery, state: FSMContext):
-    await close_menu_with_alert(cb, "🔍 *Pesquisar utilizador* – em desenvolvimento", state)
+    await close_menu_with_alert(cb, "🔍 Pesquisar utilizador – em desenvolvimento", state)
     await state.set_state(AdminMenuStates.USERS)
 
 @router.callback_query(AdminMenuStates.USERS, F.data == "users:add")
@@ -134,7 +209,7 @@ async def users_back(cb: types.CallbackQuery, state: FSMContext):
 @router.callback_query(AddUserFlow.CHOOSING_ROLE, F.data.startswith("role:"))
 async def adduser_choose_role(cb: types.CallbackQuery, state: FSMContext):
     role = cb.data.split(":", 1)[1]
-    await close_menu_with_alert(cb, f"✅ *{role.title()}* seleccionado! Vamos pedir os dados…", state)
+    await close_menu_with_alert(cb, f"✅ {role.title()} seleccionado! Vamos pedir os dados…", state)
     await state.update_data(role=role)
     await cb.message.answer("Primeiro(s) nome(s):", reply_markup=cancel_back_kbd())
     await state.set_state(AddUserFlow.FIRST_NAME)
@@ -5,17 +5,21 @@ from aiogram.fsm.context import FSMContext
 from aiogram.types import Message
 import json
 
+from bot.utils.render import PARSE_MODE, Template
+
 router = Router(name="debug-fsm")
 
+_DUMP = Template(
+    "<b>FSM state</b>: <code>{state}</code>\n"
+    "<b>FSM data</b>:\n<pre><code class=\"language-json\">{data}</code></pre>"
+)
+
 @router.message(Command("dumpfsm"))
 async def dump_fsm(msg: Message, state: FSMContext):
     data  = await state.get_data()
     cur   = await state.get_state()
-    txt   = (
-        f"*FSM state*: `{cur}`\n"
-        f"*FSM data*:\n```json\n{json.dumps(data, indent=2, ensure_ascii=False)}```"
-    )
-    await msg.answer(txt, parse_mode="Markdown")
+    txt   = _DUMP.render(state=cur, data=json.dumps(data, indent=2, ensure_ascii=False))
+    await msg.answer(txt, parse_mode=PARSE_MODE)
 
 @router.message(Command("resetfsm"))
 async def reset_fsm(msg: Message, state: FSMContext):
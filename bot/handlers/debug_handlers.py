@@ -4,12 +4,17 @@ Comandos de depuração / utilidade.
 
 • /whoami  – mostra o utilizador e o perfil activo
 • /admin   – demonstra verificação manual de perfil «administrator»
+• /slowq   – queries mais pesadas + últimas lentas com EXPLAIN (só admins)
 """
 
+import time
+
 from aiogram import Router, F
 from aiogram.types import Message
 from aiogram.fsm.context import FSMContext
 
+from bot.database import instrumentation
+
 router = Router(name="debug")
 
 # ─────────── /whoami ───────────
@@ -37,3 +42,38 @@ async def admin_check(msg: Message, state: FSMContext):
         await msg.answer("✔️ Tens acesso de administrador!")
     else:
         await msg.answer("❌ Precisas de ser administrador para esse comando.")
+
+# ─────────── /slowq (apenas para perfil administrador) ───────────
+_MAX_MSG = 4000                                  # limite Telegram: 4096
+
+@router.message(F.text.startswith("/slowq"))
+async def slow_queries(msg: Message, state: FSMContext):
+    data = await state.get_data()
+    if data.get("active_role") != "administrator":
+        await msg.answer("❌ Precisas de ser administrador para esse comando.")
+        return
+
+    rep = instrumentation.report(limit=5)
+    lines = [f"🐢 Queries (limiar {rep['threshold_ms']:.0f} ms)", "", "Top por tempo total:"]
+    for s in rep["top"]:
+        lines.append(
+            f"• {s['caller']}: {s['calls']}× · média {s['mean_ms']:.1f} ms · "
+            f"máx {s['max_ms']:.1f} ms · {s['rows']} linhas"
+        )
+    if not rep["top"]:
+        lines.append("—")
+
+    lines += ["", "Últimas lentas:"]
+    for q in rep["slow"][:3]:
+        ago = int(time.time() - q["at"])
+        lines.append(f"• {q['caller']} – {q['duration_ms']:.0f} ms (há {ago} s)")
+        lines.append(f"  {q['sql'][:300]}")
+        if q["plan"]:
+            lines.append(q["plan"][:800])
+        elif q["error"]:
+            lines.append(f"  EXPLAIN falhou: {q['error']}")
+    if not rep["slow"]:
+        lines.append("—")
+
+    # texto simples (sem parse_mode): o SQL/plano tem * _ [ …
+    await msg.answer("\n".join(lines)[:_MAX_MSG])
@@ -1,11 +1,63 @@
 # bot/handlers/patient_handlers.py
-from aiogram import Router
-from aiogram.filters import Command
+"""
+Patient menu handlers (Aiogram 3.x)
+
+• «Pagamentos» – faturas e recibos do paciente lidos da cache Moloni
+  (bot.database.billing); nenhuma chamada à API durante o update.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Dict, Optional
+
+from aiogram import F, Router, types
+from aiogram.filters import Command, StateFilter
+from aiogram.fsm.context import FSMContext
 from aiogram.types import Message
 
+from bot.database import billing
+from bot.menus import show_menu
+from bot.menus.billing_menu import build_back_kbd, render_customer
+from bot.menus.ui_helpers import refresh_menu
+from bot.states.billing_states import BillingStates
+
 router = Router(name="patient")
 
 @router.message(Command("patient_dummy"))
 async def accountant_dummy(message: Message) -> None:
     """Stub handler só para confirmar que o router está registado."""
     await message.answer("Patient handler stub está OK.")
+
+# ─────────────────────────────── Pagamentos ───────────────────────────────
+@router.callback_query(StateFilter(None), F.data == "pt:payments")
+async def open_payments(
+    cb: types.CallbackQuery,
+    state: FSMContext,
+    user: Optional[Dict[str, Any]] = None,
+) -> None:
+    await cb.answer()
+    customer_id = (user or {}).get("moloni_customer_id")
+    if customer_id is None:
+        text = render_customer(None, None)
+    else:
+        docs, synced_at = await asyncio.gather(
+            billing.customer_billing(customer_id),
+            billing.last_sync(),
+        )
+        text = render_customer(docs, synced_at)
+
+    await state.set_state(BillingStates.PATIENT)
+    await refresh_menu(
+        bot       = cb.bot,
+        state     = state,
+        chat_id   = cb.message.chat.id,
+        message_id= (await state.get_data()).get("menu_msg_id"),
+        text      = text,
+        keyboard  = build_back_kbd(),
+    )
+
+@router.callback_query(BillingStates.PATIENT, F.data == "back")
+async def payments_back(cb: types.CallbackQuery, state: FSMContext) -> None:
+    await cb.answer()
+    await show_menu(cb.bot, cb.message.chat.id, state, ["patient"], requested="patient")
@@ -1,11 +1,74 @@
 # bot/handlers/physiotherapist_handlers.py
-from aiogram import Router
-from aiogram.filters import Command
+"""
+Physiotherapist menu handlers (Aiogram 3.x)
+
+• «Relatórios» – exportação CSV/XLSX da faturação dos pacientes do
+  fisioterapeuta (job «report_export» no worker; o ficheiro chega ao
+  chat com send_document).
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, Optional
+
+from aiogram import F, Router, types
+from aiogram.filters import Command, StateFilter
+from aiogram.fsm.context import FSMContext
 from aiogram.types import Message
 
+from bot import jobs
+from bot.database import reports
+from bot.menus import show_menu
+from bot.menus.reports_menu import build_reports_kbd, export_callbacks, parse_export, render_physio
+from bot.menus.ui_helpers import refresh_menu
+from bot.states.report_states import ReportStates
+
 router = Router(name="physiotherapist")
 
 @router.message(Command("physiotherapist_dummy"))
 async def accountant_dummy(message: Message) -> None:
     """Stub handler só para confirmar que o router está registado."""
     await message.answer("Physiotherapist handler stub está OK.")
+
+# ─────────────────────────────── Relatórios ───────────────────────────────
+@router.callback_query(StateFilter(None), F.data == "ph:reports")
+async def open_reports(cb: types.CallbackQuery, state: FSMContext) -> None:
+    await cb.answer()
+    await state.set_state(ReportStates.PHYSIO)
+    await refresh_menu(
+        bot       = cb.bot,
+        state     = state,
+        chat_id   = cb.message.chat.id,
+        message_id= (await state.get_data()).get("menu_msg_id"),
+        text      = render_physio(),
+        keyboard  = build_reports_kbd("ph"),
+    )
+
+@router.callback_query(ReportStates.PHYSIO, F.data.in_(export_callbacks("ph")))
+async def export_reports(
+    cb: types.CallbackQuery,
+    user: Optional[Dict[str, Any]] = None,
+) -> None:
+    if not user:
+        await cb.answer("Conta sem ficha de utilizador.", show_alert=True)
+        return
+    fmt, period = parse_export(cb.data)
+    start, end, label = reports.period_bounds(period)
+    chat_id = cb.message.chat.id
+    await jobs.enqueue(
+        "report_export",
+        dedup_key=f"report:{chat_id}:physio:{fmt}:{period}",
+        chat_id=chat_id,
+        report="physio_billing",
+        fmt=fmt,
+        start=start.isoformat(),
+        end=end.isoformat(),
+        label=label,
+        owner=str(user["user_id"]),
+    )
+    await cb.answer(f"📥 A preparar o ficheiro ({label}) – chega a este chat dentro de momentos.")
+
+@router.callback_query(ReportStates.PHYSIO, F.data == "back")
+async def reports_back(cb: types.CallbackQuery, state: FSMContext) -> None:
+    await cb.answer()
+    await show_menu(cb.bot, cb.message.chat.id, state, ["physiotherapist"], requested="physiotherapist")
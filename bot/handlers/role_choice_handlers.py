@@ -16,6 +16,7 @@ from aiogram.fsm.context import FSMContext
 from bot.menus            import show_menu
 from bot.menus.ui_helpers import refresh_menu, close_menu_with_alert
 from bot.states.menu_states import MenuStates
+from bot.utils.render     import static
 
 router = Router(name="role_choice")
 
@@ -27,6 +28,8 @@ _LABELS_PT = {
     "accountant":      "📊 Contabilista",
     "administrator":   "👨🏼‍💻 Administrador",
 }
+_ASK_TEXT = static("🎭 <b>Escolha o perfil:</b>")
+
 def _label(role: str) -> str:
     return _LABELS_PT.get(role.lower(), role.capitalize())
 
@@ -53,7 +56,7 @@ async def ask_role(
         state     = state,
         chat_id   = chat_id,
         message_id= prev_msg_id,
-        text      = "🎭 *Escolha o perfil:*",
+        text      = _ASK_TEXT,
         keyboard  = kbd,
     )
 
@@ -0,0 +1,21 @@
+# bot/jobs/__init__.py
+"""
+Jobs em segundo plano (fila em Redis + processo worker).
+
+Para trabalho lento ou que não pode perder-se num restart – envios em
+massa, importações, relatórios, sincronizações externas.  Os handlers
+enfileiram e, se quiserem, acompanham o progresso para actualizar a
+mensagem-menu:
+
+    job_id = await jobs.enqueue("moloni_sync", dedup_key="moloni_sync")
+    async for info in jobs.follow(job_id, timeout=20):
+        ...  # info.status, info.progress, info.result
+
+As tarefas (bot.jobs.tasks) correm no worker (worker.py), que escala
+independentemente do webhook.  Detalhes da fila em bot.jobs.queue.
+"""
+
+from bot.jobs.queue import JobInfo, enqueue, follow, get, init
+from bot.jobs.registry import Context, cron, on_shutdown, task
+
+__all__ = ["Context", "JobInfo", "cron", "enqueue", "follow", "get", "init", "on_shutdown", "task"]
@@ -0,0 +1,82 @@
+# bot/jobs/cron.py
+"""
+Expressões cron de 5 campos (minuto hora dia-do-mês mês dia-da-semana)
+para os jobs periódicos do worker.
+
+Suporta «*», listas «1,15», intervalos «1-5», passos «*/10» e «8-18/2»;
+dia-da-semana 0–7 (0 e 7 = domingo).  Como no cron clássico, se dia do
+mês e dia da semana estiverem ambos restritos basta um coincidir.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from typing import FrozenSet, List, Tuple
+
+__all__ = ["CronExpr"]
+
+_BOUNDS: List[Tuple[int, int]] = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 7)]
+
+
+def _field(spec: str, lo: int, hi: int) -> FrozenSet[int]:
+    values = set()
+    for part in spec.split(","):
+        rng, _, step_s = part.partition("/")
+        step = int(step_s) if step_s else 1
+        if rng == "*":
+            start, end = lo, hi
+        elif "-" in rng:
+            a, b = rng.split("-", 1)
+            start, end = int(a), int(b)
+        else:
+            start = end = int(rng)
+            if step_s:
+                end = hi
+        if not (lo <= start <= end <= hi) or step < 1:
+            raise ValueError(f"campo cron inválido: {part!r} ({lo}-{hi})")
+        values.update(range(start, end + 1, step))
+    return frozenset(values)
+
+
+class CronExpr:
+    def __init__(self, expr: str) -> None:
+        fields = expr.split()
+        if len(fields) != 5:
+            raise ValueError(f"expressão cron precisa de 5 campos: {expr!r}")
+        self.expr = expr
+        self.minutes, self.hours, self.days, self.months, dow = (
+            _field(f, lo, hi) for f, (lo, hi) in zip(fields, _BOUNDS)
+        )
+        self.weekdays = frozenset(d % 7 for d in dow)           # 7 → 0 (domingo)
+        self._any_day = fields[2] == "*"
+        self._any_weekday = fields[4] == "*"
+
+    def _day_ok(self, t: datetime) -> bool:
+        dom = t.day in self.days
+        dow = (t.isoweekday() % 7) in self.weekdays
+        if self._any_day or self._any_weekday:
+            return dom and dow
+        return dom or dow
+
+    def next_after(self, t: datetime) -> datetime:
+        """Primeiro instante (ao minuto) estritamente depois de *t*."""
+        t = t.replace(second=0, microsecond=0) + timedelta(minutes=1)
+        limit = t + timedelta(days=366 * 4)
+        while t < limit:
+            if t.month not in self.months:
+                t = (t.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+                continue
+            if not self._day_ok(t):
+                t = t.replace(hour=0, minute=0) + timedelta(days=1)
+                continue
+            if t.hour not in self.hours:
+                t = t.replace(minute=0) + timedelta(hours=1)
+                continue
+            if t.minute not in self.minutes:
+                t += timedelta(minutes=1)
+                continue
+            return t
+        raise ValueError(f"expressão cron nunca dispara: {self.expr!r}")
+
+    def __repr__(self) -> str:
+        return f"CronExpr({self.expr!r})"
@@ -0,0 +1,334 @@
+# bot/jobs/queue.py
+"""
+Fila de jobs em Redis (partilhada pelo webhook e pelos workers).
+
+Chaves (prefixo JOBS_PREFIX):
+• <p>:queue         ZSET  id → instante (ms) em que o job pode correr
+                          (imediatos, agendados e re-tentativas)
+• <p>:running       ZSET  id → fim do lease (ms); o worker renova-o
+                          enquanto corre; leases expirados (worker morto)
+                          voltam à fila – nada se perde num restart
+• <p>:job:<id>      HASH  nome, kwargs, estado, tentativas, progresso,
+                          resultado / erro; expira JOBS_KEEP_RESULT s
+                          depois de terminar
+• <p>:dedup:<chave> STR   id do job pendente/em curso com essa chave;
+                          libertada quando o job termina
+• <p>:wake          LIST  «toque» para os workers bloqueados em BLPOP
+
+Cada transição (enfileirar, reclamar, terminar, re-tentar, devolver) é
+um script Lua – atómica entre várias instâncias.
+
+Estados: queued → running → done | failed, com retrying (à espera do
+back-off) pelo meio.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from redis.asyncio import Redis
+
+from bot.config import JOBS_KEEP_RESULT, JOBS_MAX_TRIES, JOBS_PREFIX
+
+__all__ = ["JobInfo", "enqueue", "follow", "get", "init"]
+
+FINISHED = ("done", "failed")
+
+_redis: Optional[Redis] = None
+_scripts: Dict[str, Any] = {}
+
+
+def _key(*parts: str) -> str:
+    return ":".join((JOBS_PREFIX,) + parts)
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def _s(value: Any) -> str:
+    return value.decode("utf-8") if isinstance(value, bytes) else str(value)
+
+
+# ───────────────────────────── scripts Lua ─────────────────────────────
+# KEYS: queue, job, dedup ('' = sem), wake
+# ARGV: id, run_at ms, dedup TTL ms, campo, valor, campo, valor…
+_LUA_ENQUEUE = """
+if KEYS[3] ~= '' then
+    local existing = redis.call('GET', KEYS[3])
+    if existing then return existing end
+    redis.call('SET', KEYS[3], ARGV[1], 'PX', ARGV[3])
+end
+redis.call('HSET', KEYS[2], unpack(ARGV, 4))
+redis.call('ZADD', KEYS[1], ARGV[2], ARGV[1])
+redis.call('RPUSH', KEYS[4], '1')
+redis.call('LTRIM', KEYS[4], -64, -1)
+return ARGV[1]
+"""
+
+# KEYS: queue, running · ARGV: agora ms, lease ms, worker, prefixo dos jobs
+# devolve {id, campo, valor, …} ou nil
+_LUA_CLAIM = """
+local ids = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, 1)
+if #ids == 0 then return nil end
+local id = ids[1]
+redis.call('ZREM', KEYS[1], id)
+local key = ARGV[4] .. id
+if redis.call('EXISTS', key) == 0 then return {id} end
+redis.call('ZADD', KEYS[2], tonumber(ARGV[1]) + tonumber(ARGV[2]), id)
+redis.call('HSET', key, 'status', 'running', 'worker', ARGV[3], 'started_at', ARGV[1])
+redis.call('HINCRBY', key, 'attempts', 1)
+local out = {id}
+for _, v in ipairs(redis.call('HGETALL', key)) do table.insert(out, v) end
+return out
+"""
+
+# KEYS: running, job, dedup ('' = sem) · ARGV: id, worker, TTL s, campo, valor…
+_LUA_FINISH = """
+if redis.call('HGET', KEYS[2], 'worker') ~= ARGV[2] then return 0 end
+redis.call('ZREM', KEYS[1], ARGV[1])
+redis.call('HSET', KEYS[2], unpack(ARGV, 4))
+redis.call('EXPIRE', KEYS[2], ARGV[3])
+if KEYS[3] ~= '' and redis.call('GET', KEYS[3]) == ARGV[1] then
+    redis.call('DEL', KEYS[3])
+end
+return 1
+"""
+
+# KEYS: running, queue, job, wake · ARGV: id, worker, quando ms, estado, erro
+_LUA_REQUEUE = """
+if redis.call('HGET', KEYS[3], 'worker') ~= ARGV[2] then return 0 end
+redis.call('ZREM', KEYS[1], ARGV[1])
+redis.call('ZADD', KEYS[2], ARGV[3], ARGV[1])
+redis.call('HSET', KEYS[3], 'status', ARGV[4], 'error', ARGV[5], 'worker', '')
+redis.call('RPUSH', KEYS[4], '1')
+redis.call('LTRIM', KEYS[4], -64, -1)
+return 1
+"""
+
+# KEYS: running, queue · ARGV: agora ms, prefixo dos jobs → nº recuperados
+_LUA_REAP = """
+local ids = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, 100)
+for _, id in ipairs(ids) do
+    redis.call('ZREM', KEYS[1], id)
+    redis.call('ZADD', KEYS[2], ARGV[1], id)
+    redis.call('HSET', ARGV[2] .. id, 'status', 'queued', 'worker', '', 'error', 'lease expirado')
+end
+return #ids
+"""
+
+
+def init(redis: Redis) -> None:
+    """Liga a fila a um cliente Redis (webhook: storage.redis; worker: o seu)."""
+    global _redis
+    _redis = redis
+    for name, src in (
+        ("enqueue", _LUA_ENQUEUE),
+        ("claim", _LUA_CLAIM),
+        ("finish", _LUA_FINISH),
+        ("requeue", _LUA_REQUEUE),
+        ("reap", _LUA_REAP),
+    ):
+        _scripts[name] = redis.register_script(src)
+
+
+def _r() -> Redis:
+    if _redis is None:
+        raise RuntimeError("bot.jobs.init(redis) ainda não foi chamado")
+    return _redis
+
+
+# ───────────────────────────── modelo ─────────────────────────────
+@dataclass
+class JobInfo:
+    id: str
+    name: str
+    status: str
+    attempts: int
+    max_tries: int
+    progress: Optional[Tuple[int, int, str]]
+    result: Any
+    error: Optional[str]
+    enqueued_at: float                    # epoch s
+    finished_at: Optional[float]
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED
+
+    @classmethod
+    def from_hash(cls, job_id: str, h: Dict[str, str]) -> "JobInfo":
+        progress = json.loads(h["progress"]) if h.get("progress") else None
+        return cls(
+            id=job_id,
+            name=h.get("name", "?"),
+            status=h.get("status", "queued"),
+            attempts=int(h.get("attempts", 0)),
+            max_tries=int(h.get("max_tries") or JOBS_MAX_TRIES),
+            progress=tuple(progress) if progress else None,       # type: ignore[arg-type]
+            result=json.loads(h["result"]) if h.get("result") else None,
+            error=h.get("error") or None,
+            enqueued_at=int(h.get("enqueued_at", 0)) / 1000,
+            finished_at=int(h["finished_at"]) / 1000 if h.get("finished_at") else None,
+        )
+
+
+def _hash(raw: Any) -> Dict[str, str]:
+    if isinstance(raw, dict):
+        return {_s(k): _s(v) for k, v in raw.items()}
+    it = iter(raw)
+    return {_s(k): _s(v) for k, v in zip(it, it)}
+
+
+# ───────────────────────────── API (handlers) ─────────────────────────────
+async def enqueue(
+    name: str,
+    *,
+    dedup_key: Optional[str] = None,
+    run_at: Optional[datetime] = None,
+    delay: float = 0.0,
+    max_tries: Optional[int] = None,
+    **kwargs: Any,
+) -> str:
+    """
+    Enfileira a tarefa *name* com *kwargs* (JSON) e devolve o id do job.
+
+    dedup_key: se já houver um job pendente / em curso com a mesma chave,
+               devolve o id desse em vez de criar outro.
+    run_at / delay: agenda para mais tarde.
+    """
+    _r()                                           # falha cedo sem init()
+    job_id = uuid.uuid4().hex
+    now = _now_ms()
+    when = int(run_at.timestamp() * 1000) if run_at is not None else now + int(delay * 1000)
+    fields = {
+        "name": name,
+        "kwargs": json.dumps(kwargs, ensure_ascii=False, default=str),
+        "status": "queued",
+        "attempts": 0,
+        "max_tries": max_tries or "",             # vazio → o da tarefa / JOBS_MAX_TRIES
+        "enqueued_at": now,
+        "run_at": when,
+        "dedup": dedup_key or "",
+    }
+    # a chave de dedup dura até o job terminar (com folga para o agendamento)
+    dedup_ttl = max(when - now, 0) + JOBS_KEEP_RESULT * 1000
+    flat: List[Any] = [x for kv in fields.items() for x in kv]
+    got = await _scripts["enqueue"](
+        keys=[_key("queue"), _key("job", job_id), _key("dedup", dedup_key) if dedup_key else "", _key("wake")],
+        args=[job_id, when, dedup_ttl, *flat],
+    )
+    return _s(got)
+
+
+async def get(job_id: str) -> Optional[JobInfo]:
+    raw = await _r().hgetall(_key("job", job_id))
+    return JobInfo.from_hash(job_id, _hash(raw)) if raw else None
+
+
+async def follow(
+    job_id: str,
+    *,
+    interval: float = 1.0,
+    timeout: Optional[float] = None,
+) -> AsyncIterator[JobInfo]:
+    """
+    Estado do job sempre que muda (estado ou progresso), até terminar ou
+    passar *timeout* s – para um handler ir actualizando a mensagem-menu.
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    last: Optional[Tuple[str, Any]] = None
+    while True:
+        info = await get(job_id)
+        if info is None:
+            return
+        seen = (info.status, info.progress)
+        if seen != last:
+            last = seen
+            yield info
+        if info.finished or (deadline is not None and time.monotonic() >= deadline):
+            return
+        await asyncio.sleep(interval)
+
+
+# ───────────────────────────── operações do worker ─────────────────────────────
+async def wait_for_work(timeout: float) -> None:
+    """Bloqueia até um enqueue «tocar» ou passar *timeout* s."""
+    await _r().blpop([_key("wake")], timeout=max(0.1, timeout))     # 0 = para sempre
+
+
+async def next_due_in(default: float) -> float:
+    """Segundos até ao próximo job agendado (limitado a *default*)."""
+    first = await _r().zrange(_key("queue"), 0, 0, withscores=True)
+    if not first:
+        return default
+    return max(0.0, min(default, first[0][1] / 1000 - time.time()))
+
+
+async def claim(worker: str, lease: float) -> Optional[Tuple[str, Dict[str, str]]]:
+    raw = await _scripts["claim"](
+        keys=[_key("queue"), _key("running")],
+        args=[_now_ms(), int(lease * 1000), worker, _key("job", "")],
+    )
+    if not raw:
+        return None
+    job_id = _s(raw[0])
+    return job_id, _hash(raw[1:])
+
+
+async def set_progress(job_id: str, done: int, total: int, note: str) -> None:
+    await _r().hset(_key("job", job_id), "progress", json.dumps([done, total, note], ensure_ascii=False))
+
+
+async def heartbeat(job_ids: List[str], lease: float) -> None:
+    if not job_ids:
+        return
+    until = _now_ms() + int(lease * 1000)
+    await _r().zadd(_key("running"), {j: until for j in job_ids}, xx=True)
+
+
+async def finish(job_id: str, worker: str, dedup: str, *, result: Any = None, error: Optional[str] = None) -> bool:
+    fields: Dict[str, Any] = {"status": "failed" if error else "done", "finished_at": _now_ms()}
+    if error:
+        fields["error"] = error
+    else:
+        fields["result"] = json.dumps(result, ensure_ascii=False, default=str)
+        fields["error"] = ""
+    flat = [x for kv in fields.items() for x in kv]
+    return bool(await _scripts["finish"](
+        keys=[_key("running"), _key("job", job_id), _key("dedup", dedup) if dedup else ""],
+        args=[job_id, worker, JOBS_KEEP_RESULT, *flat],
+    ))
+
+
+async def requeue(job_id: str, worker: str, *, delay: float, status: str, error: str = "") -> bool:
+    """Devolve o job à fila (re-tentativa com back-off ou shutdown do worker)."""
+    return bool(await _scripts["requeue"](
+        keys=[_key("running"), _key("queue"), _key("job", job_id), _key("wake")],
+        args=[job_id, worker, _now_ms() + int(delay * 1000), status, error],
+    ))
+
+
+async def reap() -> int:
+    """Leases expirados (worker morreu) → de volta à fila."""
+    return int(await _scripts["reap"](
+        keys=[_key("running"), _key("queue")],
+        args=[_now_ms(), _key("job", "")],
+    ))
+
+
+async def mark_once(marker: str, ttl: float) -> bool:
+    """SET NX – True só para a primeira instância (ex.: disparo de um cron)."""
+    return bool(await _r().set(_key(marker), "1", nx=True, ex=max(1, int(ttl))))
+
+
+async def depth() -> Tuple[int, int]:
+    """(jobs na fila, jobs a correr)."""
+    r = _r()
+    return await r.zcard(_key("queue")), await r.zcard(_key("running"))
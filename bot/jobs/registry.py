@@ -0,0 +1,92 @@
+# bot/jobs/registry.py
+"""
+Registo de tarefas do worker.
+
+    @task("broadcast", max_tries=3, timeout=600)
+    async def broadcast(ctx: Context, *, chat_ids: list, text: str) -> dict: ...
+
+    @cron("*/5 * * * *", task="moloni_sync")     # tarefa já registada
+
+O webhook só precisa do *nome* para enfileirar (bot.jobs.enqueue); o
+código das tarefas vive em bot.jobs.tasks e só é importado pelo worker.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from bot.jobs.cron import CronExpr
+
+__all__ = ["Context", "CronSpec", "TaskSpec", "CRONS", "SHUTDOWN", "TASKS", "cron", "on_shutdown", "task"]
+
+TaskFn = Callable[..., Awaitable[Any]]
+
+
+@dataclass
+class TaskSpec:
+    name: str
+    fn: TaskFn
+    max_tries: Optional[int] = None        # None → JOBS_MAX_TRIES
+    timeout: Optional[float] = None        # s por tentativa (None = sem limite)
+
+
+@dataclass
+class CronSpec:
+    expr: CronExpr
+    task: str
+    kwargs: Dict[str, Any] = field(default_factory=dict)
+
+
+TASKS: Dict[str, TaskSpec] = {}
+CRONS: List[CronSpec] = []
+SHUTDOWN: List[Callable[[], Awaitable[None]]] = []     # fecho de recursos das tarefas
+
+
+class Context:
+    """Passado a cada tarefa: identificação do job, progresso e recursos do worker."""
+
+    def __init__(
+        self,
+        job_id: str,
+        attempt: int,
+        progress: Callable[[int, int, str], Awaitable[None]],
+        resources: Dict[str, Any],
+        last_progress: Optional[Tuple[int, int, str]] = None,
+    ) -> None:
+        self.job_id = job_id
+        self.attempt = attempt                 # 1 na primeira tentativa
+        self.last_progress = last_progress     # da tentativa anterior – para retomar
+        self._progress = progress
+        self._resources = resources
+
+    async def progress(self, done: int, total: int, note: str = "") -> None:
+        """Publica o progresso (lido pelos handlers via bot.jobs.get / follow)."""
+        await self._progress(done, total, note)
+
+    def __getattr__(self, name: str) -> Any:
+        # recursos partilhados do worker (ex.: ctx.bot)
+        try:
+            return self._resources[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+
+def task(name: str, *, max_tries: Optional[int] = None, timeout: Optional[float] = None) -> Callable[[TaskFn], TaskFn]:
+    def deco(fn: TaskFn) -> TaskFn:
+        if name in TASKS:
+            raise ValueError(f"tarefa duplicada: {name}")
+        TASKS[name] = TaskSpec(name, fn, max_tries, timeout)
+        return fn
+    return deco
+
+
+def cron(expr: str, *, task: str, **kwargs: Any) -> None:
+    """Agenda *task* segundo *expr* (hora local – LOCAL_TIMEZONE)."""
+    CRONS.append(CronSpec(CronExpr(expr), task, kwargs))
+
+
+def on_shutdown(fn: Callable[[], Awaitable[None]]) -> Callable[[], Awaitable[None]]:
+    """Corre no fim do worker, depois de todos os jobs terminarem."""
+    SHUTDOWN.append(fn)
+    return fn
@@ -0,0 +1,141 @@
+# bot/jobs/reminders.py
+"""
+Dispatcher de lembretes de marcações (job «reminders_dispatch», cron
+REMINDERS_CRON; a BD está em bot.database.appointments).
+
+Uma ronda planeia, expira e depois reclama lotes de REMINDERS_BATCH até
+não haver vencidos.  Cada lote sai em paralelo (REMINDERS_CONCURRENCY
+envios em curso) através de um SendLimiter partilhado – REMINDERS_RATE
+mensagens/s no total e 1/s por chat – e o resultado do lote inteiro é
+gravado numa só instrução.
+
+Entrega:
+• 200 → sent (com message_id);
+• 429 / 5xx / rede → volta a pending (após retry_after ou back-off) até
+  REMINDERS_MAX_TRIES; um 429 pausa o limiter para todos;
+• bot bloqueado / chat inválido / outro erro da Bot API → failed (sem
+  nova tentativa); um erro inesperado conta como rede.
+_send nunca levanta: o record() do lote corre sempre, senão os já
+entregues ficavam em «sending» até expire() os dar como falhados.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List, Optional
+from zoneinfo import ZoneInfo
+
+from aiogram import Bot, exceptions
+
+from bot.config import (
+    REMINDER_LEADS,
+    REMINDERS_BATCH,
+    REMINDERS_CONCURRENCY,
+    REMINDERS_MAX_TRIES,
+    REMINDERS_RATE,
+    REMINDERS_STALE,
+    TIMEZONE,
+)
+from bot.database import appointments
+from bot.database.appointments import Outcome, Reminder
+from bot.utils import metrics
+from bot.utils.rate_limit import SendLimiter
+
+log = logging.getLogger(__name__)
+
+__all__ = ["LEADS", "dispatch", "render"]
+
+Progress = Callable[[int, int, str], Awaitable[None]]
+
+LEADS: List[timedelta] = [timedelta(hours=float(h)) for h in REMINDER_LEADS.split(",") if h.strip()]
+_HORIZON = max(LEADS, default=timedelta(0)) + timedelta(minutes=10)
+_TZ = ZoneInfo(TIMEZONE)
+_WEEKDAYS = ("segunda", "terça", "quarta", "quinta", "sexta", "sábado", "domingo")
+
+_SENT = metrics.counter("reminders_total", "Lembretes processados, por resultado")
+_LAG = metrics.histogram(
+    "reminder_delay_seconds",
+    "Atraso entre a hora prevista do lembrete e o envio",
+    buckets=(1.0, 5.0, 15.0, 30.0, 60.0, 120.0, 300.0, 900.0),
+)
+
+
+def render(r: Reminder) -> str:
+    """Texto simples (sem parse_mode) – nomes e local vêm da BD."""
+    when = r.starts_at.astimezone(_TZ)
+    lines = [
+        "⏰ Lembrete de sessão",
+        "",
+        f"{_WEEKDAYS[when.weekday()].capitalize()}, {when:%d/%m} às {when:%H:%M}",
+    ]
+    if r.for_caregiver:
+        lines.append(f"Paciente: {r.patient_name}")
+    if r.physio_name:
+        lines.append(f"Fisioterapeuta: {r.physio_name}")
+    if r.location:
+        lines.append(f"Local: {r.location}")
+    return "\n".join(lines)
+
+
+def _retry(r: Reminder, error: str, delay: float) -> Outcome:
+    if r.attempts >= REMINDERS_MAX_TRIES:
+        return Outcome(r.reminder_id, "failed", error=error)
+    retry_at = datetime.now(timezone.utc) + timedelta(seconds=delay)
+    return Outcome(r.reminder_id, "pending", error=error, retry_at=retry_at)
+
+
+async def _send(bot: Bot, limiter: SendLimiter, sem: asyncio.Semaphore, r: Reminder) -> Outcome:
+    async with sem:
+        await limiter.wait(r.chat_id)
+        try:
+            msg = await bot.send_message(r.chat_id, render(r))
+        except exceptions.TelegramRetryAfter as exc:
+            limiter.pause(exc.retry_after)
+            return _retry(r, f"429 retry_after={exc.retry_after}", exc.retry_after)
+        except (exceptions.TelegramForbiddenError, exceptions.TelegramBadRequest) as exc:
+            return Outcome(r.reminder_id, "failed", error=str(exc)[:300])
+        except (exceptions.TelegramServerError, exceptions.TelegramNetworkError, asyncio.TimeoutError) as exc:
+            return _retry(r, f"{type(exc).__name__}: {exc}"[:300], 30.0 * r.attempts)
+        except exceptions.TelegramAPIError as exc:       # 401 / 404 / 409 / migrate…
+            return Outcome(r.reminder_id, "failed", error=f"{type(exc).__name__}: {exc}"[:300])
+        except Exception as exc:                         # nunca deixar o lote sem record()
+            log.exception("Erro inesperado no lembrete %d", r.reminder_id)
+            return _retry(r, f"{type(exc).__name__}: {exc}"[:300], 30.0 * r.attempts)
+    _LAG.observe(max(0.0, (datetime.now(timezone.utc) - (r.starts_at - r.lead)).total_seconds()))
+    return Outcome(r.reminder_id, "sent", message_id=msg.message_id)
+
+
+async def dispatch(
+    bot: Bot,
+    *,
+    worker_id: str,
+    limiter: Optional[SendLimiter] = None,
+    batch: int = REMINDERS_BATCH,
+    concurrency: int = REMINDERS_CONCURRENCY,
+    progress: Optional[Progress] = None,
+) -> Dict[str, int]:
+    """Uma ronda completa; devolve contagens por resultado (+ planned / expired)."""
+    limiter = limiter or SendLimiter(REMINDERS_RATE)
+    sem = asyncio.Semaphore(concurrency)
+    stats: Counter = Counter()
+    stats["planned"] = await appointments.plan(LEADS, _HORIZON)
+    stats["expired"] = await appointments.expire(timedelta(seconds=REMINDERS_STALE))
+
+    while due := await appointments.claim(batch, worker_id):
+        outcomes = await asyncio.gather(*(_send(bot, limiter, sem, r) for r in due))
+        await appointments.record(worker_id, outcomes)
+        for o in outcomes:
+            stats[o.status] += 1
+            _SENT.inc(labels={"status": o.status})
+            if o.status == "failed":
+                log.warning("Lembrete %d falhou: %s", o.reminder_id, o.error)
+        if progress is not None:
+            await progress(stats["sent"], stats["sent"] + stats["failed"] + stats["pending"], "enviados")
+        if all(o.status == "pending" for o in outcomes):
+            break                            # tudo adiado (429 / rede): próxima ronda
+    if stats["sent"] or stats["failed"]:
+        log.info("Lembretes: %s", dict(stats))
+    return dict(stats)
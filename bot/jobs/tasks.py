@@ -0,0 +1,105 @@
+# bot/jobs/tasks.py
+"""
+Tarefas executadas pelo worker (importado só por bot.jobs.worker).
+
+• broadcast   – mensagem para uma lista de chats, ao ritmo permitido
+                pelo Telegram; uma re-tentativa retoma onde parou;
+• moloni_sync – ronda de sincronização da cache Moloni
+                (bot.database.billing); cron MOLONI_SYNC_CRON;
+• report_export – relatório CSV/XLSX (bot.database.reports) enviado
+                ao chat com send_document;
+• reminders_dispatch – lembretes de marcações vencidos
+                (bot.jobs.reminders); cron REMINDERS_CRON.
+"""
+
+from __future__ import annotations
+
+from datetime import date
+from typing import Any, Dict, List, Optional
+
+from aiogram import exceptions
+
+from bot.config import MOLONI_SYNC_CRON, REMINDERS_CRON
+from bot.database import billing, reports
+from bot.jobs import reminders
+from bot.jobs.registry import Context, cron, on_shutdown, task
+from bot.utils import spreadsheet
+from bot.utils.bot_session import max_upload
+from bot.utils.rate_limit import SendLimiter
+
+_BROADCAST_RATE = 25                   # mensagens/s (limite do Bot API ~30)
+_MAX_UPLOAD = max_upload()             # 50 MB no servidor oficial; 2000 MB num telegram-bot-api --local
+
+
+@task("broadcast", max_tries=3, timeout=3600)
+async def broadcast(ctx: Context, *, chat_ids: List[int], text: str) -> Dict[str, int]:
+    start = ctx.last_progress[0] if ctx.last_progress else 0
+    sent = failed = 0
+    total = len(chat_ids)
+    limiter = SendLimiter(_BROADCAST_RATE)
+    for i, chat_id in enumerate(chat_ids[start:], start + 1):
+        await limiter.wait(chat_id)
+        try:
+            await ctx.bot.send_message(chat_id, text)
+            sent += 1
+        except exceptions.TelegramRetryAfter as exc:
+            limiter.pause(exc.retry_after)
+            await limiter.wait(chat_id)
+            await ctx.bot.send_message(chat_id, text)
+            sent += 1
+        except (exceptions.TelegramForbiddenError, exceptions.TelegramBadRequest):
+            failed += 1                    # bloqueou o bot / chat inexistente
+        if i % _BROADCAST_RATE == 0 or i == total:
+            await ctx.progress(i, total, f"{failed} falhada(s)")
+    return {"sent": sent, "failed": failed, "resumed_at": start}
+
+
+@task("moloni_sync", max_tries=3, timeout=1800)
+async def moloni_sync(ctx: Context) -> Optional[Dict[str, Any]]:
+    result = await billing.sync_once(progress=ctx.progress)
+    if result is None:
+        return None                        # outra instância tinha o lock
+    await ctx.progress(2, 2, "concluído")
+    return {"changed": result[0], "backfilled": result[1]}
+
+
+@task("report_export", max_tries=2, timeout=1800)
+async def report_export(
+    ctx: Context,
+    *,
+    chat_id: int,
+    report: str,
+    fmt: str,
+    start: str,
+    end: str,
+    label: str,
+    owner: Optional[str] = None,
+) -> Dict[str, Any]:
+    async with reports.export(
+        report, fmt, date.fromisoformat(start), date.fromisoformat(end),
+        owner=owner, progress=ctx.progress,
+    ) as out:
+        title = f"{out.report.title} · {label}"
+        if not out.rows:
+            await ctx.bot.send_message(chat_id, f"📭 {title}: sem documentos no período.")
+        elif out.size > _MAX_UPLOAD:
+            await ctx.bot.send_message(
+                chat_id, f"⚠️ {title}: o ficheiro tem {out.size / 2**20:.0f} MB, acima do limite do Telegram.",
+            )
+        else:
+            await ctx.bot.send_document(chat_id, out.input_file(), caption=f"📥 {title} – {out.rows} linhas")
+        return {"rows": out.rows, "bytes": out.size, "file": out.filename}
+
+
+@task("reminders_dispatch", max_tries=1, timeout=1800)
+async def reminders_dispatch(ctx: Context) -> Dict[str, int]:
+    # claimed_by = job_id: record() só grava linhas reclamadas por este job
+    return await reminders.dispatch(ctx.bot, worker_id=ctx.job_id, progress=ctx.progress)
+
+
+if billing.enabled():
+    cron(MOLONI_SYNC_CRON, task="moloni_sync")
+if reminders.LEADS:
+    cron(REMINDERS_CRON, task="reminders_dispatch")
+on_shutdown(billing.close)
+on_shutdown(spreadsheet.close_pool)
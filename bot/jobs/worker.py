@@ -0,0 +1,256 @@
+# bot/jobs/worker.py
+"""
+Processo worker (entry-point: worker.py na raiz do projecto).
+
+Corre separado do webhook e escala à parte (`docker compose up
+--scale worker=N`); partilha bot.config, o PostgreSQL e o Redis.
+
+• até JOBS_CONCURRENCY jobs em simultâneo por processo;
+• lease de JOBS_LEASE s renovado por heartbeat; qualquer worker devolve
+  à fila os jobs de um worker que morreu (lease expirado);
+• falhas → nova tentativa com back-off exponencial (JOBS_RETRY_BASE ×
+  2^n, até JOBS_RETRY_MAX, com jitter) até max_tries; depois «failed»;
+• cron: cada worker calcula os disparos, mas só o primeiro a marcar o
+  instante (SET NX) enfileira – com dedup_key = nome da tarefa, por isso
+  um cron lento não se empilha (e um pedido manual com a mesma chave
+  junta-se ao job em curso);
+• SIGTERM: deixa de reclamar jobs, espera até JOBS_SHUTDOWN_TIMEOUT s
+  e devolve à fila os que não terminaram (a tarefa recomeça noutro
+  worker – as tarefas podem retomar via ctx.last_progress).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import random
+import signal
+import socket
+import time
+import uuid
+from contextlib import suppress
+from datetime import datetime
+from typing import Any, Dict, Optional
+from zoneinfo import ZoneInfo
+
+from aiogram import Bot
+from redis.asyncio import Redis
+
+from bot.config import (
+    BOT_TOKEN,
+    JOBS_CONCURRENCY,
+    JOBS_LEASE,
+    JOBS_MAX_TRIES,
+    JOBS_RETRY_BASE,
+    JOBS_RETRY_MAX,
+    JOBS_SHUTDOWN_TIMEOUT,
+    LOG_LEVEL,
+    REDIS_DB,
+    REDIS_HOST,
+    REDIS_PORT,
+    TIMEZONE,
+)
+from bot.database import connection
+from bot.jobs import queue
+from bot.jobs.registry import CRONS, SHUTDOWN, TASKS, Context
+from bot.utils.bot_session import build_session
+
+log = logging.getLogger(__name__)
+
+_IDLE_POLL = 5.0                       # s máximos entre verificações da fila
+
+
+def retry_delay(attempt: int) -> float:
+    """Back-off antes da tentativa attempt+1 (attempt ≥ 1)."""
+    return min(JOBS_RETRY_MAX, JOBS_RETRY_BASE * 2 ** (attempt - 1)) * random.uniform(0.8, 1.2)
+
+
+class Worker:
+    def __init__(
+        self,
+        *,
+        concurrency: int = JOBS_CONCURRENCY,
+        lease: float = JOBS_LEASE,
+        resources: Optional[Dict[str, Any]] = None,
+        crons: bool = True,
+    ) -> None:
+        self.id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.concurrency = concurrency
+        self.lease = lease
+        self.resources = resources or {}
+        self.crons = crons
+        self._running: Dict[str, asyncio.Task] = {}
+        self._stopping = asyncio.Event()
+        self._slot = asyncio.Event()
+
+    # ───────────────────────────── execução ─────────────────────────────
+    async def _execute(self, job_id: str, fields: Dict[str, str]) -> None:
+        name = fields.get("name", "?")
+        dedup = fields.get("dedup", "")
+        attempt = int(fields.get("attempts", 1))
+        spec = TASKS.get(name)
+        if spec is None:
+            await queue.finish(job_id, self.id, dedup, error=f"tarefa desconhecida: {name}")
+            return
+        # enqueue(max_tries=…) > @task(max_tries=…) > JOBS_MAX_TRIES
+        max_tries = int(fields.get("max_tries") or spec.max_tries or JOBS_MAX_TRIES)
+        if attempt > max_tries:
+            # só acontece se o worker morreu a meio em todas as tentativas
+            await queue.finish(job_id, self.id, dedup, error=fields.get("error") or "tentativas esgotadas")
+            return
+
+        async def progress(done: int, total: int, note: str) -> None:
+            await queue.set_progress(job_id, done, total, note)
+
+        last = json.loads(fields["progress"]) if fields.get("progress") else None
+        ctx = Context(job_id, attempt, progress, self.resources, tuple(last) if last else None)
+        kwargs = json.loads(fields.get("kwargs") or "{}")
+        started = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(spec.fn(ctx, **kwargs), spec.timeout)
+        except asyncio.CancelledError:
+            # shutdown: devolve já à fila; outro worker (ou o próximo arranque) retoma
+            await queue.requeue(job_id, self.id, delay=0, status="queued", error="worker terminou")
+            raise
+        except Exception as exc:
+            error = f"{type(exc).__name__}: {exc}"[:500]
+            if attempt < max_tries:
+                delay = retry_delay(attempt)
+                log.warning("Job %s %s falhou (tentativa %d) – nova em %.0fs: %s", name, job_id, attempt, delay, error)
+                await queue.requeue(job_id, self.id, delay=delay, status="retrying", error=error)
+            else:
+                log.error("Job %s %s falhou definitivamente: %s", name, job_id, error)
+                await queue.finish(job_id, self.id, dedup, error=error)
+            return
+        await queue.finish(job_id, self.id, dedup, result=result)
+        log.info("Job %s %s concluído em %.2fs", name, job_id, time.perf_counter() - started)
+
+    def _spawn(self, job_id: str, fields: Dict[str, str]) -> None:
+        task = asyncio.create_task(self._execute(job_id, fields), name=f"job:{fields.get('name')}:{job_id}")
+        self._running[job_id] = task
+
+        def done(t: asyncio.Task) -> None:
+            self._running.pop(job_id, None)
+            self._slot.set()
+            if not t.cancelled() and t.exception() is not None:
+                log.error("Job %s: erro no worker", job_id, exc_info=t.exception())
+
+        task.add_done_callback(done)
+
+    # ───────────────────────────── ciclos ─────────────────────────────
+    async def _idle(self, timeout: float) -> None:
+        """Espera por um enqueue, pelo próximo agendado ou pelo shutdown."""
+        waiter = asyncio.create_task(queue.wait_for_work(timeout))
+        stopper = asyncio.create_task(self._stopping.wait())
+        try:
+            await asyncio.wait({waiter, stopper}, timeout=timeout + 1, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for t in (waiter, stopper):
+                t.cancel()
+            with suppress(asyncio.CancelledError, Exception):
+                await waiter
+
+    async def _claim_loop(self) -> None:
+        while not self._stopping.is_set():
+            if len(self._running) >= self.concurrency:
+                self._slot.clear()
+                await self._slot.wait()
+                continue
+            try:
+                claimed = await queue.claim(self.id, self.lease)
+                if claimed is None:
+                    await self._idle(await queue.next_due_in(_IDLE_POLL))
+                    continue
+            except Exception:
+                log.exception("Worker: falha ao ler a fila")
+                await asyncio.sleep(1)
+                continue
+            job_id, fields = claimed
+            if fields:                              # hash expirado → ignora
+                self._spawn(job_id, fields)
+
+    async def _heartbeat_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            try:
+                await queue.heartbeat(list(self._running), self.lease)
+                if (n := await queue.reap()):
+                    log.warning("Worker: %d job(s) com lease expirado devolvidos à fila", n)
+            except Exception:
+                log.exception("Worker: heartbeat falhou")
+
+    async def _cron_loop(self) -> None:
+        if not CRONS:
+            return
+        tz = ZoneInfo(TIMEZONE)
+        now = datetime.now(tz)
+        due = [(spec.expr.next_after(now), spec) for spec in CRONS]
+        while True:
+            fire, spec = min(due, key=lambda d: d[0])
+            await asyncio.sleep(max(0.0, fire.timestamp() - time.time()))
+            i = next(i for i, d in enumerate(due) if d[1] is spec)
+            due[i] = (spec.expr.next_after(fire), spec)
+            try:
+                if await queue.mark_once(f"cron:{spec.task}:{int(fire.timestamp())}", ttl=3600):
+                    job_id = await queue.enqueue(spec.task, dedup_key=spec.task, **spec.kwargs)
+                    log.debug("Cron %s (%s) → job %s", spec.task, spec.expr.expr, job_id)
+            except Exception:
+                log.exception("Cron %s: falha ao enfileirar", spec.task)
+
+    async def run(self) -> None:
+        """Corre até stop(); devolve depois de todos os jobs terminarem/voltarem à fila."""
+        log.info("Worker %s: %d tarefa(s), %d cron(s), concorrência %d",
+                 self.id, len(TASKS), len(CRONS), self.concurrency)
+        side = [asyncio.create_task(self._heartbeat_loop())]
+        if self.crons:
+            side.append(asyncio.create_task(self._cron_loop()))
+        try:
+            await self._claim_loop()
+            if self._running:
+                log.info("Worker: à espera de %d job(s) em curso…", len(self._running))
+                _done, pending = await asyncio.wait(set(self._running.values()), timeout=JOBS_SHUTDOWN_TIMEOUT)
+                for t in pending:
+                    t.cancel()                      # _execute devolve o job à fila
+                if pending:
+                    await asyncio.wait(pending)
+        finally:
+            for t in side:
+                t.cancel()
+            await asyncio.gather(*side, return_exceptions=True)
+
+    def stop(self) -> None:
+        self._stopping.set()
+        self._slot.set()
+
+
+# ───────────────────────────── main() ─────────────────────────────
+async def main() -> None:
+    logging.basicConfig(
+        level=LOG_LEVEL,
+        format="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
+    )
+    import bot.jobs.tasks  # noqa: F401  – regista tarefas e crons
+
+    redis = Redis.from_url(f"redis://{REDIS_HOST}:{REDIS_PORT}/{REDIS_DB}")
+    queue.init(redis)
+    await connection.init()
+    bot = Bot(token=BOT_TOKEN, session=build_session())   # só para tarefas que enviam mensagens
+
+    worker = Worker(resources={"bot": bot})
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        with suppress(NotImplementedError):
+            loop.add_signal_handler(sig, worker.stop)
+
+    try:
+        await worker.run()
+    finally:
+        for fn in SHUTDOWN:
+            with suppress(Exception):
+                await fn()
+        await bot.session.close()
+        await connection.close()
+        await redis.aclose()
+        log.info("Worker %s terminado.", worker.id)
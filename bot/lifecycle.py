@@ -0,0 +1,310 @@
+# bot/lifecycle.py
+"""
+Ciclo de vida do processo: arranque idempotente e readiness.
+
+• ensure_webhook()   – só chama setWebhook se URL/segredo mudaram
+                       (getWebhookInfo + impressão digital do segredo no Redis)
+• ensure_commands()  – só chama setMyCommands se o hash da lista mudou
+• readiness_middleware – responde 503 ao webhook até mark_ready();
+                         o Telegram volta a tentar e nada se perde
+• Tempo desde o arranque do processo até ao primeiro update servido
+  é medido, registado no log e exposto em /readyz e /metrics.
+
+Shutdown sem perda de updates (drain):
+• o webhook fica registado – o Telegram guarda os updates enquanto
+  estamos em baixo e entrega-os ao próximo processo;
+• start_draining() faz o webhook responder 503 a pedidos novos;
+• wait_idle() espera (até um prazo) pelos updates em curso e pelas
+  chamadas ao Bot API pendentes, contadas por InFlightTracker;
+• run_drain_hooks() esvazia buffers de logs / métricas registados
+  com on_drain() antes de se fecharem os pools.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+from aiohttp import web
+from aiogram import BaseMiddleware, Bot, types
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from redis.asyncio import Redis
+
+from bot.config import REDIS_PREFIX, WEBHOOK_PATH
+from bot.utils import metrics
+
+log = logging.getLogger(__name__)
+
+__all__ = [
+    "PROCESS_START",
+    "ensure_webhook",
+    "ensure_commands",
+    "readiness_middleware",
+    "mark_ready",
+    "is_ready",
+    "readyz",
+    "InFlightTracker",
+    "start_draining",
+    "is_draining",
+    "wait_idle",
+    "on_drain",
+    "run_drain_hooks",
+]
+
+_META_WEBHOOK  = f"{REDIS_PREFIX}:meta:webhook"
+_META_COMMANDS = f"{REDIS_PREFIX}:meta:commands"
+
+_startup_seconds = metrics.gauge(
+    "bot_startup_seconds", "Segundos desde o arranque do processo até cada fase."
+)
+
+
+# ───────────────────────── relógio de arranque ─────────────────────────
+def _process_start() -> float:
+    """
+    Instante (time.time) em que o processo arrancou.
+
+    Em Linux lê /proc (inclui o tempo de import dos módulos); noutros
+    sistemas usa o momento de import deste módulo.
+    """
+    try:
+        with open("/proc/self/stat") as fh:
+            start_ticks = int(fh.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/stat") as fh:
+            btime = next(int(l.split()[1]) for l in fh if l.startswith("btime"))
+        return btime + start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError, StopIteration):
+        return time.time()
+
+
+PROCESS_START: float = _process_start()
+
+_ready_at: Optional[float] = None
+_first_update_at: Optional[float] = None
+_draining: bool = False
+
+
+def _since_start(ts: float) -> float:
+    return round(ts - PROCESS_START, 3)
+
+
+def mark_ready() -> None:
+    """Marca o processo como pronto (depois do warm-up)."""
+    global _ready_at
+    _ready_at = time.time()
+    _startup_seconds.set(_since_start(_ready_at), labels={"phase": "ready"})
+    log.info("✅ Pronto em %.3fs desde o arranque do processo", _since_start(_ready_at))
+
+
+def is_ready() -> bool:
+    return _ready_at is not None and not _draining
+
+
+def start_draining() -> None:
+    """A partir daqui o webhook recusa (503) updates novos."""
+    global _draining
+    _draining = True
+    log.info("Drain iniciado – webhook deixa de aceitar updates novos")
+
+
+def is_draining() -> bool:
+    return _draining
+
+
+# ───────────────────────── impressões digitais ─────────────────────────
+def _fingerprint(*parts: Any) -> str:
+    raw = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+async def ensure_webhook(bot: Bot, redis: Redis, url: str, secret: str) -> bool:
+    """
+    Regista o webhook apenas se for necessário.
+
+    O Bot API não devolve o secret_token em getWebhookInfo, por isso
+    guarda-se um hash (url + segredo) no Redis para o comparar.
+    Devolve True se setWebhook foi chamado.
+    """
+    wanted = _fingerprint(url, secret)
+    info = await bot.get_webhook_info()
+    stored = await redis.get(_META_WEBHOOK)
+    if isinstance(stored, bytes):
+        stored = stored.decode()
+
+    if info.url == url and stored == wanted:
+        log.info("Webhook já registado em %s – setWebhook ignorado", url)
+        return False
+
+    await bot.set_webhook(url, secret_token=secret)
+    await redis.set(_META_WEBHOOK, wanted)
+    log.info("Webhook registado em %s", url)
+    return True
+
+
+async def ensure_commands(
+    bot: Bot,
+    redis: Redis,
+    commands: Sequence[types.BotCommand],
+) -> bool:
+    """Chama setMyCommands só quando a lista de comandos mudou."""
+    wanted = _fingerprint([c.model_dump(exclude_none=True) for c in commands])
+    stored = await redis.get(_META_COMMANDS)
+    if isinstance(stored, bytes):
+        stored = stored.decode()
+
+    if stored == wanted:
+        log.info("Comandos inalterados – setMyCommands ignorado")
+        return False
+
+    await bot.set_my_commands(list(commands))
+    await redis.set(_META_COMMANDS, wanted)
+    log.info("Comandos do bot actualizados (%d)", len(commands))
+    return True
+
+
+# ───────────────────────── aiohttp: readiness ─────────────────────────
+@web.middleware
+async def readiness_middleware(
+    request: web.Request,
+    handler: Callable[[web.Request], Awaitable[web.StreamResponse]],
+) -> web.StreamResponse:
+    """Recusa updates (503) até o warm-up terminar; mede o 1.º update."""
+    global _first_update_at
+    if request.path != WEBHOOK_PATH:
+        return await handler(request)
+
+    if _draining:
+        return web.Response(status=503, text="Draining")
+    if not is_ready():
+        return web.Response(status=503, text="Warming up")
+
+    response = await handler(request)
+    if _first_update_at is None and response.status < 400:
+        _first_update_at = time.time()
+        _startup_seconds.set(_since_start(_first_update_at), labels={"phase": "first_update"})
+        log.info(
+            "⏱️ Primeiro update servido %.3fs após o arranque do processo",
+            _since_start(_first_update_at),
+        )
+    return response
+
+
+async def readyz(_request: web.Request) -> web.Response:
+    """Readiness probe: 200 quando pronto, 503 durante o warm-up."""
+    body: Dict[str, Any] = {
+        "ready": is_ready(),
+        "draining": _draining,
+        "ready_after_s": _since_start(_ready_at) if _ready_at else None,
+        "first_update_after_s": _since_start(_first_update_at) if _first_update_at else None,
+    }
+    return web.json_response(body, status=200 if is_ready() else 503)
+
+
+# ───────────────────────── drain: trabalho em curso ─────────────────────────
+class InFlightTracker:
+    """
+    Conta trabalho em curso em dois pontos:
+
+    • `update_middleware` (outer de `dp.update`) → updates a ser processados;
+    • `request_middleware` (sessão do Bot)       → chamadas ao Bot API.
+    """
+
+    def __init__(self) -> None:
+        self.updates = 0
+        self.api_calls = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self.update_middleware = _UpdateCounter(self)
+        self.request_middleware = _RequestCounter(self)
+
+    def enter(self, kind: str) -> None:
+        setattr(self, kind, getattr(self, kind) + 1)
+        self._idle.clear()
+
+    def leave(self, kind: str) -> None:
+        setattr(self, kind, getattr(self, kind) - 1)
+        if self.updates == 0 and self.api_calls == 0:
+            self._idle.set()
+
+    async def wait_idle(self, timeout: float) -> bool:
+        """Espera até não haver trabalho em curso; False se o prazo expirar."""
+        if self._idle.is_set():
+            return True
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+
+class _UpdateCounter(BaseMiddleware):
+    def __init__(self, tracker: InFlightTracker) -> None:
+        self.tracker = tracker
+
+    async def __call__(self, handler, event, data):  # type: ignore[override]
+        self.tracker.enter("updates")
+        try:
+            return await handler(event, data)
+        finally:
+            self.tracker.leave("updates")
+
+
+class _RequestCounter(BaseRequestMiddleware):
+    def __init__(self, tracker: InFlightTracker) -> None:
+        self.tracker = tracker
+
+    async def __call__(self, make_request, bot, method):  # type: ignore[override]
+        self.tracker.enter("api_calls")
+        try:
+            return await make_request(bot, method)
+        finally:
+            self.tracker.leave("api_calls")
+
+
+async def wait_idle(tracker: InFlightTracker, timeout: float) -> None:
+    """Espera pelo trabalho em curso e regista o que ficou por terminar."""
+    started = time.monotonic()
+    if await tracker.wait_idle(timeout):
+        log.info("Drain: trabalho em curso terminado em %.2fs", time.monotonic() - started)
+    else:
+        log.warning(
+            "Drain: prazo de %.0fs esgotado (%d updates, %d chamadas Bot API em curso)",
+            timeout, tracker.updates, tracker.api_calls,
+        )
+
+
+# ───────────────────────── drain: buffers ─────────────────────────
+_DRAIN_HOOKS: List[Callable[[float], Awaitable[None]]] = []
+
+FLUSH_RESERVE = 2.0             # s do prazo de drain guardados para os hooks
+
+
+def on_drain(hook: Callable[[float], Awaitable[None]]) -> None:
+    """Regista uma corrotina `hook(timeout)` que esvazia um buffer no shutdown."""
+    _DRAIN_HOOKS.append(hook)
+
+
+async def run_drain_hooks(timeout: float) -> None:
+    """
+    Corre todos os hooks (em paralelo) e faz flush dos handlers de logging.
+    Passado *timeout* os hooks por acabar são cancelados.
+    """
+    tasks = [asyncio.ensure_future(hook(timeout)) for hook in _DRAIN_HOOKS]
+    if tasks:
+        _, pending = await asyncio.wait(tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+    for hook, task in zip(_DRAIN_HOOKS, tasks):
+        if task.cancelled():
+            log.warning("Drain hook %s não acabou em %.1fs", getattr(hook, "__qualname__", hook), timeout)
+        elif task.exception() is not None:
+            log.warning("Drain hook %s falhou: %s", getattr(hook, "__qualname__", hook), task.exception())
+
+    for handler in logging.getLogger().handlers:
+        handler.flush()
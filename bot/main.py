@@ -1,6 +1,20 @@
 # bot/main.py
 """
 Entry-point da aplicação Telegram-bot (webhook • aiohttp).
+
+Arranque rápido e idempotente:
+• PostgreSQL, Redis e o runner aiohttp são inicializados em paralelo;
+• setWebhook / setMyCommands só são chamados quando algo mudou;
+• o webhook responde 503 até ao fim do warm-up (ver bot.lifecycle).
+
+Shutdown em modo drain (SIGTERM/SIGINT), por esta ordem:
+  1. o webhook deixa de aceitar updates (503) – mas continua registado,
+     pelo que o Telegram guarda o que chegar durante o restart;
+  2. espera por updates e chamadas Bot API em curso;
+  3. esvazia buffers de logs e métricas;
+  4. só então fecha servidor HTTP, pool PostgreSQL, sessão e Redis.
+Os passos 2 e 3 partilham um só prazo (DRAIN_TIMEOUT): cada um fica só
+com o tempo que sobra, e o 4 acaba antes do SIGKILL do Docker.
 """
 
 from __future__ import annotations
@@ -8,20 +22,80 @@ from __future__ import annotations
 import asyncio
 import logging
 import signal
+import time
 from contextlib import suppress
 
 from aiohttp import web
 from aiogram import Bot, Dispatcher, types
-from aiogram.fsm.storage.redis import RedisStorage, DefaultKeyBuilder
+from aiogram.fsm.storage.redis import DefaultKeyBuilder
 from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
 
+from bot import debug_http, jobs, lifecycle
 from bot.config import (
     BOT_TOKEN, WEBHOOK_URL, WEBHOOK_PATH, SECRET_TOKEN, WEBAPP_PORT, LOG_LEVEL,
-    REDIS_HOST, REDIS_PORT, REDIS_DB, REDIS_PREFIX,
+    REDIS_HOST, REDIS_PORT, REDIS_DB, REDIS_PREFIX, DRAIN_TIMEOUT,
 )
 from bot.middlewares.role_check_middleware import RoleCheckMiddleware
 from bot.middlewares.active_menu_middleware import ActiveMenuMiddleware
-from bot.database import connection
+from bot.middlewares.callback_index_middleware import CallbackIndexMiddleware
+from bot.middlewares.chat_lock_middleware import ChatLockMiddleware
+from bot.middlewares.tracing_middleware import (
+    HandlerSpanMiddleware,
+    TracedMiddleware,
+    TracingMiddleware,
+    TracingRequestMiddleware,
+)
+from bot.database import care_index, connection, log_maintenance, role_cache, stats, user_cache
+from bot.database.notify import listener as pg_listener
+from bot.database.logger import pg_handler
+from bot.utils import capture, chat_lock, metrics, tracing
+from bot.utils.bot_session import build_session
+from bot.utils.fsm_storage import AtomicRedisStorage
+
+# ───── comandos do bot (barra de sugestões) ─────
+BOT_COMMANDS = [
+    types.BotCommand(command="start",  description="▶️ Iniciar"),
+    types.BotCommand(command="services",  description="🩺 Serviços"),
+    types.BotCommand(command="team", description="🧑🏼‍🤝‍🧑🏽 Equipa"),
+    types.BotCommand(command="contacts", description="📞 Contactos"),
+]
+
+
+def build_dispatcher(
+    bot: Bot,
+    storage: AtomicRedisStorage,
+    tracker: lifecycle.InFlightTracker | None = None,
+) -> Dispatcher:
+    """Dispatcher com middlewares e routers (partilhado com scripts/bench)."""
+    dp = Dispatcher(bot=bot, storage=storage)
+
+    # ───── middlewares (ordem importa) ─────
+    if tracker is not None:
+        dp.update.outer_middleware(tracker.update_middleware)
+        bot.session.middleware(tracker.request_middleware)
+    dp.update.outer_middleware(TracingMiddleware())          # root span por update
+    dp.update.outer_middleware(ChatLockMiddleware())         # um update de cada vez por chat
+    bot.session.middleware(TracingRequestMiddleware())       # span por chamada Bot API
+    dp.message.outer_middleware(TracedMiddleware(RoleCheckMiddleware()))
+    dp.callback_query.outer_middleware(TracedMiddleware(RoleCheckMiddleware()))
+    dp.callback_query.outer_middleware(TracedMiddleware(ActiveMenuMiddleware()))
+    dp.callback_query.outer_middleware(CallbackIndexMiddleware(dp))  # (estado, data) → handler
+    dp.message.middleware(HandlerSpanMiddleware())           # span do handler
+    dp.callback_query.middleware(HandlerSpanMiddleware())
+
+    # ───── routers ─────
+    from bot.handlers import register_routers
+    register_routers(dp)
+    return dp
+
+
+async def _metrics(_request: web.Request) -> web.Response:
+    return web.Response(text=metrics.render(), content_type="text/plain")
+
+
+async def _dump_metrics(_timeout: float) -> None:
+    """Drain hook: as métricas vivem em memória – ficam registadas no log."""
+    logging.info("Métricas finais: %s", metrics.snapshot())
 
 
 # ───────────────────────────── main() ────────────────────────────────
@@ -31,52 +105,69 @@ async def main() -> None:
         format="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
     )
 
-    # bot + ligação PostgreSQL
-    bot = Bot(token=BOT_TOKEN, parse_mode=None)
-    bot.pg_pool = await connection.init()
+    bot = Bot(token=BOT_TOKEN, session=build_session())   # BOT_API_* (pool, timeouts, servidor)
 
-    # Redis-FSM
-    storage = RedisStorage.from_url(
+    # Redis-FSM (updates atómicos via Lua)
+    storage = AtomicRedisStorage.from_url(
         f"redis://{REDIS_HOST}:{REDIS_PORT}/{REDIS_DB}",
         key_builder=DefaultKeyBuilder(prefix=REDIS_PREFIX),
     )
-    dp = Dispatcher(bot=bot, storage=storage)
-
-    # ───── middlewares (ordem importa) ─────
-    dp.message.outer_middleware(RoleCheckMiddleware())
-    dp.callback_query.outer_middleware(RoleCheckMiddleware())
-    dp.callback_query.outer_middleware(ActiveMenuMiddleware())
-
-    # ───── routers ─────
-    from bot.handlers import register_routers
-    register_routers(dp)
-
-    # ───── webhook ─────
-    await bot.set_webhook(WEBHOOK_URL, secret_token=SECRET_TOKEN)
-    logging.info("Webhook registado em %s", WEBHOOK_URL)
-
-    # ───── comandos do bot (barra de sugestões) ─────
-    await bot.set_my_commands([
-        types.BotCommand(command="start",  description="▶️ Iniciar"),
-        types.BotCommand(command="services",  description="🩺 Serviços"),
-        types.BotCommand(command="team", description="🧑🏼‍🤝‍🧑🏽 Equipa"),
-        types.BotCommand(command="contacts", description="📞 Contactos"),
-    ])
+    jobs.init(storage.redis)                               # handlers enfileiram para o worker
+    chat_lock.init(storage.redis)                          # lock por chat entre réplicas
+    tracker = lifecycle.InFlightTracker()
+    dp = build_dispatcher(bot, storage, tracker)
+
+    lifecycle.on_drain(log_maintenance.stop)
+    lifecycle.on_drain(stats.stop)
+    lifecycle.on_drain(capture.stop)
+    lifecycle.on_drain(pg_handler.drain)
+    lifecycle.on_drain(tracing.exporter.drain)
+    lifecycle.on_drain(_dump_metrics)
 
     # ───── servidor aiohttp ─────
-    app = web.Application()
+    app = web.Application(middlewares=[
+        lifecycle.readiness_middleware,                  # 503 não chega à captura
+        capture.capture_middleware,                      # CAPTURE_FILE → JSONL
+    ])
+    capture.start()
     SimpleRequestHandler(dispatcher=dp, bot=bot, secret_token=SECRET_TOKEN)\
         .register(app, path=WEBHOOK_PATH)
     setup_application(app, dp)
 
     app.router.add_get("/healthz", lambda _: web.Response(text="OK"))
     app.router.add_get("/ping",    lambda _: web.Response(text="Pong"))
+    app.router.add_get("/readyz",  lifecycle.readyz)
+    app.router.add_get("/metrics", _metrics)
+    debug_http.register(app, redis=storage.redis)         # /debug/* (com DEBUG_TOKEN)
 
     runner = web.AppRunner(app)
-    await runner.setup()
+
+    # PostgreSQL + Redis + runner em paralelo
+    bot.pg_pool, _, _ = await asyncio.gather(
+        connection.init(),
+        storage.redis.ping(),
+        runner.setup(),
+    )
     await web.TCPSite(runner, host="0.0.0.0", port=WEBAPP_PORT).start()
     logging.info("🚀 Webhook server ativo em 0.0.0.0:%s", WEBAPP_PORT)
 
+    # ───── webhook + comandos (só se mudaram) ─────
+    await asyncio.gather(
+        lifecycle.ensure_webhook(bot, storage.redis, WEBHOOK_URL, SECRET_TOKEN),
+        lifecycle.ensure_commands(bot, storage.redis, BOT_COMMANDS),
+    )
+
+    # ───── warm-up (LISTEN/NOTIFY + índices em memória) ─────
+    care_index.register()
+    user_cache.register()
+    role_cache.register()
+    stats.register()
+    await pg_listener.start()
+    await bot.pg_pool.fetchval("SELECT 1")
+    lifecycle.mark_ready()
+    log_maintenance.start()                               # partições da tabela de logs
+    stats.start()                                         # vistas materializadas (admin)
+
     # graceful-shutdown
     stop_event = asyncio.Event()
     loop = asyncio.get_running_loop()
@@ -87,13 +178,21 @@ async def main() -> None:
     try:
         await stop_event.wait()
     finally:
-        logging.info("Iniciar shutdown…")
-        await bot.delete_webhook(drop_pending_updates=True)
-        await runner.cleanup()
+        logging.info("Iniciar shutdown (drain)…")
+        deadline = time.monotonic() + DRAIN_TIMEOUT
+        lifecycle.start_draining()                       # 1) 503 a updates novos
+        await lifecycle.wait_idle(                       # 2) trabalho em curso
+            tracker, max(deadline - time.monotonic() - lifecycle.FLUSH_RESERVE, 0.0)
+        )
+        await lifecycle.run_drain_hooks(                 # 3) logs / métricas
+            max(deadline - time.monotonic(), lifecycle.FLUSH_RESERVE)
+        )
+        await runner.cleanup()                           # 4) fecha tudo
+        await pg_listener.stop()
         await connection.close()
         await bot.session.close()
         await storage.close()
-        logging.info("Shutdown concluído.")
+        logging.info("Shutdown concluído (webhook mantido).")
 
 
 if __name__ == "__main__":
@@ -21,6 +21,7 @@ from aiogram.fsm.context import FSMContext
 
 from bot.states.admin_menu_states import AdminMenuStates
 from bot.utils.fsm_helpers        import clear_keep_role
+from bot.utils.render             import Template, static
 from bot.menus.ui_helpers         import (
     start_menu_timeout,
     edit_menu,
@@ -36,14 +37,15 @@ from .administrator_menu   import build_menu as _admin
 
 log = logging.getLogger(__name__)
 
-# ─────────── títulos fixos por perfil (Markdown formatting) ────────────
+# ─────────── títulos fixos por perfil (HTML, validados no import) ────────────
 _ROLE_TITLE = {
-    "patient":         "🩹 *Menu:*",
-    "caregiver":       "🫱🏼‍🫲🏽 *Menu*",
-    "physiotherapist": "👩🏼‍⚕️ *Menu:*",
-    "accountant":      "📊 *Menu:*",
-    "administrator":   "👨🏼‍💻 *Menu:*",
+    "patient":         static("🩹 <b>Menu:</b>"),
+    "caregiver":       static("🫱🏼‍🫲🏽 <b>Menu</b>"),
+    "physiotherapist": static("👩🏼‍⚕️ <b>Menu:</b>"),
+    "accountant":      static("📊 <b>Menu:</b>"),
+    "administrator":   static("👨🏼‍💻 <b>Menu:</b>"),
 }
+_OTHER_TITLE = Template("👤 <b>{role}</b> – menu principal")
 
 # builder (InlineKeyboardMarkup) por perfil
 _ROLE_MENU = {
@@ -103,7 +105,7 @@ async def show_menu(
         return
 
     # 4) title & previous message-id
-    title = _ROLE_TITLE.get(active, f"👤 *{active.title()}* – menu principal")
+    title = _ROLE_TITLE.get(active) or _OTHER_TITLE.render(role=active.title())
     prev_msg_id  = data.get("menu_msg_id")
     prev_chat_id = data.get("menu_chat_id")
     menu_ids: List[int] = data.get("menu_ids", [])
@@ -111,13 +113,14 @@ async def show_menu(
     # 4.a) choose target message for editing (same chat only)
     target_msg_id = prev_msg_id if prev_chat_id == chat_id else None
 
-    # 4.b) render (edit ↦ delete ↦ ZW ↦ new) using ui_helpers.edit_menu()
+    # 4.b) render (skip ↦ markup ↦ edit ↦ delete ↦ ZW ↦ new) using ui_helpers.edit_menu()
     msg = await edit_menu(
         bot=bot,
         chat_id=chat_id,
         message_id=target_msg_id,
         text=title,
         keyboard=builder(),
+        state=state,
     )
 
     # 4.c) purge obsolete menus (IDs ≠ actual menu)
@@ -11,6 +11,7 @@ def build_menu() -> InlineKeyboardMarkup:
             [InlineKeyboardButton(text="👥 Utilizadores", callback_data="admin:users")],
             [InlineKeyboardButton(text="📅 Agenda",       callback_data="admin:agenda")],
             [InlineKeyboardButton(text="💬 Mensagens",    callback_data="admin:messages")],
+            [InlineKeyboardButton(text="📊 Estatísticas", callback_data="admin:stats")],
         ]
     )
 
@@ -0,0 +1,111 @@
+# bot/menus/billing_menu.py
+"""
+Texto dos ecrãs de faturação (HTML, bot.utils.render) a partir da cache Moloni
+(bot.database.billing) – sem chamadas à API.
+"""
+
+from __future__ import annotations
+
+from datetime import datetime
+from decimal import Decimal
+from typing import List, Optional
+from zoneinfo import ZoneInfo
+
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+from bot.config import TIMEZONE
+from bot.database.billing import CustomerBilling, Document
+from bot.jobs import JobInfo
+from bot.menus.reports_menu import export_rows
+from bot.menus.ui_helpers import back_button
+from bot.utils.render import Template, static
+
+__all__ = ["build_back_kbd", "render_customer", "render_job", "render_recent"]
+
+_LINE = Template("<code>{date:%d/%m}</code> {number} — {gross}")
+_OPEN = Template(" · por pagar {open}")
+_NAME = Template("\n      {name}")
+_DUE = Template("Em dívida: <b>{total}</b>")
+_DUE_RECENT = Template("Por pagar (nestas {n}): <b>{total}</b>")
+_SYNCED = Template("Actualizado às {at:%H:%M}")
+_NOT_SYNCED = static("<i>Ainda não sincronizado com a faturação.</i>")
+_JOB_FAILED = Template("⚠️ Sincronização falhou: {error}")
+_JOB_PROGRESS = Template("⏳ A sincronizar… {done}/{total} {note}")
+_TITLE = {
+    "customer": static("💳 <b>Pagamentos</b>"),
+    "invoice":  static("📂 <b>Faturas</b>"),
+    "payment":  static("💰 <b>Pagamentos</b>"),
+}
+_SECTION = {"invoice": static("<b>Faturas</b>"), "payment": static("<b>Pagamentos</b>")}
+
+
+def build_back_kbd(*, sync: bool = False, export: bool = False) -> InlineKeyboardMarkup:
+    rows = export_rows("ac") if export else []
+    if sync:
+        rows.append([InlineKeyboardButton(text="🔄 Sincronizar", callback_data="ac:sync")])
+    return InlineKeyboardMarkup(inline_keyboard=rows + [[back_button()]])
+
+
+def _eur(value: Decimal) -> str:
+    return f"{value:,.2f} €".replace(",", " ").replace(".", ",")
+
+
+def _line(d: Document, *, with_name: bool = False) -> str:
+    line = _LINE.render(date=d.doc_date, number=d.number, gross=_eur(d.gross_value))
+    if d.open_value:
+        line += _OPEN.render(open=_eur(d.open_value))
+    if with_name:
+        line += _NAME.render(name=d.customer_name)
+    return line
+
+
+def _footer(synced_at: Optional[datetime]) -> List[str]:
+    if synced_at is None:
+        return ["", _NOT_SYNCED]
+    return ["", _SYNCED.render(at=synced_at.astimezone(ZoneInfo(TIMEZONE)))]
+
+
+def render_customer(b: Optional[CustomerBilling], synced_at: Optional[datetime]) -> str:
+    """Ecrã «Pagamentos» do paciente; *b* = None se não há cliente Moloni associado."""
+    lines = [_TITLE["customer"], ""]
+    if b is None:
+        lines.append("Ainda não existe ficha de faturação associada à sua conta.\nContacte a receção.")
+        return "\n".join(lines)
+    if not b.invoices and not b.payments:
+        lines.append("Sem documentos de faturação.")
+        return "\n".join(lines + _footer(synced_at))
+    lines.append(_DUE.render(total=_eur(b.open_total)))
+    if b.invoices:
+        lines += ["", _SECTION["invoice"]] + [_line(d) for d in b.invoices]
+    if b.payments:
+        lines += ["", _SECTION["payment"]] + [_line(d) for d in b.payments]
+    return "\n".join(lines + _footer(synced_at))
+
+
+def render_recent(kind: str, docs: List[Document], synced_at: Optional[datetime]) -> str:
+    """Ecrãs do contabilista: últimas faturas ou últimos pagamentos."""
+    lines = [_TITLE[kind], ""]
+    if not docs:
+        lines.append("Sem documentos de faturação.")
+    else:
+        if kind == "invoice":
+            open_total = sum((d.open_value for d in docs), Decimal(0))
+            lines += [_DUE_RECENT.render(n=len(docs), total=_eur(open_total)), ""]
+        lines += [_line(d, with_name=True) for d in docs]
+    return "\n".join(lines + _footer(synced_at))
+
+
+def render_job(info: Optional[JobInfo]) -> str:
+    """Linha de estado de um job de sincronização (acrescentada ao ecrã)."""
+    if info is None:
+        return "⚠️ Pedido de sincronização expirou."
+    if info.status == "done":
+        return "✅ Sincronizado." if info.result is not None else "✅ Já estava a sincronizar noutro processo."
+    if info.status == "failed":
+        return _JOB_FAILED.render(error=info.error or "")
+    if info.status == "retrying":
+        return f"⏳ A sincronizar… nova tentativa ({info.attempts}/{info.max_tries})"
+    if info.progress:
+        done, total, note = info.progress
+        return _JOB_PROGRESS.render(done=done, total=total, note=note).rstrip()
+    return "⏳ Sincronização em fila…"
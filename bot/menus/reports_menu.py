@@ -0,0 +1,59 @@
+# bot/menus/reports_menu.py
+"""
+Botões de exportação de relatórios (bot.database.reports).
+
+callback_data: «<prefixo>:export:<formato>:<período>», ex. «ac:export:xlsx:m»
+– prefixo do perfil (ac / ph), formato csv | xlsx, período m (mês
+anterior) | y (ano corrente).
+"""
+
+from __future__ import annotations
+
+from typing import List, Tuple
+
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+from bot.menus.ui_helpers import back_button
+from bot.utils.render import static
+
+__all__ = ["build_reports_kbd", "export_callbacks", "export_rows", "parse_export", "render_physio"]
+
+_PERIOD_LABEL = {"m": "mês anterior", "y": "este ano"}
+_FORMATS = ("xlsx", "csv")
+
+_PHYSIO_TEXT = static(
+    "📊 <b>Relatórios</b>\n\n"
+    "Faturação dos seus pacientes (faturas e pagamentos), por período.\n"
+    "Escolha o formato – o ficheiro é gerado em segundo plano e "
+    "chega a este chat."
+)
+
+
+def export_callbacks(prefix: str) -> List[str]:
+    """Todos os callback_data de exportação de um perfil (para F.data.in_)."""
+    return [f"{prefix}:export:{fmt}:{p}" for p in _PERIOD_LABEL for fmt in _FORMATS]
+
+
+def parse_export(data: str) -> Tuple[str, str]:
+    """«ac:export:xlsx:m» → ('xlsx', 'm')."""
+    _prefix, _export, fmt, period = data.split(":")
+    return fmt, period
+
+
+def export_rows(prefix: str) -> List[List[InlineKeyboardButton]]:
+    return [
+        [
+            InlineKeyboardButton(text=f"📥 {fmt.upper()} {label}", callback_data=f"{prefix}:export:{fmt}:{p}")
+            for fmt in _FORMATS
+        ]
+        for p, label in _PERIOD_LABEL.items()
+    ]
+
+
+def build_reports_kbd(prefix: str) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup(inline_keyboard=export_rows(prefix) + [[back_button()]])
+
+
+def render_physio() -> str:
+    """Ecrã «Relatórios» do fisioterapeuta."""
+    return _PHYSIO_TEXT
@@ -12,7 +12,8 @@ Exports
 • back_button()            – back InlineKeyboardButton factory
 • cancel_back_kbd()        – ReplyKeyboardMarkup for cancel/back
 • start_menu_timeout()     – auto-hide inactive menus
-• edit_menu()              – resilient menu renderer (edit ↦ delete ↦ ZW ↦ new)
+• edit_menu()              – resilient menu renderer (skip ↦ markup ↦ edit ↦
+                             delete ↦ ZW ↦ new)
 • refresh_menu()           – edit_menu + FSM update + restart timeout  ← NEW
 • close_menu_with_alert()  – pop-up + erase menu
 • delete_messages()        – bulk hard / soft delete of arbitrary messages
@@ -21,8 +22,10 @@ Exports
 from __future__ import annotations
 
 import asyncio
+import hashlib
 from contextlib import suppress
-from typing import List, Optional, Sequence, Union
+from datetime import datetime, timezone
+from typing import Any, List, Optional, Sequence, Tuple, Union
 
 from aiogram import Bot, exceptions, types
 from aiogram.fsm.context import FSMContext
@@ -31,11 +34,14 @@ from aiogram.types import (
     ReplyKeyboardMarkup,
     KeyboardButton,
     InlineKeyboardMarkup,
+    Chat,
     Message,
 )
 
 from bot.config import MENU_TIMEOUT, MESSAGE_TIMEOUT
+from bot.utils import chat_lock, metrics
 from bot.utils.fsm_helpers import clear_keep_role
+from bot.utils.render import PARSE_MODE, not_modified, parse_failed, plain
 
 # Invisible character used as last-resort placeholder
 ZERO_WIDTH = "\u200B"
@@ -76,50 +82,51 @@ async def _hide_menu_after(
     try:
         await asyncio.sleep(menu_timeout)
 
-        data = await state.get_data()
-        if data.get("menu_msg_id") != msg_id:  # a newer menu is already open
-            return
+        async with chat_lock.hold(chat_id):   # not racing a click on this same chat
+            data = await state.get_data()
+            if data.get("menu_msg_id") != msg_id:  # a newer menu is already open
+                return
 
-        # 1) hard delete attempt
-        deleted = False
-        try:
-            await bot.delete_message(chat_id=chat_id, message_id=msg_id)
-            deleted = True
-        except exceptions.TelegramBadRequest:
+            # 1) hard delete attempt
             deleted = False
+            try:
+                await bot.delete_message(chat_id=chat_id, message_id=msg_id)
+                deleted = True
+            except exceptions.TelegramBadRequest:
+                deleted = False
+
+            # 2) fallback: blank out the message
+            if not deleted:
+                with suppress(exceptions.TelegramBadRequest):
+                    await bot.edit_message_text(
+                        chat_id=chat_id,
+                        message_id=msg_id,
+                        text=ZERO_WIDTH,
+                        reply_markup=None,
+                    )
+
+            # 3) clear FSM records but keep `active_role`
+            await clear_keep_role(state)
+
+            # remove this ID from menu_ids (if present)
+            menu_ids: List[int] = data.get("menu_ids", [])
+            if msg_id in menu_ids:
+                menu_ids.remove(msg_id)
+
+            await state.update_data(
+                menu_msg_id=None,
+                menu_chat_id=None,
+                menu_ids=menu_ids,  # may end up empty
+            )
 
-        # 2) fallback: blank out the message
-        if not deleted:
+            # 4) temporary warning
+            warn: Optional[Message] = None
             with suppress(exceptions.TelegramBadRequest):
-                await bot.edit_message_text(
-                    chat_id=chat_id,
-                    message_id=msg_id,
-                    text=ZERO_WIDTH,
-                    reply_markup=None,
+                warn = await bot.send_message(
+                    chat_id,
+                    f"⌛️ O menu ficou inactivo durante {menu_timeout}s e foi ocultado.\n"
+                    "Envie /start (ou Menu > Iniciar) para o reabrir.",
                 )
-
-        # 3) clear FSM records but keep `active_role`
-        await clear_keep_role(state)
-
-        # remove this ID from menu_ids (if present)
-        menu_ids: List[int] = data.get("menu_ids", [])
-        if msg_id in menu_ids:
-            menu_ids.remove(msg_id)
-
-        await state.update_data(
-            menu_msg_id=None,
-            menu_chat_id=None,
-            menu_ids=menu_ids,  # may end up empty
-        )
-
-        # 4) temporary warning
-        warn: Optional[Message] = None
-        with suppress(exceptions.TelegramBadRequest):
-            warn = await bot.send_message(
-                chat_id,
-                f"⌛️ O menu ficou inactivo durante {menu_timeout}s e foi ocultado.\n"
-                "Envie /start (ou Menu > Iniciar) para o reabrir.",
-            )
         if warn:
             await asyncio.sleep(message_timeout)
             with suppress(exceptions.TelegramBadRequest):
@@ -155,40 +162,110 @@ def start_menu_timeout(
     )
 
 # ───────────────────────── resilient menu renderer ──────────────────────
-async def edit_menu(
-    *,
+_FALLBACK = metrics.counter(
+    "menu_render_fallback_total",
+    "Renders de menu que precisaram de mais do que uma chamada, por passo",
+)
+_CALLS = metrics.counter(
+    "menu_render_total",
+    "Renders de menu pela chamada feita (none / markup / text / send)",
+)
+
+# FSM «menu_render» = [chat_id, message_id, hash do texto, hash do teclado]
+# do último render – chega para saber se há algo a mudar sem perguntar ao
+# Telegram.  Limpo com o resto da FSM (clear_keep_role / close_menu_with_alert).
+Fingerprint = List[Any]
+
+
+def _digest(value: str) -> str:
+    return hashlib.blake2b(value.encode(), digest_size=8).hexdigest()
+
+
+def _kbd_json(keyboard: Optional[InlineKeyboardMarkup]) -> str:
+    return keyboard.model_dump_json(exclude_none=True) if keyboard is not None else ""
+
+
+def _unchanged(bot: Bot, chat_id: int, message_id: int) -> Message:
+    """Message mínima para um edit que o Telegram deu como «not modified»."""
+    return Message(
+        message_id=message_id,
+        date=datetime.now(timezone.utc),
+        chat=Chat(id=chat_id, type="private"),
+    ).as_(bot)
+
+
+async def _edit(
     bot: Bot,
     chat_id: int,
-    message_id: int | None,
+    message_id: int,
     text: str,
     keyboard: InlineKeyboardMarkup,
 ) -> Message:
-    """
-    Render (or replace) an inline menu with best-effort resilience.
+    """editMessageText; se a marcação for recusada, reedita em texto simples."""
+    try:
+        return await bot.edit_message_text(
+            text,
+            chat_id=chat_id,
+            message_id=message_id,
+            reply_markup=keyboard,
+            parse_mode=PARSE_MODE,
+        )
+    except exceptions.TelegramBadRequest as exc:
+        if not_modified(exc):
+            return _unchanged(bot, chat_id, message_id)
+        if not parse_failed(exc, "edit_menu"):
+            raise
+    _FALLBACK.inc(labels={"step": "plain"})
+    return await bot.edit_message_text(
+        plain(text),
+        chat_id=chat_id,
+        message_id=message_id,
+        reply_markup=keyboard,
+        parse_mode=None,
+    )
 
-    Attempt order:
-        1. **edit** the existing message (fastest, no flicker);
-        2. **delete** the old message if editing failed;
-        3. **zero-width fallback** – blank the message if delete also failed;
-        4. **send** a brand-new menu silently (`disable_notification=True`).
 
-    Returns the final `Message` object for timeout handling.
-    """
+async def _send(bot: Bot, chat_id: int, text: str, keyboard: InlineKeyboardMarkup) -> Message:
+    """sendMessage silencioso; mesma regra de texto simples que _edit()."""
+    try:
+        return await bot.send_message(
+            chat_id,
+            text,
+            reply_markup=keyboard,
+            parse_mode=PARSE_MODE,
+            disable_notification=True,  # no sound/vibration on client
+        )
+    except exceptions.TelegramBadRequest as exc:
+        if not parse_failed(exc, "send_menu"):
+            raise
+    _FALLBACK.inc(labels={"step": "plain"})
+    return await bot.send_message(
+        chat_id,
+        plain(text),
+        reply_markup=keyboard,
+        parse_mode=None,
+        disable_notification=True,
+    )
+
+
+async def _replace(
+    bot: Bot,
+    chat_id: int,
+    message_id: int | None,
+    text: str,
+    keyboard: InlineKeyboardMarkup,
+) -> Message:
+    """edit ↦ delete ↦ ZW ↦ new (ver edit_menu)."""
     # 1) direct edit
     if message_id:
         try:
-            return await bot.edit_message_text(
-                text,
-                chat_id=chat_id,
-                message_id=message_id,
-                reply_markup=keyboard,
-                parse_mode="Markdown",
-            )
+            return await _edit(bot, chat_id, message_id, text, keyboard)
         except exceptions.TelegramBadRequest:
             # editing not possible (message too old, missing, etc.)
             pass
 
         # 2) hard delete attempt
+        _FALLBACK.inc(labels={"step": "delete"})
         deleted = False
         try:
             await bot.delete_message(chat_id, message_id)
@@ -198,6 +275,7 @@ async def edit_menu(
 
         # 3) zero-width fallback if delete failed
         if not deleted:
+            _FALLBACK.inc(labels={"step": "zero_width"})
             with suppress(exceptions.TelegramBadRequest):
                 await bot.edit_message_text(
                     ZERO_WIDTH,
@@ -207,13 +285,76 @@ async def edit_menu(
                 )
 
     # 4) silent send – last resort or when no previous message_id
-    return await bot.send_message(
-        chat_id,
-        text,
-        reply_markup=keyboard,
-        parse_mode="Markdown",
-        disable_notification=True,  # no sound/vibration on client
-    )
+    return await _send(bot, chat_id, text, keyboard)
+
+
+async def _render(
+    bot: Bot,
+    chat_id: int,
+    message_id: int | None,
+    text: str,
+    keyboard: InlineKeyboardMarkup,
+    last: Optional[Fingerprint],
+) -> Tuple[Message, Fingerprint]:
+    """Compara com o último render e faz só a chamada necessária."""
+    text_h, kbd_h = _digest(text), _digest(_kbd_json(keyboard))
+    if message_id and last and last[:3] == [chat_id, message_id, text_h]:
+        done = [chat_id, message_id, text_h, kbd_h]
+        if last[3] == kbd_h:
+            _CALLS.inc(labels={"call": "none"})
+            return _unchanged(bot, chat_id, message_id), done
+        try:
+            res = await bot.edit_message_reply_markup(
+                chat_id=chat_id, message_id=message_id, reply_markup=keyboard,
+            )
+            _CALLS.inc(labels={"call": "markup"})
+            return (res if isinstance(res, Message) else _unchanged(bot, chat_id, message_id)), done
+        except exceptions.TelegramBadRequest as exc:
+            if not_modified(exc):
+                _CALLS.inc(labels={"call": "markup"})
+                return _unchanged(bot, chat_id, message_id), done
+            # mensagem já não existe / não editável → caminho completo
+
+    msg = await _replace(bot, chat_id, message_id, text, keyboard)
+    _CALLS.inc(labels={"call": "text" if msg.message_id == message_id else "send"})
+    return msg, [chat_id, msg.message_id, text_h, kbd_h]
+
+
+async def edit_menu(
+    *,
+    bot: Bot,
+    chat_id: int,
+    message_id: int | None,
+    text: str,
+    keyboard: InlineKeyboardMarkup,
+    state: FSMContext | None = None,
+) -> Message:
+    """
+    Render (or replace) an inline menu with best-effort resilience.
+
+    *text* is PARSE_MODE (HTML) markup – build it with bot.utils.render
+    (Template / static / esc) so user data can never break parsing.
+
+    With *state*, the last render's fingerprint (FSM «menu_render») is
+    compared first:
+        0. same text and keyboard → **no call** at all;
+           same text, new keyboard → **editMessageReplyMarkup** only.
+
+    Attempt order otherwise:
+        1. **edit** the existing message (fastest, no flicker);
+           «message is not modified» counts as success and a rejected
+           markup is retried once as plain text – neither falls through;
+        2. **delete** the old message if editing failed;
+        3. **zero-width fallback** – blank the message if delete also failed;
+        4. **send** a brand-new menu silently (`disable_notification=True`).
+
+    Returns the final `Message` object for timeout handling.
+    """
+    last = (await state.get_data()).get("menu_render") if state is not None else None
+    msg, done = await _render(bot, chat_id, message_id, text, keyboard, last)
+    if state is not None and done != last:
+        await state.update_data(menu_render=done)
+    return msg
 
 # ───────────────── composite helper (edit + FSM + timeout) ──────────────
 async def refresh_menu(
@@ -229,8 +370,9 @@ async def refresh_menu(
     High-level helper that updates the active menu and keeps FSM in sync.
 
     Workflow:
-        • Calls edit_menu() to render the new menu.
-        • Updates FSM fields (menu_msg_id, menu_chat_id, menu_ids).
+        • Renders like edit_menu() (skipping no-op / keyboard-only edits).
+        • Updates FSM fields (menu_msg_id, menu_chat_id, menu_ids,
+          menu_render) in a single write.
         • Restarts the inactivity timeout via start_menu_timeout().
 
     Returns
@@ -238,17 +380,13 @@ async def refresh_menu(
     Message
         The final Message object (useful for chaining extra actions).
     """
-    msg = await edit_menu(
-        bot=bot,
-        chat_id=chat_id,
-        message_id=message_id,
-        text=text,
-        keyboard=keyboard,
-    )
+    last = (await state.get_data()).get("menu_render")
+    msg, done = await _render(bot, chat_id, message_id, text, keyboard, last)
     await state.update_data(
         menu_msg_id=msg.message_id,
         menu_chat_id=chat_id,
         menu_ids=[msg.message_id],
+        menu_render=done,
     )
     start_menu_timeout(bot, msg, state)
     return msg
@@ -262,6 +400,9 @@ async def close_menu_with_alert(
     """
     Mostra pop-up modal e remove completamente a mensagem-menu.
 
+    *alert_text* é texto simples – os pop-ups de callback não têm
+    parse_mode («*…*» aparecia literalmente).
+
     Passos:
         1. answerCallbackQuery (pop-up).
         2. deleteMessage para apagar título+botões.
@@ -289,7 +430,7 @@ async def close_menu_with_alert(
 
     # 4) limpa registos do menu no FSM (se aplicável)
     if state is not None:
-        await state.update_data(menu_msg_id=None, menu_chat_id=None)
+        await state.update_data(menu_msg_id=None, menu_chat_id=None, menu_render=None)
 
 # ───────────────────────── bulk (soft/hard) delete ──────────────────────
 async def delete_messages(
@@ -32,6 +32,7 @@ from aiogram.fsm.context import FSMContext
 
 from bot.states.auth_states   import AuthStates
 from bot.menus.ui_helpers     import close_menu_with_alert  # unified helper
+from bot.utils.fsm_helpers    import get_state_and_data
 
 log = logging.getLogger(__name__)
 
@@ -48,7 +49,7 @@ class ActiveMenuMiddleware(BaseMiddleware):
         if state is None:                         # no FSM → nothing to enforce
             return await handler(event, data)
 
-        stored        = await state.get_data()
+        cur_state, stored = await get_state_and_data(state)
         menu_msg_id   = stored.get("menu_msg_id")
         menu_chat_id  = stored.get("menu_chat_id")
 
@@ -71,7 +72,6 @@ class ActiveMenuMiddleware(BaseMiddleware):
             return
 
         # ───────────── Case B – no menu registered ───────────────
-        cur_state = await state.get_state()
         if cur_state in (
             AuthStates.WAITING_CONTACT.state,
             AuthStates.CONFIRMING_LINK.state,
@@ -0,0 +1,263 @@
+# bot/middlewares/callback_index_middleware.py
+"""
+Índice de despacho de callbacks: (estado FSM, callback_data) → handlers.
+
+Sem índice, cada CallbackQuery percorre os handlers de todos os routers
+e o aiogram avalia um a um `StateFilter` / `F.data == …` – filtros
+síncronos que o aiogram corre em `asyncio.to_thread`, um salto de thread
+por avaliação.
+
+No primeiro callback o índice analisa os filtros de todos os handlers:
+• estado:  State, StatesGroup ou StateFilter(…)
+• dados:   F.data == "x" · F.data.in_([...]) · F.data.startswith("p:")
+e indexa cada handler por (estado, valor exacto) ou (estado, prefixo).
+Esses filtros são substituídos por um único portão assíncrono: com o
+índice, «o handler é candidato» equivale exactamente a «os filtros
+reconhecidos passam», por isso um clique custa um lookup em dicionário
+e nenhum salto de thread; os restantes filtros do handler correm como
+antes, pela mesma ordem.
+
+Garantias:
+• a pertença ao conjunto de candidatos é exacta para os filtros
+  substituídos, por isso a semântica não muda;
+• handlers com filtros não reconhecidos não levam portão (fallback:
+  avaliação normal), e a ordem global dos handlers mantém-se;
+• sem este middleware (ex.: outro Dispatcher) o portão avalia os
+  filtros que substituiu.
+"""
+
+from __future__ import annotations
+
+from inspect import isclass
+from typing import (
+    Any, Awaitable, Callable, Dict, FrozenSet, Iterable, List, Optional, Set, Tuple,
+)
+
+from aiogram import BaseMiddleware, Router, types
+from aiogram.dispatcher.event.handler import FilterObject, HandlerObject
+from aiogram.filters.state import StateFilter
+from aiogram.fsm.state import State, StatesGroup
+from magic_filter.operations import (
+    CallOperation,
+    ComparatorOperation,
+    FunctionOperation,
+    GetAttributeOperation,
+)
+from magic_filter.util import in_op
+
+from bot.utils import metrics
+
+__all__ = ["CallbackIndex", "CallbackIndexMiddleware"]
+
+CANDIDATES_KEY = "dispatch_candidates"
+
+_ANY = "\x00*"                          # «qualquer estado»
+
+_LOOKUPS = metrics.counter(
+    "callback_index_lookups_total", "Callbacks encaminhados pelo índice de despacho",
+)
+
+StateSet = Optional[FrozenSet[Optional[str]]]        # None = qualquer estado
+
+
+# ───────────────────────────── análise de filtros ─────────────────────────────
+def _state_names(value: Any) -> StateSet:
+    """Estados aceites por um argumento de StateFilter (None = qualquer)."""
+    if isinstance(value, State):
+        return None if value.state == "*" else frozenset({value.state})
+    if isinstance(value, StatesGroup):
+        return frozenset(type(value).__all_states_names__)
+    if isclass(value) and issubclass(value, StatesGroup):
+        return frozenset(value.__all_states_names__)
+    if value == "*":
+        return None
+    return frozenset({value})                      # str ou None (sem estado)
+
+
+def _state_filter(callback: Any) -> Tuple[bool, StateSet]:
+    """(é filtro de estado?, estados aceites)."""
+    if isinstance(callback, (State, StatesGroup)) or (
+        isclass(callback) and issubclass(callback, StatesGroup)
+    ):
+        return True, _state_names(callback)
+    if isinstance(callback, StateFilter):
+        names: Set[Optional[str]] = set()
+        for st in callback.states:
+            one = _state_names(st)
+            if one is None:
+                return True, None
+            names |= one
+        return True, frozenset(names)
+    return False, None
+
+
+DataSpec = Tuple[str, Tuple[str, ...]]              # ("exact" | "prefix", valores)
+
+
+def _data_filter(fobj: FilterObject) -> Optional[DataSpec]:
+    """Reconhece F.data == x / F.data.in_(…) / F.data.startswith(…)."""
+    magic = fobj.magic
+    if magic is None:
+        return None
+    ops = magic._operations
+    if not ops or not isinstance(ops[0], GetAttributeOperation) or ops[0].name != "data":
+        return None
+
+    if len(ops) == 2:
+        op = ops[1]
+        if isinstance(op, ComparatorOperation) and op.comparator.__name__ == "eq" \
+                and isinstance(op.right, str):
+            return "exact", (op.right,)
+        if isinstance(op, FunctionOperation) and op.function is in_op and not op.kwargs \
+                and len(op.args) == 1 and isinstance(op.args[0], (list, tuple, set, frozenset)) \
+                and all(isinstance(v, str) for v in op.args[0]):
+            return "exact", tuple(op.args[0])
+
+    if len(ops) == 3:
+        attr, call = ops[1], ops[2]
+        if isinstance(attr, GetAttributeOperation) and attr.name == "startswith" \
+                and isinstance(call, CallOperation) and not call.kwargs and len(call.args) == 1:
+            arg = call.args[0]
+            prefixes = (arg,) if isinstance(arg, str) else arg
+            if isinstance(prefixes, tuple) and all(isinstance(p, str) for p in prefixes):
+                return "prefix", prefixes
+    return None
+
+
+def _gate(hid: int, consumed: List[FilterObject]) -> Callable[..., Awaitable[bool]]:
+    """
+    Portão que substitui os filtros de estado/dados reconhecidos.
+
+    Com candidatos (middleware activo) a pertença ao conjunto equivale
+    exactamente a esses filtros passarem; sem candidatos avalia-os.
+    """
+    async def _dispatch_gate(event: types.TelegramObject, **kwargs: Any) -> bool:
+        candidates: Optional[FrozenSet[int]] = kwargs.get(CANDIDATES_KEY)
+        if candidates is not None:
+            return hid in candidates
+        for f in consumed:
+            if not await f.call(event, **kwargs):
+                return False
+        return True
+
+    _dispatch_gate.__dispatch_gate__ = consumed      # type: ignore[attr-defined]
+    return _dispatch_gate
+
+
+def is_gate(fobj: FilterObject) -> bool:
+    return hasattr(fobj.callback, "__dispatch_gate__")
+
+
+def _ungated(filters: List[FilterObject]) -> List[FilterObject]:
+    """Repõe os filtros originais de um handler já indexado."""
+    out: List[FilterObject] = []
+    for f in filters:
+        out.extend(f.callback.__dispatch_gate__ if is_gate(f) else (f,))
+    return out
+
+
+# ───────────────────────────── índice ─────────────────────────────
+class CallbackIndex:
+    """Mapas (estado, data) → ids de handlers, construídos a partir dos routers."""
+
+    def __init__(self) -> None:
+        self._exact: Dict[Tuple[Optional[str], str], Set[int]] = {}
+        self._prefix: Dict[Tuple[Optional[str], str], Set[int]] = {}
+        self._any_data: Dict[Optional[str], Set[int]] = {}
+        self._prefix_lens: Tuple[int, ...] = ()
+        self.indexed = 0
+        self.unindexed = 0
+
+    @staticmethod
+    def handlers(root: Router) -> Iterable[HandlerObject]:
+        """Handlers de callback_query pela ordem de propagação do aiogram."""
+        for router in root.chain_tail:
+            yield from router.callback_query.handlers
+
+    @classmethod
+    def build(cls, root: Router) -> "CallbackIndex":
+        idx = cls()
+        lens: Set[int] = set()
+        for handler in cls.handlers(root):
+            filters = _ungated(handler.filters or [])
+            handler.filters = filters
+
+            states: StateSet = None
+            data: Optional[DataSpec] = None
+            consumed: List[FilterObject] = []
+            for f in filters:
+                is_state, names = _state_filter(f.callback)
+                if is_state and names is not None:
+                    states = names if states is None else states & names
+                    consumed.append(f)
+                elif data is None:
+                    data = _data_filter(f)
+                    if data is not None:
+                        consumed.append(f)
+
+            if states is None and data is None:
+                idx.unindexed += 1                   # fallback: avaliação normal
+                continue
+
+            hid = id(handler)
+            for st in (states if states is not None else (_ANY,)):
+                if data is None:
+                    idx._any_data.setdefault(st, set()).add(hid)
+                elif data[0] == "exact":
+                    for v in data[1]:
+                        idx._exact.setdefault((st, v), set()).add(hid)
+                else:
+                    for p in data[1]:
+                        idx._prefix.setdefault((st, p), set()).add(hid)
+                        lens.add(len(p))
+            rest = [f for f in filters if all(f is not c for c in consumed)]
+            handler.filters = [FilterObject(callback=_gate(hid, consumed)), *rest]
+            idx.indexed += 1
+
+        idx._prefix_lens = tuple(sorted(lens))
+        return idx
+
+    def lookup(self, raw_state: Optional[str], data: str) -> FrozenSet[int]:
+        out: Set[int] = set()
+        for st in (raw_state, _ANY):
+            out.update(self._exact.get((st, data), ()))
+            out.update(self._any_data.get(st, ()))
+            for n in self._prefix_lens:
+                if n > len(data):
+                    break
+                out.update(self._prefix.get((st, data[:n]), ()))
+        return frozenset(out)
+
+
+class CallbackIndexMiddleware(BaseMiddleware):
+    """
+    Outer middleware de `dp.callback_query`: calcula os candidatos do
+    índice (construído no primeiro callback, quando os routers já estão
+    todos incluídos) e passa-os aos portões em data["dispatch_candidates"].
+    """
+
+    def __init__(self, root: Router) -> None:
+        self.root = root
+        self.index: Optional[CallbackIndex] = None
+
+    def rebuild(self) -> CallbackIndex:
+        self.index = CallbackIndex.build(self.root)
+        return self.index
+
+    async def __call__(
+        self,
+        handler: Callable[[types.TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: types.CallbackQuery,
+        data: Dict[str, Any],
+    ) -> Any:
+        if self.index is None:
+            self.rebuild()
+        assert self.index is not None
+
+        if event.data is None:                       # game callbacks, etc.
+            _LOOKUPS.inc(labels={"result": "fallback"})
+            return await handler(event, data)
+
+        data[CANDIDATES_KEY] = self.index.lookup(data.get("raw_state"), event.data)
+        _LOOKUPS.inc(labels={"result": "indexed"})
+        return await handler(event, data)
@@ -0,0 +1,32 @@
+# bot/middlewares/chat_lock_middleware.py
+"""
+Outer middleware de `dp.update`: um update de cada vez por chat.
+
+Corre depois do TracingMiddleware (a espera pelo lock fica no root span)
+e antes de RoleCheck/ActiveMenu, que já lêem a FSM.  Updates sem chat
+(inline queries, poll answers…) passam sem lock; chats diferentes
+continuam em paralelo.  Ver bot.utils.chat_lock.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware, types
+
+from bot.utils import chat_lock, tracing
+
+
+class ChatLockMiddleware(BaseMiddleware):
+    async def __call__(
+        self,
+        handler: Callable[[types.TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: types.TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        chat: types.Chat | None = data.get("event_chat")
+        if chat is None:
+            return await handler(event, data)
+        async with chat_lock.hold(chat.id) as token:
+            tracing.set_root_attribute("chat_lock.fence", token)
+            return await handler(event, data)
@@ -20,23 +20,21 @@ Role-Check Middleware
 
 from __future__ import annotations
 
-import logging, time
+import logging
 from contextlib import suppress
 from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 
 from aiogram import BaseMiddleware, exceptions, types
 from aiogram.fsm.context import FSMContext
 
-from bot.database.connection import get_pool
-from bot.database import queries as q
+from bot.database import user_cache
 from bot.states.menu_states import MenuStates
 from bot.states.auth_states  import AuthStates
+from bot.utils.fsm_helpers   import get_state_and_data
 
 log = logging.getLogger(__name__)
 
-# ───────────────────────── cache muito simples ─────────────────────────
-_CACHE: Dict[int, Tuple[Optional[Dict[str, Any]], List[str], float]] = {}
-_TTL = 60.0                                    # segundos
+# utilizador + roles vêm de bot.database.user_cache (invalidada por NOTIFY)
 _ALLOWED_CMDS = {"/admin", "/whoami"}          # /start é tratado à parte
 
 
@@ -56,7 +54,7 @@ class RoleCheckMiddleware(BaseMiddleware):                         # type: ignor
                 data["user"] = user                     # ← só isto
 
         state: FSMContext = data["state"]
-        cur_state = await state.get_state()
+        cur_state, fsm_data = await get_state_and_data(state)
 
         # 2) situações sempre permitidas
         if cur_state in (
@@ -82,7 +80,7 @@ class RoleCheckMiddleware(BaseMiddleware):                         # type: ignor
                     return await handler(event, data)
 
         # 3) exige active_role
-        if (await state.get_data()).get("active_role"):
+        if fsm_data.get("active_role"):
             return await handler(event, data)
 
         # 4) bloqueado
@@ -96,17 +94,7 @@ class RoleCheckMiddleware(BaseMiddleware):                         # type: ignor
         self,
         tg_id: int,
     ) -> Tuple[Optional[Dict[str, Any]], List[str]]:
-        now = time.time()
-        cached = _CACHE.get(tg_id)
-        if cached and now - cached[2] < _TTL:
-            return cached[0], cached[1]
-
-        pool  = await get_pool()
-        user  = await q.get_user_by_telegram_id(pool, tg_id)
-        roles = [r.lower() for r in await q.get_user_roles(pool, user["user_id"])] if user else []
-
-        _CACHE[tg_id] = (user, roles, now)
-        return user, roles
+        return await user_cache.get_user_and_roles(tg_id)
 
     @staticmethod
     async def _deny(event: types.TelegramObject) -> None:
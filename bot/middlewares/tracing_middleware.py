@@ -0,0 +1,110 @@
+# bot/middlewares/tracing_middleware.py
+"""
+Middlewares de tracing (ver bot.utils.tracing).
+
+• TracingMiddleware        – outer de `dp.update`: root span por update,
+                             com tipo de update, utilizador e chat
+• HandlerSpanMiddleware    – inner de `dp.message` / `dp.callback_query`:
+                             span do handler escolhido + router (também
+                             gravado no root span)
+• TracedMiddleware(mw)     – envolve um middleware existente num span
+• TracingRequestMiddleware – middleware da sessão do Bot: span por método
+                             do Bot API
+"""
+
+from __future__ import annotations
+
+from typing import Any, Awaitable, Callable, Dict
+
+from aiogram import BaseMiddleware, types
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramAPIError
+
+from bot.utils import tracing
+
+
+class TracingMiddleware(BaseMiddleware):
+    async def __call__(
+        self,
+        handler: Callable[[types.TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: types.TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        if not tracing.enabled():
+            return await handler(event, data)
+
+        user: types.User | None = data.get("event_from_user")
+        chat: types.Chat | None = data.get("event_chat")
+        update_type = getattr(event, "event_type", type(event).__name__)
+        with tracing.start_trace(
+            f"update.{update_type}",
+            **{
+                "update.id": getattr(event, "update_id", None),
+                "update.type": update_type,
+                "telegram.user_id": user.id if user else None,
+                "telegram.chat_id": chat.id if chat else None,
+            },
+        ):
+            return await handler(event, data)
+
+
+class HandlerSpanMiddleware(BaseMiddleware):
+    async def __call__(
+        self,
+        handler: Callable[[types.TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: types.TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        if not tracing.enabled():
+            return await handler(event, data)
+
+        handler_obj = data.get("handler")
+        router = data.get("event_router")
+        callback = getattr(handler_obj, "callback", None)
+        name = getattr(callback, "__qualname__", "unknown")
+        router_name = getattr(router, "name", None)
+
+        tracing.set_root_attribute("bot.router", router_name)
+        tracing.set_root_attribute("bot.handler", name)
+        with tracing.span(
+            f"handler.{name}",
+            **{
+                "bot.router": router_name,
+                "code.function": name,
+                "code.namespace": getattr(callback, "__module__", None),
+            },
+        ):
+            return await handler(event, data)
+
+
+class TracedMiddleware(BaseMiddleware):
+    """Envolve `inner` num span `middleware.<Classe>` (inclui o que vem a seguir)."""
+
+    def __init__(self, inner: BaseMiddleware) -> None:
+        self.inner = inner
+        self.span_name = f"middleware.{type(inner).__name__}"
+
+    async def __call__(
+        self,
+        handler: Callable[[types.TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: types.TelegramObject,
+        data: Dict[str, Any],
+    ) -> Any:
+        with tracing.span(self.span_name):
+            return await self.inner(handler, event, data)
+
+
+class TracingRequestMiddleware(BaseRequestMiddleware):
+    async def __call__(self, make_request, bot, method):  # type: ignore[override]
+        api_method = getattr(method, "__api_method__", type(method).__name__)
+        with tracing.span(
+            f"bot_api.{api_method}",
+            kind=tracing.KIND_CLIENT,
+            **{"rpc.system": "telegram", "rpc.method": api_method},
+        ) as sp:
+            try:
+                return await make_request(bot, method)
+            except TelegramAPIError as exc:
+                if sp is not None:
+                    sp.set_attribute("telegram.error", exc.message)
+                raise
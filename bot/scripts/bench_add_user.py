@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Benchmark da criação de utilizadores (precisa de uma BD real – DATABASE_URL).
+
+Compara, para N utilizadores:
+1.  legado  – transacção com 5 instruções dependentes (o add_user antigo);
+2.  CTE     – queries.add_user(): 1 instrução por utilizador;
+3.  lote    – queries.add_users(): 1 instrução por lote de BATCH.
+
+No fim apaga tudo o que criou (ON DELETE CASCADE trata do resto).
+
+Uso:
+    python -m bot.scripts.bench_add_user [N] [BATCH]
+"""
+
+from __future__ import annotations
+
+import asyncio
+import random
+import sys
+import time
+from typing import Awaitable, Callable, List
+
+from asyncpg import Pool
+
+from bot.database import queries as q
+from bot.database.connection import close, get_pool
+
+RUN = f"{random.randrange(16**6):06x}"
+
+
+def _new_user(i: int) -> q.NewUser:
+    return q.NewUser(
+        role="patient",
+        first_name="Bench",
+        last_name=f"{RUN}_{i}",
+        date_of_birth=None,
+        phone_cc="351",
+        phone=f"9{random.randrange(10**8):08d}",
+        email=f"bench_{RUN}_{i}@example.com",
+        created_by=None,
+    )
+
+
+async def _legacy_add_user(pool: Pool, u: q.NewUser) -> str:
+    """Réplica do add_user anterior (5 idas à BD dentro de uma transacção)."""
+    async with pool.acquire() as conn, conn.transaction():
+        user_id = await conn.fetchval(
+            "INSERT INTO users (first_name, last_name, date_of_birth, created_by) "
+            "VALUES ($1,$2,$3,$4) RETURNING user_id",
+            u["first_name"], u["last_name"], u["date_of_birth"], u["created_by"],
+        )
+        role_id = await conn.fetchval("SELECT role_id FROM roles WHERE role_name = $1", u["role"])
+        if role_id:
+            await conn.execute("INSERT INTO user_roles (user_id, role_id) VALUES ($1,$2)", user_id, role_id)
+        await conn.execute(
+            "INSERT INTO user_emails (user_id, email, is_primary) VALUES ($1,$2,TRUE)",
+            user_id, u["email"],
+        )
+        await conn.execute(
+            "INSERT INTO user_phones (user_id, phone_number, is_primary) VALUES ($1,$2,TRUE)",
+            user_id, f"{u['phone_cc']}{u['phone']}",
+        )
+    return str(user_id)
+
+
+async def _timed(label: str, n: int, fn: Callable[[], Awaitable[List[str]]]) -> None:
+    started = time.perf_counter()
+    await fn()
+    elapsed = time.perf_counter() - started
+    print(f"{label:8}{elapsed * 1000:>10.1f} ms{elapsed / n * 1000:>10.2f} ms/user")
+
+
+async def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    batch = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    pool = await get_pool()
+
+    async def legacy() -> List[str]:
+        return [await _legacy_add_user(pool, _new_user(i)) for i in range(n)]
+
+    async def cte() -> List[str]:
+        return [await q.add_user(pool, **_new_user(n + i)) for i in range(n)]
+
+    async def batched() -> List[str]:
+        out: List[str] = []
+        users = [_new_user(2 * n + i) for i in range(n)]
+        for i in range(0, n, batch):
+            out += await q.add_users(pool, users[i:i + batch])
+        return out
+
+    print(f"{n} utilizadores (lote de {batch})")
+    try:
+        await q.add_user(pool, **_new_user(-1))          # aquece ligação + mapa de roles
+        await _timed("legado", n, legacy)
+        await _timed("CTE", n, cte)
+        await _timed("lote", n, batched)
+    finally:
+        await pool.execute(
+            "DELETE FROM users WHERE first_name = 'Bench' AND last_name LIKE $1", f"{RUN}\\_%",
+        )
+        await close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
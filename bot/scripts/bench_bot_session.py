@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Benchmark da sessão HTTP do Bot API (bot.utils.bot_session) contra o
+Bot API falso (bot.scripts.fake_bot_api).
+
+Compara, com a mesma carga – --calls chamadas sendMessage/editMessageText
+com teclado inline (como um render de menu), --concurrency em paralelo
+por --chats chats:
+
+• aiogram        – AiohttpSession por omissão (json stdlib)
+• tuned-json     – build_session() com json da stdlib
+• tuned          – build_session() (orjson, pool BOT_API_POOL, keep-alive)
+• no-keepalive   – build_session(keepalive=0): ligação nova por pedido
+• pool-4         – build_session(pool=4): fila no connector
+
+e mostra chamadas/s e latência p50/p95/p99 por configuração.
+
+O Bot API falso corre no mesmo processo (o tempo dele conta para todas as
+configurações por igual); --api usa um servidor já a correr, ex.:
+    python -m bot.scripts.fake_bot_api --port 8081 &
+    python -m bot.scripts.bench_bot_session --api http://127.0.0.1:8081
+
+Uso:
+    python -m bot.scripts.bench_bot_session [--calls 5000] [--concurrency 50]
+        [--chats 200] [--latency 0.0] [--rounds 3] [--only tuned,aiogram]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+from typing import Callable, Dict, List, Optional
+
+# o bot.config exige estas variáveis; o benchmark não liga a nada
+for _k, _v in {
+    "BOT_TOKEN": "0:bench", "DOMAIN": "localhost", "TELEGRAM_SECRET_TOKEN": "bench",
+    "REDIS_HOST": "localhost", "DATABASE_URL": "postgresql://bench@localhost/bench",
+}.items():
+    os.environ.setdefault(_k, _v)
+
+from aiogram import Bot, exceptions                                      # noqa: E402
+from aiogram.client.session.aiohttp import AiohttpSession                # noqa: E402
+from aiogram.client.session.base import BaseSession                      # noqa: E402
+from aiogram.client.telegram import TelegramAPIServer                    # noqa: E402
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup     # noqa: E402
+
+from bot.config import BOT_TOKEN                                         # noqa: E402
+from bot.scripts.fake_bot_api import FakeBotAPI                          # noqa: E402
+from bot.utils.bot_session import build_session                          # noqa: E402
+
+CONFIGS: Dict[str, Callable[[str], BaseSession]] = {
+    "aiogram":      lambda url: AiohttpSession(api=TelegramAPIServer.from_base(url)),
+    "tuned-json":   lambda url: build_session(base=url, json_codec="json"),
+    "tuned":        lambda url: build_session(base=url),
+    "no-keepalive": lambda url: build_session(base=url, keepalive=0),
+    "pool-4":       lambda url: build_session(base=url, pool=4),
+}
+
+_KBD = InlineKeyboardMarkup(inline_keyboard=[
+    [InlineKeyboardButton(text=f"Opção {r}.{c}", callback_data=f"bench:{r}:{c}") for c in range(2)]
+    for r in range(4)
+])
+
+
+def _pct(values: List[float], q: float) -> float:
+    return sorted(values)[min(len(values) - 1, int(q * len(values)))] * 1000
+
+
+async def _run(bot: Bot, calls: int, concurrency: int, chats: int) -> Dict[str, float]:
+    latencies: List[float] = []
+    menus: Dict[int, int] = {}
+    sem = asyncio.Semaphore(concurrency)
+    errors = 0
+
+    async def one(i: int) -> None:
+        nonlocal errors
+        chat_id = 1 + i % chats
+        async with sem:
+            t0 = time.perf_counter()
+            try:
+                mid: Optional[int] = menus.get(chat_id)
+                if mid is None:
+                    msg = await bot.send_message(chat_id, f"<b>Menu</b> {i}", reply_markup=_KBD, parse_mode="HTML")
+                    menus[chat_id] = msg.message_id
+                else:
+                    await bot.edit_message_text(
+                        f"<b>Menu</b> {i}", chat_id=chat_id, message_id=mid, reply_markup=_KBD, parse_mode="HTML",
+                    )
+            except exceptions.TelegramAPIError:
+                errors += 1
+            latencies.append(time.perf_counter() - t0)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(calls)))
+    elapsed = time.perf_counter() - t0
+    return {
+        "rps": calls / elapsed,
+        "p50": _pct(latencies, 0.50),
+        "p95": _pct(latencies, 0.95),
+        "p99": _pct(latencies, 0.99),
+        "errors": errors,
+    }
+
+
+async def main(args: argparse.Namespace) -> int:
+    api: Optional[FakeBotAPI] = None
+    url = args.api
+    if not url:
+        api = FakeBotAPI(latency=args.latency)
+        url = await api.start()
+    names = [n for n in CONFIGS if not args.only or n in args.only.split(",")]
+    results: Dict[str, List[Dict[str, float]]] = {n: [] for n in names}
+    try:
+        for _ in range(args.rounds):                      # rondas alternadas: aquecimento igual para todos
+            for name in names:
+                bot = Bot(token=BOT_TOKEN, session=CONFIGS[name](url))
+                try:
+                    await _run(bot, min(200, args.calls), args.concurrency, args.chats)   # aquece o pool
+                    results[name].append(await _run(bot, args.calls, args.concurrency, args.chats))
+                finally:
+                    await bot.session.close()
+    finally:
+        if api is not None:
+            await api.stop()
+
+    print(f"{args.calls} chamadas · {args.concurrency} em paralelo · {args.chats} chats · "
+          f"latência do servidor {args.latency * 1000:.0f} ms · mediana de {args.rounds} rondas")
+    print(f"{'configuração':<14} {'chamadas/s':>11} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'erros':>6}")
+    for name, runs in results.items():
+        med = {k: statistics.median(r[k] for r in runs) for k in runs[0]}
+        print(f"{name:<14} {med['rps']:>11.0f} {med['p50']:>8.1f} {med['p95']:>8.1f} "
+              f"{med['p99']:>8.1f} {med['errors']:>6.0f}")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--chats", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.0, help="latência do Bot API falso (s)")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--api", default="", help="URL de um Bot API falso já a correr")
+    parser.add_argument("--only", default="", help="configurações separadas por vírgula")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Benchmark do despacho de callbacks – antes/depois do índice
+(bot.middlewares.callback_index_middleware).
+
+Reproduz o ciclo de `TelegramEventObserver.trigger` sobre os routers
+reais de bot.handlers (sem executar os handlers nem tocar no Telegram)
+para um conjunto de callbacks representativos, e mede:
+
+• avaliações de filtros «reais» por update (StateFilter, F.data…);
+• tempo médio por update (µs).
+
+Uso:
+    python -m bot.scripts.bench_dispatch [iterações]
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+# o bot.config exige estas variáveis; o benchmark não liga a nada
+for _k, _v in {
+    "BOT_TOKEN": "0:bench", "DOMAIN": "localhost", "TELEGRAM_SECRET_TOKEN": "bench",
+    "REDIS_HOST": "localhost", "DATABASE_URL": "postgresql://bench@localhost/bench",
+}.items():
+    os.environ.setdefault(_k, _v)
+
+from aiogram import Dispatcher, types                                  # noqa: E402
+from aiogram.dispatcher.event.handler import FilterObject               # noqa: E402
+from aiogram.fsm.storage.memory import MemoryStorage                    # noqa: E402
+
+from bot.handlers import register_routers                               # noqa: E402
+from bot.middlewares.callback_index_middleware import (                 # noqa: E402
+    CANDIDATES_KEY, CallbackIndex, is_gate,
+)
+from bot.states.admin_menu_states import AdminMenuStates                # noqa: E402
+from bot.states.add_user_flow import AddUserFlow                        # noqa: E402
+from bot.states.auth_states import AuthStates                           # noqa: E402
+from bot.states.menu_states import MenuStates                           # noqa: E402
+
+# (estado FSM, callback_data) – cliques típicos + alguns sem handler
+SAMPLES: List[Tuple[Optional[str], str]] = [
+    (MenuStates.WAIT_ROLE_CHOICE.state, "role:administrator"),
+    (MenuStates.WAIT_ROLE_CHOICE.state, "role:patient"),
+    (AuthStates.CONFIRMING_LINK.state, "link_yes"),
+    (AdminMenuStates.MAIN.state, "admin:agenda"),
+    (AdminMenuStates.MAIN.state, "admin:users"),
+    (AdminMenuStates.AGENDA.state, "agenda:geral"),
+    (AdminMenuStates.AGENDA.state, "back"),
+    (AdminMenuStates.USERS.state, "users:add"),
+    (AddUserFlow.CHOOSING_ROLE.state, "role:patient"),
+    (AddUserFlow.CONFIRM_DATA.state, "add_ok"),
+    (None, "pt:physio"),                         # sem handler
+    (None, "cg:dependents"),                     # sem handler
+]
+
+_evaluations = 0
+_orig_call = FilterObject.call
+
+
+async def _counting_call(self: FilterObject, *args: Any, **kwargs: Any) -> Any:
+    global _evaluations
+    if not is_gate(self):
+        _evaluations += 1
+    return await _orig_call(self, *args, **kwargs)
+
+
+def _event(data: str) -> types.CallbackQuery:
+    return types.CallbackQuery(
+        id="1", chat_instance="1", data=data,
+        from_user=types.User(id=1, is_bot=False, first_name="Bench"),
+    )
+
+
+async def _dispatch(dp: Dispatcher, event: types.CallbackQuery, kwargs: Dict[str, Any]) -> Optional[str]:
+    """Mesmo ciclo que TelegramEventObserver.trigger; devolve o handler escolhido."""
+    for handler in CallbackIndex.handlers(dp):
+        ok, _ = await handler.check(event, **kwargs)
+        if ok:
+            return handler.callback.__qualname__
+    return None
+
+
+async def _run(
+    dp: Dispatcher,
+    iterations: int,
+    index: Optional[CallbackIndex],
+) -> Tuple[float, float, List[Optional[str]]]:
+    global _evaluations
+    events = [(st, _event(data)) for st, data in SAMPLES]
+    chosen: List[Optional[str]] = []
+    _evaluations = 0
+    started = time.perf_counter()
+    for i in range(iterations):
+        for raw_state, ev in events:
+            kwargs: Dict[str, Any] = {"raw_state": raw_state}
+            if index is not None:
+                kwargs[CANDIDATES_KEY] = index.lookup(raw_state, ev.data or "")
+            picked = await _dispatch(dp, ev, kwargs)
+            if i == 0:
+                chosen.append(picked)
+    elapsed = time.perf_counter() - started
+    n = iterations * len(events)
+    return _evaluations / n, elapsed / n * 1e6, chosen
+
+
+async def main() -> None:
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    FilterObject.call = _counting_call               # type: ignore[method-assign]
+
+    dp = Dispatcher(storage=MemoryStorage())
+    register_routers(dp)
+    total = sum(1 for _ in CallbackIndex.handlers(dp))
+
+    before = await _run(dp, iterations, None)
+    index = CallbackIndex.build(dp)
+    after = await _run(dp, iterations, index)
+    no_mw = await _run(dp, 1, None)                  # portões sem middleware
+
+    # o índice não pode mudar o handler escolhido
+    assert before[2] == after[2] == no_mw[2], (before[2], after[2], no_mw[2])
+
+    print(f"handlers de callback: {total} ({index.indexed} indexados, {index.unindexed} fallback)")
+    print(f"amostras: {len(SAMPLES)} × {iterations}")
+    print(f"{'':10}{'filtros/update':>16}{'µs/update':>12}")
+    print(f"{'antes':10}{before[0]:>16.2f}{before[1]:>12.1f}")
+    print(f"{'depois':10}{after[0]:>16.2f}{after[1]:>12.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
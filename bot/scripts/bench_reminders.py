@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Benchmark do dispatcher de lembretes (bot.jobs.reminders) contra o Bot
+API falso (bot.scripts.fake_bot_api) e uma BD real (DATABASE_URL, com a
+migração 008).
+
+Cria N pacientes com Telegram ligado (1 em cada --caregiver-every com um
+cuidador), uma sessão para daqui a 30 min por paciente marcada há dias –
+todos os lembretes (REMINDER_LEADS) ficam vencidos de uma vez – e corre
+--workers dispatchers em paralelo sobre a mesma fila (SKIP LOCKED).
+
+Mede lembretes/s e verifica que cada lembrete saiu exactamente uma vez:
+mensagens recebidas pelo Bot API falso = linhas «sent» = esperado, e
+nenhum chat recebeu mais do que len(REMINDER_LEADS) mensagens.
+Depois remarca as sessões (trigger da migração 008) para que só a maior
+antecedência fique vencida e corre outra ronda: cada destinatário tem de
+receber esse lembrete outra vez, e os restantes ficam pending para a nova
+hora (só sem --flood-rate).
+No fim apaga tudo o que criou (ON DELETE CASCADE trata do resto).
+
+--rate limita o total de mensagens/s como em produção (REMINDERS_RATE);
+por omissão é alto para medir o custo do próprio dispatcher.
+
+Uso:
+    python -m bot.scripts.bench_reminders [--patients 2000] [--workers 3]
+        [--rate 1000] [--latency 0.03] [--flood-rate 0.0]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+for _k, _v in {"BOT_TOKEN": "0:bench", "DOMAIN": "localhost", "TELEGRAM_SECRET_TOKEN": "bench"}.items():
+    os.environ.setdefault(_k, _v)
+
+from aiogram import Bot                                                  # noqa: E402
+from aiogram.client.session.aiohttp import AiohttpSession                # noqa: E402
+from aiogram.client.telegram import TelegramAPIServer                    # noqa: E402
+
+from bot.config import BOT_TOKEN                                         # noqa: E402
+from bot.database.connection import close, get_pool                      # noqa: E402
+from bot.jobs import reminders                                           # noqa: E402
+from bot.scripts.fake_bot_api import FakeBotAPI                          # noqa: E402
+from bot.utils.rate_limit import SendLimiter                             # noqa: E402
+
+RUN = f"{random.randrange(16**6):06x}"
+TG_BASE = 7_000_000_000 + random.randrange(10**6) * 1000   # telegram_user_id fictícios
+
+_SEED_SQL = """
+WITH p AS (
+    INSERT INTO users (first_name, last_name)
+    SELECT 'Bench', $1 || '_p' || i FROM generate_series(1, $2) i
+    RETURNING user_id, last_name
+), c AS (
+    INSERT INTO users (first_name, last_name)
+    SELECT 'Bench', $1 || '_c' || i FROM generate_series(1, $2) i WHERE i % $3 = 0
+    RETURNING user_id, last_name
+), roles_ AS (
+    INSERT INTO user_roles (user_id, role_id)
+    SELECT p.user_id, r.role_id FROM p, roles r WHERE r.role_name = 'patient'
+    UNION ALL
+    SELECT c.user_id, r.role_id FROM c, roles r WHERE r.role_name = 'caregiver'
+), phones AS (
+    INSERT INTO user_phones (user_id, phone_number, telegram_user_id, is_primary)
+    SELECT u.user_id, '9' || lpad((row_number() OVER ())::text, 8, '0'), $4 + row_number() OVER (), TRUE
+    FROM (SELECT user_id FROM p UNION ALL SELECT user_id FROM c) u
+), links AS (
+    INSERT INTO caregiver_patients (caregiver_id, patient_id)
+    SELECT c.user_id, p.user_id
+    FROM   c JOIN p ON p.last_name = replace(c.last_name, '_c', '_p')
+)
+INSERT INTO appointments (patient_id, starts_at, location, created_at)
+SELECT user_id, now() + interval '30 minutes', 'Bench ' || $1, now() - interval '3 days' FROM p
+"""
+
+
+async def _reschedule_after_send(pool, bot: Bot, api: FakeBotAPI, recipients: int) -> bool:
+    """Remarcação depois do envio: a maior antecedência sai outra vez, as outras ficam à espera."""
+    longest = max(reminders.LEADS)
+    before = api.calls["sendMessage"]
+    await pool.execute(
+        "UPDATE appointments SET starts_at = now() + $2::interval + interval '1 second' WHERE location = $1",
+        f"Bench {RUN}", longest,
+    )
+    await asyncio.sleep(1.5)
+    await reminders.dispatch(bot, worker_id=f"bench-{RUN}-resched")
+    rows = dict(await pool.fetch(
+        "SELECT r.lead = $2 AS longest, count(*) FILTER (WHERE r.status = "
+        "CASE WHEN r.lead = $2 THEN 'sent' ELSE 'pending' END AND r.due_at = a.starts_at - r.lead) "
+        "FROM appointment_reminders r JOIN appointments a USING (appointment_id) "
+        "WHERE a.location = $1 GROUP BY 1", f"Bench {RUN}", longest,
+    ))
+    resent = api.calls["sendMessage"] - before
+    others = recipients * (len(reminders.LEADS) - 1)
+    ok = resent == rows.get(True, 0) == recipients and rows.get(False, 0) == others
+    print(f"remarcação depois do envio: {resent} reenviados, BD {rows} →", "OK" if ok else "FALHOU")
+    return ok
+
+
+async def main(args: argparse.Namespace) -> int:
+    api = FakeBotAPI(latency=args.latency, flood_rate=args.flood_rate)
+    url = await api.start()
+    bot = Bot(token=BOT_TOKEN, session=AiohttpSession(api=TelegramAPIServer.from_base(url)))
+    pool = await get_pool()
+    try:
+        async with pool.acquire() as conn, conn.transaction():
+            await conn.execute(_SEED_SQL, RUN, args.patients, args.caregiver_every, TG_BASE)
+        recipients = args.patients + args.patients // args.caregiver_every
+        expected = recipients * len(reminders.LEADS)
+        print(f"{args.patients} pacientes, {recipients} destinatários × {len(reminders.LEADS)} "
+              f"antecedências = {expected} lembretes · {args.workers} dispatcher(s)")
+
+        limiter = SendLimiter(args.rate, burst=max(1, int(args.rate // 10)))
+        t0 = time.perf_counter()
+        results = await asyncio.gather(*(
+            reminders.dispatch(bot, worker_id=f"bench-{RUN}-{w}", limiter=limiter)
+            for w in range(args.workers)
+        ))
+        # lembretes adiados por 429 voltam noutra ronda (como o cron faria)
+        while args.flood_rate and await pool.fetchval(
+            "SELECT count(*) FROM appointment_reminders r JOIN appointments a USING (appointment_id) "
+            "WHERE a.location = $1 AND r.status = 'pending'", f"Bench {RUN}",
+        ):
+            await pool.execute(
+                "UPDATE appointment_reminders r SET due_at = now() FROM appointments a "
+                "WHERE a.appointment_id = r.appointment_id AND a.location = $1 AND r.status = 'pending'",
+                f"Bench {RUN}",
+            )
+            results.append(await reminders.dispatch(bot, worker_id=f"bench-{RUN}-retry", limiter=limiter))
+        elapsed = time.perf_counter() - t0
+
+        totals: Counter = Counter()
+        for r in results:
+            totals.update({k: v for k, v in r.items() if k in ("sent", "failed", "pending")})
+        rows = dict(await pool.fetch(
+            "SELECT r.status, count(*) FROM appointment_reminders r JOIN appointments a USING (appointment_id) "
+            "WHERE a.location = $1 GROUP BY r.status", f"Bench {RUN}",
+        ))
+        per_chat = Counter(len(c.live) for c in api.chats.values())
+        delivered = api.calls["sendMessage"] - sum(v for k, v in api.errors.items() if k.startswith("sendMessage"))
+
+        print(f"{totals['sent']} enviados em {elapsed:.2f}s → {totals['sent'] / elapsed:.0f} lembretes/s")
+        print(f"por dispatcher: {[r.get('sent', 0) for r in results]}")
+        print(f"BD: {rows} · Bot API: {delivered} entregues, 429: {api.errors.get('sendMessage:429', 0)}")
+        ok = (
+            delivered == rows.get("sent", 0) == expected
+            and max(per_chat, default=0) <= len(reminders.LEADS)
+        )
+        print("exactamente uma vez:", "OK" if ok else f"FALHOU (mensagens por chat: {dict(per_chat)})")
+        if ok and not args.flood_rate:                   # com 429 a contagem não é exacta
+            ok = await _reschedule_after_send(pool, bot, api, recipients)
+        return 0 if ok else 1
+    finally:
+        await pool.execute("DELETE FROM users WHERE first_name = 'Bench' AND last_name LIKE $1", f"{RUN}\\_%")
+        await bot.session.close()
+        await api.stop()
+        await close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--patients", type=int, default=2000)
+    parser.add_argument("--caregiver-every", type=int, default=4, help="1 cuidador por cada N pacientes")
+    parser.add_argument("--workers", type=int, default=3, help="dispatchers em paralelo")
+    parser.add_argument("--rate", type=float, default=1000.0, help="mensagens/s no total")
+    parser.add_argument("--latency", type=float, default=0.03, help="latência do Bot API falso (s)")
+    parser.add_argument("--flood-rate", type=float, default=0.0, help="fracção de respostas 429")
+    sys.exit(asyncio.run(main(parser.parse_args())))
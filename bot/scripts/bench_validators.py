@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Benchmark da validação em lote (bot.utils.validators.check_*) contra o
+ciclo «uma chamada valid_* por linha + try/except ValueError» que uma
+importação faria sem ela.
+
+Gera --rows linhas sintéticas por coluna (--invalid de inválidas, como
+numa folha importada com erros), confirma que os dois caminhos dão o
+mesmo resultado e mostra linhas/s e o ganho por coluna.
+
+Uso:
+    python -m bot.scripts.bench_validators [--rows 100000] [--invalid 0.2]
+        [--rounds 5] [--seed 1]
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import statistics
+import sys
+import time
+from typing import Any, Callable, Dict, List, Tuple
+
+from bot.utils import validators as V
+
+
+def _nif(rng: random.Random, ok: bool) -> str:
+    digs = [rng.choice((1, 2, 5, 9))] + [rng.randrange(10) for _ in range(7)]
+    chk = sum(d * (9 - i) for i, d in enumerate(digs)) % 11
+    chk = 0 if chk in (0, 1) else 11 - chk
+    if not ok:
+        return rng.choice(["".join(map(str, digs)) + str((chk + 1) % 10), "12345", "PT12345678"])
+    return "".join(map(str, digs)) + str(chk)
+
+
+def _date(rng: random.Random, ok: bool) -> str:
+    if not ok:
+        return rng.choice(["31-02-2001", "2001-01-01", "01/01/1850", "hoje"])
+    return f"{rng.randint(1, 28):02d}{rng.choice('-/')}{rng.randint(1, 12):02d}-{rng.randint(1930, 2020)}"
+
+
+def _email(rng: random.Random, ok: bool) -> str:
+    user = "".join(rng.choice("abcdefghij._") for _ in range(rng.randint(3, 12))).strip("._") or "x"
+    if not ok:
+        return rng.choice([user, f"{user}@", f"{user}@dominio"])
+    return f" {user.title()}@Clinica{rng.randint(1, 99)}.pt"
+
+
+def _phone(rng: random.Random, ok: bool) -> str:
+    if not ok:
+        return rng.choice(["812345678", "91234", "+351912345678"])
+    return "9" + "".join(str(rng.randrange(10)) for _ in range(8))
+
+
+def _cc(rng: random.Random, ok: bool) -> str:
+    if not ok:
+        return rng.choice(["+35 1", "abc", "+12345"])
+    return rng.choice(["+351", "351", "00351", "+44", "0033"])
+
+
+COLUMNS: Dict[str, Tuple[Callable[[random.Random, bool], str], Callable[[str], Any], Callable[..., V.Batch]]] = {
+    "nif":      (_nif, V.valid_pt_nif, V.check_pt_nifs),
+    "date":     (_date, V.valid_date, V.check_dates),
+    "email":    (_email, V.valid_email, V.check_emails),
+    "phone":    (_phone, V.valid_pt_phone, V.check_pt_phones),
+    "phone_cc": (_cc, V.normalize_phone_cc, V.check_phone_ccs),
+}
+
+
+def _per_row(column: List[str], fn: Callable[[str], Any]) -> Tuple[List[Any], List[bool]]:
+    values: List[Any] = []
+    mask: List[bool] = []
+    for cell in column:
+        try:
+            values.append(fn(cell))
+            mask.append(True)
+        except ValueError:
+            values.append(None)
+            mask.append(False)
+    return values, mask
+
+
+def _best(fn: Callable[[], Any], rounds: int) -> float:
+    times = []
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times)
+
+
+def main(args: argparse.Namespace) -> int:
+    rng = random.Random(args.seed)
+    print(f"{args.rows} linhas por coluna · {args.invalid:.0%} inválidas · mediana de {args.rounds} rondas")
+    print(f"{'coluna':<9} {'por linha/s':>12} {'lote/s':>12} {'ganho':>7}")
+    for name, (gen, single, batch) in COLUMNS.items():
+        column = [gen(rng, rng.random() >= args.invalid) for _ in range(args.rows)]
+        values, mask = _per_row(column, single)
+        res = batch(column)
+        if res.valid != mask or res.values != values:
+            print(f"{name}: resultados diferentes entre os dois caminhos!", file=sys.stderr)
+            return 1
+        t_row = _best(lambda: _per_row(column, single), args.rounds)
+        t_batch = _best(lambda: batch(column), args.rounds)
+        print(f"{name:<9} {args.rows / t_row:>12,.0f} {args.rows / t_batch:>12,.0f} {t_row / t_batch:>6.1f}×")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--invalid", type=float, default=0.2, help="fracção de linhas inválidas")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=1)
+    sys.exit(main(parser.parse_args()))
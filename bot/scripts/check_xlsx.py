@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Verifica o XLSX escrito à mão (bot.utils.spreadsheet) relendo-o com o
+openpyxl: cada minuto de um dia (coluna datetime), datas, valores e
+texto têm de voltar exactamente iguais.
+
+O openpyxl não é dependência do bot – só deste script:
+    pip install openpyxl
+    python -m bot.scripts.check_xlsx
+"""
+
+from __future__ import annotations
+
+import io
+import os
+import sys
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+for _k, _v in {"BOT_TOKEN": "0:check", "DOMAIN": "localhost", "TELEGRAM_SECRET_TOKEN": "check"}.items():
+    os.environ.setdefault(_k, _v)
+
+from bot.utils.spreadsheet import _xlsx_chunk, open_sink                 # noqa: E402
+
+COLUMNS = [("Quando", "datetime"), ("Dia", "date"), ("Valor", "money"), ("Nota", "text")]
+
+
+def main() -> int:
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        print("openpyxl não instalado (pip install openpyxl)")
+        return 2
+
+    day = datetime(2026, 3, 29)
+    rows = [
+        (day + timedelta(minutes=m), day.date() + timedelta(days=m % 400), Decimal(m) / 100, f"linha {m}")
+        for m in range(24 * 60)
+    ]
+    buf = io.BytesIO()
+    sink = open_sink("xlsx", buf, COLUMNS)
+    sink.write(_xlsx_chunk(rows, sink.kinds, 2), len(rows))
+    sink.close()
+
+    sheet = load_workbook(io.BytesIO(buf.getvalue()), read_only=True).active
+    bad = 0
+    for want, got in zip(rows, sheet.iter_rows(min_row=2, values_only=True)):
+        got = (got[0], got[1].date() if isinstance(got[1], datetime) else got[1], Decimal(str(got[2])), got[3])
+        if got != want:
+            bad += 1
+            if bad <= 5:
+                print("diferente:", want, "→", got)
+    print(f"{len(rows)} linhas relidas, {bad} diferentes →", "OK" if not bad else "FALHOU")
+    return 1 if bad else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
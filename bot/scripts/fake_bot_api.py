@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Servidor Bot API falso (aiohttp) para soak tests e benchmarks.
+
+Responde a /bot<token>/<método> como o Telegram: mensagens com
+message_id crescente por chat, 400 «message to edit/delete not found»
+para mensagens que já não existem, «message is not modified» quando o
+conteúdo é igual.  Guarda só as últimas MAX_LIVE mensagens de cada chat
+(memória limitada – corre no mesmo processo que o bot em soak_test).
+
+Uso directo (aponte o bot para http://127.0.0.1:8081):
+    python -m bot.scripts.fake_bot_api [--port 8081] [--latency 0.05]
+
+Em código:
+    api = FakeBotAPI(latency=0.02)
+    url = await api.start()            # porta livre
+    api.chat(chat_id).menu()           # último teclado inline visível
+    await api.stop()
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+from aiohttp import web
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "FakeBot", "username": "fake_bot"}
+USER_MSG_BASE = 1_000_000_000          # message_ids de mensagens «do utilizador»
+MAX_LIVE = 64
+
+
+class ApiError(Exception):
+    def __init__(self, code: int, description: str, retry_after: Optional[int] = None) -> None:
+        super().__init__(description)
+        self.code = code
+        self.description = description
+        self.retry_after = retry_after
+
+
+class FakeChat:
+    """Mensagens enviadas pelo bot num chat (as MAX_LIVE mais recentes)."""
+
+    def __init__(self, chat_id: int) -> None:
+        self.chat_id = chat_id
+        self.next_id = 1
+        self.live: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self.reply_keyboard: Optional[Dict[str, Any]] = None   # teclado «normal» activo
+
+    def add(self, text: str, reply_markup: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        inline = _inline(reply_markup)
+        if reply_markup is not None and inline is None:
+            # ReplyKeyboardMarkup / Remove: muda o teclado do chat, não a mensagem
+            self.reply_keyboard = None if reply_markup.get("remove_keyboard") else reply_markup
+        msg: Dict[str, Any] = {
+            "message_id": self.next_id,
+            "date": int(time.time()),
+            "chat": {"id": self.chat_id, "type": "private"},
+            "from": BOT_USER,
+            "text": text,
+        }
+        if inline is not None:
+            msg["reply_markup"] = inline
+        self.next_id += 1
+        self.live[msg["message_id"]] = msg
+        while len(self.live) > MAX_LIVE:
+            self.live.popitem(last=False)
+        return msg
+
+    def get(self, message_id: int, action: str) -> Dict[str, Any]:
+        msg = self.live.get(message_id)
+        if msg is None:
+            raise ApiError(400, f"Bad Request: message to {action} not found")
+        return msg
+
+    def last(self) -> Optional[Dict[str, Any]]:
+        return next(reversed(self.live.values()), None)
+
+    def menu(self) -> Optional[Dict[str, Any]]:
+        """Mensagem mais recente com teclado inline (o «menu» visível)."""
+        for msg in reversed(self.live.values()):
+            if "inline_keyboard" in (msg.get("reply_markup") or {}):
+                return msg
+        return None
+
+    def asks_contact(self) -> bool:
+        """O teclado activo tem um botão request_contact?"""
+        rows = (self.reply_keyboard or {}).get("keyboard") or []
+        return any(btn.get("request_contact") for row in rows for btn in row)
+
+
+def callback_data(msg: Dict[str, Any]) -> List[str]:
+    """Todos os callback_data de uma mensagem (ordem dos botões)."""
+    rows = (msg.get("reply_markup") or {}).get("inline_keyboard") or []
+    return [btn["callback_data"] for row in rows for btn in row if "callback_data" in btn]
+
+
+def _markup(raw: Any) -> Optional[Dict[str, Any]]:
+    if raw in (None, "", "null"):
+        return None
+    return json.loads(raw) if isinstance(raw, str) else raw
+
+
+def _inline(markup: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Só teclados inline ficam na mensagem (como no Telegram)."""
+    return markup if markup is not None and "inline_keyboard" in markup else None
+
+
+class FakeBotAPI:
+    def __init__(self, *, latency: float = 0.0, flood_rate: float = 0.0) -> None:
+        self.latency = latency
+        self.flood_rate = flood_rate             # fracção de pedidos com 429
+        self.calls: Counter = Counter()
+        self.errors: Counter = Counter()
+        self.chats: Dict[int, FakeChat] = {}
+        self.webhook: Dict[str, Any] = {"url": "", "has_custom_certificate": False, "pending_update_count": 0}
+        self.commands: List[Dict[str, Any]] = []
+        self._runner: Optional[web.AppRunner] = None
+        self._methods: Dict[str, Callable[[Dict[str, Any]], Any]] = {
+            "getMe": lambda p: BOT_USER,
+            "sendMessage": self._send_message,
+            "editMessageText": self._edit_text,
+            "editMessageReplyMarkup": self._edit_markup,
+            "deleteMessage": self._delete,
+            "answerCallbackQuery": lambda p: True,
+            "setWebhook": self._set_webhook,
+            "deleteWebhook": self._delete_webhook,
+            "getWebhookInfo": lambda p: self.webhook,
+            "setMyCommands": self._set_commands,
+            "getMyCommands": lambda p: self.commands,
+        }
+
+    def chat(self, chat_id: int) -> FakeChat:
+        chat = self.chats.get(chat_id)
+        if chat is None:
+            chat = self.chats[chat_id] = FakeChat(chat_id)
+        return chat
+
+    # ───────────────────────────── métodos ─────────────────────────────
+    def _send_message(self, p: Dict[str, Any]) -> Dict[str, Any]:
+        return self.chat(int(p["chat_id"])).add(p["text"], _markup(p.get("reply_markup")))
+
+    def _edit_text(self, p: Dict[str, Any]) -> Dict[str, Any]:
+        msg = self.chat(int(p["chat_id"])).get(int(p["message_id"]), "edit")
+        markup = _inline(_markup(p.get("reply_markup")))
+        if msg["text"] == p["text"] and msg.get("reply_markup") == markup:
+            raise ApiError(400, "Bad Request: message is not modified")
+        msg["text"] = p["text"]
+        msg["edit_date"] = int(time.time())
+        if markup is None:
+            msg.pop("reply_markup", None)
+        else:
+            msg["reply_markup"] = markup
+        return msg
+
+    def _edit_markup(self, p: Dict[str, Any]) -> Dict[str, Any]:
+        msg = self.chat(int(p["chat_id"])).get(int(p["message_id"]), "edit")
+        markup = _inline(_markup(p.get("reply_markup")))
+        if markup is None:
+            msg.pop("reply_markup", None)
+        else:
+            msg["reply_markup"] = markup
+        return msg
+
+    def _delete(self, p: Dict[str, Any]) -> bool:
+        message_id = int(p["message_id"])
+        if message_id >= USER_MSG_BASE:                 # mensagem do utilizador
+            return True
+        chat = self.chat(int(p["chat_id"]))
+        chat.get(message_id, "delete")
+        del chat.live[message_id]
+        return True
+
+    def _set_webhook(self, p: Dict[str, Any]) -> bool:
+        self.webhook["url"] = p.get("url", "")
+        return True
+
+    def _delete_webhook(self, p: Dict[str, Any]) -> bool:
+        self.webhook["url"] = ""
+        return True
+
+    def _set_commands(self, p: Dict[str, Any]) -> bool:
+        self.commands = json.loads(p.get("commands") or "[]")
+        return True
+
+    # ───────────────────────────── HTTP ─────────────────────────────
+    async def _handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        self.calls[method] += 1
+        params: Dict[str, Any] = dict(await request.post())
+        if not params and request.can_read_body:
+            params = await request.json()
+        if self.latency:
+            await asyncio.sleep(random.uniform(0.5, 1.5) * self.latency)
+
+        try:
+            if self.flood_rate and random.random() < self.flood_rate:
+                raise ApiError(429, "Too Many Requests: retry after 1", retry_after=1)
+            fn = self._methods.get(method)
+            if fn is None:
+                raise ApiError(404, "Not Found")
+            result = fn(params)
+        except ApiError as e:
+            self.errors[f"{method}:{e.code}"] += 1
+            body: Dict[str, Any] = {"ok": False, "error_code": e.code, "description": e.description}
+            if e.retry_after is not None:
+                body["parameters"] = {"retry_after": e.retry_after}
+            return web.json_response(body, status=e.code)
+        return web.json_response({"ok": True, "result": result})
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self._handle)
+        app.router.add_get("/bot{token}/{method}", self._handle)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Arranca o servidor e devolve o URL base (porta 0 = livre)."""
+        self._runner = web.AppRunner(self.app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        bound = self._runner.addresses[0][1]
+        return f"http://{host}:{bound}"
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+async def _serve(args: argparse.Namespace) -> None:
+    api = FakeBotAPI(latency=args.latency, flood_rate=args.flood_rate)
+    url = await api.start(args.host, args.port)
+    print(f"Bot API falso em {url} (Ctrl-C para sair)")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await api.stop()
+        print(dict(api.calls))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.0, help="latência média por pedido (s)")
+    parser.add_argument("--flood-rate", type=float, default=0.0, help="fracção de respostas 429")
+    try:
+        asyncio.run(_serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Servidor Moloni falso (aiohttp) para testar bot.utils.moloni e a
+sincronização de bot.database.billing sem tocar na conta real.
+
+Imita o que o cliente usa da API v1:
+• GET  /grant/  – grant_type=password | refresh_token; access_token
+  expira ao fim de --token-ttl s, refresh_token é de uso único;
+• POST /documents/getAll/             (customer_id, qty, offset)
+• POST /documents/getModifiedSince/   (lastmodified, qty, offset)
+  com ?access_token=…; token expirado/desconhecido → 401 invalid_token;
+• --rate-limit N: mais de N pedidos por segundo → 429 com Retry-After;
+• regista pedidos por endpoint e o pico de pedidos em simultâneo.
+
+Uso directo (MOLONI_API_URL=http://127.0.0.1:8082, MOLONI_CLIENT_ID=fake):
+    python -m bot.scripts.fake_moloni [--customers 1001,1002] [--docs 120]
+
+Em código:
+    api = FakeMoloni(token_ttl=5)
+    url = await api.start()
+    api.seed([1001, 1002], per_customer=60)
+    api.pay(document_id, 10)            # recibo + lastmodified novo
+    await api.stop()
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import random
+import secrets
+import time
+from collections import Counter, deque
+from datetime import date, datetime, timedelta
+from typing import Any, Deque, Dict, List, Optional
+from zoneinfo import ZoneInfo
+
+from aiohttp import web
+
+TZ = ZoneInfo("Europe/Lisbon")
+MAX_QTY = 50
+
+
+def _now() -> str:
+    return datetime.now(TZ).strftime("%Y-%m-%d %H:%M:%S")
+
+
+class FakeMoloni:
+    def __init__(
+        self,
+        *,
+        token_ttl: float = 3600.0,
+        rate_limit: float = 0.0,             # pedidos/s (0 = sem limite)
+        latency: float = 0.0,
+        username: str = "fake",
+        password: str = "fake",
+    ) -> None:
+        self.token_ttl = token_ttl
+        self.rate_limit = rate_limit
+        self.latency = latency
+        self._login = (username, password)
+        self.docs: Dict[int, Dict[str, Any]] = {}
+        self.next_id = 1
+        self.access: Dict[str, float] = {}   # token → expira (monotonic)
+        self.refresh: set = set()
+        self.calls: Counter = Counter()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._recent: Deque[float] = deque()
+        self._runner: Optional[web.AppRunner] = None
+
+    # ───────────────────────────── dados ─────────────────────────────
+    def add_document(
+        self,
+        customer_id: int,
+        saft: str = "FT",
+        gross: float = 45.0,
+        *,
+        paid: float = 0.0,
+        day: Optional[date] = None,
+        status: int = 1,
+    ) -> Dict[str, Any]:
+        day = day or date.today()
+        doc = {
+            "document_id": self.next_id,
+            "customer_id": customer_id,
+            "document_type": {"saft_code": saft},
+            "document_set_name": "A",
+            "number": self.next_id,
+            "date": f"{day.isoformat()}T00:00:00+0000",
+            "expiration_date": f"{(day + timedelta(days=30)).isoformat()}T00:00:00+0000",
+            "gross_value": gross,
+            "reconciled_value": paid,
+            "status": status,
+            "lastmodified": _now(),
+        }
+        self.docs[self.next_id] = doc
+        self.next_id += 1
+        return doc
+
+    def pay(self, document_id: int, amount: float) -> Dict[str, Any]:
+        """Recibo (RC) para uma fatura; a fatura fica com reconciled_value novo."""
+        inv = self.docs[document_id]
+        inv["reconciled_value"] = min(inv["gross_value"], inv["reconciled_value"] + amount)
+        inv["lastmodified"] = _now()
+        return self.add_document(inv["customer_id"], "RC", amount)
+
+    def seed(self, customers: List[int], per_customer: int = 10) -> None:
+        today = date.today()
+        for c in customers:
+            for i in range(per_customer):
+                day = today - timedelta(days=7 * i)
+                if i % 3 == 0:
+                    self.add_document(c, "FR", 45.0, day=day)
+                else:
+                    inv = self.add_document(c, "FT", 45.0, day=day)
+                    if i % 2:
+                        self.pay(inv["document_id"], 45.0)
+
+    def expire_tokens(self) -> None:
+        """Invalida todos os access tokens (força 401 → refresh)."""
+        self.access.clear()
+
+    # ───────────────────────────── HTTP ─────────────────────────────
+    def _limited(self) -> bool:
+        if not self.rate_limit:
+            return False
+        now = time.monotonic()
+        while self._recent and now - self._recent[0] > 1.0:
+            self._recent.popleft()
+        if len(self._recent) >= self.rate_limit:
+            return True
+        self._recent.append(now)
+        return False
+
+    def _issue(self) -> Dict[str, Any]:
+        access, refresh = secrets.token_hex(16), secrets.token_hex(16)
+        self.access[access] = time.monotonic() + self.token_ttl
+        self.refresh.add(refresh)
+        return {
+            "access_token": access,
+            "expires_in": self.token_ttl,
+            "token_type": "bearer",
+            "scope": None,
+            "refresh_token": refresh,
+        }
+
+    async def _grant(self, request: web.Request) -> web.Response:
+        q = request.query
+        grant = q.get("grant_type")
+        self.calls[f"grant:{grant}"] += 1
+        if grant == "password" and (q.get("username"), q.get("password")) == self._login:
+            return web.json_response(self._issue())
+        if grant == "refresh_token" and q.get("refresh_token") in self.refresh:
+            self.refresh.discard(q["refresh_token"])
+            return web.json_response(self._issue())
+        return web.json_response({"error": "invalid_grant"}, status=400)
+
+    def _page(self, docs: List[Dict[str, Any]], body: Dict[str, Any]) -> List[Dict[str, Any]]:
+        qty = min(int(body.get("qty") or MAX_QTY), MAX_QTY)
+        offset = int(body.get("offset") or 0)
+        return docs[offset:offset + qty]
+
+    async def _call(self, request: web.Request) -> web.Response:
+        endpoint = request.match_info["endpoint"].strip("/")
+        self.calls[endpoint] += 1
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        try:
+            if self.latency:
+                await asyncio.sleep(random.uniform(0.5, 1.5) * self.latency)
+            if self._limited():
+                self.calls["429"] += 1
+                return web.Response(status=429, text="Too Many Requests", headers={"Retry-After": "1"})
+            expires = self.access.get(request.query.get("access_token", ""))
+            if expires is None or time.monotonic() > expires:
+                return web.json_response(
+                    {"error": "invalid_token", "error_description": "The access token provided is invalid"},
+                    status=401,
+                )
+            body = await request.json() if request.can_read_body else {}
+            ordered = sorted(self.docs.values(), key=lambda d: (d["date"], d["document_id"]), reverse=True)
+            if endpoint == "documents/getAll":
+                cid = body.get("customer_id")
+                return web.json_response(
+                    self._page([d for d in ordered if cid is None or d["customer_id"] == int(cid)], body)
+                )
+            if endpoint == "documents/getModifiedSince":
+                since = body.get("lastmodified", "")
+                changed = sorted(
+                    (d for d in self.docs.values() if d["lastmodified"] >= since),
+                    key=lambda d: d["document_id"],
+                )
+                return web.json_response(self._page(changed, body))
+            return web.json_response([{"code": "2 invalid_endpoint", "description": endpoint}], status=400)
+        finally:
+            self.in_flight -= 1
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/grant/", self._grant)
+        app.router.add_post("/{endpoint:.+}", self._call)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Arranca o servidor e devolve o URL base (porta 0 = livre)."""
+        self._runner = web.AppRunner(self.app(), access_log=None)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+        return f"http://{host}:{self._runner.addresses[0][1]}"
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+
+async def _serve(args: argparse.Namespace) -> None:
+    api = FakeMoloni(token_ttl=args.token_ttl, rate_limit=args.rate_limit, latency=args.latency)
+    api.seed([int(c) for c in args.customers.split(",") if c], per_customer=args.docs)
+    url = await api.start(args.host, args.port)
+    print(f"Moloni falso em {url} com {len(api.docs)} documentos (Ctrl-C para sair)")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await api.stop()
+        print(dict(api.calls), "pico em simultâneo:", api.peak_in_flight)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8082)
+    parser.add_argument("--customers", default="1001,1002,1003", help="moloni_customer_id a semear")
+    parser.add_argument("--docs", type=int, default=60, help="documentos por cliente")
+    parser.add_argument("--token-ttl", type=float, default=3600.0)
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="pedidos/s antes de 429 (0 = sem)")
+    parser.add_argument("--latency", type=float, default=0.0, help="latência média por pedido (s)")
+    try:
+        asyncio.run(_serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
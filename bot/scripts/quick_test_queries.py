@@ -24,7 +24,7 @@ from datetime import datetime
 
 from bot.database.connection import get_pool
 from bot.database import queries as q
-from bot.utils.phone import cleanse
+from bot.utils.phone import canonical
 
 logging.basicConfig(
     level=logging.INFO,
@@ -33,7 +33,7 @@ logging.basicConfig(
 
 # ─────────────── dados de teste ───────────────
 RAW_PHONE        = "351916932985"
-PHONE_DIGITS     = cleanse(RAW_PHONE)          # só dígitos
+PHONE_DIGITS     = canonical(RAW_PHONE)        # dígitos E.164
 TEST_TG_ID       = 5555                        # qualquer nº ≠ real
 DUMMY_FIRST_NAME = "Test"
 DUMMY_LAST_NAME  = f"User_{datetime.utcnow():%H%M%S}"  # evite colisões
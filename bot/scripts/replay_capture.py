@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Replay de uma captura do webhook (bot.utils.capture) contra o Dispatcher
+real, com o Bot API falso (bot.scripts.fake_bot_api) no lugar do Telegram.
+
+Velocidade:
+    --speed 1     tempos originais (rajadas reais, ex.: abertura da clínica)
+    --speed 10    10× mais depressa
+    --speed max   tudo o mais depressa possível (até --concurrency em paralelo)
+
+Como no webhook, cada update corre numa tarefa própria à hora marcada.
+Os cliques em menus são reapontados para o menu que o Bot API falso
+mostra nesse chat (os message_ids da captura não existem aqui);
+--no-remap desliga isto.
+
+Precisa de DATABASE_URL e REDIS_HOST (prefixo de chaves próprio, apagado
+no fim) ou --memory para a FSM em memória.  Os utilizadores da captura
+estão pseudonimizados: numa BD normal não existem e seguem o caminho de
+onboarding; para reproduzir os caminhos de produção use uma cópia da BD
+com os telegram_user_id pseudonimizados com o mesmo CAPTURE_SALT.
+
+Relatório: latência (serviço, atraso de arranque e total) por tipo de
+update, débito, CPU, RSS, tarefas e chamadas ao Bot API.
+
+Uso:
+    python -m bot.scripts.replay_capture capture/updates.jsonl [--speed 10]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import glob
+import json
+import logging
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+for _k, _v in {
+    "BOT_TOKEN": "0:replay", "DOMAIN": "localhost", "TELEGRAM_SECRET_TOKEN": "replay",
+    "REDIS_HOST": "localhost",
+}.items():
+    os.environ.setdefault(_k, _v)
+
+from aiogram import Bot, types                                           # noqa: E402
+from aiogram.client.session.aiohttp import AiohttpSession                # noqa: E402
+from aiogram.client.telegram import TelegramAPIServer                    # noqa: E402
+from aiogram.fsm.storage.base import BaseStorage                         # noqa: E402
+from aiogram.fsm.storage.memory import MemoryStorage                     # noqa: E402
+from aiogram.fsm.storage.redis import DefaultKeyBuilder                  # noqa: E402
+
+from bot import lifecycle                                                # noqa: E402
+from bot.config import BOT_TOKEN, REDIS_DB, REDIS_HOST, REDIS_PORT      # noqa: E402
+from bot.database import care_index, connection, role_cache, user_cache  # noqa: E402
+from bot.database.notify import listener as pg_listener                 # noqa: E402
+from bot.main import build_dispatcher                                    # noqa: E402
+from bot.scripts.fake_bot_api import USER_MSG_BASE, FakeBotAPI          # noqa: E402
+from bot.utils.fsm_storage import AtomicRedisStorage                     # noqa: E402
+
+PREFIX = f"replay{random.randrange(16**4):04x}"
+
+
+# ───────────────────────────── leitura ─────────────────────────────
+def _files(paths: List[str]) -> List[str]:
+    """Ficheiro base + rotações (base.N … base.1, base) por ordem cronológica."""
+    out: List[str] = []
+    for p in paths:
+        rotated = sorted(glob.glob(f"{glob.escape(p)}.[0-9]*"), key=lambda f: -int(f.rsplit(".", 1)[1]))
+        out += rotated + ([p] if os.path.exists(p) else [])
+    return out
+
+
+def _records(files: List[str], limit: Optional[int]) -> List[Tuple[float, Dict[str, Any]]]:
+    recs: List[Tuple[float, Dict[str, Any]]] = []
+    for path in files:
+        with open(path, encoding="utf-8") as fh:
+            for line in fh:
+                if line.strip():
+                    rec = json.loads(line)
+                    recs.append((rec["ts"], rec["update"]))
+    recs.sort(key=lambda r: r[0])
+    return recs[:limit] if limit else recs
+
+
+def _kind(update: Dict[str, Any]) -> str:
+    return next((k for k in update if k != "update_id"), "?")
+
+
+# ───────────────────────────── métricas ─────────────────────────────
+@dataclass
+class Stats:
+    service: Dict[str, List[float]] = field(default_factory=lambda: defaultdict(list))
+    lag: List[float] = field(default_factory=list)
+    total: List[float] = field(default_factory=list)
+    errors: int = 0
+    peak_rss_mb: float = 0.0
+    peak_tasks: int = 0
+
+
+def _rss_mb() -> float:
+    with open("/proc/self/statm") as fh:
+        return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+def _pct(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+
+def _line(label: str, values: List[float]) -> str:
+    ms = [v * 1000 for v in values]
+    return (
+        f"{label:18}{len(ms):>8}{_pct(ms, 50):>10.1f}{_pct(ms, 90):>10.1f}"
+        f"{_pct(ms, 99):>10.1f}{max(ms, default=0):>10.1f}"
+    )
+
+
+async def _monitor(stats: Stats) -> None:
+    while True:
+        stats.peak_rss_mb = max(stats.peak_rss_mb, _rss_mb())
+        stats.peak_tasks = max(stats.peak_tasks, len(asyncio.all_tasks()))
+        await asyncio.sleep(0.5)
+
+
+# ───────────────────────────── replay ─────────────────────────────
+class Replayer:
+    def __init__(self, dp: Any, bot: Bot, api: FakeBotAPI, *, remap: bool) -> None:
+        self.dp = dp
+        self.bot = bot
+        self.api = api
+        self.remap = remap
+        self.stats = Stats()
+
+    def _prepare(self, raw: Dict[str, Any]) -> types.Update:
+        msg = raw.get("message")
+        if msg:
+            # mensagens do utilizador: fora da gama de ids do bot falso
+            msg["message_id"] += USER_MSG_BASE
+        cb = raw.get("callback_query")
+        if self.remap and cb and cb.get("message"):
+            menu = self.api.chat(cb["message"]["chat"]["id"]).menu()
+            if menu is not None:
+                cb["message"] = menu
+        return types.Update.model_validate(raw, context={"bot": self.bot})
+
+    async def feed(self, raw: Dict[str, Any], due: float) -> None:
+        started = time.perf_counter()
+        kind = _kind(raw)
+        try:
+            await self.dp.feed_update(self.bot, self._prepare(raw))
+        except Exception:
+            self.stats.errors += 1
+            logging.getLogger("replay").exception("Update %s falhou", raw.get("update_id"))
+        done = time.perf_counter()
+        self.stats.service[kind].append(done - started)
+        self.stats.lag.append(max(0.0, started - due))
+        self.stats.total.append(done - due)
+
+    async def paced(self, recs: List[Tuple[float, Dict[str, Any]]], speed: float) -> None:
+        t0 = recs[0][0]
+        base = time.perf_counter()
+        tasks = []
+        for ts, raw in recs:
+            due = base + (ts - t0) / speed
+            delay = due - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(self.feed(raw, due)))
+        await asyncio.gather(*tasks)
+
+    async def flat_out(self, recs: List[Tuple[float, Dict[str, Any]]], concurrency: int) -> None:
+        sem = asyncio.Semaphore(concurrency)
+
+        async def one(raw: Dict[str, Any]) -> None:
+            async with sem:
+                await self.feed(raw, time.perf_counter())
+
+        await asyncio.gather(*(one(raw) for _ts, raw in recs))
+
+
+async def run(args: argparse.Namespace) -> int:
+    files = _files(args.paths)
+    recs = _records(files, args.limit)
+    if not recs:
+        print("Captura vazia.")
+        return 1
+    span = recs[-1][0] - recs[0][0]
+    print(f"{len(recs)} updates de {len(files)} ficheiro(s), {span:.0f} s de tráfego original", flush=True)
+
+    api = FakeBotAPI(latency=args.latency)
+    url = await api.start()
+    bot = Bot(token=BOT_TOKEN, session=AiohttpSession(api=TelegramAPIServer.from_base(url)))
+    storage: BaseStorage
+    if args.memory:
+        storage = MemoryStorage()
+    else:
+        storage = AtomicRedisStorage.from_url(
+            f"redis://{REDIS_HOST}:{REDIS_PORT}/{REDIS_DB}",
+            key_builder=DefaultKeyBuilder(prefix=PREFIX),
+        )
+    dp = build_dispatcher(bot, storage, lifecycle.InFlightTracker())
+    replayer = Replayer(dp, bot, api, remap=not args.no_remap)
+
+    await connection.init()
+    care_index.register()
+    user_cache.register()
+    role_cache.register()
+    await pg_listener.start()
+
+    monitor = asyncio.create_task(_monitor(replayer.stats))
+    rss0, cpu0 = _rss_mb(), time.process_time()
+    started = time.perf_counter()
+    try:
+        if args.speed == "max":
+            await replayer.flat_out(recs, args.concurrency)
+        else:
+            await replayer.paced(recs, float(args.speed))
+        elapsed = time.perf_counter() - started
+        cpu = time.process_time() - cpu0
+    finally:
+        monitor.cancel()
+        if isinstance(storage, AtomicRedisStorage):
+            keys = [k async for k in storage.redis.scan_iter(match=f"{PREFIX}:*", count=1000)]
+            if keys:
+                await storage.redis.unlink(*keys)
+        await pg_listener.stop()
+        await connection.close()
+        await bot.session.close()
+        await storage.close()
+        await api.stop()
+
+    st = replayer.stats
+    calls = sum(api.calls.values())
+    print(f"\nvelocidade {args.speed}: {elapsed:.1f} s · {len(recs) / elapsed:.1f} updates/s")
+    print(f"{'latência (ms)':18}{'n':>8}{'p50':>10}{'p90':>10}{'p99':>10}{'max':>10}")
+    for kind, values in sorted(st.service.items()):
+        print(_line(f"serviço {kind}", values))
+    if args.speed != "max":
+        print(_line("atraso arranque", st.lag))
+        print(_line("total", st.total))
+    print(
+        f"\nCPU {cpu:.1f} s ({cpu / elapsed:.0%}) · RSS {rss0:.1f} → pico {st.peak_rss_mb:.1f} MB · "
+        f"pico de tarefas {st.peak_tasks}"
+    )
+    print(f"Bot API: {calls} chamadas ({calls / len(recs):.2f}/update) {dict(api.calls.most_common())}")
+    if st.errors:
+        print(f"{st.errors} updates com excepção (ver log)")
+    return 1 if st.errors else 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+", help="ficheiro(s) de captura (as rotações .1, .2… são incluídas)")
+    parser.add_argument("--speed", default="1", help="1, N (×N) ou max")
+    parser.add_argument("--concurrency", type=int, default=100, help="updates em paralelo com --speed max")
+    parser.add_argument("--limit", type=int, default=None, help="só os primeiros N updates")
+    parser.add_argument("--latency", type=float, default=0.05, help="latência do Bot API falso (s)")
+    parser.add_argument("--memory", action="store_true", help="FSM em memória em vez de Redis")
+    parser.add_argument("--no-remap", action="store_true", help="não reapontar cliques para o menu actual")
+    parser.add_argument("--log-level", default="ERROR")
+    args = parser.parse_args()
+    if args.speed != "max" and float(args.speed) <= 0:
+        parser.error("--speed tem de ser > 0 ou «max»")
+
+    logging.basicConfig(level=args.log_level, format="%(asctime)s | %(levelname)s | %(name)s | %(message)s")
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
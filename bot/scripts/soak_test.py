@@ -0,0 +1,500 @@
+#!/usr/bin/env python3
+"""
+Soak test: milhares de utilizadores simulados durante horas de tempo
+«comprimido», contra o Bot API falso (bot.scripts.fake_bot_api) e um
+Redis / PostgreSQL locais.
+
+Precisa de DATABASE_URL (BD com o schema do bot – cria e apaga os seus
+próprios utilizadores) e REDIS_HOST (usa um prefixo de chaves próprio).
+
+O relógio é comprimido pelo mesmo factor que MENU_TIMEOUT (60 s em
+produção → 3 s por omissão, ou seja ×20): tempos de reflexão, intervalos
+entre sessões e timeouts mantêm a proporção real.
+
+Cada sessão começa com /start e pode incluir:
+• onboarding (contacto → «É você?») – por vezes abandonado a meio;
+• troca de perfil (utilizadores com vários papéis);
+• navegação nos menus; administradores abrem e abandonam o
+  assistente «Adicionar utilizador» (AddUserFlow);
+• abandono puro – o menu expira sozinho.
+
+Amostra RSS, tarefas asyncio vivas, chaves Redis e uso do pool e falha
+(exit 1) se alguma destas séries crescer sem limite depois do warm-up,
+se ficarem tarefas vivas depois de todos os timeouts expirarem ou se
+algum handler rebentar.
+
+Uso:
+    python -m bot.scripts.soak_test [--users 2000] [--hours 4] [--workers 200]
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import os
+import random
+import sys
+import time
+import traceback
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+for _k, _v in {
+    "BOT_TOKEN": "0:soak", "DOMAIN": "localhost", "TELEGRAM_SECRET_TOKEN": "soak",
+    "REDIS_HOST": "localhost", "MENU_TIMEOUT": "3", "MESSAGE_TIMEOUT": "3",
+}.items():
+    os.environ.setdefault(_k, _v)
+
+from aiogram import Bot, types                                           # noqa: E402
+from aiogram.client.session.aiohttp import AiohttpSession                # noqa: E402
+from aiogram.client.telegram import TelegramAPIServer                    # noqa: E402
+from aiogram.fsm.storage.redis import DefaultKeyBuilder                  # noqa: E402
+
+from bot import lifecycle                                                # noqa: E402
+from bot.config import (                                                 # noqa: E402
+    BOT_TOKEN, MENU_TIMEOUT, MESSAGE_TIMEOUT, REDIS_DB, REDIS_HOST, REDIS_PORT,
+)
+from bot.database import care_index, connection, queries as q, role_cache, user_cache  # noqa: E402
+from bot.database.notify import listener as pg_listener                 # noqa: E402
+from bot.main import build_dispatcher                                    # noqa: E402
+from bot.scripts.fake_bot_api import USER_MSG_BASE, FakeBotAPI, callback_data  # noqa: E402
+from bot.utils.fsm_storage import AtomicRedisStorage                     # noqa: E402
+
+COMPRESS = 60 / MENU_TIMEOUT                 # 1 s simulado = 1/COMPRESS s reais
+RUN = f"{random.randrange(1000):03d}"
+PREFIX = f"soak{RUN}"
+TG_BASE = 7_000_000_000                      # telegram ids simulados
+
+# (tipo, peso, papéis)
+KINDS = [
+    ("patient",  0.55, ["patient"]),
+    ("multi",    0.20, ["patient", "physiotherapist"]),
+    ("admin",    0.15, ["administrator"]),
+    ("stranger", 0.10, []),                  # número desconhecido na BD
+]
+CANCEL = "❌ Cancelar processo de adição"
+WIZARD_ANSWERS = ["Soak", f"{RUN}_wizard", "saltar", "351", "912345678"]
+
+log = logging.getLogger("soak")
+
+
+# ───────────────────────────── população ─────────────────────────────
+@dataclass
+class SimUser:
+    idx: int
+    kind: str
+    roles: List[str]
+    linked: bool = False
+    last_role: Optional[str] = None
+    msg_seq: int = USER_MSG_BASE
+
+    @property
+    def tg_id(self) -> int:
+        return TG_BASE + self.idx
+
+    @property
+    def phone(self) -> str:                  # dígitos E.164 (351 9XXXXXXXX)
+        prefix = "2" if self.kind == "stranger" else "9"
+        return f"351{prefix}{RUN}{self.idx:05d}"
+
+    def next_msg_id(self) -> int:
+        self.msg_seq += 1
+        return self.msg_seq
+
+
+def _population(n: int) -> List[SimUser]:
+    kinds = random.choices(KINDS, weights=[k[1] for k in KINDS], k=n)
+    return [SimUser(i, kind, roles) for i, (kind, _w, roles) in enumerate(kinds)]
+
+
+async def _seed(users: List[SimUser]) -> None:
+    pool = await connection.get_pool()
+    known = [u for u in users if u.roles]
+    for i in range(0, len(known), 500):
+        chunk = known[i:i + 500]
+        ids = await q.add_users(pool, [
+            q.NewUser(
+                role=u.roles[0], first_name="Soak", last_name=f"{RUN}_{u.idx}",
+                date_of_birth=None, phone_cc="351", phone=u.phone[3:],
+                email=f"soak_{RUN}_{u.idx}@example.com", created_by=None,
+            )
+            for u in chunk
+        ])
+        for u, user_id in zip(chunk, ids):
+            for extra in u.roles[1:]:
+                await q.add_user_role(pool, user_id, extra)
+
+
+async def _cleanup(storage: AtomicRedisStorage) -> None:
+    pool = await connection.get_pool()
+    await pool.execute(
+        "DELETE FROM users WHERE first_name = 'Soak' AND last_name LIKE $1", f"{RUN}\\_%",
+    )
+    keys = [k async for k in storage.redis.scan_iter(match=f"{PREFIX}:*", count=1000)]
+    for i in range(0, len(keys), 1000):
+        await storage.redis.unlink(*keys[i:i + 1000])
+
+
+# ───────────────────────────── cliente simulado ─────────────────────────────
+class Client:
+    """Gera updates como o Telegram os entregaria ao webhook."""
+
+    def __init__(self, dp: Any, bot: Bot, api: FakeBotAPI) -> None:
+        self.dp = dp
+        self.bot = bot
+        self.api = api
+        self.update_seq = 0
+        self.sessions = 0
+        self.stats: Counter = Counter()
+        self.errors: List[str] = []
+
+    async def _feed(self, raw: Dict[str, Any]) -> None:
+        self.update_seq += 1
+        raw["update_id"] = self.update_seq
+        update = types.Update.model_validate(raw, context={"bot": self.bot})
+        try:
+            await self.dp.feed_update(self.bot, update)
+        except Exception:
+            self.errors.append(traceback.format_exc(limit=3))
+
+    @staticmethod
+    def _user(u: SimUser) -> Dict[str, Any]:
+        return {"id": u.tg_id, "is_bot": False, "first_name": "Soak"}
+
+    def _message(self, u: SimUser, **content: Any) -> Dict[str, Any]:
+        return {
+            "message_id": u.next_msg_id(),
+            "date": int(time.time()),
+            "chat": {"id": u.tg_id, "type": "private"},
+            "from": self._user(u),
+            **content,
+        }
+
+    async def text(self, u: SimUser, text: str) -> None:
+        content: Dict[str, Any] = {"text": text}
+        if text.startswith("/"):
+            content["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+        await self._feed({"message": self._message(u, **content)})
+
+    async def contact(self, u: SimUser) -> None:
+        contact = {"phone_number": f"+{u.phone}", "first_name": "Soak", "user_id": u.tg_id}
+        await self._feed({"message": self._message(u, contact=contact)})
+
+    def buttons(self, u: SimUser) -> List[str]:
+        menu = self.api.chat(u.tg_id).menu()
+        return callback_data(menu) if menu else []
+
+    async def click(self, u: SimUser, data: str) -> bool:
+        menu = self.api.chat(u.tg_id).menu()
+        if menu is None or data not in callback_data(menu):
+            return False
+        await self._feed({"callback_query": {
+            "id": str(self.update_seq),
+            "from": self._user(u),
+            "chat_instance": str(u.tg_id),
+            "message": menu,
+            "data": data,
+        }})
+        return True
+
+    @staticmethod
+    async def think(mean: float) -> None:
+        """Pausa do utilizador (`mean` em segundos simulados)."""
+        await asyncio.sleep(random.expovariate(1 / mean) / COMPRESS)
+
+    # ───────────────────────── sessão ─────────────────────────
+    async def session(self, u: SimUser) -> None:
+        self.sessions += 1
+        await self.text(u, "/start")
+        if self.api.chat(u.tg_id).asks_contact():
+            self.stats["onboarding"] += 1
+            await self._onboarding(u)
+            if not u.linked:
+                return
+        if any(b.startswith("role:") for b in self.buttons(u)):
+            await self._pick_role(u)
+        await self._navigate(u)
+
+    async def _onboarding(self, u: SimUser) -> None:
+        r = random.random()
+        if r < 0.10:                                 # abandona – o pedido expira
+            return
+        await self.think(6)
+        if r < 0.20:                                 # escreve o número à mão
+            await self.text(u, u.phone[3:])
+            await self.think(6)
+        await self.contact(u)
+        if "link_yes" not in self.buttons(u):        # número desconhecido
+            return
+        await self.think(4)
+        r = random.random()
+        if r < 0.05:                                 # confirmação expira
+            return
+        if r < 0.10:
+            await self.click(u, "link_no")
+            return
+        u.linked = await self.click(u, "link_yes")
+        self.stats["linked"] += u.linked
+
+    async def _pick_role(self, u: SimUser) -> None:
+        options = [b for b in self.buttons(u) if b.startswith("role:")]
+        others = [b for b in options if b != f"role:{u.last_role}"] or options
+        choice = random.choice(others)
+        await self.think(3)
+        if await self.click(u, choice):
+            self.stats["role_choice"] += 1
+            u.last_role = choice.split(":", 1)[1]
+
+    async def _navigate(self, u: SimUser) -> None:
+        for _ in range(random.randint(0, 6)):
+            await self.think(8)
+            options = self.buttons(u)
+            if not options:                          # menu expirou / foi fechado
+                return
+            preferred = [b for b in options if b in ("admin:users", "users:add")]
+            if preferred and random.random() < 0.6:
+                choice = preferred[0]
+            else:
+                choice = random.choice(options)
+            await self.click(u, choice)
+            if self._in_wizard(u):
+                await self._wizard(u)
+                return
+
+    def _in_wizard(self, u: SimUser) -> bool:
+        kbd = self.api.chat(u.tg_id).reply_keyboard or {}
+        return any(b.get("text") == CANCEL for row in kbd.get("keyboard", []) for b in row)
+
+    async def _wizard(self, u: SimUser) -> None:
+        """AddUserFlow: alguns campos e depois cancela ou abandona."""
+        self.stats["wizard"] += 1
+        for answer in WIZARD_ANSWERS[:random.randint(0, len(WIZARD_ANSWERS) - 1)]:
+            await self.think(10)
+            await self.text(u, answer)
+        if random.random() < 0.3:
+            await self.think(5)
+            await self.text(u, CANCEL)
+        else:
+            self.stats["wizard_abandoned"] += 1
+
+
+# ───────────────────────────── amostragem ─────────────────────────────
+@dataclass
+class Sample:
+    t: float
+    sessions: int
+    rss_mb: float
+    tasks: int
+    redis_keys: int
+    pool_busy: int
+    pool_size: int
+
+
+def _rss_mb() -> float:
+    with open("/proc/self/statm") as fh:
+        return int(fh.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+def _live_tasks() -> int:
+    # as ligações keep-alive do Bot API falso (RequestHandler.start do
+    # aiohttp) vivem no mesmo loop mas não são do bot
+    return sum(
+        1 for t in asyncio.all_tasks()
+        if not getattr(t.get_coro(), "__qualname__", "").startswith("RequestHandler.")
+    )
+
+
+async def _redis_keys(storage: AtomicRedisStorage) -> int:
+    n = 0
+    async for _ in storage.redis.scan_iter(match=f"{PREFIX}:*", count=1000):
+        n += 1
+    return n
+
+
+async def _keys_without_ttl(storage: AtomicRedisStorage) -> int:
+    keys = [k async for k in storage.redis.scan_iter(match=f"{PREFIX}:*", count=1000)]
+    async with storage.redis.pipeline(transaction=False) as pipe:
+        for k in keys:
+            pipe.ttl(k)
+        ttls = await pipe.execute()
+    return sum(1 for t in ttls if t == -1)
+
+
+async def _sample(started: float, client: Client, storage: AtomicRedisStorage) -> Sample:
+    pool = connection.peek()
+    size = pool.get_size() if pool else 0
+    return Sample(
+        t=time.monotonic() - started,
+        sessions=client.sessions,
+        rss_mb=_rss_mb(),
+        tasks=_live_tasks(),
+        redis_keys=await _redis_keys(storage),
+        pool_busy=size - (pool.get_idle_size() if pool else 0),
+        pool_size=size,
+    )
+
+
+def _print(s: Sample) -> None:
+    print(
+        f"t={s.t:7.0f}s (≈{s.t * COMPRESS / 3600:5.2f} h)  sessões={s.sessions:7d}  "
+        f"rss={s.rss_mb:7.1f} MB  tarefas={s.tasks:5d}  redis={s.redis_keys:6d}  "
+        f"pool={s.pool_busy}/{s.pool_size}",
+        flush=True,
+    )
+
+
+def _grows(values: List[float], tolerance: float, slack: float) -> Optional[str]:
+    """Máximo do último terço acima do máximo do primeiro terço (+ folga)?"""
+    third = len(values) // 3
+    if third < 2:
+        return None
+    first, last = max(values[:third]), max(values[-third:])
+    if last > first * (1 + tolerance) + slack:
+        return f"{first:.1f} → {last:.1f}"
+    return None
+
+
+# ───────────────────────────── execução ─────────────────────────────
+@dataclass
+class Scheduler:
+    """Fila de sessões: cada utilizador volta após um intervalo aleatório."""
+
+    client: Client
+    users: List[SimUser]
+    gap: float                                   # s simulados entre sessões
+    end: float
+    queue: "asyncio.Queue[SimUser]" = field(default_factory=asyncio.Queue)
+
+    async def worker(self) -> None:
+        while True:
+            u = await self.queue.get()
+            try:
+                await self.client.session(u)
+            except Exception:
+                self.client.errors.append(traceback.format_exc(limit=3))
+            finally:
+                self.queue.task_done()
+            if time.monotonic() < self.end:
+                delay = random.expovariate(1 / self.gap) / COMPRESS
+                asyncio.get_running_loop().call_later(delay, self._due, u)
+
+    def _due(self, u: SimUser) -> None:
+        if time.monotonic() < self.end:
+            self.queue.put_nowait(u)
+
+    def kick_off(self, spread: float) -> None:
+        loop = asyncio.get_running_loop()
+        for u in self.users:
+            loop.call_later(random.uniform(0, spread), self._due, u)
+
+
+async def run(args: argparse.Namespace) -> int:
+    api = FakeBotAPI(latency=args.latency)
+    url = await api.start()
+    bot = Bot(token=BOT_TOKEN, session=AiohttpSession(api=TelegramAPIServer.from_base(url)))
+    storage = AtomicRedisStorage.from_url(
+        f"redis://{REDIS_HOST}:{REDIS_PORT}/{REDIS_DB}",
+        key_builder=DefaultKeyBuilder(prefix=PREFIX),
+    )
+    dp = build_dispatcher(bot, storage, lifecycle.InFlightTracker())
+    client = Client(dp, bot, api)
+
+    users = _population(args.users)
+    await connection.init()
+    care_index.register()
+    user_cache.register()
+    role_cache.register()
+    await pg_listener.start()
+    await _seed(users)
+
+    duration = args.hours * 3600 / COMPRESS
+    settle = 2 * MENU_TIMEOUT + MESSAGE_TIMEOUT + 5   # todos os timers expiram
+    print(
+        f"{args.users} utilizadores · {args.hours} h simuladas em {duration:.0f} s "
+        f"(×{COMPRESS:.0f}, MENU_TIMEOUT={MENU_TIMEOUT}s) · {args.workers} workers",
+        flush=True,
+    )
+
+    started = time.monotonic()
+    sched = Scheduler(client, users, gap=args.gap * 60, end=started + duration)
+    workers = [asyncio.create_task(sched.worker()) for _ in range(args.workers)]
+    baseline = await _sample(started, client, storage)
+    samples: List[Sample] = []
+    failures: List[str] = []
+    try:
+        sched.kick_off(spread=min(duration * 0.1, args.gap * 60 / COMPRESS))
+        while time.monotonic() < sched.end:
+            await asyncio.sleep(args.sample)
+            samples.append(await _sample(started, client, storage))
+            _print(samples[-1])
+
+        await sched.queue.join()                     # sessões em curso
+        await asyncio.sleep(settle)
+        final = await _sample(started, client, storage)
+        print("— depois de todos os timeouts —")
+        _print(final)
+
+        # ───── veredicto ─────
+        steady = [s for s in samples if s.t >= duration * args.warmup]
+        checks = {
+            "RSS (MB)":      ([s.rss_mb for s in steady], 16),
+            "tarefas":       ([s.tasks for s in steady], 20),
+            "chaves Redis":  ([s.redis_keys for s in steady], 50),
+        }
+        for name, (values, slack) in checks.items():
+            growth = _grows(values, args.tolerance, slack)
+            if growth:
+                failures.append(f"{name} a crescer sem limite: {growth}")
+        if final.tasks > baseline.tasks + 5:
+            failures.append(f"tarefas vivas depois dos timeouts: {baseline.tasks} → {final.tasks}")
+        if final.pool_busy:
+            failures.append(f"{final.pool_busy} ligações PostgreSQL ainda em uso")
+        if final.redis_keys > 3 * args.users:        # estado + hash + legado por chat
+            failures.append(f"{final.redis_keys} chaves Redis para {args.users} chats")
+        if client.errors:
+            failures.append(f"{len(client.errors)} excepções em handlers; primeira:\n{client.errors[0]}")
+
+        print(f"chaves Redis sem TTL: {await _keys_without_ttl(storage)} (limitadas a ≤ 3 por chat)")
+        print(f"sessões: {client.sessions} · {dict(client.stats)}")
+        print(f"chamadas Bot API: {dict(api.calls.most_common())}")
+        if api.errors:
+            print(f"erros Bot API (esperados – mensagens já apagadas): {dict(api.errors)}")
+    finally:
+        for w in workers:
+            w.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+        await _cleanup(storage)
+        await pg_listener.stop()
+        await connection.close()
+        await bot.session.close()
+        await storage.close()
+        await api.stop()
+
+    if failures:
+        print("FALHOU:\n  " + "\n  ".join(failures))
+        return 1
+    print("OK – memória, tarefas e chaves estáveis")
+    return 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--hours", type=float, default=4.0, help="horas simuladas")
+    parser.add_argument("--gap", type=float, default=30.0, help="minutos simulados entre sessões (média)")
+    parser.add_argument("--workers", type=int, default=200, help="sessões em simultâneo (máx.)")
+    parser.add_argument("--sample", type=float, default=5.0, help="segundos reais entre amostras")
+    parser.add_argument("--warmup", type=float, default=0.25, help="fracção inicial ignorada no veredicto")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="crescimento relativo tolerado")
+    parser.add_argument("--latency", type=float, default=0.01, help="latência do Bot API falso (s)")
+    parser.add_argument("--log-level", default="ERROR")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=args.log_level, format="%(asctime)s | %(levelname)s | %(name)s | %(message)s")
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == "__main__":
+    main()
@@ -10,3 +10,4 @@ class AdminMenuStates(StatesGroup):
     USERS_SEARCH = State()   # placeholder
     USERS_ADD    = State()   # wrapper “Adicionar”
     MESSAGES     = State()   # submenu Mensagens
+    STATS        = State()   # ecrã Estatísticas
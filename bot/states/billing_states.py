@@ -0,0 +1,8 @@
+# bot/states/billing_states.py
+from aiogram.fsm.state import State, StatesGroup
+
+
+class BillingStates(StatesGroup):
+    """Ecrãs de faturação (cache Moloni) – o «Voltar» regressa ao menu do perfil."""
+    PATIENT    = State()   # paciente: «Pagamentos»
+    ACCOUNTANT = State()   # contabilista: «Faturas» / «Pagamentos»
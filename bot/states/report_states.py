@@ -0,0 +1,6 @@
+from aiogram.fsm.state import State, StatesGroup
+
+
+class ReportStates(StatesGroup):
+    """Ecrãs de exportação de relatórios – o «Voltar» regressa ao menu do perfil."""
+    PHYSIO = State()   # fisioterapeuta: «Relatórios»
@@ -0,0 +1,140 @@
+# bot/utils/bot_session.py
+"""
+Sessão HTTP do Bot API (bot, worker e scripts).
+
+A AiohttpSession por omissão do aiogram usa o connector com limites
+genéricos, json da stdlib, 60 s de timeout para tudo e sempre
+api.telegram.org.  build_session() afina isso a partir de BOT_API_*:
+
+• ligações    – BOT_API_POOL ligações (todas ao mesmo host), keep-alive
+                de BOT_API_KEEPALIVE s (0 → uma ligação por pedido);
+• timeouts    – BOT_API_TIMEOUT por chamada; uploads (sendDocument…)
+                BOT_API_UPLOAD_TIMEOUT; BOT_API_TIMEOUTS «método=s,…»
+                sobrepõe métodos concretos;
+• JSON        – orjson (BOT_API_JSON=orjson) para respostas e
+                reply_markup; «json» volta à stdlib;
+• servidor    – BOT_API_BASE aponta para um telegram-bot-api próprio
+                (ou o FakeBotAPI dos scripts); BOT_API_LOCAL=1 se
+                correr com --local (ficheiros até 2000 MB, file_path
+                local).  Antes de mudar de servidor o bot tem de fazer
+                logOut no api.telegram.org – ver README.
+
+    bot = Bot(token=BOT_TOKEN, session=build_session())
+"""
+
+from __future__ import annotations
+
+import json
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import PRODUCTION, TelegramAPIServer
+from aiogram.methods import TelegramMethod
+
+from bot.config import (
+    BOT_API_BASE,
+    BOT_API_JSON,
+    BOT_API_KEEPALIVE,
+    BOT_API_LOCAL,
+    BOT_API_POOL,
+    BOT_API_TIMEOUT,
+    BOT_API_TIMEOUTS,
+    BOT_API_UPLOAD_TIMEOUT,
+)
+
+__all__ = ["TunedSession", "build_session", "max_upload", "parse_timeouts"]
+
+_UPLOAD_METHODS = (
+    "sendDocument", "sendPhoto", "sendVideo", "sendAudio", "sendVoice",
+    "sendAnimation", "sendVideoNote", "sendMediaGroup", "sendSticker",
+)
+
+_MB = 1024 * 1024
+_CLOUD_UPLOAD = 50 * _MB                # limites de envio do Bot API
+_LOCAL_UPLOAD = 2000 * _MB
+
+
+def parse_timeouts(spec: str) -> Dict[str, float]:
+    """«sendDocument=300,getFile=60» → {"sendDocument": 300.0, "getFile": 60.0}."""
+    out: Dict[str, float] = {}
+    for item in spec.split(","):
+        if item.strip():
+            method, _, seconds = item.partition("=")
+            out[method.strip()] = float(seconds)
+    return out
+
+
+def _codec(name: str) -> Tuple[Callable[..., Any], Callable[..., str]]:
+    if name == "orjson":
+        import orjson
+
+        return orjson.loads, lambda obj: orjson.dumps(obj).decode()
+    if name == "json":
+        return json.loads, json.dumps
+    raise ValueError(f"BOT_API_JSON desconhecido: {name!r} (orjson | json)")
+
+
+def _server(base: str, local: bool) -> TelegramAPIServer:
+    return TelegramAPIServer.from_base(base.rstrip("/"), is_local=local) if base else PRODUCTION
+
+
+def max_upload(base: str = BOT_API_BASE, local: bool = BOT_API_LOCAL) -> int:
+    """Maior ficheiro (bytes) que o servidor configurado aceita em sendDocument."""
+    return _LOCAL_UPLOAD if base and local else _CLOUD_UPLOAD
+
+
+class TunedSession(AiohttpSession):
+    """AiohttpSession com timeout por método e connector configurável."""
+
+    def __init__(
+        self,
+        *,
+        timeouts: Dict[str, float],
+        keepalive: float,
+        **kwargs: Any,
+    ) -> None:
+        super().__init__(**kwargs)
+        self.method_timeouts = timeouts
+        # um só host: o limite é o do pool; DNS em cache 1 h (já o default do aiogram)
+        self._connector_init["limit_per_host"] = 0
+        if keepalive > 0:
+            self._connector_init["keepalive_timeout"] = keepalive
+        else:
+            self._connector_init["force_close"] = True        # uma ligação por pedido
+
+    async def make_request(
+        self,
+        bot: Bot,
+        method: TelegramMethod[Any],
+        timeout: Optional[int] = None,
+    ) -> Any:
+        if timeout is None:
+            timeout = self.method_timeouts.get(method.__api_method__, self.timeout)
+        return await super().make_request(bot, method, timeout)
+
+
+def build_session(
+    *,
+    base: str = BOT_API_BASE,
+    local: bool = BOT_API_LOCAL,
+    pool: int = BOT_API_POOL,
+    keepalive: float = BOT_API_KEEPALIVE,
+    timeout: float = BOT_API_TIMEOUT,
+    upload_timeout: float = BOT_API_UPLOAD_TIMEOUT,
+    json_codec: str = BOT_API_JSON,
+    overrides: str = BOT_API_TIMEOUTS,
+) -> TunedSession:
+    """Sessão com a configuração BOT_API_* (os argumentos servem aos benchmarks)."""
+    loads, dumps = _codec(json_codec)
+    timeouts = {m: upload_timeout for m in _UPLOAD_METHODS}
+    timeouts.update(parse_timeouts(overrides))
+    return TunedSession(
+        api=_server(base, local),
+        limit=pool,
+        keepalive=keepalive,
+        timeouts=timeouts,
+        timeout=timeout,
+        json_loads=loads,
+        json_dumps=dumps,
+    )
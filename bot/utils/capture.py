@@ -0,0 +1,208 @@
+# bot/utils/capture.py
+"""
+Captura do tráfego do webhook para replay (bot.scripts.replay_capture).
+
+Com CAPTURE_FILE definido, cada update aceite pelo webhook (resposta
+200) é escrito numa linha JSONL `{"ts": <epoch>, "update": {...}}`:
+
+• ficheiro rotativo (CAPTURE_MAX_MB × CAPTURE_BACKUPS);
+• escrita numa thread (QueueHandler/QueueListener) – o pedido HTTP
+  só serializa e enfileira;
+• pseudonimização determinística (HMAC com CAPTURE_SALT):
+    – ids de utilizador/chat → outro id estável (mesmo sinal);
+    – nomes, username, título → «U» + hash;
+    – telefones → mesmo indicativo, restantes dígitos trocados;
+    – texto livre → cada palavra trocada por outra do mesmo tamanho e
+      forma (letras↔letras, dígitos↔dígitos), pelo que os offsets das
+      entities continuam válidos; comandos e botões conhecidos ficam;
+    – vcard, localização e afins são removidos.
+  O mesmo valor gera sempre o mesmo pseudónimo dentro da captura
+  (sessões e chats continuam reconhecíveis).  Sem CAPTURE_SALT usa-se
+  um sal aleatório por processo.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import hmac
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import re
+import string
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiohttp import web
+
+from bot.config import (
+    CAPTURE_BACKUPS,
+    CAPTURE_FILE,
+    CAPTURE_MAX_MB,
+    CAPTURE_SALT,
+    WEBHOOK_PATH,
+)
+from bot.utils import metrics
+
+log = logging.getLogger(__name__)
+
+__all__ = ["Pseudonymizer", "capture_middleware", "enabled", "start", "stop"]
+
+_CAPTURED = metrics.counter("capture_updates_total", "Updates escritos no ficheiro de captura")
+
+# objectos cujo «id» identifica uma pessoa ou chat
+_PERSON_KEYS = {
+    "from", "chat", "user", "sender_chat", "forward_from", "forward_from_chat",
+    "via_bot", "new_chat_member", "old_chat_member", "left_chat_member", "new_chat_members",
+}
+_NAME_KEYS = {"first_name", "last_name", "username", "title"}
+_TEXT_KEYS = {"text", "caption", "query", "email"}
+_DROP_KEYS = {"vcard", "location", "venue", "bio", "shipping_address"}
+
+# textos de teclados do próprio bot (sem dados pessoais) – mantidos para o
+# replay seguir o mesmo caminho
+_KEEP_TEXTS = {
+    "↩️ Regressar à opção anterior",
+    "❌ Cancelar processo de adição",
+    "saltar",
+    "skip",
+}
+_COMMAND = re.compile(r"^/\w+(@\w+)?")
+_WORD = re.compile(r"\w+")
+
+
+class Pseudonymizer:
+    """Substituições determinísticas (mesmo sal → mesmos pseudónimos)."""
+
+    def __init__(self, salt: bytes) -> None:
+        self._salt = salt
+
+    def _digest(self, kind: str, value: Any) -> bytes:
+        return hmac.new(self._salt, f"{kind}:{value}".encode(), hashlib.sha256).digest()
+
+    def user_id(self, value: int) -> int:
+        h = int.from_bytes(self._digest("id", abs(value))[:6], "big") % 9_000_000_000 + 1_000_000_000
+        return -h if value < 0 else h
+
+    def name(self, value: str) -> str:
+        return "U" + self._digest("name", value).hex()[:7]
+
+    def _reshape(self, kind: str, value: str) -> str:
+        """Mesmo tamanho e forma: letras → letras (caixa mantida), dígitos → dígitos."""
+        digest = self._digest(kind, value)
+        out = []
+        for i, ch in enumerate(value):
+            b = digest[i % len(digest)] ^ (i // len(digest))
+            if ch.isdigit():
+                out.append(string.digits[b % 10])
+            elif ch.isalpha():
+                c = string.ascii_lowercase[b % 26]
+                out.append(c.upper() if ch.isupper() else c)
+            else:
+                out.append(ch)
+        return "".join(out)
+
+    def phone(self, value: str) -> str:
+        plus = "+" if value.startswith("+") else ""
+        digits = value.lstrip("+")
+        return plus + digits[:3] + self._reshape("phone", digits)[3:]
+
+    def text(self, value: str) -> str:
+        if value.strip() in _KEEP_TEXTS:
+            return value
+        cmd = _COMMAND.match(value)
+        head, tail = (cmd.group(0), value[cmd.end():]) if cmd else ("", value)
+        return head + _WORD.sub(lambda m: self._reshape("word", m.group(0)), tail)
+
+    def scrub(self, obj: Any, parent: Optional[str] = None) -> Any:
+        if isinstance(obj, list):
+            return [self.scrub(item, parent) for item in obj]
+        if not isinstance(obj, dict):
+            return obj
+        out: Dict[str, Any] = {}
+        for key, value in obj.items():
+            if key in _DROP_KEYS:
+                continue
+            if (key == "id" and parent in _PERSON_KEYS) or key == "user_id":
+                out[key] = self.user_id(int(value))
+            elif key in _NAME_KEYS and isinstance(value, str):
+                out[key] = self.name(value)
+            elif key == "phone_number":
+                out[key] = self.phone(str(value))
+            elif key == "chat_instance":
+                out[key] = self._reshape("chat_instance", str(value))
+            elif key in _TEXT_KEYS and isinstance(value, str):
+                out[key] = self.text(value)
+            else:
+                out[key] = self.scrub(value, key)
+        return out
+
+
+# ───────────────────────────── escrita ─────────────────────────────
+_pseudo = Pseudonymizer(CAPTURE_SALT.encode() if CAPTURE_SALT else os.urandom(32))
+_writer = logging.getLogger("bot.capture.writer")
+_writer.propagate = False
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def enabled() -> bool:
+    return bool(CAPTURE_FILE)
+
+
+def start() -> None:
+    """Abre o ficheiro rotativo e arranca a thread de escrita (no-op sem CAPTURE_FILE)."""
+    global _listener
+    if not enabled() or _listener is not None:
+        return
+    q: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    target = logging.handlers.RotatingFileHandler(
+        CAPTURE_FILE,
+        maxBytes=int(CAPTURE_MAX_MB * 2**20),
+        backupCount=CAPTURE_BACKUPS,
+        encoding="utf-8",
+    )
+    target.setFormatter(logging.Formatter("%(message)s"))
+    _writer.addHandler(logging.handlers.QueueHandler(q))
+    _writer.setLevel(logging.INFO)
+    _listener = logging.handlers.QueueListener(q, target)
+    _listener.start()
+    if not CAPTURE_SALT:
+        log.warning("CAPTURE_SALT vazio – pseudónimos mudam a cada arranque")
+    log.info("Captura de updates activa → %s", CAPTURE_FILE)
+
+
+async def stop(_timeout: float = 0) -> None:
+    """Drain hook: escreve o que falta e fecha o ficheiro."""
+    global _listener
+    if _listener is None:
+        return
+    _listener.stop()
+    for h in _listener.handlers:
+        h.close()
+    _listener = None
+
+
+def record(update: Dict[str, Any], ts: Optional[float] = None) -> None:
+    line = {"ts": round(ts if ts is not None else time.time(), 6), "update": _pseudo.scrub(update)}
+    _writer.info(json.dumps(line, ensure_ascii=False, separators=(",", ":")))
+    _CAPTURED.inc()
+
+
+@web.middleware
+async def capture_middleware(
+    request: web.Request,
+    handler: Callable[[web.Request], Awaitable[web.StreamResponse]],
+) -> web.StreamResponse:
+    """Regista os updates que o webhook aceitou (depois do handler)."""
+    if _listener is None or request.path != WEBHOOK_PATH:
+        return await handler(request)
+    ts = time.time()
+    response = await handler(request)
+    if response.status == 200:
+        try:
+            record(await request.json(), ts)          # corpo já lido (em cache)
+        except Exception:
+            log.exception("Falha ao capturar update")
+    return response
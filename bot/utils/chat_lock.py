@@ -0,0 +1,241 @@
+# bot/utils/chat_lock.py
+"""
+Execução em série por chat – um update (ou tarefa de timeout) de cada
+vez por chat, em paralelo entre chats diferentes.
+
+Dois updates do mesmo chat processados ao mesmo tempo (contacto a chegar
+enquanto _expire_contact_request dispara, dois cliques seguidos)
+intercalavam leituras e escritas da FSM e deixavam menus duplicados ou
+órfãos.  hold(chat_id) serializa-os em dois níveis:
+
+• processo – um asyncio.Lock por chat, criado a pedido e removido
+             quando já ninguém o usa (o mapa só tem os chats activos);
+• réplicas – (CHAT_LOCK_REDIS=1) lock em Redis «SET NX PX» com lease de
+             CHAT_LOCK_LEASE s renovado a cada lease/3 enquanto o bloco
+             corre.  Cada aquisição recebe um fencing token (INCR por
+             chat): AtomicRedisStorage recusa escritas na FSM com um
+             token mais antigo do que o último emitido (LockLost), por
+             isso um detentor que perdeu o lease – pausa longa, Redis
+             inacessível – não estraga o trabalho do seguinte.
+
+Quem espera mais de CHAT_LOCK_WAIT s pelo lock Redis segue sem ele
+(mantém o lock local) e conta em chat_lock_timeouts_total: o webhook
+corre em segundo plano e perder o update seria pior.
+
+O lock é re-entrante na mesma tarefa (handler → helper que também
+chama hold()).  Tarefas criadas dentro do bloco (create_task) não o
+herdam: esperam que o bloco termine – nunca as aguarde lá dentro.
+
+    async with chat_lock.hold(chat_id):
+        ...
+
+Métricas: chat_lock_wait_seconds{scope}, chat_lock_contended_total{scope},
+chat_lock_timeouts_total, chat_lock_lost_total, chat_lock_active.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import time
+import uuid
+from contextlib import asynccontextmanager, suppress
+from typing import AsyncIterator, Dict, Optional
+
+from redis.asyncio import Redis
+
+from bot.config import CHAT_LOCK_LEASE, CHAT_LOCK_REDIS, CHAT_LOCK_WAIT, REDIS_PREFIX
+from bot.utils import metrics
+
+log = logging.getLogger(__name__)
+
+__all__ = ["ChatLocks", "LockLost", "fence", "fence_key", "hold", "init"]
+
+_WAIT = metrics.histogram(
+    "chat_lock_wait_seconds",
+    "Espera pelo lock do chat antes de processar",
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+_CONTENDED = metrics.counter("chat_lock_contended_total", "Aquisições que encontraram o lock ocupado")
+_TIMEOUTS = metrics.counter("chat_lock_timeouts_total", "Esperas pelo lock Redis que esgotaram CHAT_LOCK_WAIT")
+_LOST = metrics.counter("chat_lock_lost_total", "Leases perdidos durante o processamento")
+_ACTIVE = metrics.gauge("chat_lock_active", "Chats com lock local em uso (detentor + à espera)")
+
+# KEYS[1] = lock · KEYS[2] = contador de fencing · ARGV[1] = dono · ARGV[2] = lease ms
+# devolve o token (> 0) ou -PTTL do detentor actual (espera sugerida)
+_LUA_ACQUIRE = """
+if redis.call('SET', KEYS[1], ARGV[1], 'NX', 'PX', ARGV[2]) then
+    return redis.call('INCR', KEYS[2])
+end
+local ttl = redis.call('PTTL', KEYS[1])
+if ttl < 0 then return 0 end
+return -ttl
+"""
+
+# KEYS[1] = lock · ARGV[1] = dono · ARGV[2] = lease ms (0 = libertar)
+_LUA_RENEW = """
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then return 0 end
+if ARGV[2] == '0' then return redis.call('DEL', KEYS[1]) end
+return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+"""
+
+_POLL_MIN = 0.005
+_POLL_MAX = 0.1
+
+
+class LockLost(RuntimeError):
+    """O lease deste detentor expirou e outro já recebeu um token mais novo."""
+
+
+
+def _lock_key(chat_id: int) -> str:
+    return f"{REDIS_PREFIX}:lock:chat:{chat_id}"
+
+
+def fence_key(chat_id: int) -> str:
+    """Contador de fencing tokens do chat (sem TTL: tem de ser monotónico)."""
+    return f"{_lock_key(chat_id)}:fence"
+
+
+class _Entry:
+    __slots__ = ("lock", "users", "owner", "token")
+
+    def __init__(self) -> None:
+        self.lock = asyncio.Lock()
+        self.users = 0                                  # detentor + à espera
+        self.owner: Optional[asyncio.Task] = None
+        self.token: Optional[int] = None
+
+
+class ChatLocks:
+    def __init__(
+        self,
+        redis: Optional[Redis] = None,
+        *,
+        lease: float = CHAT_LOCK_LEASE,
+        wait: float = CHAT_LOCK_WAIT,
+    ) -> None:
+        self.redis = redis
+        self.lease_ms = max(1000, int(lease * 1000))
+        self.wait = wait
+        self._local: Dict[int, _Entry] = {}
+        if redis is not None:
+            self._acquire = redis.register_script(_LUA_ACQUIRE)
+            self._renew = redis.register_script(_LUA_RENEW)
+
+    def __len__(self) -> int:
+        return len(self._local)
+
+    def fence(self, chat_id: int) -> Optional[int]:
+        """Fencing token de *chat_id* se a tarefa actual detém o lock."""
+        entry = self._local.get(chat_id)
+        if entry is None or entry.owner is None or entry.owner is not asyncio.current_task():
+            return None
+        return entry.token
+
+    # ───────────────────────────── Redis ─────────────────────────────
+    async def _acquire_remote(self, chat_id: int, owner: str, deadline: float) -> Optional[int]:
+        """Token de fencing, ou None se o prazo acabar (ou o Redis falhar)."""
+        delay = _POLL_MIN
+        first = True
+        keys = [_lock_key(chat_id), fence_key(chat_id)]
+        while True:
+            try:
+                res = int(await self._acquire(keys=keys, args=[owner, self.lease_ms]))
+            except Exception:
+                log.exception("Lock Redis indisponível (chat %s) – segue só com o lock local", chat_id)
+                return None
+            if res > 0:
+                return res
+            if first:
+                _CONTENDED.inc(labels={"scope": "redis"})
+                first = False
+            left = deadline - time.monotonic()
+            if left <= 0:
+                _TIMEOUTS.inc()
+                log.warning("Lock do chat %s ocupado há mais de %.0fs – segue sem lock distribuído", chat_id, self.wait)
+                return None
+            # não dorme mais do que o lease restante do detentor nem o prazo
+            hint = -res / 1000 if res < 0 else _POLL_MAX
+            await asyncio.sleep(min(delay * random.uniform(0.5, 1.0), hint, left))
+            delay = min(delay * 2, _POLL_MAX)
+
+    async def _keep_alive(self, chat_id: int, owner: str) -> None:
+        key = _lock_key(chat_id)
+        while True:
+            await asyncio.sleep(self.lease_ms / 3000)
+            try:
+                ok = await self._renew(keys=[key], args=[owner, self.lease_ms])
+            except Exception:
+                log.warning("Renovação do lock do chat %s falhou", chat_id, exc_info=True)
+                continue
+            if not ok:
+                _LOST.inc()
+                log.warning("Lease do lock do chat %s perdido – escritas na FSM ficam vedadas", chat_id)
+                return
+
+    async def _release_remote(self, chat_id: int, owner: str) -> None:
+        with suppress(Exception):
+            await self._renew(keys=[_lock_key(chat_id)], args=[owner, 0])
+
+    # ───────────────────────────── API ─────────────────────────────
+    @asynccontextmanager
+    async def hold(self, chat_id: int) -> AsyncIterator[Optional[int]]:
+        """Bloco exclusivo para *chat_id*; devolve o fencing token (ou None)."""
+        entry = self._local.get(chat_id)
+        if entry is not None and entry.owner is not None and entry.owner is asyncio.current_task():
+            yield entry.token                                           # re-entrante
+            return
+
+        t0 = time.monotonic()
+        if entry is None:
+            entry = self._local[chat_id] = _Entry()
+            _ACTIVE.set(len(self._local))
+        entry.users += 1
+        try:
+            if entry.lock.locked():
+                _CONTENDED.inc(labels={"scope": "local"})
+            async with entry.lock:
+                _WAIT.observe(time.monotonic() - t0, labels={"scope": "local"})
+                owner = uuid.uuid4().hex
+                renew: Optional[asyncio.Task] = None
+                entry.owner, entry.token = asyncio.current_task(), None
+                try:
+                    if self.redis is not None:
+                        t1 = time.monotonic()
+                        entry.token = await self._acquire_remote(chat_id, owner, t1 + self.wait)
+                        _WAIT.observe(time.monotonic() - t1, labels={"scope": "redis"})
+                        if entry.token is not None:
+                            renew = asyncio.get_running_loop().create_task(self._keep_alive(chat_id, owner))
+                    yield entry.token
+                finally:
+                    entry.owner, entry.token = None, None
+                    if renew is not None:
+                        renew.cancel()
+                        await self._release_remote(chat_id, owner)
+        finally:
+            entry.users -= 1
+            if entry.users == 0 and self._local.get(chat_id) is entry:
+                del self._local[chat_id]
+                _ACTIVE.set(len(self._local))
+
+
+# ───────────────────────── instância do processo ─────────────────────────
+_locks = ChatLocks()                      # só local até init() (scripts, testes)
+
+
+def init(redis: Optional[Redis]) -> None:
+    """Liga o nível distribuído (se CHAT_LOCK_REDIS) – chamado no arranque do bot."""
+    global _locks
+    _locks = ChatLocks(redis if CHAT_LOCK_REDIS else None)
+
+
+def hold(chat_id: int):
+    """Atalho para a instância do processo: `async with chat_lock.hold(chat_id):`."""
+    return _locks.hold(chat_id)
+
+
+def fence(chat_id: int) -> Optional[int]:
+    """Token a validar nas escritas da FSM de *chat_id* (None → sem verificação)."""
+    return _locks.fence(chat_id)
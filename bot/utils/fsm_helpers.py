@@ -1,13 +1,34 @@
 # bot/utils/fsm_helpers.py
+"""
+Atalhos sobre FSMContext.
+
+Quando a storage é AtomicRedisStorage as operações são feitas no
+servidor numa única chamada; com outras storages (MemoryStorage em
+testes locais) cai-se no read-modify-write clássico.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional, Tuple
+
 from aiogram.fsm.context import FSMContext
 
-__all__ = ["clear_keep_role"]
+from bot.utils.fsm_storage import AtomicRedisStorage
+
+__all__ = ["clear_keep_role", "append_data", "get_state_and_data"]
+
+_KEEP_ON_CLEAR = ("active_role",)
+
 
 async def clear_keep_role(state: FSMContext) -> None:
     """
     Limpa toda a FSM mas mantém «active_role».
     Remove também chaves temporárias (_menu_timeout_task, menu_msg_id…).
     """
+    if isinstance(state.storage, AtomicRedisStorage):
+        await state.storage.clear_keep(state.key, _KEEP_ON_CLEAR)
+        return
+
     data = await state.get_data()
     role = data.get("active_role")          # pode ser None
     await state.clear()
@@ -15,3 +36,21 @@ async def clear_keep_role(state: FSMContext) -> None:
     # repõe só o que interessa
     if role:
         await state.update_data(active_role=role)
+
+
+async def append_data(state: FSMContext, field: str, *values: Any) -> List[Any]:
+    """Acrescenta `values` à lista `field` da FSM e devolve a lista final."""
+    if isinstance(state.storage, AtomicRedisStorage):
+        return await state.storage.append_to_list(state.key, field, values)
+
+    data = await state.get_data()
+    items = list(data.get(field) or []) + list(values)
+    await state.update_data({field: items})
+    return items
+
+
+async def get_state_and_data(state: FSMContext) -> Tuple[Optional[str], Dict[str, Any]]:
+    """Devolve (estado, dados) — num só pedido quando a storage o permite."""
+    if isinstance(state.storage, AtomicRedisStorage):
+        return await state.storage.get_state_and_data(state.key)
+    return await state.get_state(), await state.get_data()
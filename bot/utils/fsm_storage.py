@@ -0,0 +1,297 @@
+# bot/utils/fsm_storage.py
+"""
+RedisStorage com actualizações atómicas do lado do servidor.
+
+O `update_data` do aiogram é um read-modify-write (GET → merge em Python
+→ SET): custa duas idas ao Redis e perde escritas quando dois updates do
+mesmo chat se intercalam.  Esta classe guarda os dados da FSM num HASH
+(um campo por chave, valor em JSON) e faz cada operação numa única
+chamada Lua:
+
+• update_data()   → HSET parcial (só as chaves alteradas)
+• append_to_list() → acrescenta itens a uma lista (ex.: «flow_msgs»)
+• clear_keep()    → limpa estado + dados mas preserva as chaves indicadas
+• get_state_and_data() → estado + dados num único pedido pipelined
+
+Os dados antigos (string JSON em «…:data») são migrados para o HASH
+na primeira leitura, por isso o deploy não reinicia as sessões activas.
+
+Cada escrita leva o fencing token do lock do chat (bot.utils.chat_lock)
+quando a tarefa o detém: um detentor cujo lease já expirou recebe
+LockLost em vez de sobrepor o trabalho do seguinte.
+
+Cada operação abre um span `redis.<op>` (ver bot.utils.tracing).
+"""
+
+from __future__ import annotations
+
+from datetime import timedelta
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import StateType, StorageKey
+from aiogram.fsm.storage.redis import RedisStorage
+from redis.commands.core import AsyncScript
+from redis.exceptions import ResponseError
+
+from bot.utils import chat_lock, tracing
+
+__all__ = ["AtomicRedisStorage"]
+
+# ───────────────────────────── scripts Lua ─────────────────────────────
+# Todas as escritas começam pela verificação de fencing (bot.utils.chat_lock):
+# KEYS[#KEYS] = contador de tokens do chat · ARGV[1] = token do detentor
+# ('' = sem lock distribuído → não verifica).  Um token mais antigo do que o
+# último emitido é de quem já perdeu o lease: a escrita é recusada.
+_FENCE = """
+if ARGV[1] ~= '' and tonumber(redis.call('GET', KEYS[#KEYS]) or '0') > tonumber(ARGV[1]) then
+    return redis.error_reply('STALE_FENCE')
+end
+"""
+
+# KEYS[1] = hash de dados
+# ARGV[2] = TTL em ms (0 = sem TTL) · ARGV[3..] = campo, valor, campo, valor…
+_LUA_UPDATE = _FENCE + """
+redis.call('HSET', KEYS[1], unpack(ARGV, 3))
+local ttl = tonumber(ARGV[2])
+if ttl > 0 then redis.call('PEXPIRE', KEYS[1], ttl) end
+return redis.call('HGETALL', KEYS[1])
+"""
+
+# KEYS[1] = hash de dados
+# ARGV[2] = TTL em ms · ARGV[3] = campo · ARGV[4] = lista JSON não vazia
+_LUA_APPEND = _FENCE + """
+local cur = redis.call('HGET', KEYS[1], ARGV[3])
+local new
+if (not cur) or cur == 'null' or cur == '[]' then
+    new = ARGV[4]
+elseif string.sub(cur, 1, 1) == '[' then
+    new = string.sub(cur, 1, -2) .. ',' .. string.sub(ARGV[4], 2)
+else
+    return redis.error_reply('FSM field ' .. ARGV[3] .. ' is not a list')
+end
+redis.call('HSET', KEYS[1], ARGV[3], new)
+local ttl = tonumber(ARGV[2])
+if ttl > 0 then redis.call('PEXPIRE', KEYS[1], ttl) end
+return new
+"""
+
+# KEYS[1] = hash de dados · KEYS[2] = chave de estado · KEYS[3] = dados legados
+# ARGV[2] = TTL em ms · ARGV[3..] = campos a preservar
+_LUA_CLEAR_KEEP = _FENCE + """
+local keep = {}
+if #ARGV > 2 then
+    local vals = redis.call('HMGET', KEYS[1], unpack(ARGV, 3))
+    for i, v in ipairs(vals) do
+        if v then
+            table.insert(keep, ARGV[i + 2])
+            table.insert(keep, v)
+        end
+    end
+end
+redis.call('DEL', KEYS[1], KEYS[2], KEYS[3])
+if #keep > 0 then
+    redis.call('HSET', KEYS[1], unpack(keep))
+    local ttl = tonumber(ARGV[2])
+    if ttl > 0 then redis.call('PEXPIRE', KEYS[1], ttl) end
+end
+return #keep / 2
+"""
+
+# KEYS[1] = hash de dados · KEYS[2] = dados legados
+# ARGV[2] = TTL em ms · ARGV[3..] = campo, valor… (pode vir vazio)
+_LUA_REPLACE = _FENCE + """
+redis.call('DEL', KEYS[1], KEYS[2])
+if #ARGV > 2 then
+    redis.call('HSET', KEYS[1], unpack(ARGV, 3))
+    local ttl = tonumber(ARGV[2])
+    if ttl > 0 then redis.call('PEXPIRE', KEYS[1], ttl) end
+end
+return 1
+"""
+
+# KEYS[1] = chave de estado
+# ARGV[2] = TTL em ms · ARGV[3] = estado ('' = apagar)
+_LUA_SET_STATE = _FENCE + """
+if ARGV[3] == '' then return redis.call('DEL', KEYS[1]) end
+local ttl = tonumber(ARGV[2])
+if ttl > 0 then
+    redis.call('SET', KEYS[1], ARGV[3], 'PX', ttl)
+else
+    redis.call('SET', KEYS[1], ARGV[3])
+end
+return 1
+"""
+
+
+def _ttl_ms(ttl: Any) -> int:
+    """Converte ExpiryT (int segundos ou timedelta) para milissegundos."""
+    if not ttl:
+        return 0
+    if isinstance(ttl, timedelta):
+        return int(ttl.total_seconds() * 1000)
+    return int(ttl) * 1000
+
+
+def _text(value: Any) -> str:
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+
+def _span(op: str, key: StorageKey):
+    return tracing.span(
+        f"redis.{op}",
+        kind=tracing.KIND_CLIENT,
+        **{"db.system": "redis", "db.operation": op, "telegram.chat_id": key.chat_id},
+    )
+
+
+class AtomicRedisStorage(RedisStorage):
+    """RedisStorage cujos dados vivem num HASH e mudam via scripts Lua."""
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self._update_script = self.redis.register_script(_LUA_UPDATE)
+        self._append_script = self.redis.register_script(_LUA_APPEND)
+        self._clear_keep_script = self.redis.register_script(_LUA_CLEAR_KEEP)
+        self._replace_script = self.redis.register_script(_LUA_REPLACE)
+        self._set_state_script = self.redis.register_script(_LUA_SET_STATE)
+
+    # ───────────────────────── chaves ─────────────────────────
+    def _legacy_key(self, key: StorageKey) -> str:
+        return self.key_builder.build(key, "data")
+
+    def _hash_key(self, key: StorageKey) -> str:
+        return f"{self._legacy_key(key)}:h"
+
+    async def _write(
+        self,
+        script: AsyncScript,
+        key: StorageKey,
+        keys: Sequence[str],
+        ttl: Any,
+        args: Sequence[Any] = (),
+    ) -> Any:
+        """Corre um script de escrita com o fencing token do chat (se houver)."""
+        token = chat_lock.fence(key.chat_id)
+        try:
+            return await script(
+                keys=[*keys, chat_lock.fence_key(key.chat_id)],
+                args=["" if token is None else token, _ttl_ms(ttl), *args],
+            )
+        except ResponseError as exc:
+            if "STALE_FENCE" in str(exc):
+                raise chat_lock.LockLost(
+                    f"lock do chat {key.chat_id} perdido (token {token}) – escrita na FSM recusada"
+                ) from None
+            raise
+
+    # ──────────────────────── (de)serialização ────────────────────────
+    def _encode(self, data: Mapping[str, Any]) -> List[str]:
+        flat: List[str] = []
+        for field, value in data.items():
+            flat.append(field)
+            flat.append(self.json_dumps(value))
+        return flat
+
+    def _decode(self, raw: Any) -> Dict[str, Any]:
+        # HGETALL devolve dict (redis-py) ou lista plana (resposta de script)
+        if isinstance(raw, dict):
+            items = raw.items()
+        else:
+            items = zip(raw[::2], raw[1::2])
+        return {_text(k): self.json_loads(_text(v)) for k, v in items}
+
+    # ─────────────────────── API do BaseStorage ───────────────────────
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        value = state.state if isinstance(state, State) else state
+        with _span("set_state", key):
+            await self._write(
+                self._set_state_script, key,
+                [self.key_builder.build(key, "state")], self.state_ttl, [value or ""],
+            )
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        with _span("get_state", key):
+            return await super().get_state(key)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        _state, data = await self.get_state_and_data(key)
+        return data
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        with _span("set_data", key):
+            await self._write(
+                self._replace_script, key,
+                [self._hash_key(key), self._legacy_key(key)], self.data_ttl, self._encode(data),
+            )
+
+    async def update_data(self, key: StorageKey, data: Mapping[str, Any]) -> Dict[str, Any]:
+        if not data:
+            return await self.get_data(key)
+        with _span("update_data", key):
+            raw = await self._write(
+                self._update_script, key, [self._hash_key(key)], self.data_ttl, self._encode(data),
+            )
+        return self._decode(raw)
+
+    async def get_value(
+        self,
+        storage_key: StorageKey,
+        dict_key: str,
+        default: Optional[Any] = None,
+    ) -> Optional[Any]:
+        with _span("get_value", storage_key):
+            raw = await self.redis.hget(self._hash_key(storage_key), dict_key)
+        if raw is None:
+            # pode ainda estar no formato legado
+            return (await self.get_data(storage_key)).get(dict_key, default)
+        return self.json_loads(_text(raw))
+
+    # ───────────────────────── extensões ─────────────────────────
+    async def get_state_and_data(
+        self,
+        key: StorageKey,
+    ) -> Tuple[Optional[str], Dict[str, Any]]:
+        """Estado + dados num único pedido pipelined (3 comandos, 1 RTT)."""
+        with _span("get_state_and_data", key):
+            async with self.redis.pipeline(transaction=False) as pipe:
+                pipe.get(self.key_builder.build(key, "state"))
+                pipe.hgetall(self._hash_key(key))
+                pipe.get(self._legacy_key(key))
+                raw_state, raw_hash, raw_legacy = await pipe.execute()
+
+        data = self._decode(raw_hash) if raw_hash else {}
+        if raw_legacy is not None:
+            # migração preguiçosa do formato antigo (string JSON)
+            legacy: Dict[str, Any] = self.json_loads(_text(raw_legacy)) or {}
+            data = {**legacy, **data}
+            await self.set_data(key, data)
+
+        state = _text(raw_state) if raw_state is not None else None
+        return state, data
+
+    async def append_to_list(
+        self,
+        key: StorageKey,
+        field: str,
+        values: Iterable[Any],
+    ) -> List[Any]:
+        """Acrescenta `values` à lista `field` (criando-a se necessário)."""
+        items = list(values)
+        if not items:
+            return await self.get_value(key, field, []) or []
+        with _span("append_to_list", key):
+            raw = await self._write(
+                self._append_script, key,
+                [self._hash_key(key)], self.data_ttl, [field, self.json_dumps(items)],
+            )
+        return self.json_loads(_text(raw))
+
+    async def clear_keep(self, key: StorageKey, keep: Iterable[str]) -> None:
+        """Apaga estado e dados, preservando apenas os campos em `keep`."""
+        with _span("clear_keep", key):
+            await self._write(
+                self._clear_keep_script, key,
+                [self._hash_key(key), self.key_builder.build(key, "state"), self._legacy_key(key)],
+                self.data_ttl, list(keep),
+            )
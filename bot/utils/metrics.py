@@ -0,0 +1,161 @@
+# bot/utils/metrics.py
+"""
+Métricas em memória (sem dependências externas).
+
+• counter(name)    → contador monotónico (inc)
+• gauge(name)      → valor instantâneo (set / inc / dec)
+• histogram(name)  → distribuição com buckets fixos (observe)
+
+Todas aceitam labels opcionais (`labels={"method": "sendMessage"}`).
+render() devolve o formato de texto Prometheus, servido em /metrics.
+"""
+
+from __future__ import annotations
+
+import bisect
+import threading
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+__all__ = ["counter", "gauge", "histogram", "render", "snapshot"]
+
+_LabelKey = Tuple[Tuple[str, str], ...]
+
+_DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+_lock = threading.Lock()
+
+
+def _key(labels: Optional[Mapping[str, str]]) -> _LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in (labels or {}).items()))
+
+
+def _fmt_labels(key: _LabelKey, extra: Iterable[Tuple[str, str]] = ()) -> str:
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{v}"' for k, v in pairs) + "}"
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, doc: str) -> None:
+        self.name = name
+        self.doc = doc
+
+    def lines(self) -> List[str]:  # pragma: no cover - abstract
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, doc: str) -> None:
+        super().__init__(name, doc)
+        self._values: Dict[_LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, labels: Optional[Mapping[str, str]] = None) -> None:
+        k = _key(labels)
+        with _lock:
+            self._values[k] = self._values.get(k, 0.0) + amount
+
+    def value(self, labels: Optional[Mapping[str, str]] = None) -> float:
+        return self._values.get(_key(labels), 0.0)
+
+    def lines(self) -> List[str]:
+        return [f"{self.name}{_fmt_labels(k)} {v}" for k, v in self._values.items()]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def set(self, value: float, labels: Optional[Mapping[str, str]] = None) -> None:
+        with _lock:
+            self._values[_key(labels)] = float(value)
+
+    def dec(self, amount: float = 1.0, labels: Optional[Mapping[str, str]] = None) -> None:
+        self.inc(-amount, labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, doc: str, buckets: Tuple[float, ...]) -> None:
+        super().__init__(name, doc)
+        self.buckets = tuple(sorted(buckets))
+        # por label: (contagens por bucket, soma, total)
+        self._values: Dict[_LabelKey, Tuple[List[int], float, int]] = {}
+
+    def observe(self, value: float, labels: Optional[Mapping[str, str]] = None) -> None:
+        k = _key(labels)
+        with _lock:
+            counts, total, n = self._values.get(k) or ([0] * len(self.buckets), 0.0, 0)
+            idx = bisect.bisect_left(self.buckets, value)
+            if idx < len(counts):
+                counts[idx] += 1
+            self._values[k] = (counts, total + value, n + 1)
+
+    def stats(self, labels: Optional[Mapping[str, str]] = None) -> Tuple[float, int]:
+        """Devolve (soma, contagem) — útil para médias rápidas."""
+        _counts, total, n = self._values.get(_key(labels)) or ([], 0.0, 0)
+        return total, n
+
+    def lines(self) -> List[str]:
+        out: List[str] = []
+        for k, (counts, total, n) in self._values.items():
+            acc = 0
+            for le, c in zip(self.buckets, counts):
+                acc += c
+                out.append(f"{self.name}_bucket{_fmt_labels(k, [('le', str(le))])} {acc}")
+            out.append(f"{self.name}_bucket{_fmt_labels(k, [('le', '+Inf')])} {n}")
+            out.append(f"{self.name}_sum{_fmt_labels(k)} {total}")
+            out.append(f"{self.name}_count{_fmt_labels(k)} {n}")
+        return out
+
+
+_REGISTRY: Dict[str, _Metric] = {}
+
+
+def _get_or_create(cls, name: str, doc: str, *args) -> _Metric:
+    with _lock:
+        metric = _REGISTRY.get(name)
+        if metric is None:
+            metric = cls(name, doc, *args)
+            _REGISTRY[name] = metric
+    if not isinstance(metric, cls):
+        raise TypeError(f"Metric {name!r} already registered as {metric.kind}")
+    return metric
+
+
+def counter(name: str, doc: str = "") -> Counter:
+    return _get_or_create(Counter, name, doc)  # type: ignore[return-value]
+
+
+def gauge(name: str, doc: str = "") -> Gauge:
+    return _get_or_create(Gauge, name, doc)  # type: ignore[return-value]
+
+
+def histogram(
+    name: str,
+    doc: str = "",
+    buckets: Tuple[float, ...] = _DEFAULT_BUCKETS,
+) -> Histogram:
+    return _get_or_create(Histogram, name, doc, buckets)  # type: ignore[return-value]
+
+
+def render() -> str:
+    """Formato de exposição Prometheus (text/plain; version=0.0.4)."""
+    out: List[str] = []
+    for metric in list(_REGISTRY.values()):
+        if metric.doc:
+            out.append(f"# HELP {metric.name} {metric.doc}")
+        out.append(f"# TYPE {metric.name} {metric.kind}")
+        out.extend(metric.lines())
+    return "\n".join(out) + "\n"
+
+
+def snapshot() -> Dict[str, List[str]]:
+    """Cópia legível de todas as séries (para logs / debug)."""
+    return {name: m.lines() for name, m in list(_REGISTRY.items())}
@@ -0,0 +1,225 @@
+# bot/utils/moloni.py
+"""
+Cliente HTTP da API Moloni (v1) – usado só pela sincronização em
+segundo plano (bot.database.billing); os handlers lêem a cache local.
+
+• uma única ClientSession com TCPConnector limitado (MOLONI_MAX_CONNECTIONS
+  ligações keep-alive reutilizadas entre pedidos);
+• token OAuth: grant «password» no primeiro pedido, «refresh_token»
+  quando o access_token expira (com margem), de novo «password» se o
+  refresh for recusado; um lock garante um único pedido de token mesmo
+  com chamadas concorrentes; um 401 força renovação e repete uma vez;
+• tudo o que sai daqui é MoloniError – falhas de rede incluídas (no
+  token logo; nos pedidos depois de esgotadas as tentativas);
+• rate limit: 429 (e 5xx / falhas de rede) → espera Retry-After ou
+  backoff exponencial com jitter; a pausa de um 429 é partilhada por
+  todas as chamadas em curso;
+• paginação qty/offset em `paginate()`.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import aiohttp
+
+from bot.utils import metrics
+
+log = logging.getLogger(__name__)
+
+__all__ = ["MoloniClient", "MoloniError"]
+
+PAGE_SIZE = 50                           # máximo de registos por getAll
+_TOKEN_MARGIN = 60.0                     # renova até 60 s antes de expirar
+_REFRESH_TTL = 14 * 86400.0              # validade do refresh_token (Moloni)
+
+_REQUESTS = metrics.counter("moloni_requests_total", "Pedidos à API Moloni")
+_LATENCY = metrics.histogram(
+    "moloni_request_seconds",
+    "Duração dos pedidos à API Moloni",
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+
+
+async def _json(resp: aiohttp.ClientResponse) -> Any:
+    """Corpo JSON ou None (429 / 5xx podem vir em HTML)."""
+    try:
+        return await resp.json(content_type=None)
+    except ValueError:
+        return None
+
+
+class MoloniError(Exception):
+    """Erro devolvido pela API (ou tentativas esgotadas)."""
+
+    def __init__(self, message: str, status: Optional[int] = None) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+class MoloniClient:
+    def __init__(
+        self,
+        base_url: str,
+        *,
+        client_id: str,
+        client_secret: str,
+        username: str,
+        password: str,
+        company_id: int,
+        max_connections: int = 4,
+        timeout: float = 30.0,
+        max_retries: int = 5,
+    ) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.company_id = company_id
+        self._creds = {"client_id": client_id, "client_secret": client_secret}
+        self._login = {"username": username, "password": password}
+        self._max_connections = max_connections
+        self._timeout = aiohttp.ClientTimeout(total=timeout)
+        self._max_retries = max_retries
+
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._token_lock = asyncio.Lock()
+        self._access: Optional[str] = None
+        self._access_expires = 0.0
+        self._refresh: Optional[str] = None
+        self._refresh_expires = 0.0
+        self._paused_until = 0.0             # 429 → todas as chamadas esperam
+
+    # ───────────────────────────── sessão ─────────────────────────────
+    def _http(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=self._max_connections,
+                    keepalive_timeout=60,
+                    ttl_dns_cache=300,
+                ),
+                timeout=self._timeout,
+                raise_for_status=False,
+            )
+        return self._session
+
+    async def close(self) -> None:
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    # ───────────────────────────── token ─────────────────────────────
+    async def _grant(self, params: Dict[str, str]) -> None:
+        try:
+            async with self._http().get(f"{self.base_url}/grant/", params={**self._creds, **params}) as resp:
+                _REQUESTS.inc(labels={"endpoint": "grant", "status": str(resp.status)})
+                body = await _json(resp)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as exc:
+            _REQUESTS.inc(labels={"endpoint": "grant", "status": "0"})
+            raise MoloniError(f"grant {params['grant_type']}: {type(exc).__name__}: {exc}") from exc
+        if resp.status != 200 or not isinstance(body, dict) or "access_token" not in body:
+            raise MoloniError(f"grant {params['grant_type']}: {body}", resp.status)
+        now = time.monotonic()
+        self._access = body["access_token"]
+        ttl = float(body.get("expires_in", 3600))
+        self._access_expires = now + ttl - min(_TOKEN_MARGIN, ttl / 4)
+        self._refresh = body.get("refresh_token")
+        self._refresh_expires = now + _REFRESH_TTL
+
+    async def _token(self, *, rejected: Optional[str] = None) -> str:
+        """Access token válido; *rejected* = token que a API acabou de recusar (401)."""
+        async with self._token_lock:
+            now = time.monotonic()
+            if self._access and self._access != rejected and (
+                rejected is not None or now < self._access_expires
+            ):
+                return self._access              # válido (ou já renovado por outra tarefa)
+            if self._refresh and now < self._refresh_expires - _TOKEN_MARGIN:
+                try:
+                    await self._grant({"grant_type": "refresh_token", "refresh_token": self._refresh})
+                    return self._access or ""
+                except MoloniError as exc:
+                    log.warning("Moloni: refresh_token recusado (%s) – novo login", exc)
+            await self._grant({"grant_type": "password", **self._login})
+            return self._access or ""
+
+    # ───────────────────────────── pedidos ─────────────────────────────
+    def _backoff(self, attempt: int, retry_after: Optional[str]) -> float:
+        if retry_after:
+            try:
+                return max(0.0, float(retry_after))
+            except ValueError:
+                pass
+        return min(30.0, 0.5 * 2 ** attempt) * (0.5 + random.random() / 2)
+
+    async def call(self, endpoint: str, **params: Any) -> Any:
+        """POST a «<endpoint>/» com company_id; devolve o JSON já descodificado."""
+        data = {"company_id": self.company_id, **params}
+        url = f"{self.base_url}/{endpoint.strip('/')}/"
+        token = await self._token()
+        renewed = False
+        attempt = 0
+        while True:
+            wait = self._paused_until - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            started = time.perf_counter()
+            try:
+                async with self._http().post(
+                    url, params={"access_token": token, "json": "true"}, json=data,
+                ) as resp:
+                    status = resp.status
+                    retry_after = resp.headers.get("Retry-After")
+                    body = await _json(resp)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as exc:
+                status, retry_after, body = 0, None, None
+                log.debug("Moloni %s: %r", endpoint, exc)
+            _LATENCY.observe(time.perf_counter() - started)
+            _REQUESTS.inc(labels={"endpoint": endpoint, "status": str(status)})
+
+            if status == 200 and not (isinstance(body, dict) and "error" in body):
+                return body
+            if status == 401 or (isinstance(body, dict) and body.get("error") == "invalid_token"):
+                if renewed:
+                    raise MoloniError(f"{endpoint}: token recusado", status)
+                token = await self._token(rejected=token)
+                renewed = True
+                continue
+            if status == 429 or status == 0 or status >= 500:
+                if attempt >= self._max_retries:
+                    raise MoloniError(f"{endpoint}: {status or 'sem resposta'} após {attempt} tentativas", status)
+                delay = self._backoff(attempt, retry_after)
+                if status == 429:
+                    self._paused_until = max(self._paused_until, time.monotonic() + delay)
+                    log.info("Moloni: rate limit em %s – pausa de %.1fs", endpoint, delay)
+                else:
+                    await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            raise MoloniError(f"{endpoint}: {status} {body}", status)
+
+    async def paginate(self, endpoint: str, **params: Any) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Páginas de PAGE_SIZE registos até uma página incompleta."""
+        offset = 0
+        while True:
+            page = await self.call(endpoint, qty=PAGE_SIZE, offset=offset, **params) or []
+            if page:
+                yield page
+            if len(page) < PAGE_SIZE:
+                return
+            offset += len(page)
+
+    # ───────────────────────────── documentos ─────────────────────────────
+    async def documents_modified_since(self, since: str) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Documentos (todos os tipos) alterados desde *since* («YYYY-MM-DD HH:MM:SS»)."""
+        async for page in self.paginate("documents/getModifiedSince", lastmodified=since):
+            yield page
+
+    async def customer_documents(self, customer_id: int) -> List[Dict[str, Any]]:
+        """Histórico completo de um cliente (todas as páginas)."""
+        out: List[Dict[str, Any]] = []
+        async for page in self.paginate("documents/getAll", customer_id=customer_id):
+            out += page
+        return out
@@ -1,14 +1,232 @@
 # bot/utils/phone.py
-import re
+"""
+Números de telefone → dígitos E.164 canónicos (sem «+»), o formato de
+user_phones.phone_number.
 
-E164_DIGITS = re.compile(r"^\+?([1-9]\d{6,14})$")
+Antes havia três normalizações diferentes (regex E.164 no onboarding,
+normalize_phone_cc + valid_pt_phone no «adicionar utilizador» e
+f"{cc}{número}" em queries.add_user): «+44 07700 900123» ficava
+«4407700900123» num sítio e «447700900123» noutro, e get_user_by_phone
+falhava.  Agora todos passam por canonical():
 
-def cleanse(raw: str) -> str:
+    canonical("+351 912 345 678")        → "351912345678"
+    canonical("00 44 (0)7700 900123")    → "447700900123"
+    canonical("912345678", cc="351")     → "351912345678"   (nacional)
+    canonical("07700 900123", cc="44")   → "447700900123"   (prefixo 0 removido)
+    canonical("351912345678")            → "351912345678"   (Telegram, sem «+»)
+
+Numa só passagem pelo texto: separadores fora (str.translate), o
+indicativo é o prefixo mais longo numa trie dos indicativos ITU-T
+(pré-compilada no import; no máximo 3 níveis) e o número nacional tem de
+cumprir o comprimento do país (_RULES; os restantes só o limite E.164
+de 15 dígitos).  O prefixo nacional («0» na maior parte da Europa, «1»
+no NANP) é removido.
+
+canonical() levanta ValueError (mensagem legível); _canonical() é o
+núcleo sem excepções usado em lote (validators.check_phones).
+A migração 009 aplica as mesmas regras aos números já gravados.
+"""
+
+from __future__ import annotations
+
+import unicodedata
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+__all__ = ["MESSAGES", "canonical", "display", "is_country_code", "split"]
+
+# ─────────────────────────── erros ────────────────────────────
+PHONE_CHARS      = "phone_chars"
+PHONE_CC_UNKNOWN = "phone_cc_unknown"
+PHONE_LENGTH     = "phone_length"
+
+MESSAGES: Dict[str, str] = {
+    PHONE_CHARS:      "Número inválido (use apenas dígitos, espaços, «+», «-» e parênteses).",
+    PHONE_CC_UNKNOWN: "Indicativo de país desconhecido.",
+    PHONE_LENGTH:     "Número com comprimento inválido para o país.",
+}
+
+# ─────────────────────── indicativos ITU-T ───────────────────────
+_CODES = """
+1 7
+20 27 30 31 32 33 34 36 39 40 41 43 44 45 46 47 48 49 51 52 53 54 55 56 57 58
+60 61 62 63 64 65 66 81 82 84 86 90 91 92 93 94 95 98
+211 212 213 216 218 220 221 222 223 224 225 226 227 228 229 230 231 232 233
+234 235 236 237 238 239 240 241 242 243 244 245 246 247 248 249 250 251 252
+253 254 255 256 257 258 260 261 262 263 264 265 266 267 268 269 290 291 297
+298 299 350 351 352 353 354 355 356 357 358 359 370 371 372 373 374 375 376
+377 378 379 380 381 382 383 385 386 387 389 420 421 423 500 501 502 503 504
+505 506 507 508 509 590 591 592 593 594 595 596 597 598 599 670 672 673 674
+675 676 677 678 679 680 681 682 683 685 686 687 688 689 690 691 692 800 808
+850 852 853 855 856 870 878 880 881 882 883 886 888 960 961 962 963 964 965
+966 967 968 970 971 972 973 974 975 976 977 979 992 993 994 995 996 998
+""".split()
+
+# comprimento do número nacional (mín., máx.) e prefixo nacional a remover
+_RULES: Dict[str, Tuple[int, int, Optional[str]]] = {
+    "1":   (10, 10, "1"),       # NANP
+    "7":   (10, 10, None),
+    "30":  (10, 10, None),
+    "31":  (9, 9, "0"),
+    "32":  (8, 9, "0"),
+    "33":  (9, 9, "0"),
+    "34":  (9, 9, None),
+    "39":  (6, 11, None),       # Itália: o «0» faz parte do número
+    "41":  (9, 9, "0"),
+    "43":  (4, 13, "0"),
+    "44":  (9, 10, "0"),
+    "45":  (8, 8, None),
+    "46":  (7, 13, "0"),
+    "47":  (5, 8, None),
+    "48":  (9, 9, None),
+    "49":  (5, 13, "0"),
+    "55":  (10, 11, "0"),
+    "61":  (9, 9, "0"),
+    "91":  (10, 10, "0"),
+    "92":  (9, 10, "0"),
+    "93":  (9, 9, "0"),
+    "238": (7, 7, None),        # Cabo Verde
+    "239": (7, 7, None),        # São Tomé e Príncipe
+    "244": (9, 9, None),        # Angola
+    "245": (7, 9, None),        # Guiné-Bissau
+    "258": (8, 9, None),        # Moçambique
+    "351": (9, 9, None),        # Portugal
+    "352": (4, 11, None),
+    "353": (7, 9, "0"),
+    "376": (6, 9, None),
+    "670": (7, 8, None),        # Timor-Leste
+    "853": (8, 8, None),        # Macau
+    "960": (7, 7, None),
+    "961": (7, 8, "0"),
+    "962": (8, 9, "0"),
+    "963": (8, 9, "0"),
+    "964": (8, 10, "0"),
+    "965": (8, 8, None),
+    "966": (8, 9, "0"),
+    "967": (7, 9, "0"),
+    "968": (8, 8, None),
+}
+
+_E164_MAX = 15
+_MIN_TOTAL = 7                  # o mesmo mínimo do CHECK de user_phones
+
+
+@dataclass(frozen=True)
+class _Country:
+    cc: str
+    min_len: int
+    max_len: int
+    trunk: Optional[str]
+
+    def national(self, digits: str) -> Optional[str]:
+        """Número nacional sem prefixo nacional, ou None se o comprimento falhar."""
+        if self.trunk and digits.startswith(self.trunk):
+            digits = digits[len(self.trunk):]
+        return digits if self.min_len <= len(digits) <= self.max_len else None
+
+
+def _country(cc: str) -> _Country:
+    lo, hi, trunk = _RULES.get(cc, (max(1, _MIN_TOTAL - len(cc)), _E164_MAX - len(cc), None))
+    return _Country(cc, lo, hi, trunk)
+
+
+_END = ""                       # chave do nó terminal (as outras são dígitos)
+
+
+def _build_trie() -> Dict[str, Any]:
+    root: Dict[str, Any] = {}
+    for cc in _CODES:
+        node = root
+        for ch in cc:
+            node = node.setdefault(ch, {})
+        node[_END] = _country(cc)
+    return root
+
+
+_TRIE = _build_trie()
+
+
+def _match(digits: str) -> Optional[_Country]:
+    """Indicativo = prefixo mais longo de *digits* na trie."""
+    node, found = _TRIE, None
+    for ch in digits:
+        node = node.get(ch)
+        if node is None:
+            break
+        found = node.get(_END, found)
+    return found
+
+
+def is_country_code(cc: str) -> bool:
+    """*cc* (só dígitos) é um indicativo atribuído?"""
+    m = _match(cc)
+    return m is not None and m.cc == cc
+
+# ───────────────────────── limpeza do texto ─────────────────────────
+_SEPARATORS = str.maketrans("", "", " -.()/\u00a0\u2009\u202f")   # espaços finos/inquebráveis
+
+
+def _clean(raw: str) -> Tuple[Optional[str], bool]:
+    """(dígitos, internacional?) – None se houver algo além de separadores."""
+    s = raw.strip().translate(_SEPARATORS)
+    intl = s.startswith("+")
+    if intl:
+        s = s[1:]
+    if not (s.isascii() and s.isdigit()):
+        try:                                    # dígitos Unicode («٩١٢…»)
+            s = "".join(str(unicodedata.decimal(ch)) for ch in s)
+        except (TypeError, ValueError):
+            return None, intl
+    if not intl and s.startswith("00"):
+        return s[2:], True
+    return s, intl
+
+# ───────────────────────────── API ─────────────────────────────
+def _canonical(raw: str, cc: Optional[str] = None) -> Tuple[Optional[str], Optional[str]]:
+    """(dígitos E.164, None) ou (None, código de erro) – sem excepções."""
+    digits, intl = _clean(raw)
+    if not digits:
+        return None, PHONE_CHARS
+    if not intl and cc:                         # número nacional do país *cc*
+        country = _match(cc)
+        if country is None or country.cc != cc:
+            return None, PHONE_CC_UNKNOWN
+        national = country.national(digits)
+        if national is not None:
+            return cc + national, None
+        if not digits.startswith(cc):
+            return None, PHONE_LENGTH
+        # já trazia o indicativo (sem «+»): segue como internacional
+    country = _match(digits)
+    if country is None:
+        return None, PHONE_CC_UNKNOWN
+    national = country.national(digits[len(country.cc):])
+    if national is None:
+        return None, PHONE_LENGTH
+    return country.cc + national, None
+
+
+def canonical(raw: str, cc: Optional[str] = None) -> str:
     """
-    Converte número E.164 para dígitos-apenas.
-    Aceita com ou sem '+'. Lança ValueError se inválido.
+    Dígitos E.164 de *raw*.  Com «+»/«00» (ou sem *cc*) o indicativo vem
+    no próprio número; com *cc* e sem eles, *raw* é um número nacional
+    desse país.  Levanta ValueError se inválido.
     """
-    m = E164_DIGITS.match(raw.strip())
-    if not m:
-        raise ValueError(f"Invalid phone number: {raw!r}")
-    return m.group(1)          # só dígitos
+    value, error = _canonical(raw, cc)
+    if error is not None:
+        raise ValueError(MESSAGES[error])
+    return value
+
+
+def split(e164: str) -> Tuple[str, str]:
+    """«351912345678» → ("351", "912345678")."""
+    country = _match(e164)
+    if country is None:
+        raise ValueError(MESSAGES[PHONE_CC_UNKNOWN])
+    return country.cc, e164[len(country.cc):]
+
+
+def display(e164: str) -> str:
+    """«351912345678» → «+351 912345678» (para mostrar ao utilizador)."""
+    cc, national = split(e164)
+    return f"+{cc} {national}"
@@ -0,0 +1,68 @@
+# bot/utils/rate_limit.py
+"""
+Ritmo de envio para o Bot API (mensagens em massa / lembretes).
+
+O Telegram aceita ~30 mensagens/s no total e ~1/s por chat; acima disso
+responde 429 com retry_after.  SendLimiter reserva a vez de cada envio
+(GCRA – «virtual scheduling»), por isso N tarefas concorrentes saem
+espaçadas sem fila explícita; um envio para um chat ainda «ocupado»
+espera primeiro pelo chat e só depois reserva o slot global:
+
+    limiter = SendLimiter(25)
+    await limiter.wait(chat_id)          # dorme até ao slot reservado
+    await bot.send_message(chat_id, …)
+
+pause(s) – depois de um 429: ninguém reserva slots antes de now + s.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Dict
+
+__all__ = ["SendLimiter"]
+
+_PRUNE_AT = 10_000                     # entradas por chat antes de limpar as antigas
+
+
+class SendLimiter:
+    def __init__(self, rate: float, *, burst: int = 1, per_chat: float = 1.0) -> None:
+        if rate <= 0:
+            raise ValueError("rate tem de ser > 0")
+        self.interval = 1.0 / rate
+        self.tolerance = (max(1, burst) - 1) * self.interval
+        self.per_chat = per_chat
+        self._tat = 0.0                          # «theoretical arrival time» do próximo envio
+        self._paused_until = 0.0
+        self._chat_next: Dict[int, float] = {}
+
+    def _reserve(self) -> float:
+        """Reserva o próximo slot global; devolve os segundos até lá."""
+        now = time.monotonic()
+        tat = max(self._tat, now, self._paused_until)
+        when = max(now, self._paused_until, tat - self.tolerance)
+        self._tat = tat + self.interval
+        return when - now
+
+    async def wait(self, chat_id: int) -> None:
+        """Dorme até este envio caber no ritmo global e no do chat."""
+        while True:
+            now = time.monotonic()
+            busy_until = self._chat_next.get(chat_id, 0.0)
+            if busy_until > now:
+                # ainda não reserva o slot global – não o desperdiça à espera do chat
+                await asyncio.sleep(busy_until - now)
+                continue
+            delay = self._reserve()
+            self._chat_next[chat_id] = now + delay + self.per_chat
+            if len(self._chat_next) > _PRUNE_AT:
+                self._chat_next = {c: t for c, t in self._chat_next.items() if t > now}
+            if delay > 0:
+                await asyncio.sleep(delay)
+            return
+
+    def pause(self, seconds: float) -> None:
+        until = time.monotonic() + seconds
+        self._paused_until = max(self._paused_until, until)
+        self._tat = max(self._tat, until)
@@ -0,0 +1,268 @@
+# bot/utils/render.py
+"""
+Texto formatado para o Bot API – templates com escape (HTML / MarkdownV2).
+
+Nomes, e-mails e mensagens de erro eram interpolados directamente em
+texto «Markdown»: um «_» ou «*» num apelido fazia o Telegram recusar a
+mensagem («can't parse entities») e edit_menu caía na cascata
+apagar → ZW → enviar.  Aqui cada valor é escapado para o parse_mode
+do template e a parte fixa é validada uma única vez, no import:
+
+    _FOUND = Template("Encontrámos um perfil para <b>{name}</b>.\\nÉ você?")
+    text = _FOUND.render(name=f"{first} {last}")      # → Safe (HTML)
+
+• Template(src, mode)  – compilado + validado no import (ValueError se o
+                         Telegram fosse recusar o texto fixo);
+                         .render(**valores) escapa tudo o que não é Safe
+• static(src, mode)    – texto fixo validado (Template sem campos)
+• esc(valor, mode)     – escape de um valor solto
+• join(sep, partes)    – junta fragmentos (escapa os que não são Safe)
+• validate(text, mode) – a mesma verificação para texto montado à mão
+• plain(text, mode)    – remove a marcação (reenvio sem parse_mode)
+• parse_failed(exc, where) – BadRequest de parsing? conta em
+                         telegram_parse_errors_total{mode, where}
+
+O bot usa PARSE_MODE (HTML: só «<», «>» e «&» precisam de escape);
+MarkdownV2 fica disponível para quem o prefira num ecrã concreto.
+"""
+
+from __future__ import annotations
+
+import html
+import re
+from html.parser import HTMLParser
+from string import Formatter
+from typing import Any, Iterable, List, Optional, Tuple
+
+from aiogram import exceptions
+from aiogram.enums import ParseMode
+
+from bot.utils import metrics
+
+__all__ = [
+    "PARSE_MODE",
+    "Safe",
+    "Template",
+    "esc",
+    "join",
+    "not_modified",
+    "parse_failed",
+    "plain",
+    "static",
+    "validate",
+]
+
+PARSE_MODE: str = ParseMode.HTML.value
+
+_PARSE_ERRORS = metrics.counter(
+    "telegram_parse_errors_total",
+    "Mensagens recusadas pelo Telegram por erro de parsing (can't parse entities)",
+)
+
+
+class Safe(str):
+    """Texto já escapado/validado – não volta a ser escapado por render()/join()."""
+
+    __slots__ = ()
+
+
+# ───────────────────────────── escape ─────────────────────────────
+_MDV2_SPECIAL = re.compile(r"([_*\[\]()~`>#+\-=|{}.!\\])")
+
+
+def esc(value: Any, mode: str = PARSE_MODE) -> Safe:
+    """Escapa *value* (str() primeiro; None → «—») para *mode*."""
+    if isinstance(value, Safe):
+        return value
+    text = "—" if value is None else str(value)
+    if mode == ParseMode.HTML:
+        return Safe(html.escape(text, quote=False))
+    if mode == ParseMode.MARKDOWN_V2:
+        return Safe(_MDV2_SPECIAL.sub(r"\\\1", text))
+    raise ValueError(f"parse_mode não suportado: {mode}")
+
+
+def join(sep: str, parts: Iterable[Any], mode: str = PARSE_MODE) -> Safe:
+    """Como str.join, mas escapa as partes que ainda não são Safe."""
+    return Safe(esc(sep, mode).join(esc(p, mode) for p in parts))
+
+# ──────────────────────────── validação ────────────────────────────
+# tags aceites pelo Bot API (https://core.telegram.org/bots/api#html-style)
+_HTML_TAGS = frozenset({
+    "b", "strong", "i", "em", "u", "ins", "s", "strike", "del", "a", "code",
+    "pre", "span", "tg-spoiler", "tg-emoji", "blockquote",
+})
+_HTML_ENTITIES = frozenset({"lt", "gt", "amp", "quot"})
+
+
+class _HtmlChecker(HTMLParser):
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=False)
+        self.stack: List[str] = []
+        self.errors: List[str] = []
+
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        if tag not in _HTML_TAGS:
+            self.errors.append(f"tag não suportada <{tag}>")
+        self.stack.append(tag)
+
+    def handle_endtag(self, tag: str) -> None:
+        if not self.stack or self.stack[-1] != tag:
+            self.errors.append(f"</{tag}> sem abertura correspondente")
+        else:
+            self.stack.pop()
+
+    def handle_entityref(self, name: str) -> None:
+        if name not in _HTML_ENTITIES:
+            self.errors.append(f"entidade desconhecida &{name};")
+
+    def handle_data(self, data: str) -> None:
+        for ch in "<>&":
+            if ch in data:
+                self.errors.append(f"«{ch}» por escapar")
+
+
+def _check_html(text: str) -> List[str]:
+    p = _HtmlChecker()
+    p.feed(text)
+    p.close()
+    if p.rawdata:                                      # «<» solto no fim
+        p.errors.append("«<» por escapar")
+    return p.errors + [f"<{t}> por fechar" for t in p.stack]
+
+
+_MDV2_MARKERS = ("||", "__", "*", "_", "~")
+
+
+def _check_mdv2(text: str) -> List[str]:
+    errors: List[str] = []
+    open_: List[str] = []
+    i, n = 0, len(text)
+    while i < n:
+        ch = text[i]
+        if ch == "\\":
+            if i + 1 >= n:
+                errors.append("«\\» no fim do texto")
+            i += 2
+            continue
+        if text.startswith("```", i):                  # bloco pre: até ao próximo ```
+            end = text.find("```", i + 3)
+            if end < 0:
+                errors.append("``` por fechar")
+                break
+            i = end + 3
+            continue
+        if ch == "`":
+            end = text.find("`", i + 1)
+            if end < 0:
+                errors.append("` por fechar")
+                break
+            i = end + 1
+            continue
+        if ch == "[":
+            close = text.find("](", i)
+            end = text.find(")", close + 2) if close >= 0 else -1
+            if end < 0:
+                errors.append("link [..](..) incompleto")
+                break
+            errors += _check_mdv2(text[i + 1:close])
+            i = end + 1
+            continue
+        if ch == ">" and (i == 0 or text[i - 1] == "\n"):   # citação
+            i += 1
+            continue
+        marker = next((m for m in _MDV2_MARKERS if text.startswith(m, i)), None)
+        if marker is not None:
+            if open_ and open_[-1] == marker:
+                open_.pop()
+            else:
+                open_.append(marker)
+            i += len(marker)
+            continue
+        if _MDV2_SPECIAL.match(ch):
+            errors.append(f"«{ch}» por escapar (posição {i})")
+        i += 1
+    return errors + [f"«{m}» por fechar" for m in open_]
+
+
+def validate(text: str, mode: str = PARSE_MODE) -> None:
+    """ValueError se o Telegram fosse recusar *text* em *mode*."""
+    if mode == ParseMode.HTML:
+        errors = _check_html(text)
+    elif mode == ParseMode.MARKDOWN_V2:
+        errors = _check_mdv2(text)
+    else:
+        raise ValueError(f"parse_mode não suportado: {mode}")
+    if errors:
+        raise ValueError(f"{ParseMode(mode).value} inválido ({'; '.join(errors)}): {text[:80]!r}")
+
+# ──────────────────────────── templates ────────────────────────────
+class Template:
+    """
+    Template str.format com escape automático dos valores.
+
+    A parte fixa é compilada e validada no construtor – um erro de
+    marcação num ecrã rebenta no import, não em produção.  Campos só por
+    nome, com format spec opcional: «{when:%H:%M}», «{total}».
+    """
+
+    __slots__ = ("source", "mode", "_parts", "fields")
+
+    def __init__(self, source: str, mode: str = PARSE_MODE) -> None:
+        self.source = source
+        self.mode = ParseMode(mode).value
+        self._parts: List[Tuple[str, Optional[str], str]] = []
+        for literal, field, spec, conv in Formatter().parse(source):
+            if field is not None and (not field.isidentifier() or conv):
+                raise ValueError(f"campo inválido {{{field}}} em {source[:80]!r}")
+            self._parts.append((literal, field, spec or ""))
+        self.fields = frozenset(f for _l, f, _s in self._parts if f)
+        # os valores nunca acrescentam marcação: basta validar com um marcador neutro
+        validate("".join(lit + ("x" if f else "") for lit, f, _s in self._parts), mode)
+
+    def render(self, **values: Any) -> Safe:
+        out: List[str] = []
+        for literal, field, spec in self._parts:
+            out.append(literal)
+            if field is not None:
+                value = values[field]
+                if not isinstance(value, Safe):
+                    value = esc(format(value, spec) if spec else value, self.mode)
+                out.append(value)
+        return Safe("".join(out))
+
+    __call__ = render
+
+    def __repr__(self) -> str:
+        return f"Template({self.source[:40]!r}, {self.mode})"
+
+
+def static(source: str, mode: str = PARSE_MODE) -> Safe:
+    """Texto fixo com marcação, validado uma vez (no import)."""
+    validate(source, mode)
+    return Safe(source)
+
+# ─────────────────────── fallback / erros do Bot API ───────────────────────
+_TAG = re.compile(r"<[^>]*>")
+_MDV2_UNESCAPE = re.compile(r"\\(.)")
+_MDV2_MARKUP = re.compile(r"(?<!\\)(\|\||__|[*_~`])")
+
+
+def plain(text: str, mode: str = PARSE_MODE) -> str:
+    """Texto sem marcação, para reenviar com parse_mode=None."""
+    if mode == ParseMode.HTML:
+        return html.unescape(_TAG.sub("", text))
+    return _MDV2_UNESCAPE.sub(r"\1", _MDV2_MARKUP.sub("", text))
+
+
+def parse_failed(exc: exceptions.TelegramBadRequest, where: str, mode: str = PARSE_MODE) -> bool:
+    """True (e conta) se o Telegram recusou o texto por erro de parsing."""
+    if "can't parse entities" not in exc.message:
+        return False
+    _PARSE_ERRORS.inc(labels={"mode": ParseMode(mode).value, "where": where})
+    return True
+
+
+def not_modified(exc: exceptions.TelegramBadRequest) -> bool:
+    """editMessage* com conteúdo e teclado iguais aos actuais."""
+    return "message is not modified" in exc.message
@@ -0,0 +1,319 @@
+# bot/utils/spreadsheet.py
+"""
+Escrita incremental de CSV / XLSX para os relatórios (bot.database.reports).
+
+O ficheiro é construído aos blocos:
+    sink = open_sink("xlsx", fileobj, columns)
+    for rows in …:                       # lotes vindos do cursor
+        sink.write(await format_rows(sink, rows), len(rows))
+    sink.close()
+
+• format_rows() converte um lote de tuplos em bytes num ProcessPoolExecutor
+  (REPORTS_PROCESSES processos; 0 → thread) – a formatação de dezenas de
+  milhares de linhas nunca corre no event loop;
+• o XLSX é escrito à mão (zipfile + SpreadsheetML com inline strings), por
+  isso não há tabela de strings partilhadas para manter em memória nem
+  dependência do openpyxl; a folha é comprimida à medida que é escrita;
+• CSV em UTF-8 com BOM, «;» e vírgula decimal – abre directamente no Excel
+  em pt-PT.
+• SpooledInputFile envia o ficheiro (memória ou disco) ao Bot API aos
+  pedaços, sem o ler todo para bytes.
+
+Tipos de coluna: text · int · money · date · datetime.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import csv
+import io
+import multiprocessing
+import re
+import zipfile
+from contextlib import suppress
+from concurrent.futures import Executor, ProcessPoolExecutor
+from datetime import date, datetime
+from decimal import Decimal
+from typing import IO, Any, AsyncGenerator, List, Optional, Sequence, Tuple
+from xml.sax.saxutils import escape
+from zoneinfo import ZoneInfo
+
+from aiogram.types import InputFile
+
+from bot.config import REPORTS_PROCESSES, TIMEZONE
+
+__all__ = [
+    "FORMATS",
+    "Column",
+    "SpooledInputFile",
+    "close_pool",
+    "format_rows",
+    "open_sink",
+]
+
+Column = Tuple[str, str]                 # (cabeçalho, tipo)
+
+_TZ = ZoneInfo(TIMEZONE)
+_EPOCH = date(1899, 12, 30)              # dia 0 das datas Excel
+_BAD_XML = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f]")
+_WIDTHS = {"text": 28, "int": 12, "money": 14, "date": 12, "datetime": 18}
+_STYLE = {"date": 1, "datetime": 2, "money": 3}      # índice em cellXfs
+_HEADER_STYLE = 4
+
+_pool: Optional[Executor] = None
+
+
+# ───────────────────────────── formatação (processos) ─────────────────────────────
+def _local(v: datetime) -> datetime:
+    return v.astimezone(_TZ).replace(tzinfo=None) if v.tzinfo else v
+
+
+def _csv_value(v: Any, kind: str) -> str:
+    if v is None:
+        return ""
+    if kind == "money":
+        return f"{Decimal(v):.2f}".replace(".", ",")
+    if kind == "datetime" and isinstance(v, datetime):
+        return _local(v).strftime("%Y-%m-%d %H:%M")
+    if isinstance(v, date):
+        return v.isoformat()
+    return str(v)
+
+
+def _csv_chunk(rows: List[tuple], kinds: Sequence[str]) -> bytes:
+    buf = io.StringIO()
+    out = csv.writer(buf, delimiter=";", lineterminator="\r\n")
+    for row in rows:
+        out.writerow([_csv_value(v, k) for v, k in zip(row, kinds)])
+    return buf.getvalue().encode("utf-8")
+
+
+def _col(i: int) -> str:
+    name = ""
+    i += 1
+    while i:
+        i, r = divmod(i - 1, 26)
+        name = chr(65 + r) + name
+    return name
+
+
+def _xlsx_cell(ref: str, v: Any, kind: str) -> str:
+    if v is None:
+        return ""
+    if kind == "datetime" and isinstance(v, datetime):
+        d = _local(v)
+        seconds = d.hour * 3600 + d.minute * 60 + d.second + d.microsecond / 1e6
+        serial = (d.date() - _EPOCH).days + seconds / 86400
+        # repr: precisão completa – com 6 casas (~0,09 s) 11:00 lia-se 10:59:59,97
+        return f'<c r="{ref}" s="{_STYLE[kind]}"><v>{serial!r}</v></c>'
+    if kind == "date" and isinstance(v, date):
+        return f'<c r="{ref}" s="{_STYLE[kind]}"><v>{(v - _EPOCH).days}</v></c>'
+    if kind in ("money", "int") and isinstance(v, (int, float, Decimal)):
+        style = f' s="{_STYLE[kind]}"' if kind in _STYLE else ""
+        return f'<c r="{ref}"{style}><v>{v}</v></c>'
+    text = escape(_BAD_XML.sub("", str(v)))
+    return f'<c r="{ref}" t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+def _xlsx_row(n: int, values: Sequence[Any], kinds: Sequence[str]) -> str:
+    cells = "".join(_xlsx_cell(f"{_col(i)}{n}", v, k) for i, (v, k) in enumerate(zip(values, kinds)))
+    return f'<row r="{n}">{cells}</row>'
+
+
+def _xlsx_chunk(rows: List[tuple], kinds: Sequence[str], first: int) -> bytes:
+    return "".join(_xlsx_row(first + i, row, kinds) for i, row in enumerate(rows)).encode("utf-8")
+
+
+# ───────────────────────────── sinks ─────────────────────────────
+class _CsvSink:
+    fmt = "csv"
+    mime = "text/csv"
+
+    def __init__(self, fileobj: IO[bytes], columns: Sequence[Column]) -> None:
+        self.kinds = [k for _h, k in columns]
+        self.rows = 0
+        self.queued = 0
+        self._f = fileobj
+        self._f.write(b"\xef\xbb\xbf" + _csv_chunk([tuple(h for h, _k in columns)], ["text"] * len(columns)))
+
+    def write(self, chunk: bytes, rows: int) -> None:
+        self._f.write(chunk)
+        self.rows += rows
+
+    def close(self) -> None:
+        self._f.flush()
+
+    def abort(self) -> None:
+        pass
+
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/styles.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+    '</Types>'
+)
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+_WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '<Relationship Id="rId2" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" '
+    'Target="styles.xml"/>'
+    '</Relationships>'
+)
+# cellXfs: 0 normal · 1 data · 2 data-hora · 3 € (#,##0.00) · 4 cabeçalho a negrito
+_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+    '<numFmts count="1"><numFmt numFmtId="164" formatCode="dd/mm/yyyy hh:mm"/></numFmts>'
+    '<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font>'
+    '<font><b/><sz val="11"/><name val="Calibri"/></font></fonts>'
+    '<fills count="2"><fill><patternFill patternType="none"/></fill>'
+    '<fill><patternFill patternType="gray125"/></fill></fills>'
+    '<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>'
+    '<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>'
+    '<cellXfs count="5">'
+    '<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>'
+    '<xf numFmtId="14" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="164" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="4" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>'
+    '<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/>'
+    '</cellXfs>'
+    '<cellStyles count="1"><cellStyle name="Normal" xfId="0" builtinId="0"/></cellStyles>'
+    '</styleSheet>'
+)
+
+
+class _XlsxSink:
+    fmt = "xlsx"
+    mime = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+    def __init__(self, fileobj: IO[bytes], columns: Sequence[Column], sheet: str = "Relatório") -> None:
+        self.kinds = [k for _h, k in columns]
+        self.rows = 0
+        self.queued = 0                          # linhas já entregues a format_rows
+        self._zip = zipfile.ZipFile(fileobj, "w", zipfile.ZIP_DEFLATED, compresslevel=6)
+        sheet_name = escape(re.sub(r"[\[\]:*?/\\]", "", sheet)[:31] or "Sheet1")
+        self._zip.writestr("[Content_Types].xml", _CONTENT_TYPES)
+        self._zip.writestr("_rels/.rels", _ROOT_RELS)
+        self._zip.writestr("xl/_rels/workbook.xml.rels", _WORKBOOK_RELS)
+        self._zip.writestr("xl/styles.xml", _STYLES)
+        self._zip.writestr(
+            "xl/workbook.xml",
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            f'<sheets><sheet name="{sheet_name}" sheetId="1" r:id="rId1"/></sheets></workbook>',
+        )
+        # a folha é a única entrada grande: stream aberto até close()
+        self._sheet = self._zip.open("xl/worksheets/sheet1.xml", "w", force_zip64=True)
+        cols = "".join(
+            f'<col min="{i}" max="{i}" width="{_WIDTHS.get(k, 16)}" customWidth="1"/>'
+            for i, k in enumerate(self.kinds, 1)
+        )
+        header = "".join(
+            f'<c r="{_col(i)}1" s="{_HEADER_STYLE}" t="inlineStr"><is><t>{escape(h)}</t></is></c>'
+            for i, (h, _k) in enumerate(columns)
+        )
+        self._sheet.write((
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+            '<sheetViews><sheetView workbookViewId="0">'
+            '<pane ySplit="1" topLeftCell="A2" activePane="bottomLeft" state="frozen"/>'
+            '</sheetView></sheetViews>'
+            f'<cols>{cols}</cols><sheetData><row r="1">{header}</row>'
+        ).encode("utf-8"))
+
+    def write(self, chunk: bytes, rows: int) -> None:
+        self._sheet.write(chunk)
+        self.rows += rows
+
+    def close(self) -> None:
+        self._sheet.write(b"</sheetData></worksheet>")
+        self._sheet.close()
+        self._zip.close()
+
+    def abort(self) -> None:
+        """Fecha o zip a meio (erro) – o ficheiro fica inútil mas sem handles abertos."""
+        with suppress(Exception):
+            self._sheet.close()
+        with suppress(Exception):
+            self._zip.close()
+
+
+Sink = Any                                      # _CsvSink | _XlsxSink
+
+FORMATS = ("csv", "xlsx")
+
+
+def open_sink(fmt: str, fileobj: IO[bytes], columns: Sequence[Column], *, sheet: str = "Relatório") -> Sink:
+    if fmt == "csv":
+        return _CsvSink(fileobj, columns)
+    if fmt == "xlsx":
+        return _XlsxSink(fileobj, columns, sheet)
+    raise ValueError(f"formato desconhecido: {fmt}")
+
+
+# ───────────────────────────── pool ─────────────────────────────
+def _executor() -> Optional[Executor]:
+    global _pool
+    if REPORTS_PROCESSES <= 0:
+        return None                              # None → thread por omissão do loop
+    if _pool is None:
+        # spawn: os filhos não herdam sockets/locks do processo asyncio
+        _pool = ProcessPoolExecutor(REPORTS_PROCESSES, mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+def format_rows(sink: Sink, rows: List[tuple]) -> "asyncio.Future[bytes]":
+    """
+    Lote de linhas → bytes no formato do *sink*, fora do event loop.
+
+    Os números de linha (XLSX) são reservados já, por isso podem estar
+    vários lotes em formatação desde que sejam escritos pela mesma ordem.
+    """
+    first = sink.queued + 2                      # linha 1 = cabeçalho
+    sink.queued += len(rows)
+    loop = asyncio.get_running_loop()
+    if sink.fmt == "csv":
+        return loop.run_in_executor(_executor(), _csv_chunk, rows, sink.kinds)
+    return loop.run_in_executor(_executor(), _xlsx_chunk, rows, sink.kinds, first)
+
+
+async def close_pool() -> None:
+    global _pool
+    if _pool is not None:
+        pool, _pool = _pool, None
+        await asyncio.to_thread(pool.shutdown, wait=True, cancel_futures=True)
+
+
+# ───────────────────────────── upload ─────────────────────────────
+class SpooledInputFile(InputFile):
+    """InputFile sobre um ficheiro aberto (ex.: SpooledTemporaryFile) – lido aos pedaços."""
+
+    def __init__(self, fileobj: IO[bytes], filename: str, chunk_size: int = 64 * 1024) -> None:
+        super().__init__(filename=filename, chunk_size=chunk_size)
+        self._f = fileobj
+
+    async def read(self, bot: Any) -> AsyncGenerator[bytes, None]:
+        self._f.seek(0)                          # o envio pode ser repetido
+        while chunk := await asyncio.to_thread(self._f.read, self.chunk_size):
+            yield chunk
@@ -0,0 +1,318 @@
+# bot/utils/tracing.py
+"""
+Tracing por spans (compatível com OTLP/JSON, sem dependências externas).
+
+Modelo
+──────
+• Cada update abre um *root span* (TracingMiddleware); tudo o que corre
+  dentro dele – middlewares, handler, SQL, Redis, Bot API – abre spans
+  filhos via `span("nome", atributo=valor)`.
+• O contexto propaga-se por contextvars, por isso funciona através de
+  `await` sem passar objectos à mão.
+• Amostragem:
+    – head:  TRACE_SAMPLE_RATE decide no início se o trace é exportado;
+    – tail:  traces mais lentos que TRACE_SLOW_MS (ou com erro) são
+             exportados mesmo que a head-sampling os tenha rejeitado.
+• Exportação em lote (OTLP/JSON):
+    – TRACE_EXPORT=/caminho/traces.jsonl  → uma linha por lote;
+    – TRACE_EXPORT=http://host:4318/v1/traces → POST para um collector.
+  Com TRACE_EXPORT vazio o tracing fica desligado (span() é no-op).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+
+from bot.config import TRACE_EXPORT, TRACE_SAMPLE_RATE, TRACE_SLOW_MS
+
+log = logging.getLogger(__name__)
+
+__all__ = [
+    "Span",
+    "enabled",
+    "span",
+    "start_trace",
+    "current_span",
+    "set_root_attribute",
+    "exporter",
+]
+
+# OTLP SpanKind
+KIND_INTERNAL = 1
+KIND_SERVER   = 2
+KIND_CLIENT   = 3
+
+_STATUS_OK    = 1
+_STATUS_ERROR = 2
+
+_SERVICE_NAME = "clinicafisina_telegram_bot"
+
+_current: ContextVar[Optional["Span"]] = ContextVar("bot_trace_span", default=None)
+
+
+def enabled() -> bool:
+    return bool(TRACE_EXPORT)
+
+
+class Span:
+    """Um span; o root guarda todos os spans terminados do seu trace."""
+
+    __slots__ = (
+        "trace_id", "span_id", "parent_id", "name", "kind", "attributes",
+        "start_ns", "end_ns", "error", "root", "sampled", "finished_spans",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        parent: Optional["Span"],
+        kind: int,
+        attributes: Dict[str, Any],
+        sampled: bool = False,
+    ) -> None:
+        self.name = name
+        self.kind = kind
+        self.attributes = attributes
+        self.span_id = os.urandom(8).hex()
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.error: Optional[str] = None
+        if parent is None:
+            self.trace_id = os.urandom(16).hex()
+            self.parent_id = ""
+            self.root = self
+            self.sampled = sampled
+            self.finished_spans: List[Span] = []
+        else:
+            self.trace_id = parent.trace_id
+            self.parent_id = parent.span_id
+            self.root = parent.root
+            self.sampled = parent.sampled
+            self.finished_spans = []
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end_ns or time.time_ns()
+        return (end - self.start_ns) / 1e6
+
+    def to_otlp(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or self.start_ns),
+            "attributes": [_otlp_attr(k, v) for k, v in self.attributes.items() if v is not None],
+            "status": (
+                {"code": _STATUS_ERROR, "message": self.error}
+                if self.error else {"code": _STATUS_OK}
+            ),
+        }
+        if self.parent_id:
+            out["parentSpanId"] = self.parent_id
+        return out
+
+
+def _otlp_attr(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        v = {"boolValue": value}
+    elif isinstance(value, int):
+        v = {"intValue": str(value)}
+    elif isinstance(value, float):
+        v = {"doubleValue": value}
+    else:
+        v = {"stringValue": str(value)}
+    return {"key": key, "value": v}
+
+
+def current_span() -> Optional[Span]:
+    return _current.get()
+
+
+def set_root_attribute(key: str, value: Any) -> None:
+    """Acrescenta um atributo ao root span do trace actual (se houver)."""
+    cur = _current.get()
+    if cur is not None:
+        cur.root.set_attribute(key, value)
+
+
+# ───────────────────────────── API de spans ─────────────────────────────
+@contextmanager
+def start_trace(name: str, *, kind: int = KIND_SERVER, **attributes: Any) -> Iterator[Optional[Span]]:
+    """Abre um root span; no fim decide (head/tail) se o trace é exportado."""
+    if not enabled():
+        yield None
+        return
+
+    root = Span(
+        name,
+        parent=None,
+        kind=kind,
+        attributes=attributes,
+        sampled=random.random() < TRACE_SAMPLE_RATE,
+    )
+    token = _current.set(root)
+    try:
+        yield root
+    except BaseException as exc:
+        root.error = f"{type(exc).__name__}: {exc}"
+        raise
+    finally:
+        _current.reset(token)
+        root.end_ns = time.time_ns()
+        if root.sampled or root.error or root.duration_ms >= TRACE_SLOW_MS:
+            root.set_attribute("sampling.reason", _reason(root))
+            exporter.submit([*root.finished_spans, root])
+
+
+def _reason(root: Span) -> str:
+    if root.sampled:
+        return "head"
+    return "error" if root.error else "slow"
+
+
+@contextmanager
+def span(name: str, *, kind: int = KIND_INTERNAL, **attributes: Any) -> Iterator[Optional[Span]]:
+    """
+    Span filho do span actual.
+
+    Fora de um trace (ou depois de o root terminar – p.ex. em tarefas de
+    timeout lançadas pelo handler) não regista nada.
+    """
+    parent = _current.get()
+    if parent is None or parent.root.end_ns is not None:
+        yield None
+        return
+
+    child = Span(name, parent=parent, kind=kind, attributes=attributes)
+    token = _current.set(child)
+    try:
+        yield child
+    except BaseException as exc:
+        child.error = f"{type(exc).__name__}: {exc}"
+        raise
+    finally:
+        _current.reset(token)
+        child.end_ns = time.time_ns()
+        child.root.finished_spans.append(child)
+
+
+# ───────────────────────────── exportador ─────────────────────────────
+class OTLPJsonExporter:
+    """
+    Acumula spans e escreve-os em lote (OTLP/JSON) num ficheiro ou collector.
+
+    O flush corre numa tarefa de fundo (de FLUSH_INTERVAL em FLUSH_INTERVAL
+    segundos ou quando o lote enche) e no shutdown via drain().  Para um
+    collector HTTP há uma só ClientSession (ligações keep-alive
+    reutilizadas entre lotes), fechada no drain().
+    """
+
+    FLUSH_INTERVAL = 5.0
+    MAX_BATCH      = 512
+    MAX_QUEUE      = 10_000
+
+    def __init__(self, target: str) -> None:
+        self.target = target
+        self._queue: List[Span] = []
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._session: Optional[Any] = None      # aiohttp.ClientSession (import tardio)
+        self.dropped = 0
+
+    def submit(self, spans: List[Span]) -> None:
+        if len(self._queue) + len(spans) > self.MAX_QUEUE:
+            self.dropped += len(spans)
+            return
+        self._queue.extend(spans)
+        self._ensure_task()
+        if len(self._queue) >= self.MAX_BATCH and self._wakeup is not None:
+            self._wakeup.set()
+
+    def _ensure_task(self) -> None:
+        if self._task is not None and not self._task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._wakeup = asyncio.Event()
+        self._task = loop.create_task(self._run())
+
+    async def _run(self) -> None:
+        assert self._wakeup is not None
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.FLUSH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self) -> None:
+        while self._queue:
+            batch, self._queue = self._queue[: self.MAX_BATCH], self._queue[self.MAX_BATCH:]
+            try:
+                await self._export(batch)
+            except Exception as exc:
+                log.warning("Exportação de %d spans falhou: %s", len(batch), exc)
+
+    async def drain(self, timeout: float) -> None:
+        """Drain hook do shutdown: pára a tarefa de fundo e exporta o resto."""
+        if self._task is not None:
+            self._task.cancel()
+        try:
+            await asyncio.wait_for(self.flush(), timeout)
+        finally:
+            if self._session is not None and not self._session.closed:
+                await self._session.close()
+            self._session = None
+
+    @staticmethod
+    def _payload(batch: List[Span]) -> Dict[str, Any]:
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [_otlp_attr("service.name", _SERVICE_NAME)]},
+                "scopeSpans": [{
+                    "scope": {"name": "bot.utils.tracing"},
+                    "spans": [s.to_otlp() for s in batch],
+                }],
+            }]
+        }
+
+    async def _export(self, batch: List[Span]) -> None:
+        payload = self._payload(batch)
+        if self.target.startswith(("http://", "https://")):
+            async with self._http().post(self.target, json=payload) as resp:
+                resp.raise_for_status()
+            return
+
+        line = json.dumps(payload, ensure_ascii=False, separators=(",", ":"))
+        await asyncio.get_running_loop().run_in_executor(None, self._append, line)
+
+    def _http(self) -> Any:
+        if self._session is None or self._session.closed:
+            import aiohttp
+
+            self._session = aiohttp.ClientSession()
+        return self._session
+
+    def _append(self, line: str) -> None:
+        with open(self.target, "a", encoding="utf-8") as fh:
+            fh.write(line + "\n")
+
+
+exporter = OTLPJsonExporter(TRACE_EXPORT)
@@ -3,17 +3,107 @@
 Validações e normalizações usadas em todo o projecto.
 
 Cada função levanta ValueError com mensagem legível quando o input é inválido.
+
+Para colunas inteiras (importações, milhares de linhas) há a versão em
+lote, que não levanta nada por linha – devolve um Batch com valores
+normalizados, máscara de validade e código de erro por linha:
+
+    res = check_pt_nifs(coluna)             # listas, tuplos, geradores…
+    res.valid      → [True, False, …]
+    res.values     → ["123456789", None, …]
+    res.errors     → [None, "nif_checksum", …]   (MESSAGES[código] → texto)
+
+    validate_columns({"nif": nifs, "email": emails},
+                     {"nif": "nif", "email": "email"})  → {coluna: Batch}
+
+Telefones para gravar (qualquer país) passam por check_phones(), que
+devolve os dígitos E.164 de bot.utils.phone.canonical – o formato de
+user_phones.phone_number.
+
+As funções de uma só linha são invólucros finos sobre o mesmo núcleo
+(_date, _email, …), por isso as regras e as mensagens são as mesmas.
 """
 
 from __future__ import annotations
 
+import calendar
 import re
 import unicodedata
+from dataclasses import dataclass, field
 from datetime import datetime, date
-from typing import Tuple
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+
+from bot.utils import phone as _phone
+
+__all__ = [
+    "Batch",
+    "CHECKS",
+    "MESSAGES",
+    "check_dates",
+    "check_emails",
+    "check_phone_ccs",
+    "check_phones",
+    "check_pt_nifs",
+    "check_pt_phones",
+    "normalize_phone_cc",
+    "row_mask",
+    "valid_date",
+    "valid_email",
+    "valid_pt_nif",
+    "valid_pt_phone",
+    "validate_columns",
+]
+
+# ─────────────────────────── códigos de erro ────────────────────────────
+MISSING        = "missing"
+DATE_FORMAT    = "date_format"
+DATE_IMPOSSIBLE = "date_impossible"
+DATE_RANGE     = "date_range"
+EMAIL_INVALID  = "email_invalid"
+PHONE_INVALID  = "phone_pt_invalid"
+NIF_FORMAT     = "nif_format"
+NIF_CHECKSUM   = "nif_checksum"
+CC_INVALID     = "phone_cc_invalid"
+
+MESSAGES: Dict[str, str] = {
+    MISSING:         "Valor em falta.",
+    DATE_FORMAT:     "Formato inválido (use dd-MM-aaaa).",
+    DATE_IMPOSSIBLE: "Data impossível.",
+    DATE_RANGE:      "Ano fora do intervalo 1900-hoje.",
+    EMAIL_INVALID:   "Endereço de e-mail inválido.",
+    PHONE_INVALID:   "Telemóvel PT deve ter 9 dígitos e começar por 9.",
+    NIF_FORMAT:      "NIF PT deve ter 9 dígitos.",
+    NIF_CHECKSUM:    "NIF PT inválido.",
+    CC_INVALID:      "Indicativo deve conter apenas dígitos, '+', ou '00'.",
+    **_phone.MESSAGES,                      # phone_chars / phone_cc_unknown / phone_length
+}
+
+# núcleo de cada validação: valor → (normalizado, None) ou (None, código)
+_Result = Tuple[Any, Optional[str]]
+
+
+def _unwrap(result: _Result) -> Any:
+    value, error = result
+    if error is not None:
+        raise ValueError(MESSAGES[error])
+    return value
 
 # ─────────────────────────── datas ────────────────────────────
 _DATE_RE = re.compile(r"^(?P<d>\d{2})[-/](?P<m>\d{2})[-/](?P<y>\d{4})$")
+_MONTH_DAYS = (0, 31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+
+def _date(value: str, this_year: int) -> _Result:
+    m = _DATE_RE.fullmatch(value.strip())
+    if not m:
+        return None, DATE_FORMAT
+    d, mth, y = map(int, (m["d"], m["m"], m["y"]))
+    # as mesmas regras do construtor de datetime, sem o custo da excepção
+    if not (1 <= y and 1 <= mth <= 12 and 1 <= d <= _MONTH_DAYS[mth] + (mth == 2 and calendar.isleap(y))):
+        return None, DATE_IMPOSSIBLE
+    if not (1900 <= y <= this_year):
+        return None, DATE_RANGE
+    return date(y, mth, d), None
 
 
 def valid_date(value: str) -> date:
@@ -21,17 +111,7 @@ def valid_date(value: str) -> date:
     Aceita 'dd-MM-aaaa' ou 'dd/MM/aaaa'.
     Garante ano ≥ 1900 e não no futuro.
     """
-    m = _DATE_RE.fullmatch(value.strip())
-    if not m:
-        raise ValueError("Formato inválido (use dd-MM-aaaa).")
-    d, mth, y = map(int, (m["d"], m["m"], m["y"]))
-    try:
-        dt = datetime(year=y, month=mth, day=d).date()
-    except ValueError:
-        raise ValueError("Data impossível.")
-    if not (1900 <= dt.year <= datetime.now().year):
-        raise ValueError("Ano fora do intervalo 1900-hoje.")
-    return dt
+    return _unwrap(_date(value, datetime.now().year))
 
 
 # ─────────────────────────── e-mail ────────────────────────────
@@ -40,45 +120,87 @@ _EMAIL_RE = re.compile(r"^[\w\.-]+@[\w\.-]+\.[a-zA-Z]{2,}$")
 
 def _strip_invisible(s: str) -> str:
     """Remove chars categoria Cf (format) e espaços invisíveis."""
+    if s.isprintable():                 # caso comum: nenhum char categoria C
+        return s
     return "".join(ch for ch in s if unicodedata.category(ch)[0] != "C")
 
-def valid_email(value: str) -> str:
+
+def _email(value: str) -> _Result:
     value = _strip_invisible(value).strip()
     if not _EMAIL_RE.fullmatch(value):
-        raise ValueError("Endereço de e-mail inválido.")
-    return value.lower()
+        return None, EMAIL_INVALID
+    return value.lower(), None
+
+
+def valid_email(value: str) -> str:
+    return _unwrap(_email(value))
 
 
 # ───────────────────── telemóvel Portugal ─────────────────────
+def _pt_phone(num: str) -> _Result:
+    if not num.isdigit() or len(num) != 9 or not num.startswith("9"):
+        return None, PHONE_INVALID
+    return num, None
+
+
 def valid_pt_phone(num: str) -> str:
     """
     Valida número de telemóvel português (9 dígitos começando por 9).
     Devolve o número tal como veio (apenas dígitos).
     """
-    if not num.isdigit() or len(num) != 9 or not num.startswith("9"):
-        raise ValueError("Telemóvel PT deve ter 9 dígitos e começar por 9.")
-    return num
+    return _unwrap(_pt_phone(num))
 
 
 # ─────────────────────── NIF Portugal ────────────────────────
+# dígito de controlo (código ASCII) para cada resto da soma ponderada mod 11
+_NIF_CHECK = bytes(0x30 + (0 if r in (0, 1) else 11 - r) for r in range(11))
+_NIF_OFFSET = 0x30 * sum(range(2, 10))          # os dígitos chegam como códigos ASCII
+
+
+def _nif_ok(a: int, b: int, c: int, d: int, e: int, f: int, g: int, h: int, k: int) -> bool:
+    """Controlo de um NIF a partir dos 9 códigos ASCII (pesos 9…2)."""
+    s = 9 * a + 8 * b + 7 * c + 6 * d + 5 * e + 4 * f + 3 * g + 2 * h - _NIF_OFFSET
+    return _NIF_CHECK[s % 11] == k
+
+
+def _ascii_digits(nif: str) -> Optional[bytes]:
+    """9 dígitos (isdigit) → bytes ASCII; None se algum não tiver valor decimal."""
+    if nif.isascii():
+        return nif.encode()
+    try:
+        return "".join(str(int(ch)) for ch in nif).encode()
+    except ValueError:                              # «²», «①»… isdigit mas não int
+        return None
+
+
+def _pt_nif(nif: str) -> _Result:
+    raw = _ascii_digits(nif) if nif.isdigit() and len(nif) == 9 else None
+    if raw is None or len(raw) != 9:
+        return None, NIF_FORMAT
+    if not _nif_ok(*raw):
+        return None, NIF_CHECKSUM
+    return nif, None
+
+
 def valid_pt_nif(nif: str) -> str:
     """
     Valida NIF português usando algoritmo de controlo.
     """
-    if not (nif.isdigit() and len(nif) == 9):
-        raise ValueError("NIF PT deve ter 9 dígitos.")
-    digs = list(map(int, nif))
-    chk = sum(d * (9 - i) for i, d in enumerate(digs[:-1])) % 11
-    chk = 0 if chk in (0, 1) else 11 - chk
-    if chk != digs[-1]:
-        raise ValueError("NIF PT inválido.")
-    return nif
+    return _unwrap(_pt_nif(nif))
 
 
 # ──────────────── indicativo de país genérico ────────────────
 _CC_RE = re.compile(r"^(?:\+|00)?(\d{1,4})$")
 
 
+def _phone_cc(raw: str) -> _Result:
+    m = _CC_RE.fullmatch(raw.strip())
+    if not m:
+        return None, CC_INVALID
+    digits = m.group(1).lstrip("0") or "0"
+    return (f"+{digits}", digits), None
+
+
 def normalize_phone_cc(raw: str) -> Tuple[str, str]:
     """
     Normaliza o indicativo do país.
@@ -91,9 +213,128 @@ def normalize_phone_cc(raw: str) -> Tuple[str, str]:
 
     Levanta ValueError se contiver algo além de dígitos, '+' ou '00'.
     """
-    raw = raw.strip()
-    m = _CC_RE.fullmatch(raw)
-    if not m:
-        raise ValueError("Indicativo deve conter apenas dígitos, '+', ou '00'.")
-    digits = m.group(1).lstrip("0") or "0"
-    return f"+{digits}", digits
+    return _unwrap(_phone_cc(raw))
+
+
+# ─────────────────────────── em lote ────────────────────────────
+@dataclass
+class Batch:
+    """Resultado de uma coluna: uma entrada por linha, pela ordem de entrada."""
+
+    values: List[Any]                       # normalizado; None onde inválido
+    errors: List[Optional[str]]             # código (MESSAGES); None onde válido
+    valid: List[bool] = field(init=False)
+
+    def __post_init__(self) -> None:
+        self.valid = [e is None for e in self.errors]
+
+    def __len__(self) -> int:
+        return len(self.errors)
+
+    @property
+    def ok(self) -> int:
+        return self.valid.count(True)
+
+    def invalid(self) -> Iterator[Tuple[int, str]]:
+        """(índice, código) das linhas inválidas."""
+        return ((i, e) for i, e in enumerate(self.errors) if e is not None)
+
+    def message(self, row: int) -> Optional[str]:
+        error = self.errors[row]
+        return MESSAGES[error] if error is not None else None
+
+
+def _column(column: Iterable[Any]) -> List[Optional[str]]:
+    """Células de folha de cálculo → str (números viram texto; vazio → None)."""
+    return [v if isinstance(v, str) or v is None else str(v) for v in column]
+
+
+def _run(column: Iterable[Any], core: Callable[[str], _Result]) -> Batch:
+    values: List[Any] = []
+    errors: List[Optional[str]] = []
+    for cell in _column(column):
+        value, error = core(cell) if cell is not None else (None, MISSING)
+        values.append(value)
+        errors.append(error)
+    return Batch(values, errors)
+
+
+def check_dates(column: Iterable[Any]) -> Batch:
+    this_year = datetime.now().year                    # uma vez por coluna
+    return _run(column, lambda v: _date(v, this_year))
+
+
+def check_emails(column: Iterable[Any]) -> Batch:
+    return _run(column, _email)
+
+
+def check_pt_phones(column: Iterable[Any]) -> Batch:
+    return _run(column, _pt_phone)
+
+
+def check_phone_ccs(column: Iterable[Any]) -> Batch:
+    return _run(column, _phone_cc)
+
+
+def check_phones(column: Iterable[Any], cc: Optional[str] = None) -> Batch:
+    """Dígitos E.164 canónicos; *cc* = indicativo dos números sem «+»/«00»."""
+    return _run(column, lambda v: _phone._canonical(v, cc))
+
+
+def check_pt_nifs(column: Iterable[Any]) -> Batch:
+    """
+    NIFs de uma coluna.  Os que já são 9 dígitos ASCII (quase todos) são
+    validados de uma vez: junta-os num único bytes e cada posição do NIF
+    passa a ser uma fatia com passo 9 (blob[k::9]) – o controlo corre em
+    map() sobre as 9 fatias, sem str→int nem excepções por linha.
+    """
+    cells = _column(column)
+    values: List[Any] = [None] * len(cells)
+    errors: List[Optional[str]] = [NIF_FORMAT] * len(cells)
+    fast: List[int] = []
+    for i, nif in enumerate(cells):
+        if nif is None:
+            errors[i] = MISSING
+        elif len(nif) == 9 and nif.isascii() and nif.isdigit():
+            fast.append(i)
+        else:
+            values[i], errors[i] = _pt_nif(nif)         # Unicode / formato errado
+    if fast:
+        blob = "".join([cells[i] for i in fast]).encode()
+        for i, ok in zip(fast, map(_nif_ok, *(blob[k::9] for k in range(9)))):
+            if ok:
+                values[i], errors[i] = cells[i], None
+            else:
+                errors[i] = NIF_CHECKSUM
+    return Batch(values, errors)
+
+
+CHECKS: Dict[str, Callable[[Iterable[Any]], Batch]] = {
+    "date": check_dates,
+    "email": check_emails,
+    "phone": check_pt_phones,
+    "phone_cc": check_phone_ccs,
+    "e164": check_phones,
+    "nif": check_pt_nifs,
+}
+
+
+def validate_columns(
+    columns: Mapping[str, Iterable[Any]],
+    kinds: Mapping[str, str],
+) -> Dict[str, Batch]:
+    """Valida cada coluna de *kinds* ({coluna: tipo em CHECKS}); as outras são ignoradas."""
+    unknown = set(kinds.values()) - CHECKS.keys()
+    if unknown:
+        raise ValueError(f"Tipos de validação desconhecidos: {', '.join(sorted(unknown))}")
+    return {name: CHECKS[kind](columns[name]) for name, kind in kinds.items()}
+
+
+def row_mask(results: Mapping[str, Batch]) -> List[bool]:
+    """Linhas válidas em todas as colunas validadas."""
+    masks = [r.valid for r in results.values()]
+    if not masks:
+        return []
+    if len({len(m) for m in masks}) > 1:
+        raise ValueError("Colunas com números de linhas diferentes.")
+    return [all(row) for row in zip(*masks)]
@@ -0,0 +1,177 @@
+-- ======================================================================
+--  002 – Tabela de logs do bot particionada por mês       (2026-10)
+--
+--  • clinicafisina_telegram_bot passa a RANGE (created_at), 1 partição
+--    por mês (clinicafisina_telegram_bot_yYYYYmMM) + DEFAULT de segurança
+--  • BRIN em created_at (inserts sempre no fim → índice minúsculo)
+--  • B-tree (telegram_user_id, created_at DESC, log_id DESC) para o
+--    «últimas N linhas do utilizador X» com paginação keyset
+--  • bot_log_ensure_partitions() / bot_log_drop_expired() chamadas
+--    periodicamente pelo bot (bot.database.log_maintenance)
+--
+--  Idempotente: se a tabela já existir sem partições é renomeada para
+--  clinicafisina_telegram_bot_legacy e os dados são copiados.
+-- ======================================================================
+
+\connect fisina
+SET search_path = public;
+
+------------------------------------------------------------------
+-- 1. Tabela-mãe particionada
+------------------------------------------------------------------
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM pg_class c
+        JOIN   pg_namespace n ON n.oid = c.relnamespace
+        WHERE  n.nspname = 'public'
+          AND  c.relname = 'clinicafisina_telegram_bot'
+          AND  c.relkind = 'r'                    -- tabela normal (não particionada)
+    ) THEN
+        ALTER TABLE clinicafisina_telegram_bot
+            RENAME TO clinicafisina_telegram_bot_legacy;
+    END IF;
+END;
+$$;
+
+CREATE TABLE IF NOT EXISTS clinicafisina_telegram_bot (
+    log_id            BIGINT GENERATED ALWAYS AS IDENTITY,
+    created_at        TIMESTAMPTZ NOT NULL DEFAULT now(),
+    level             VARCHAR(10) NOT NULL,
+    telegram_user_id  BIGINT,
+    chat_id           BIGINT,
+    is_system         BOOLEAN NOT NULL DEFAULT FALSE,
+    message           TEXT NOT NULL,
+
+    PRIMARY KEY (created_at, log_id)          -- tem de incluir a chave de partição
+) PARTITION BY RANGE (created_at);
+
+CREATE TABLE IF NOT EXISTS clinicafisina_telegram_bot_default
+    PARTITION OF clinicafisina_telegram_bot DEFAULT;
+
+/* índices na tabela-mãe → propagados a todas as partições */
+CREATE INDEX IF NOT EXISTS brin_bot_log_created_at
+    ON clinicafisina_telegram_bot USING brin (created_at)
+    WITH (pages_per_range = 32);
+
+CREATE INDEX IF NOT EXISTS idx_bot_log_user_keyset
+    ON clinicafisina_telegram_bot (telegram_user_id, created_at DESC, log_id DESC)
+    WHERE telegram_user_id IS NOT NULL;
+
+------------------------------------------------------------------
+-- 2. Manutenção de partições
+------------------------------------------------------------------
+/* cria as partições do mês actual e dos p_ahead meses seguintes */
+CREATE OR REPLACE FUNCTION bot_log_ensure_partitions(p_ahead INT DEFAULT 3)
+RETURNS INT AS $$
+DECLARE
+    m       DATE := date_trunc('month', now() AT TIME ZONE 'UTC')::date;
+    part    TEXT;
+    created INT  := 0;
+BEGIN
+    FOR i IN 0..p_ahead LOOP
+        part := format('clinicafisina_telegram_bot_y%sm%s',
+                       to_char(m, 'YYYY'), to_char(m, 'MM'));
+        IF to_regclass(part) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF clinicafisina_telegram_bot
+                     FOR VALUES FROM (%L) TO (%L)',
+                part, m::timestamptz, (m + INTERVAL '1 month')::timestamptz);
+            created := created + 1;
+        END IF;
+        m := (m + INTERVAL '1 month')::date;
+    END LOOP;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+/* desanexa e apaga partições totalmente anteriores a now() - p_keep meses */
+CREATE OR REPLACE FUNCTION bot_log_drop_expired(p_keep_months INT DEFAULT 12)
+RETURNS INT AS $$
+DECLARE
+    cutoff  DATE := (date_trunc('month', now() AT TIME ZONE 'UTC')
+                     - make_interval(months => p_keep_months))::date;
+    rec     RECORD;
+    dropped INT  := 0;
+BEGIN
+    FOR rec IN
+        SELECT c.relname
+        FROM   pg_inherits i
+        JOIN   pg_class c ON c.oid = i.inhrelid
+        WHERE  i.inhparent = 'clinicafisina_telegram_bot'::regclass
+          AND  c.relname ~ '^clinicafisina_telegram_bot_y[0-9]{4}m[0-9]{2}$'
+    LOOP
+        IF to_date(right(rec.relname, 7), 'YYYY"m"MM') < cutoff THEN   -- «2025m05»
+            EXECUTE format('ALTER TABLE clinicafisina_telegram_bot DETACH PARTITION %I', rec.relname);
+            EXECUTE format('DROP TABLE %I', rec.relname);
+            dropped := dropped + 1;
+        END IF;
+    END LOOP;
+    RETURN dropped;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT bot_log_ensure_partitions(3);
+
+------------------------------------------------------------------
+-- 3. Migração dos dados antigos (se existirem)
+------------------------------------------------------------------
+DO $$
+DECLARE
+    ts_col TEXT;
+    first_month DATE;
+    m DATE;
+BEGIN
+    IF to_regclass('clinicafisina_telegram_bot_legacy') IS NULL THEN
+        RETURN;
+    END IF;
+
+    /* coluna temporal da tabela antiga (se houver) */
+    SELECT column_name INTO ts_col
+    FROM   information_schema.columns
+    WHERE  table_schema = 'public'
+      AND  table_name   = 'clinicafisina_telegram_bot_legacy'
+      AND  data_type LIKE 'timestamp%'
+    ORDER  BY ordinal_position
+    LIMIT  1;
+
+    IF ts_col IS NULL THEN
+        INSERT INTO clinicafisina_telegram_bot
+               (level, telegram_user_id, chat_id, is_system, message)
+        SELECT level, telegram_user_id, chat_id, coalesce(is_system, FALSE), message
+        FROM   clinicafisina_telegram_bot_legacy;
+        RETURN;
+    END IF;
+
+    /* partições para os meses históricos */
+    EXECUTE format('SELECT date_trunc(''month'', min(%I) AT TIME ZONE ''UTC'')::date
+                    FROM clinicafisina_telegram_bot_legacy', ts_col)
+       INTO first_month;
+    m := first_month;
+    WHILE m IS NOT NULL AND m < date_trunc('month', now() AT TIME ZONE 'UTC')::date LOOP
+        IF to_regclass(format('clinicafisina_telegram_bot_y%sm%s',
+                              to_char(m, 'YYYY'), to_char(m, 'MM'))) IS NULL THEN
+            EXECUTE format(
+                'CREATE TABLE %I PARTITION OF clinicafisina_telegram_bot
+                     FOR VALUES FROM (%L) TO (%L)',
+                format('clinicafisina_telegram_bot_y%sm%s', to_char(m, 'YYYY'), to_char(m, 'MM')),
+                m::timestamptz, (m + INTERVAL '1 month')::timestamptz);
+        END IF;
+        m := (m + INTERVAL '1 month')::date;
+    END LOOP;
+
+    EXECUTE format(
+        'INSERT INTO clinicafisina_telegram_bot
+                (created_at, level, telegram_user_id, chat_id, is_system, message)
+         SELECT coalesce(%I, now()), level, telegram_user_id, chat_id,
+                coalesce(is_system, FALSE), message
+         FROM   clinicafisina_telegram_bot_legacy
+         ORDER  BY %I', ts_col, ts_col);
+END;
+$$;
+
+/* depois de validar:  DROP TABLE clinicafisina_telegram_bot_legacy; */
+
+------------------------------------------------------------------
+-- Feito!  psql -U jorgeavlobo -f migrations/002_bot_log_partitioning.sql
+------------------------------------------------------------------
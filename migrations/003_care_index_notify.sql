@@ -0,0 +1,76 @@
+-- ======================================================================
+--  003 – NOTIFY nas relações de cuidado                   (2026-10)
+--
+--  caregiver_patients / therapist_patients emitem no canal «care_index»
+--  um payload JSON compacto por linha alterada; o bot mantém com isso o
+--  índice em memória bot.database.care_index (sem SQL por clique).
+--
+--      {"t": "cg"|"th", "op": "I"|"D"|"U"|"T", "new": [a, p], "old": [a, p]}
+--
+--  O NOTIFY só é entregue no COMMIT (rollbacks não chegam ao bot).
+-- ======================================================================
+
+\connect fisina
+SET search_path = public;
+
+------------------------------------------------------------------
+-- 1. Função de trigger (por linha)
+------------------------------------------------------------------
+CREATE OR REPLACE FUNCTION trg_care_index_notify() RETURNS TRIGGER AS $$
+DECLARE
+    kind  TEXT := TG_ARGV[0];               -- 'cg' | 'th'
+    a_col TEXT := TG_ARGV[1];               -- caregiver_id | physiotherapist_id
+    j_new JSONB;
+    j_old JSONB;
+BEGIN
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        j_new := jsonb_build_array(to_jsonb(NEW) ->> a_col, NEW.patient_id);
+    END IF;
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        j_old := jsonb_build_array(to_jsonb(OLD) ->> a_col, OLD.patient_id);
+    END IF;
+
+    PERFORM pg_notify('care_index', jsonb_build_object(
+        't',  kind,
+        'op', left(TG_OP, 1),
+        'new', j_new,
+        'old', j_old
+    )::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+/* TRUNCATE não tem linhas → o bot faz recarga completa */
+CREATE OR REPLACE FUNCTION trg_care_index_truncate() RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('care_index', json_build_object('t', TG_ARGV[0], 'op', 'T')::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+------------------------------------------------------------------
+-- 2. Triggers
+------------------------------------------------------------------
+DROP TRIGGER IF EXISTS trg_caregiver_patients_notify ON caregiver_patients;
+CREATE TRIGGER trg_caregiver_patients_notify
+AFTER INSERT OR DELETE OR UPDATE OF caregiver_id, patient_id ON caregiver_patients
+FOR EACH ROW EXECUTE FUNCTION trg_care_index_notify('cg', 'caregiver_id');
+
+DROP TRIGGER IF EXISTS trg_caregiver_patients_truncate ON caregiver_patients;
+CREATE TRIGGER trg_caregiver_patients_truncate
+AFTER TRUNCATE ON caregiver_patients
+FOR EACH STATEMENT EXECUTE FUNCTION trg_care_index_truncate('cg');
+
+DROP TRIGGER IF EXISTS trg_therapist_patients_notify ON therapist_patients;
+CREATE TRIGGER trg_therapist_patients_notify
+AFTER INSERT OR DELETE OR UPDATE OF physiotherapist_id, patient_id ON therapist_patients
+FOR EACH ROW EXECUTE FUNCTION trg_care_index_notify('th', 'physiotherapist_id');
+
+DROP TRIGGER IF EXISTS trg_therapist_patients_truncate ON therapist_patients;
+CREATE TRIGGER trg_therapist_patients_truncate
+AFTER TRUNCATE ON therapist_patients
+FOR EACH STATEMENT EXECUTE FUNCTION trg_care_index_truncate('th');
+
+------------------------------------------------------------------
+-- Feito!  psql -U jorgeavlobo -f migrations/003_care_index_notify.sql
+------------------------------------------------------------------
@@ -0,0 +1,78 @@
+-- ======================================================================
+--  004 – Bus de invalidação de caches via NOTIFY           (2026-10)
+--
+--  users / user_roles / user_phones / roles emitem no canal
+--  «cache_inval» o mínimo necessário para o bot despejar exactamente as
+--  entradas afectadas da cache de utilizadores (bot.database.user_cache):
+--
+--      {"t": tabela, "u": [user_id…], "tg": [telegram_user_id…], "ts": epoch}
+--
+--  • "ts" = clock_timestamp() no trigger → o bot mede o atraso;
+--  • alterações em roles (renomear / apagar) → o bot limpa tudo.
+-- ======================================================================
+
+\connect fisina
+SET search_path = public;
+
+CREATE OR REPLACE FUNCTION trg_cache_inval_notify() RETURNS TRIGGER AS $$
+DECLARE
+    j_new JSONB := CASE WHEN TG_OP <> 'DELETE' THEN to_jsonb(NEW) END;
+    j_old JSONB := CASE WHEN TG_OP <> 'INSERT' THEN to_jsonb(OLD) END;
+    users JSONB := '[]';
+    tgids JSONB := '[]';
+BEGIN
+    IF TG_TABLE_NAME <> 'roles' THEN
+        SELECT coalesce(jsonb_agg(DISTINCT v), '[]') INTO users
+        FROM   unnest(ARRAY[j_new ->> 'user_id', j_old ->> 'user_id']) v
+        WHERE  v IS NOT NULL;
+    END IF;
+
+    IF TG_TABLE_NAME = 'user_phones' THEN
+        SELECT coalesce(jsonb_agg(DISTINCT v::bigint), '[]') INTO tgids
+        FROM   unnest(ARRAY[j_new ->> 'telegram_user_id', j_old ->> 'telegram_user_id']) v
+        WHERE  v IS NOT NULL;
+    END IF;
+
+    PERFORM pg_notify('cache_inval', jsonb_build_object(
+        't',  TG_TABLE_NAME,
+        'u',  users,
+        'tg', tgids,
+        'ts', extract(epoch FROM clock_timestamp())
+    )::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+/* TRUNCATE de qualquer tabela → o bot limpa a cache inteira */
+CREATE OR REPLACE FUNCTION trg_cache_inval_truncate() RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('cache_inval', json_build_object(
+        't', 'roles', 'u', '[]'::json, 'tg', '[]'::json,
+        'ts', extract(epoch FROM clock_timestamp()))::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+DECLARE
+    tbl TEXT;
+BEGIN
+    FOREACH tbl IN ARRAY ARRAY['users', 'user_roles', 'user_phones', 'roles'] LOOP
+        EXECUTE format('DROP TRIGGER IF EXISTS trg_%s_cache_inval ON %I', tbl, tbl);
+        EXECUTE format(
+            'CREATE TRIGGER trg_%s_cache_inval
+             AFTER INSERT OR UPDATE OR DELETE ON %I
+             FOR EACH ROW EXECUTE FUNCTION trg_cache_inval_notify()', tbl, tbl);
+
+        EXECUTE format('DROP TRIGGER IF EXISTS trg_%s_cache_inval_truncate ON %I', tbl, tbl);
+        EXECUTE format(
+            'CREATE TRIGGER trg_%s_cache_inval_truncate
+             AFTER TRUNCATE ON %I
+             FOR EACH STATEMENT EXECUTE FUNCTION trg_cache_inval_truncate()', tbl, tbl);
+    END LOOP;
+END;
+$$;
+
+------------------------------------------------------------------
+-- Feito!  psql -U jorgeavlobo -f migrations/004_cache_invalidation_notify.sql
+------------------------------------------------------------------
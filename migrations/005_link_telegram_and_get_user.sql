@@ -0,0 +1,64 @@
+-- ======================================================================
+--  005 – Ligação do Telegram + utilizador + roles numa só chamada (2026-10)
+--
+--  link_telegram_and_get_user(user, phone, tgid) faz, numa transacção
+--  (a da própria chamada):
+--    1. liberta o TG-ID de qualquer outro telefone;
+--    2. liga-o ao telefone pedido via link_telegram() (migração 001),
+--       só se ainda não estiver ligado – evita UPDATEs inúteis;
+--    3. devolve o utilizador e as roles (minúsculas, ordenadas).
+--
+--  Usada por bot.auth.auth_flow.confirm_link: 1 ida à BD em vez de 4–5.
+-- ======================================================================
+
+\connect fisina
+SET search_path = public;
+
+CREATE OR REPLACE FUNCTION link_telegram_and_get_user(
+        p_user  UUID,
+        p_phone VARCHAR,
+        p_tgid  BIGINT
+) RETURNS TABLE (
+        user_id    UUID,
+        first_name VARCHAR,
+        last_name  VARCHAR,
+        roles      TEXT[]
+) AS $$
+BEGIN
+    /* ① libertar o TG-ID de QUALQUER outro registo (índice único) */
+    UPDATE user_phones p
+    SET    telegram_user_id = NULL
+    WHERE  p.telegram_user_id = p_tgid
+      AND  NOT (p.user_id = p_user AND p.phone_number = p_phone);
+
+    /* ② ligar ao telefone pretendido (insere-o se não existir) */
+    IF NOT EXISTS (
+        SELECT 1 FROM user_phones p
+        WHERE  p.user_id = p_user
+          AND  p.phone_number = p_phone
+          AND  p.telegram_user_id = p_tgid
+    ) THEN
+        PERFORM link_telegram(p_user, p_phone, p_tgid);
+    END IF;
+
+    /* ③ utilizador + roles */
+    RETURN QUERY
+    SELECT u.user_id,
+           u.first_name,
+           u.last_name,
+           coalesce(
+               array_agg(lower(r.role_name) ORDER BY lower(r.role_name))
+                   FILTER (WHERE r.role_name IS NOT NULL),
+               '{}'
+           )::TEXT[]
+    FROM   users u
+    LEFT   JOIN user_roles ur ON ur.user_id = u.user_id
+    LEFT   JOIN roles r       ON r.role_id  = ur.role_id
+    WHERE  u.user_id = p_user
+    GROUP  BY u.user_id;
+END;
+$$ LANGUAGE plpgsql;
+
+------------------------------------------------------------------
+-- Feito!  psql -U jorgeavlobo -f migrations/005_link_telegram_and_get_user.sql
+------------------------------------------------------------------
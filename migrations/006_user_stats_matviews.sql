@@ -0,0 +1,69 @@
+-- ======================================================================
+--  006 – Estatísticas de utilizadores materializadas        (2026-10)
+--
+--  • mv_user_stats  – contagens para o ecrã «Estatísticas» do admin:
+--        kind = 'total'  key = 'users'        n = utilizadores
+--        kind = 'role'   key = <role_name>    n = utilizadores com a role
+--        kind = 'linked' key = <role_name>    n = … com Telegram ligado
+--        kind = 'week'   key = <segunda-feira> n = novos utilizadores,
+--                                           n_by_staff = criados por alguém
+--                                           (created_by), últimas 12 semanas
+--  • refresh_user_stats() – REFRESH … CONCURRENTLY (as leituras não
+--    bloqueiam); chamada pelo bot (bot.database.stats) periodicamente
+--    e depois de lotes de escritas.
+--
+--  CONCURRENTLY exige um índice UNIQUE na vista.  As roles continuam a
+--  ser lidas ao vivo (get_user_roles): a autorização não pode esperar
+--  pelo próximo refresh.
+-- ======================================================================
+
+\connect fisina
+SET search_path = public;
+
+/* ───────────── mv_user_stats ───────────── */
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_user_stats AS
+WITH linked AS (                                   -- utilizadores com Telegram
+    SELECT DISTINCT user_id
+    FROM   user_phones
+    WHERE  telegram_user_id IS NOT NULL
+), weeks AS (
+    SELECT generate_series(
+               date_trunc('week', now()) - interval '11 weeks',
+               date_trunc('week', now()),
+               interval '1 week') AS week
+)
+SELECT 'total'::text AS kind, 'users'::text AS key,
+       count(*)::bigint AS n, NULL::bigint AS n_by_staff, now() AS refreshed_at
+FROM   users
+UNION ALL
+SELECT 'role', r.role_name, count(ur.user_id), NULL, now()
+FROM   roles r
+LEFT   JOIN user_roles ur USING(role_id)
+GROUP  BY r.role_name
+UNION ALL
+SELECT 'linked', r.role_name, count(l.user_id), NULL, now()
+FROM   roles r
+LEFT   JOIN user_roles ur USING(role_id)
+LEFT   JOIN linked l     USING(user_id)
+GROUP  BY r.role_name
+UNION ALL
+SELECT 'week', to_char(w.week, 'YYYY-MM-DD'),
+       count(u.user_id), count(u.created_by), now()
+FROM   weeks w
+LEFT   JOIN users u
+       ON u.created_at >= w.week AND u.created_at < w.week + interval '1 week'
+GROUP  BY w.week;
+
+CREATE UNIQUE INDEX IF NOT EXISTS ux_mv_user_stats_kind_key
+    ON mv_user_stats(kind, key);
+
+/* para a contagem semanal não varrer users inteira */
+CREATE INDEX IF NOT EXISTS ix_users_created_at
+    ON users(created_at);
+
+/* ───────────── refresh ───────────── */
+CREATE OR REPLACE FUNCTION refresh_user_stats() RETURNS void AS $$
+BEGIN
+    REFRESH MATERIALIZED VIEW CONCURRENTLY mv_user_stats;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,55 @@
+-- ======================================================================
+--  007 – Cache local da faturação Moloni                    (2026-10)
+--
+--  • moloni_documents    – faturas e recibos, uma linha por documento
+--                          Moloni (document_id); kind = 'invoice' | 'payment'
+--  • moloni_customers    – clientes já com histórico completo descarregado
+--                          (backfill por cliente quando é ligado a um user)
+--  • moloni_sync_cursor  – cursor «lastmodified» da sincronização incremental
+--
+--  Escrito apenas pelo bot (bot.database.billing); os ecrãs «Pagamentos»
+--  e «Faturas» lêem daqui e nunca chamam a API Moloni.
+-- ======================================================================
+
+\connect fisina
+SET search_path = public;
+
+/* ───────────── documentos ───────────── */
+CREATE TABLE IF NOT EXISTS moloni_documents (
+    document_id    BIGINT PRIMARY KEY,                 -- id Moloni
+    customer_id    INTEGER NOT NULL,                   -- = users.moloni_customer_id
+    kind           TEXT NOT NULL,
+    doc_type       VARCHAR(5) NOT NULL,                -- SAF-T: FT, FR, FS, NC, RC…
+    number         TEXT NOT NULL,                      -- «FT A/123»
+    doc_date       DATE NOT NULL,
+    due_date       DATE,
+    gross_value    NUMERIC(12,2) NOT NULL,
+    paid_value     NUMERIC(12,2) NOT NULL DEFAULT 0,   -- reconciled_value
+    status         SMALLINT NOT NULL,                  -- 0 rascunho · 1 fechado · 2 anulado
+    lastmodified   TIMESTAMPTZ NOT NULL,
+    synced_at      TIMESTAMPTZ NOT NULL DEFAULT now(),
+
+    CONSTRAINT chk_moloni_documents_kind
+        CHECK (kind IN ('invoice', 'payment'))
+);
+
+/* ecrã do paciente: documentos de um cliente, mais recentes primeiro */
+CREATE INDEX IF NOT EXISTS ix_moloni_documents_customer
+    ON moloni_documents(customer_id, kind, doc_date DESC);
+
+/* ecrãs do contabilista: últimos documentos de cada tipo */
+CREATE INDEX IF NOT EXISTS ix_moloni_documents_kind_date
+    ON moloni_documents(kind, doc_date DESC);
+
+/* ───────────── clientes com backfill feito ───────────── */
+CREATE TABLE IF NOT EXISTS moloni_customers (
+    customer_id    INTEGER PRIMARY KEY,
+    backfilled_at  TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+/* ───────────── cursor da sincronização ───────────── */
+CREATE TABLE IF NOT EXISTS moloni_sync_cursor (
+    name           TEXT PRIMARY KEY,                   -- 'documents'
+    lastmodified   TIMESTAMPTZ NOT NULL,
+    synced_at      TIMESTAMPTZ NOT NULL DEFAULT now()
+);
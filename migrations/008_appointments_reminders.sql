@@ -0,0 +1,130 @@
+-- ======================================================================
+--  008 – Marcações e lembretes                               (2026-10)
+--
+--  • appointments           – sessões (paciente, fisioterapeuta, início)
+--  • appointment_reminders  – um lembrete por (marcação, chat, antecedência);
+--                             criados pelo dispatcher (bot.database.appointments)
+--                             para o paciente e os seus cuidadores
+--                             (caregiver_patients) com Telegram ligado
+--
+--  Ciclo de vida de um lembrete:
+--      pending ──claim (FOR UPDATE SKIP LOCKED)──▶ sending ──▶ sent | failed
+--         ▲                                           │
+--         └────────── erro temporário (429, rede) ────┘
+--      pending ──▶ cancelled (marcação cancelada) | skipped (sessão já passou)
+--
+--  Um lembrete «sending» nunca volta a «pending» por timeout: se o worker
+--  morrer a meio, passa a «failed» – nunca há lembretes em duplicado.
+-- ======================================================================
+
+\connect fisina
+SET search_path = public;
+
+/* ───────────── marcações ───────────── */
+CREATE TABLE IF NOT EXISTS appointments (
+    appointment_id      UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    patient_id          UUID NOT NULL
+        REFERENCES users(user_id) ON DELETE CASCADE,
+    physiotherapist_id  UUID
+        REFERENCES users(user_id) ON DELETE SET NULL,
+    starts_at           TIMESTAMPTZ NOT NULL,
+    ends_at             TIMESTAMPTZ,
+    status              TEXT NOT NULL DEFAULT 'scheduled',
+    location            TEXT,
+    notes               TEXT,
+
+    created_by          UUID REFERENCES users(user_id),
+    created_at          TIMESTAMPTZ NOT NULL DEFAULT now(),
+    updated_at          TIMESTAMPTZ NOT NULL DEFAULT now(),
+
+    CONSTRAINT chk_appointments_status
+        CHECK (status IN ('scheduled', 'cancelled', 'done', 'no_show'))
+);
+
+CREATE TRIGGER trg_appointments_updated
+BEFORE UPDATE ON appointments
+FOR EACH ROW EXECUTE FUNCTION set_updated_at();
+
+CREATE INDEX IF NOT EXISTS ix_appointments_patient
+    ON appointments(patient_id, starts_at);
+CREATE INDEX IF NOT EXISTS ix_appointments_physio
+    ON appointments(physiotherapist_id, starts_at);
+
+/* planeamento: só as sessões marcadas das próximas horas */
+CREATE INDEX IF NOT EXISTS ix_appointments_upcoming
+    ON appointments(starts_at) WHERE status = 'scheduled';
+
+/* ───────────── lembretes ───────────── */
+CREATE TABLE IF NOT EXISTS appointment_reminders (
+    reminder_id     BIGSERIAL PRIMARY KEY,
+    appointment_id  UUID NOT NULL
+        REFERENCES appointments(appointment_id) ON DELETE CASCADE,
+    recipient_id    UUID NOT NULL
+        REFERENCES users(user_id) ON DELETE CASCADE,
+    chat_id         BIGINT NOT NULL,                    -- user_phones.telegram_user_id
+    lead            INTERVAL NOT NULL,                  -- antecedência (ex.: 24 h)
+    due_at          TIMESTAMPTZ NOT NULL,               -- starts_at - lead
+    status          TEXT NOT NULL DEFAULT 'pending',
+    attempts        SMALLINT NOT NULL DEFAULT 0,
+    claimed_by      TEXT,
+    claimed_at      TIMESTAMPTZ,
+    sent_at         TIMESTAMPTZ,
+    message_id      BIGINT,
+    error           TEXT,
+    created_at      TIMESTAMPTZ NOT NULL DEFAULT now(),
+
+    CONSTRAINT uq_appointment_reminders UNIQUE (appointment_id, chat_id, lead),
+    CONSTRAINT chk_appointment_reminders_status
+        CHECK (status IN ('pending', 'sending', 'sent', 'failed', 'cancelled', 'skipped'))
+);
+
+/* scan dos lembretes a enviar: só as linhas pendentes, por due_at –
+   o índice fica do tamanho da fila, não do histórico */
+CREATE INDEX IF NOT EXISTS ix_appointment_reminders_due
+    ON appointment_reminders(due_at) WHERE status = 'pending';
+
+/* recuperação de envios interrompidos (worker morto a meio) */
+CREATE INDEX IF NOT EXISTS ix_appointment_reminders_sending
+    ON appointment_reminders(claimed_at) WHERE status = 'sending';
+
+/* ───────────── remarcação / cancelamento ───────────── */
+-- A chave (marcação, chat, antecedência) não inclui a hora: plan() não
+-- volta a criar um lembrete que já existe, por isso é aqui que ele
+-- recomeça:
+--  • desmarcada         → pendentes passam a cancelled;
+--  • remarcada          → todos (enviados, falhados, a enviar…) voltam a
+--                         pending para a nova hora – um «sending» em curso
+--                         era da hora antiga e o record() do worker já não
+--                         o apanha (exige status = 'sending');
+--  • de novo 'scheduled' → os cancelled voltam a pending.
+-- Antecedências que já passaram ficam skipped, como plan() faz para
+-- marcações feitas em cima da hora.
+CREATE OR REPLACE FUNCTION trg_appointment_reminders_sync() RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.status <> 'scheduled' THEN
+        UPDATE appointment_reminders
+        SET    status = 'cancelled'
+        WHERE  appointment_id = NEW.appointment_id AND status = 'pending';
+    ELSIF NEW.starts_at IS DISTINCT FROM OLD.starts_at OR OLD.status <> 'scheduled' THEN
+        UPDATE appointment_reminders
+        SET    status     = CASE WHEN NEW.starts_at - lead > now() THEN 'pending' ELSE 'skipped' END,
+               due_at     = NEW.starts_at - lead,
+               attempts   = 0,
+               claimed_by = NULL,
+               claimed_at = NULL,
+               sent_at    = NULL,
+               message_id = NULL,
+               error      = NULL
+        WHERE  appointment_id = NEW.appointment_id
+          AND  (NEW.starts_at IS DISTINCT FROM OLD.starts_at OR status = 'cancelled');
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_appointments_reminders ON appointments;
+CREATE TRIGGER trg_appointments_reminders
+AFTER UPDATE OF starts_at, status ON appointments
+FOR EACH ROW EXECUTE FUNCTION trg_appointment_reminders_sync();
+
+-- Feito!  psql -U jorgeavlobo -f migrations/008_appointments_reminders.sql
@@ -0,0 +1,101 @@
+-- ======================================================================
+--  009 – Telefones canónicos (E.164) + índice de pesquisa    (2026-10)
+--
+--  O onboarding procura o utilizador pelo número do contacto Telegram
+--  (get_user_by_phone: phone_number = $1), mas os números gravados nem
+--  sempre tinham o mesmo formato:
+--    • «4407700900123» – add_user antigo juntava indicativo + número
+--      nacional com o «0» (o Telegram envia 447700900123);
+--    • «912345678»     – telemóveis PT inseridos sem indicativo.
+--  O bot passou a gravar tudo via bot.utils.phone.canonical; aqui:
+--    1. canonical_phone(dígitos) – as mesmas regras para números já só
+--       com dígitos (o CHECK de user_phones garante-o);
+--    2. backfill – corrige as linhas; se o utilizador já tiver o número
+--       canónico, as duas linhas fundem-se (telegram_user_id e
+--       is_primary passam para a que fica);
+--    3. ix_user_phones_number – a pesquisa por número deixa de ler a
+--       tabela toda (o único índice era (user_id, phone_number)).
+--
+--  Cada alteração fica em user_phones_backfill_009 (auditoria / reverter).
+--  Idempotente: correr outra vez não encontra nada para mudar.
+-- ======================================================================
+
+\connect fisina
+SET search_path = public;
+
+/* ───────────── regras (espelho de bot.utils.phone) ───────────── */
+-- Indicativos com prefixo nacional «0» em _RULES:
+--   31 32 33 41 43 44 46 49 55 61 91 92 93 353 961 962 963 964 966 967
+-- (os indicativos não são prefixo uns dos outros – a alternância é inequívoca).
+-- PT sem indicativo: só telemóveis (91/92/93/96 – quem tem Telegram); um fixo
+-- «2xxxxxxxx» confunde-se com números E.164 curtos de indicativos 2xx e fica.
+CREATE OR REPLACE FUNCTION canonical_phone(p_digits TEXT)
+RETURNS TEXT
+LANGUAGE sql IMMUTABLE STRICT PARALLEL SAFE AS $$
+    SELECT CASE
+        WHEN p_digits ~ '^9[1236][0-9]{7}$'
+            THEN '351' || p_digits
+        WHEN p_digits ~ '^(31|32|33|41|43|44|46|49|55|61|91|92|93|353|961|962|963|964|966|967)0[1-9]'
+            THEN regexp_replace(p_digits, '^(31|32|33|41|43|44|46|49|55|61|91|92|93|353|961|962|963|964|966|967)0', '\1')
+        WHEN p_digits ~ '^11[2-9][0-9]{9}$'                 -- NANP com o «1» nacional
+            THEN substr(p_digits, 2)
+        ELSE p_digits
+    END
+$$;
+
+/* ───────────── backfill ───────────── */
+CREATE TABLE IF NOT EXISTS user_phones_backfill_009 (
+    phone_id    UUID PRIMARY KEY,                    -- linha alterada (ou apagada)
+    user_id     UUID NOT NULL,
+    old_number  VARCHAR(20) NOT NULL,
+    new_number  VARCHAR(20) NOT NULL,
+    action      TEXT NOT NULL,                       -- 'updated' | 'merged'
+    done_at     TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+DO $$
+DECLARE
+    r     RECORD;
+    keep  UUID;
+    n_upd INT := 0;
+    n_mrg INT := 0;
+BEGIN
+    FOR r IN
+        SELECT phone_id, user_id, phone_number,
+               canonical_phone(phone_number) AS canon,
+               telegram_user_id, is_primary
+        FROM   user_phones
+        WHERE  canonical_phone(phone_number) <> phone_number
+        ORDER  BY user_id, is_primary DESC
+        FOR UPDATE
+    LOOP
+        SELECT phone_id INTO keep
+        FROM   user_phones
+        WHERE  user_id = r.user_id AND phone_number = r.canon;
+
+        IF keep IS NULL THEN
+            UPDATE user_phones SET phone_number = r.canon WHERE phone_id = r.phone_id;
+            INSERT INTO user_phones_backfill_009 (phone_id, user_id, old_number, new_number, action)
+            VALUES (r.phone_id, r.user_id, r.phone_number, r.canon, 'updated');
+            n_upd := n_upd + 1;
+        ELSE
+            -- apagar primeiro: telegram_user_id e is_primary têm índices únicos
+            DELETE FROM user_phones WHERE phone_id = r.phone_id;
+            UPDATE user_phones
+            SET    telegram_user_id = COALESCE(telegram_user_id, r.telegram_user_id),
+                   is_primary       = is_primary OR r.is_primary
+            WHERE  phone_id = keep;
+            INSERT INTO user_phones_backfill_009 (phone_id, user_id, old_number, new_number, action)
+            VALUES (r.phone_id, r.user_id, r.phone_number, r.canon, 'merged');
+            n_mrg := n_mrg + 1;
+        END IF;
+    END LOOP;
+    RAISE NOTICE 'user_phones: % números corrigidos, % fundidos', n_upd, n_mrg;
+END
+$$;
+
+/* ───────────── índice de pesquisa ───────────── */
+CREATE INDEX IF NOT EXISTS ix_user_phones_number
+    ON user_phones(phone_number);
+
+ANALYZE user_phones;